@@ -1,7 +1,14 @@
 from apps.sequences.models import ChordSequence, Chord, ChordType, Source
 from django.contrib import admin
 
+class ChordAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        obj.save()
+        # Keep the sequence's annotation counts up to date
+        if obj.sequence_id is not None:
+            obj.sequence.update_stored_info()
+
 admin.site.register(Source)
 admin.site.register(ChordSequence)
-admin.site.register(Chord)
+admin.site.register(Chord, ChordAdmin)
 admin.site.register(ChordType)
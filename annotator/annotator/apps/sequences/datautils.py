@@ -39,9 +39,11 @@ def pickle_all_sequences(query=None, filter=None, no_names=False):
     """
     from apps.sequences.models import ChordSequence
     # Get all the sequences from the database
-    seqs = ChordSequence.objects.all()
+    seqs = ChordSequence.objects.select_related('song', 'source')
     if query is not None:
         seqs = seqs.filter(query)
+    # Fetch all the chords at once, rather than a query per chord
+    seqs = ChordSequence.load_chords(seqs)
     # Apply a filter if one was given
     if filter is not None:
         seqs = [s for s in seqs if filter(s)]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.signals import post_save, pre_delete
 import simplejson as json
 
 from apps.sequences.utils import get_chord_list_from_sequence
@@ -31,23 +32,28 @@ class Chord(models.Model):
     duration = models.IntegerField()
     category = models.CharField(max_length=20, blank=True, null=True)
     sequence = models.ForeignKey('ChordSequence', blank=True, null=True)
+    position = models.IntegerField(blank=True, null=True, editable=False, help_text="Index of the chord within its sequence. This is maintained when the sequence is saved.")
     
-    def to_list(self):
-        if self.next is None:
-            tail = []
-        else:
-            tail = self.next.to_list()
-        tail.append({
+    def to_dict(self):
+        """ The chord's data, as used in the JSON chord sequence data. """
+        return {
             'id': self.id,
             'root': self.root,
-            'type': self.type.id,
+            'type': self.type_id,
             'duration': self.duration,
             'category': self.category,
             'additions': self.additions,
             'bass': self.bass,
             'coord_unresolved' : self.treeinfo.coord_unresolved,
             'coord_resolved' : self.treeinfo.coord_resolved,
-        })
+        }
+    
+    def to_list(self):
+        if self.next is None:
+            tail = []
+        else:
+            tail = self.next.to_list()
+        tail.append(self.to_dict())
         return tail
         
     def __unicode__(self):
@@ -86,6 +92,13 @@ class Chord(models.Model):
         return chord
         
     def _get_treeinfo(self):
+        if hasattr(self, "_prefetched_treeinfo"):
+            # Set by the bulk loader: the chord may not have one yet
+            if self._prefetched_treeinfo is not None:
+                return self._prefetched_treeinfo
+            new_info = TreeInfo()
+            new_info.chord = self
+            return new_info
         try:
             return self._treeinfo
         except TreeInfo.DoesNotExist:
@@ -99,9 +112,9 @@ class Chord(models.Model):
         """
         The index of the chord within its sequence.
         """
-        if not hasattr(self, "__index"):
-            self.__index = list(self.sequence.iterator()).index(self)
-        return self.__index
+        if self.position is None:
+            self.position = list(self.sequence.iterator()).index(self)
+        return self.position
     
 class Song(models.Model):
     """
@@ -124,6 +137,15 @@ class ChordSequence(models.Model):
     """
     A chord sequence for a song.
     
+    The number of chords and annotated chords and the position of each 
+    chord are stored, so that listing sequences doesn't need to load all 
+    their chords. These are updated by L{update_stored_info} when the 
+    sequence is saved. Anything that changes the chords without saving 
+    the sequence should call it once it's done. If a chord is saved, or 
+    deleted while it's still in the sequence, the stored info is cleared, 
+    so it gets computed from the chords until it's next updated, rather 
+    than being wrong.
+    
     """
     song = models.ForeignKey(Song, null=True)
     description = models.CharField(max_length=256, blank=True, null=True, help_text="Descriptive text specific to this chord sequence, distinguishing it from others for the same song.")
@@ -134,10 +156,99 @@ class ChordSequence(models.Model):
     omissions = models.TextField(blank=True, null=True, help_text="A simple list of the gaps in the analyis")
     source = models.ForeignKey(Source, null=True, help_text="Where the sequence came from")
     alternative = models.BooleanField(help_text="This is an alternative annotation of the chord sequence. It will not be included in the default exported data set, unless requested for consistency testing")
+    num_chords = models.IntegerField(blank=True, null=True, editable=False, help_text="Number of chords in the sequence. This is maintained when the sequence is saved.")
+    num_annotated = models.IntegerField(blank=True, null=True, editable=False, help_text="Number of chords in the sequence that have a category. This is maintained when the sequence is saved.")
+    
+    @staticmethod
+    def load_chords(sequences):
+        """
+        Bulk loader for the chords of many sequences. Fetches all the 
+        chords (and their types and tree info) in a constant number of 
+        queries, instead of following the C{next} pointers one query at 
+        a time, and puts them in order in memory.
+        
+        The ordered chords are stored on each sequence, so that 
+        subsequent calls to L{iterator}, etc don't need to touch the 
+        database.
+        
+        @type sequences: list of L{ChordSequence}s
+        @return: the sequences that were given
+        
+        """
+        sequences = list(sequences)
+        ids = [seq.id for seq in sequences if seq.id is not None]
+        if len(ids) == 0:
+            return sequences
+        
+        chords = dict([(chord.id, chord) for chord in 
+                        Chord.objects.filter(sequence__in=ids)\
+                                                    .select_related('type')])
+        treeinfos = dict([(ti.chord_id, ti) for ti in 
+                        TreeInfo.objects.filter(chord__sequence__in=ids)])
+        for chord in chords.values():
+            chord._prefetched_treeinfo = treeinfos.get(chord.id, None)
+        
+        for seq in sequences:
+            ordered = []
+            chord_id = seq.first_chord_id
+            while chord_id is not None:
+                if chord_id not in chords:
+                    # The chord's sequence pointer doesn't point to this 
+                    #  sequence: fall back to following the next pointers
+                    chord = Chord.objects.select_related('type').get(
+                                                                id=chord_id)
+                    chords[chord_id] = chord
+                chord = chords[chord_id]
+                ordered.append(chord)
+                chord_id = chord.next_id
+            seq._chord_list = ordered
+        return sequences
+    
+    def _get_chords(self):
+        """
+        The chords of the sequence, in order. These are loaded from the 
+        database the first time they're needed.
+        
+        """
+        if not hasattr(self, "_chord_list"):
+            ChordSequence.load_chords([self])
+            if not hasattr(self, "_chord_list"):
+                # Unsaved sequence
+                self._chord_list = []
+        return self._chord_list
+    chords = property(_get_chords)
+    
+    def update_stored_info(self):
+        """
+        Updates the stored chord positions and annotation counts to 
+        reflect the current chords of the sequence. This is called when 
+        the sequence is saved. Anything that changes the chords without 
+        saving the sequence should call it once it's finished.
+        
+        """
+        # Reload the chords, in case they've changed
+        if hasattr(self, "_chord_list"):
+            del self._chord_list
+        chords = self.chords
+        for i,chord in enumerate(chords):
+            if chord.position != i:
+                chord.position = i
+                Chord.objects.filter(id=chord.id).update(position=i)
+        self.num_chords = len(chords)
+        self.num_annotated = len([c for c in chords if c.category])
+        # Always store these: a chord may have cleared them since this 
+        #  instance was loaded
+        ChordSequence.objects.filter(id=self.id).update(
+                                num_chords=self.num_chords, 
+                                num_annotated=self.num_annotated)
+    
+    def save(self, *args, **kwargs):
+        super(ChordSequence, self).save(*args, **kwargs)
+        self.update_stored_info()
     
     def to_json(self):
-        if self.first_chord is not None:
-            chord_data = list(reversed(self.first_chord.to_list()))
+        if self.first_chord_id is not None:
+            chord_data = [chord.to_dict() for chord in self.chords]
         else:
             chord_data = {}
         return json.dumps(chord_data)
@@ -169,12 +280,12 @@ class ChordSequence(models.Model):
         super(ChordSequence, self).delete()
         
     def iterator(self):
-        chord = self.first_chord
-        while chord is not None:
-            yield chord
-            chord = chord.next
+        return iter(self.chords)
             
     def _get_number_annotated(self):
+        if self.num_chords is not None and self.num_annotated is not None:
+            # Use the stored counts
+            return (self.num_annotated, self.num_chords)
         total = 0
         annotated = 0
         for chord in self.iterator():
@@ -194,6 +305,8 @@ class ChordSequence(models.Model):
         True if every chord in the sequence is annotated. This should 
         usually be a bit quicker than checking percentage_annotated.
         """
+        if self.num_chords is not None and self.num_annotated is not None:
+            return self.num_annotated == self.num_chords
         for chord in self.iterator():
             if chord.category is None or chord.category == "":
                 return False
@@ -201,7 +314,9 @@ class ChordSequence(models.Model):
     fully_annotated = property(_get_fully_annotated)
     
     def _get_length(self):
-        return len(list(self.iterator()))
+        if self.num_chords is not None:
+            return self.num_chords
+        return len(self.chords)
     length = property(_get_length)
     __len__ = _get_length
     
@@ -217,9 +332,11 @@ class ChordSequence(models.Model):
             analysis_omitted=self.analysis_omitted, omissions=self.omissions,
             source=self.source.name, id=self.id)
         # Mirror all the chords too
-        if self.first_chord is not None:
-            chord = self.first_chord.get_mirror(sequence)
-        sequence.first_chord = chord
+        chords = [chord.get_chord_mirror(sequence) for chord in self.chords]
+        for chord,next_chord in zip(chords, chords[1:]):
+            chord.next = next_chord
+        if len(chords):
+            sequence.first_chord = chords[0]
         return sequence
     mirror = property(get_mirror)
     
@@ -236,6 +353,36 @@ class ChordSequence(models.Model):
         return self.song.key
     key = property(_get_key)
     
+def _chord_changed(sender, instance, **kwargs):
+    """
+    Clears the stored info of a chord's sequence when the chord is saved 
+    or deleted, in case nothing updates it. This takes a constant number 
+    of queries, so doesn't slow down views that save every chord of a 
+    sequence before updating it.
+    
+    """
+    if instance.sequence_id is None:
+        return
+    ChordSequence.objects.filter(id=instance.sequence_id).update(
+                                    num_chords=None, num_annotated=None)
+    Chord.objects.filter(sequence=instance.sequence_id).update(position=None)
+
+def _chord_deleted(sender, instance, **kwargs):
+    """
+    Clears the stored info of a chord's sequence when a chord that's 
+    still linked into it is deleted. Chords that have already been taken 
+    out of the sequence (as the edit view does) make no difference.
+    
+    """
+    if instance.sequence_id is None:
+        return
+    if Chord.objects.filter(next=instance.id).count() or \
+            ChordSequence.objects.filter(first_chord=instance.id).count():
+        _chord_changed(sender, instance)
+
+post_save.connect(_chord_changed, sender=Chord)
+pre_delete.connect(_chord_deleted, sender=Chord)
+
 class TreeInfo(models.Model):
     """
     Associates information with a chord that is relevant to building 
@@ -1,11 +1,163 @@
-"""
-This file demonstrates two different styles of tests (one doctest and one
-unittest). These will both pass when you run "manage.py test".
+from django.test import TestCase
+from django.conf import settings
+from django.db import connection
+from django.contrib import admin
 
-Replace these with more appropriate tests for your application.
-"""
+from apps.sequences.admin import ChordAdmin
 
-from django.test import TestCase
+from apps.sequences.models import ChordSequence, Chord, ChordType, Song, \
+                        Source
+
+class StoredInfoTest(TestCase):
+    """
+    The chord positions and annotation counts stored on sequences and 
+    chords should be kept up to date as the sequence is edited, in the 
+    way the views edit them.
+    
+    """
+    fixtures = ['chord_types.json']
+    
+    def setUp(self):
+        song = Song(name="Test song")
+        song.save()
+        source = Source(name="Test source")
+        source.save()
+        self.sequence = ChordSequence(song=song, source=source, bar_length=4)
+        self.sequence.save()
+        self.chord_type = ChordType.objects.get(pk=1)
+        self.chords = self._make_chords(["T", None, "D", ""])
+        self._link(self.chords)
+    
+    def _make_chords(self, categories):
+        chords = []
+        for root,category in enumerate(categories):
+            chord = Chord(root=root, type=self.chord_type, duration=1, 
+                          category=category, sequence=self.sequence)
+            chord.save()
+            chords.append(chord)
+        return chords
+    
+    def _link(self, chords):
+        """ Chains the chords together and saves the sequence. """
+        for chord,next_chord in zip(chords, chords[1:]+[None]):
+            chord.next = next_chord
+            chord.save()
+        if len(chords):
+            self.sequence.first_chord = chords[0]
+        else:
+            self.sequence.first_chord = None
+        self.sequence.save()
+    
+    def _check(self, chords, annotated):
+        # Reload everything from the database
+        sequence = ChordSequence.objects.get(id=self.sequence.id)
+        self.assertEqual(sequence.num_chords, len(chords))
+        self.assertEqual(sequence.num_annotated, annotated)
+        self.assertEqual(sequence.number_annotated, (annotated, len(chords)))
+        self.assertEqual(sequence.length, len(chords))
+        self.assertEqual(sequence.fully_annotated, annotated == len(chords))
+        self.assertEqual([c.id for c in sequence.iterator()], 
+                         [c.id for c in chords])
+        for i,chord in enumerate(chords):
+            self.assertEqual(Chord.objects.get(id=chord.id).position, i)
+    
+    def test_create(self):
+        self._check(self.chords, 2)
+    
+    def test_reannotate(self):
+        # The reannotation view and scripts save the chords, not the 
+        #  sequence, then update the stored info once at the end
+        sequence = ChordSequence.objects.get(id=self.sequence.id)
+        for chord in sequence.iterator():
+            chord.category = "T"
+            chord.save()
+        sequence.update_stored_info()
+        self._check(self.chords, 4)
+        
+        for chord in sequence.iterator():
+            chord.category = ""
+            chord.save()
+        sequence.update_stored_info()
+        self._check(self.chords, 0)
+    
+    def test_chord_saved(self):
+        """ Saving a single chord on its own through the admin """
+        chord = Chord.objects.get(id=self.chords[1].id)
+        chord.category = "S"
+        ChordAdmin(Chord, admin.site).save_model(None, chord, None, True)
+        self._check(self.chords, 3)
+    
+    def test_chord_save_queries(self):
+        """
+        Saving the chords of a sequence shouldn't touch the rest of the 
+        sequence each time: the number of queries should be linear in 
+        the length of the sequence.
+        
+        """
+        sequence = ChordSequence.objects.get(id=self.sequence.id)
+        chords = list(sequence.iterator())
+        settings.DEBUG = True
+        try:
+            connection.queries = []
+            for chord in chords:
+                chord.category = "T"
+                chord.save()
+            # Saving, and clearing the sequence's stored info
+            self.assertTrue(len(connection.queries) <= 4*len(chords))
+        finally:
+            settings.DEBUG = False
+        sequence.update_stored_info()
+        self._check(self.chords, 4)
+    
+    def test_not_updated(self):
+        """
+        If a chord's changed and nothing updates the stored info, it 
+        should be cleared rather than left wrong.
+        
+        """
+        chord = Chord.objects.get(id=self.chords[1].id)
+        chord.category = "S"
+        chord.save()
+        sequence = ChordSequence.objects.get(id=self.sequence.id)
+        self.assertEqual(sequence.num_chords, None)
+        self.assertEqual(sequence.num_annotated, None)
+        self.assertEqual(sequence.number_annotated, (3, 4))
+        self.assertEqual([c.index for c in sequence.iterator()], range(4))
+        # Updating it should store it again
+        sequence.update_stored_info()
+        self._check(self.chords, 3)
+    
+    def test_remove(self):
+        # Take out the first and the third chord
+        removed = [self.chords[0], self.chords[2]]
+        chords = [self.chords[1], self.chords[3]]
+        self._link(chords)
+        for chord in removed:
+            chord.delete()
+        self._check(chords, 0)
+        
+        # Remove all of them
+        self._link([])
+        self._check([], 0)
+    
+    def test_insert(self):
+        # Add chords at the start and in the middle
+        new_chords = self._make_chords(["S", "D"])
+        chords = [new_chords[0]] + self.chords[:2] + [new_chords[1]] + \
+                    self.chords[2:]
+        self._link(chords)
+        self._check(chords, 4)
+    
+    def test_not_stored(self):
+        """ Sequences saved before the counts were stored """
+        ChordSequence.objects.filter(id=self.sequence.id).update(
+                                        num_chords=None, num_annotated=None)
+        Chord.objects.filter(sequence=self.sequence).update(position=None)
+        sequence = ChordSequence.objects.get(id=self.sequence.id)
+        self.assertEqual(sequence.number_annotated, (2, 4))
+        self.assertEqual(sequence.length, 4)
+        self.assertEqual([chord.index for chord in sequence.iterator()], 
+                         range(4))
 
 class SimpleTest(TestCase):
     def test_basic_addition(self):
@@ -47,14 +47,18 @@ def song_index(request):
     return render_to_response('sequences/song_index.html', context, RequestContext(request))
     
 def index_with_stats(request):
-    sequences = ChordSequence.objects.all().order_by('name')
+    sequences = list(ChordSequence.objects.select_related('song').order_by('name'))
+    # The annotation stats are stored on the sequences, but load the 
+    #  chords in one go for any that don't have them yet
+    ChordSequence.load_chords([s for s in sequences if s.num_chords is None \
+                                                or s.num_annotated is None])
     sequences_by_letter = [(key, list(data)) for key,data in itertools.groupby(sequences, lambda s: s.name[0])]
     # All sequences that haven't been annotated yet
-    unannotated = ChordSequence.objects.filter(analysis_omitted=True)
+    unannotated = [s for s in sequences if s.analysis_omitted]
     # Some helpful stats
-    annotated = ChordSequence.objects.filter(analysis_omitted=False)
+    annotated = [s for s in sequences if not s.analysis_omitted]
     num_annotated_greatly = len([s for s in annotated if s.percentage_annotated >= 80.0])
-    num_annotated_little = annotated.count() - num_annotated_greatly
+    num_annotated_little = len(annotated) - num_annotated_greatly
     context = {
         'sequences' : sequences,
         'sequences_by_letter' : sequences_by_letter,
@@ -302,6 +306,8 @@ def view_sequences(request):
         if 'include_analysis_omitted' not in request.GET:
             sequences = sequences.filter(analysis_omitted=False)
         if not show_all:
+            # Get all the chords we'll need to check at once
+            sequences = ChordSequence.load_chords(sequences)
             sequence_list = []
             # Check each sequence for whether we should include it
             for sequence in sequences:
@@ -394,6 +400,8 @@ def annotate_sequence(request, id):
                 # This view can only change the annotations on a sequence
                 for cf in chord_forms:
                     cf.save()
+                # Update the annotation counts for the new categories
+                sequence.update_stored_info()
                 
                 if 'save_and_exit' in request.POST:
                     return HttpResponseRedirect(reverse(index))
@@ -510,6 +518,8 @@ def reannotate_sequence(request, id, new=False):
                     tree.coord_unresolved = False
                     tree.save()
                 chords.append(chord)
+            # Update the annotation counts for the new categories
+            sequence.update_stored_info()
             
             if 'save_and_exit' in request.POST:
                 return HttpResponseRedirect(reverse(index))
@@ -235,6 +235,9 @@ def reannotate(opts, args):
         for crd,val in assignment.items():
             crd.category = val
             crd.save()
+        # Update the annotation counts once for each changed sequence
+        for seq in replaced:
+            seq.update_stored_info()
         print "Replacements made:"
         for seq,num in replaced.items():
             print "%s: %d" % (seq.name.encode('ascii','replace'), num)
@@ -14,6 +14,7 @@ def set_sequence_pointers():
             chord.sequence = sequence
             chord.save()
             chord = chord.next
+        sequence.update_stored_info()
     print "Done all sequences"
     
 def main():
@@ -0,0 +1,18 @@
+## I've just added stored chord positions and annotation counts to the 
+## models. This goes through all the sequences and fills them in.
+
+import sys
+
+from apps.sequences.models import ChordSequence
+
+def update_sequence_info():
+    for sequence in ChordSequence.objects.select_related('song'):
+        print "Updating %s" % sequence.name
+        sequence.update_stored_info()
+    print "Done all sequences"
+    
+def main():
+    sys.exit(update_sequence_info())
+    
+if __name__ == "__main__":
+    main()
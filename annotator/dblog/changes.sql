@@ -120,3 +120,9 @@ COMMIT;
 
 /** Adding "alternative" column to the ChordSequence model **/
 ALTER TABLE sequences_chordsequence ADD COLUMN "alternative" bool NOT NULL DEFAULT 0;
+
+/** Adding stored chord positions and annotation counts **/
+/* Run bin/update_sequence_info.py afterwards to fill them in */
+ALTER TABLE sequences_chord ADD COLUMN "position" integer;
+ALTER TABLE sequences_chordsequence ADD COLUMN "num_chords" integer;
+ALTER TABLE sequences_chordsequence ADD COLUMN "num_annotated" integer;
@@ -35,17 +35,21 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 import sys, datetime, numpy
 from optparse import OptionParser
 
-from jazzparser.data.parsing import ParseResults
+from jazzparser.data.parsing import ParseResults, ResultsStore
 # Currently specific to music_halfspan formalism: could take an option to 
 #  select formalism
 from jazzparser.formalisms.music_halfspan import Formalism as formalism
 from jazzparser.formalisms.base.semantics.distance import command_line_metric
+from jazzparser.evaluation.batch import evaluate_files, evaluate_store, \
+                            EvaluationCache
 
 def main():
     usage = "%prog [options] <results-files>"
     description = "Evaluates parse results stored in files by comparing "\
         "them to the gold standard results stored with them, using any "\
-        "a variety of metrics."
+        "a variety of metrics. The files may be results files for "\
+        "individual inputs or results stores (parser option --store), "\
+        "in which case every input in the store is evaluated."
     parser = OptionParser(usage=usage, description=description)
     parser.add_option("--errors", dest="errors", action="store_true", help="display errors reading in the files.")
     parser.add_option("--unscored", dest="unscored", action="store_true", help="output a list of files containing no results (i.e. no successful full parses) and exit")
@@ -53,9 +57,11 @@ def main():
     parser.add_option("-m", "--metric", dest="metric", action="store", help="semantics distance metric to use. Use '-m help' for a list of available metrics")
     parser.add_option("--mopt", "--metric-options", dest="mopts", action="append", help="options to pass to the semantics metric. Use with '--mopt help' with -m to see available options")
     parser.add_option("--mc", "--metric-computation", dest="print_computation", action="store_true", help="show the metric's computation trace for each input")
-    parser.add_option("-f", "--f-score", dest="f_score", action="store_true", help="outputs recall, precision and f-score for an f-score-based metric. Just uses the same metric 3 times with output=recall, etc. Will only work with appropriate metrics")
+    parser.add_option("-f", "--f-score", dest="f_score", action="store_true", help="outputs recall, precision and f-score for an f-score-based metric. The metric is computed once for each input and all three values derived from it. Will only work with appropriate metrics")
     parser.add_option("-q", "--quiet", dest="quiet", action="store_true", help="just output the numbers, nothing else")
     parser.add_option("-t", "--time", dest="time", action="store_true", help="output average parse time. This is output by default, but hidden in quiet mode unless this switch is used")
+    parser.add_option("--processes", dest="processes", action="store", type="int", help="number of processes to use to evaluate the files in parallel. Default: 1", default=1)
+    parser.add_option("--cache", dest="cache", action="store", help="file to cache the per-file metric computations in. Only files whose contents have changed since the cache was written will be re-evaluated")
     options, arguments = parser.parse_args()
         
     if options.f_score:
@@ -77,62 +83,86 @@ def main():
         print >>sys.stderr, "Specify at least one file to read the results from"
         sys.exit(1)
     
-    # Try loading all the input files
-    input_pairs = []
+    if options.processes < 1:
+        print >>sys.stderr, "Cannot create %d processes!" % options.processes
+        sys.exit(1)
+    
+    if options.cache is not None:
+        cache = EvaluationCache(options.cache)
+    else:
+        cache = None
+    
+    # Separate out any results stores from the individual results files
+    stores = []
+    filenames = []
+    for filename in arguments:
+        if ResultsStore.is_store(filename):
+            stores.append(filename)
+        else:
+            filenames.append(filename)
+    
+    # Compute the metric stats for each input file
+    # Any metrics that share their stats (e.g. precision and recall 
+    #  variants of the same metric) will only be computed once per file
+    file_evals = evaluate_files(filenames, metrics, 
+                                processes=options.processes, cache=cache)
+    # Keep a note of where to find the inputs from stores
+    store_inputs = {}
+    for store_filename in stores:
+        store_evals = evaluate_store(store_filename, metrics, 
+                                processes=options.processes, cache=cache)
+        for file_eval in store_evals:
+            identifier = file_eval.filename[len(store_filename)+1:]
+            store_inputs[file_eval.filename] = (store_filename, identifier)
+        file_evals.extend(store_evals)
+    if cache is not None:
+        cache.save()
+    
+    input_filenames = []
+    input_stats = dict([(metric.stats_key,[]) for metric in metrics])
     errors = []
     covered = 0
-    input_filenames = []
     times = []
     timed_out = 0
-    for filename in arguments:
-        # We read in the whole file (it's pickled, so we have to), but don't 
-        #  keep the pres object after the loop iteration, because it can 
-        #  be very big
-        try:
-            pres = ParseResults.from_file(filename)
-        except ParseResults.LoadError, err:
+    for file_eval in file_evals:
+        filename = file_eval.filename
+        if file_eval.error is not None:
             if options.errors:
                 # Print all load errors
-                print >>sys.stderr, "Error loading file: %s" % (err)
+                print >>sys.stderr, "Error loading file: %s" % (file_eval.error)
             errors.append(filename)
             continue
         
-        if options.timeout and pres.timed_out:
+        if options.timeout and file_eval.timed_out:
             print "Timed out: %s" % filename
-        if pres.timed_out:
+        if file_eval.timed_out:
             timed_out += 1
         
-        # Try to get a gold standard result
-        gold_result = pres.get_gold_semantics()
-        if gold_result is None:
+        if not file_eval.gold:
             # Can't evaluate this: ignore it
             if not options.quiet:
                 print "No gold result for", filename
             continue
         
-        # Get the top result's semantics
-        if len(pres.semantics) == 0:
+        input_filenames.append(filename)
+        for key,stats in input_stats.items():
+            stats.append(file_eval.stats[key])
+        
+        if not file_eval.result:
             # No results for this
-            input_pairs.append((None, gold_result))
-            input_filenames.append(filename)
             if options.unscored:
                 print "No results: %s" % filename
             continue
-        top_result = pres.semantics[0][1]
         
         # Got a result and gold result for this
         covered += 1
-        input_pairs.append((top_result, gold_result))
-        input_filenames.append(filename)
-        # Check this for compat with old stored results
-        if hasattr(pres, 'cpu_time'):
-            times.append(pres.cpu_time)
+        times.append(file_eval.cpu_time)
     
     if options.unscored or options.timeout:
         # We've output the resultless files: no more to do
         return
         
-    evaluated = len(input_pairs)
+    evaluated = len(input_filenames)
     if evaluated:
         coverage = 100.0 * float(covered) / float(evaluated)
     else:
@@ -145,7 +175,7 @@ def main():
     
     distances = []
     for metric in metrics:
-        distance = metric.total_distance(input_pairs)
+        distance = metric.total_from_stats(input_stats[metric.stats_key])
         if options.quiet:
             print metric.format_distance(distance)
         else:
@@ -155,14 +185,29 @@ def main():
         
         if options.print_computation:
             print "\nMetric computations"
-            for (top_result,gold_result),filename in zip(input_pairs,input_filenames):
+            for filename in input_filenames:
+                # We need the results themselves for this, so load the file
+                if filename in store_inputs:
+                    store_filename,identifier = store_inputs[filename]
+                    store = ResultsStore(store_filename)
+                    pres = store.get(identifier, top_only=True)
+                    store.close()
+                else:
+                    pres = ParseResults.from_file(filename)
+                gold_result = pres.get_gold_semantics()
+                if len(pres.semantics) == 0:
+                    top_result = None
+                else:
+                    top_result = pres.semantics[0][1]
                 print "\n%s" % filename
                 print metric.print_computation(top_result, gold_result)
     
     if options.f_score:
         # We'll have shown the recall and precision
-        # Now compute the f-score from them
-        f_score = 2.0 * distances[0] * distances[1] / (distances[0]+distances[1])
+        # Now compute the f-score from the same stats
+        stats = input_stats[metrics[0].stats_key]
+        f_score = metrics[0].fscore_from_stats(
+                        *[sum([s[i] for s in stats], 0.0) for i in range(3)])[2]
         if options.quiet:
             print "%f%%" % (f_score*100.0)
         else:
@@ -186,7 +231,7 @@ def main():
         
     if not options.quiet:
         # Output how many parses timed out
-        print "Parses timed out: %d/%d" % (timed_out, len(input_pairs))
+        print "Parses timed out: %d/%d" % (timed_out, evaluated)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env ../jazzshell
+"""
+Convert a sequence data file to the compact columnar format, which is 
+much quicker to load.
+
+"""
+import sys, os
+from optparse import OptionParser
+
+from jazzparser.data.db_mirrors import SequenceIndex
+from jazzparser.data.db_mirrors.columnar import save_columnar
+
+def main():
+    usage = "%prog [options] <in-file> <out-file>"
+    description = "Convert a sequence data file to the compact columnar "\
+        "format. All the scripts that read sequence data files can read "\
+        "the output."
+    parser = OptionParser(usage=usage, description=description)
+    options, arguments = parser.parse_args()
+        
+    if len(arguments) < 2:
+        print >>sys.stderr, "You must specify an input and an output file"
+        sys.exit(1)
+    in_filename = os.path.abspath(arguments[0])
+    out_filename = os.path.abspath(arguments[1])
+    
+    seqs = SequenceIndex.from_file(in_filename)
+    save_columnar(out_filename, seqs.sequences)
+    
+    print >>sys.stderr, "Wrote %d sequences (%d bytes) to %s" % \
+        (len(seqs), os.path.getsize(out_filename), out_filename)
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ import sys, os
 from optparse import OptionParser
 from midi import read_midifile
 from jazzparser.utils.csv import UnicodeCsvReader
-from jazzparser.utils.midi import note_on_similarity
+from jazzparser.utils.midi import note_on_similarity, MidiFingerprintIndex
 from jazzparser.data.db_mirrors import SequenceIndex
 
 def main():
@@ -23,6 +23,7 @@ def main():
     parser.add_option("--names", dest="names", action="store_true", help="only show the names in the output, not the numbers (only applies to --zeroes or --few)")
     parser.add_option("-d", "--diff", dest="diff", action="store_true", help="check every pair of files for each sequence and report the similarity of the midi notes")
     parser.add_option("--min-diff", dest="min_diff", action="store", type="float", help="the minimum similarity the report when diffing files (see --diff). By default, all are reported (i.e. 0)", default=0.0)
+    parser.add_option("--duplicates", dest="duplicates", action="store_true", help="look for near-duplicate files across all sequences, using a fingerprint index of the notes, and report the similarity of the midi notes of each pair found (see --min-diff). Much faster than --diff, but only reports pairs that look alike")
     options, arguments = parser.parse_args()
         
     if len(arguments) == 0:
@@ -76,16 +77,45 @@ def main():
         for seq_id,files in existing_seqs.items():
             seq = sequences.sequence_by_id(seq_id)
             print "%s (%d)" % (seq.string_name,len(files))
+            # Load each file just once
+            mids = [_load_midi(filename) for (filename,__) in files]
             # Compare every pair
             for i,(filename0,__) in enumerate(files):
-                mid0 = _load_midi(filename0)
-                for (filename1,__) in files[:i]:
-                    mid1 = _load_midi(filename1)
+                mid0 = mids[i]
+                for j,(filename1,__) in enumerate(files[:i]):
+                    mid1 = mids[j]
                     similarity0,similarity1 = note_on_similarity(mid0, mid1)
                     if similarity0 >= options.min_diff:
                         print "  %s, %s: %f" % (filename0, filename1, similarity0)
                     if similarity1 >= options.min_diff:
                         print "  %s, %s: %f" % (filename1, filename0, similarity1)
+    elif options.duplicates:
+        # Index all the files, only keeping the ones that might be 
+        #  duplicates of others in memory
+        index = MidiFingerprintIndex()
+        filenames = sorted(set(filename for files in existing_seqs.values() \
+                                            for (filename,__) in files))
+        candidate_mids = {}
+        pairs = []
+        for filename in filenames:
+            mid = _load_midi(filename)
+            candidates = index.add(filename, mid)
+            for other in candidates:
+                pairs.append((other, filename))
+                if other not in candidate_mids:
+                    # We didn't keep this one: load it again
+                    candidate_mids[other] = _load_midi(other)
+            if candidates:
+                candidate_mids[filename] = mid
+        print "%d files, %d candidate pairs" % (len(filenames), len(pairs))
+        # Check each candidate pair properly
+        for filename0,filename1 in pairs:
+            similarity0,similarity1 = note_on_similarity(
+                            candidate_mids[filename0], candidate_mids[filename1])
+            if max(similarity0, similarity1) >= options.min_diff:
+                print "%s, %s: %f, %f (estimated %f)" % (filename0, filename1, 
+                            similarity0, similarity1, 
+                            index.estimate_similarity(filename0, filename1))
     else:
         # By default, count the midi files found for each sequence
         for seq in sequences:
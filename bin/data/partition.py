@@ -8,6 +8,8 @@ import sys, os
 from optparse import OptionParser
 
 from jazzparser.data.db_mirrors import SequenceIndex, save_sequences
+from jazzparser.data.db_mirrors.columnar import ColumnarSequenceIndex, \
+                        ColumnarCorpus, save_columnar
 from jazzparser.utils.data import partition, holdout_partition
 
 DEFAULT_PARTITIONS = 10
@@ -17,6 +19,7 @@ def main():
     parser = OptionParser(usage=usage)
     parser.add_option("-p", "--partitions", dest="partitions", action="store", type="int", default=DEFAULT_PARTITIONS, help="the number of partitions to use (default: %d)" % DEFAULT_PARTITIONS)
     parser.add_option("--ids", dest="ids", action="store_true", help="don't output any files - just print out a list of the ids of the sequences in each partition")
+    parser.add_option("--columnar", dest="columnar", action="store_true", help="write the partitions in the compact columnar format. This is done anyway if the input file is in that format")
     options, arguments = parser.parse_args()
         
     if len(arguments) == 0:
@@ -29,16 +32,30 @@ def main():
     
     part_pattern = "%s.part%%d" % filename
     heldout_pattern = "%s.heldout_part%%d" % filename
+    if isinstance(seqs, ColumnarSequenceIndex):
+        # Partition the corpus without building any of the sequences
+        corpus = seqs.corpus
+        options.columnar = True
+    elif options.columnar:
+        corpus = ColumnarCorpus.from_sequences(seqs.sequences)
+    
     # Divide the data up into partitions, with their complements
-    parts = zip(partition(seqs.sequences, options.partitions), holdout_partition(seqs.sequences, options.partitions))
+    indices = range(len(seqs))
+    parts = zip(partition(indices, options.partitions), holdout_partition(indices, options.partitions))
     # Save each partition and its complement
     for i,(part,heldout) in enumerate(parts):
         if options.ids:
             # Just print out a list of the ids in the partition
-            print " ".join(["%d" % s.id for s in part])
+            print " ".join(["%d" % seqs.id_for_index(ind) for ind in part])
         else:
-            save_sequences(part_pattern % i, part)
-            save_sequences(heldout_pattern % i, heldout)
+            if options.columnar:
+                save_columnar(part_pattern % i, corpus.subset(part))
+                save_columnar(heldout_pattern % i, corpus.subset(heldout))
+            else:
+                save_sequences(part_pattern % i,
+                            [seqs.sequence_by_index(ind) for ind in part])
+                save_sequences(heldout_pattern % i,
+                            [seqs.sequence_by_index(ind) for ind in heldout])
             print >>sys.stderr, "Wrote partition %d to %s and %s" % (i,part_pattern % i,heldout_pattern % i)
 
 if __name__ == "__main__":
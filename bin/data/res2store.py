@@ -0,0 +1,67 @@
+#!/usr/bin/env ../jazzshell
+"""
+Reads in parse results files and adds them all to a single results store, 
+which is much quicker to evaluate than the individual files.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
+
+import sys, os.path, gc
+from optparse import OptionParser
+
+from jazzparser.data.parsing import ParseResults, ResultsStore
+
+def main():
+    usage = "%prog [options] <store-file> <res-file1> [<res-file2> ...]"
+    description = "Reads in parse results files and adds them to a "\
+        "results store. Each input is identified in the store by the "\
+        "name of its results file, without the extension"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("-a", "--append", dest="append", action="store_true", help="add the results to an existing store. By default, the store file is overwritten")
+    options, arguments = parser.parse_args()
+    
+    if len(arguments) < 2:
+        print "Specify a store file and at least one parse results file"
+        sys.exit(1)
+    
+    store = ResultsStore(arguments[0], mode=('a' if options.append else 'w'))
+    try:
+        for filename in arguments[1:]:
+            # Make sure the old results get cleaned up
+            gc.collect()
+            identifier = os.path.splitext(os.path.basename(filename))[0]
+            try:
+                pres = ParseResults.from_file(filename)
+            except ParseResults.LoadError, err:
+                print >>sys.stderr, "Could not load %s: %s" % (filename, err)
+                continue
+            store.add(identifier, pres)
+            pres = None
+    finally:
+        store.close()
+    print "Stored results for %d inputs in %s" % (len(store), arguments[0])
+    
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,100 @@
 #!/usr/bin/env ../../jazzshell
 """
-A suite of parsing experiments on a subset of the corpus exploring different 
+A suite of parsing experiments on a subset of the corpus exploring different
 beam settings.
 
+All the settings are tried in a single run (see
+L{jazzparser.parsers.pcfg.sweep}), so the models are only loaded and each
+sequence only tagged once.
+
 """
-from subprocess import PIPE, Popen, STDOUT, call
 from optparse import OptionParser
-import os, csv
+import sys, os, csv
 
-from jazzparser.utils.config import ConfigFile
+from jazzparser import settings
+from jazzparser.grammar import get_grammar
+from jazzparser.data.input import DbBulkInput
+from jazzparser.taggers.loader import get_tagger
+from jazzparser.parsers.pcfg.sweep import beam_sweep
+from jazzparser.formalisms.base.semantics.distance import command_line_metric
+from jazzparser.utils.options import ModuleOption
+from jazzparser.utils.data import partition
 
-BASE_CONFIG = """
-%% INCLUDE %{PROJECT_ROOT}/input/config/pcfg/eval/base/beam.conf
-"""
+DEFAULT_INPUT = os.path.join(settings.PROJECT_ROOT, "input", "fullseqs")
 
+def _float_list(string):
+    return [float(val) for val in string.split(",")]
+
+def _int_list(string):
+    return [int(val) for val in string.split(",")]
 
 def main():
     usage = "%prog [options]"
     description = "Runs a suite of small parsing experiments to try different beam settings"
     parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--file", dest="file", action="store", default=DEFAULT_INPUT, help="chord sequence file to take the inputs from (default: %s)" % DEFAULT_INPUT)
+    parser.add_option("--indices", dest="indices", action="store", default="15,19,24,53,56,37,60,72", help="indices of the sequences in the file to parse (default: %default)")
+    parser.add_option("--partitions", dest="partitions", action="store", type="int", default=10, help="the number of partitions the models were trained on. The models for each sequence's partition are used (default: %default)")
+    parser.add_option("--thresholds", dest="thresholds", action="store", default="0.5,0.1,0.01,0.001", help="comma-separated beam thresholds to try (default: %default)")
+    parser.add_option("--maxarcs", dest="maxarcs", action="store", default="5,10,15,20", help="comma-separated maximum arc sizes to try with every threshold (default: %default)")
+    parser.add_option("--tagger", dest="tagger", action="store", default="ngram-multi", help="supertagger to use (default: %default)")
+    parser.add_option("--topt", dest="topts", action="store", default="batch=0.1:model=bigram", help="options for the supertagger (default: %default)")
+    parser.add_option("--popt", dest="popts", action="store", default="model=chords:timeout=120", help="options for the parser, apart from the beam settings (default: %default)")
+    parser.add_option("--processes", dest="processes", action="store", type="int", default=8, help="number of processes to spread the sequences over (default: %default)")
+    parser.add_option("-o", "--output", dest="output", action="store", default="test_suite.csv", help="CSV file to write the results to (default: %default)")
     options, arguments = parser.parse_args()
     
-    cmd_dir = os.path.abspath(os.path.join("..", ".."))
-    parser = os.path.join(cmd_dir, "jazzparser")
-    result_eval = os.path.join(cmd_dir, "analysis", "result_eval.py")
-    result_eval_dir = os.path.join(cmd_dir, "analysis")
-    
     # Try all combinations of threshold and maxarc settings
-    settings = [(threshold,maxarc) for threshold in [0.5, 0.1, 0.01, 0.001] \
-                                   for maxarc in [5, 10, 15, 20]]
+    beam_settings = [(threshold,maxarc) \
+                        for threshold in _float_list(options.thresholds) \
+                        for maxarc in _int_list(options.maxarcs)]
     # Don't try different thresholds for maxarc=1: they're all the same
-    settings.append((0.1, 1))
+    beam_settings.append((0.1, 1))
+    
+    grammar = get_grammar()
+    input_data = DbBulkInput.from_file(options.file)
+    # Every sequence is parsed with the models for its partition
+    partition_numbers = sum([[partnum for i in part] for (partnum,part) in \
+        enumerate(partition(range(len(input_data)), options.partitions))], [])
+    indices = _int_list(options.indices)
+    
+    tagger_cls = get_tagger(options.tagger)
+    metric = command_line_metric(grammar.formalism, "deprec", "output=f")
+    
+    print >>sys.stderr, "Parsing %d sequences with %d beam settings" % \
+                                            (len(indices), len(beam_settings))
+    results = beam_sweep(grammar,
+                [input_data[i] for i in indices],
+                tagger_cls,
+                beam_settings,
+                tagger_options=ModuleOption.process_option_string(options.topts),
+                parser_options=ModuleOption.process_option_string(options.popts),
+                partitions=[partition_numbers[i] for i in indices],
+                metric=metric,
+                processes=options.processes)
     
-    # Open a CSV file to write the results to
-    with open("test_suite.csv", "w") as result_file:
-        results = csv.writer(result_file)
-        results.writerow(["Threshold", "Maxarc", "Dep rec"])
-        
-        for threshold,maxarc in settings:
-            print "\n#####################################################"
-            print "### Threshold %s, maxarc %d ###" % (threshold, maxarc)
-            
-            # Build a config file string for these settings
-            options = "%%%% DEF threshold %s\n" % threshold
-            options += "%%%% DEF maxarc %d\n" % maxarc
-            conf = ConfigFile.from_string(options+BASE_CONFIG)
-            # Run the parser
-            retcode = call([parser]+conf.get_strings(), 
-                                 cwd=cmd_dir, stderr=STDOUT)
-            if retcode:
-                print "Parse failed"
-                # Don't bother continuing with the others
-                return 1
-            
-            # Find out where the output was being put
-            output_dir = dict(conf.options)['output']
-            files = os.path.join(output_dir, "*.res")
-            # Evaluate all the results files in that directory
-            eval_proc = Popen([result_eval, files, "--mopt output=f", 
-                                    "-m deprec", "-q"], 
-                                cwd=result_eval_dir, stdout=PIPE)
-            eval_out = eval_proc.stdout.read()
-            f_score = eval_out.rstrip().rstrip("%")
-            
-            # Write the result out to the summary file
-            results.writerow(["%s" % threshold, 
-                              "%d" % maxarc,
-                              f_score])
-            # Flush the file object so each result appears immediately
-            result_file.flush()
+    # Write the results to a CSV file
+    with open(options.output, "w") as result_file:
+        writer = csv.writer(result_file)
+        writer.writerow(["Threshold", "Maxarc", "Dep rec", "Ave time",
+                         "Std dev time", "Ave chart size", "Parsed",
+                         "Timed out"])
+        for result in results:
+            accuracy = result.accuracy(metric)
+            if accuracy is None:
+                accuracy = ""
+            else:
+                accuracy = "%f" % (accuracy * 100.0)
+            writer.writerow(["%s" % result.threshold,
+                             "%d" % result.maxarc,
+                             accuracy,
+                             "%f" % result.mean_time,
+                             "%f" % result.std_time,
+                             "%f" % result.mean_chart_size,
+                             "%d" % sum(result.parsed),
+                             "%d" % sum(result.timed_out)])
+            print "%s: dep rec %s%%, %fs per sequence" % \
+                                        (result, accuracy, result.mean_time)
 
 
 if __name__ == "__main__":
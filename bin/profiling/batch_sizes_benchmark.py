@@ -0,0 +1,109 @@
+#!/usr/bin/env ../jazzshell
+"""
+Benchmarks the array-based computation of tag batch sizes for a whole 
+input (beamed_batch_sizes) against the original list-based implementation.
+
+Random tag distributions are generated for each word of an input, 
+skewed so that a few tags get most of the probability mass, as they do 
+in the output of the model taggers. Each implementation is timed on 
+the same distributions and checked to give the same batches.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import sys, random
+from optparse import OptionParser
+
+from jazzparser.utils.probabilities import beamed_batch_sizes, \
+                    list_beamed_batch_sizes
+from jazzparser.utils.base import ExecutionTimer
+from jazzparser.utils.tableprint import pprint_table
+
+def random_distribution(tags):
+    """
+    Generates a random distribution over the given number of tags, with 
+    most of the mass on a few of them.
+    
+    """
+    weights = [random.expovariate(1.0) ** 4 for i in range(tags)]
+    total = sum(weights)
+    return [w / total for w in weights]
+
+def time_function(fn, repeats):
+    """
+    Runs the function the given number of times and returns the average 
+    time taken and the result.
+    
+    """
+    timer = ExecutionTimer(clock=True)
+    for i in range(repeats):
+        result = fn()
+    return timer.get_time() / repeats, result
+
+def main():
+    usage = "%prog [options]"
+    description = "Benchmarks the computation of beamed tag batch sizes, "\
+        "comparing the array-based implementation to the original "\
+        "list-based one"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("-w", "--words", dest="words", action="store", help="comma-separated list of input lengths to test. Default: 50,100,500", default="50,100,500")
+    parser.add_option("-t", "--tags", dest="tags", action="store", type="int", help="number of tags for each word. Default: 60", default=60)
+    parser.add_option("-r", "--ratio", dest="ratio", action="store", type="float", help="batch ratio. Default: 0.1", default=0.1)
+    parser.add_option("-m", "--max-batch", dest="max_batch", action="store", type="int", help="maximum batch size. Default: 0 (no limit)", default=0)
+    parser.add_option("-n", "--repeats", dest="repeats", action="store", type="int", help="number of times to run each implementation. Default: 5", default=5)
+    parser.add_option("--seed", dest="seed", action="store", type="int", help="random seed", default=0)
+    options, arguments = parser.parse_args()
+    
+    random.seed(options.seed)
+    lengths = [int(length) for length in options.words.split(",")]
+    
+    rows = [["Words", "Batches", "Array (s)", "List (s)", "Speedup"]]
+    for length in lengths:
+        probabilities = [random_distribution(options.tags) \
+                                                for i in range(length)]
+        
+        new_time,new_result = time_function(
+                    lambda: beamed_batch_sizes(probabilities, options.ratio, 
+                                            max_batch=options.max_batch), 
+                    options.repeats)
+        old_time,old_result = time_function(
+                    lambda: list_beamed_batch_sizes(probabilities, 
+                                            options.ratio, 
+                                            max_batch=options.max_batch), 
+                    options.repeats)
+        # Check we're computing the same thing
+        if new_result != old_result:
+            print >>sys.stderr, "Implementations disagree on %d words" % length
+            sys.exit(1)
+        rows.append(["%d" % length, "%d" % len(new_result[0]), 
+                     "%f" % new_time, "%f" % old_time, 
+                     "%.1f" % (old_time / new_time)])
+        print >>sys.stderr, "Done %d words" % length
+    
+    print
+    pprint_table(sys.stdout, rows, justs=[True,True,True,True,True])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env ../jazzshell
+"""
+Measures how much memory the signs in a parse chart take up.
+
+Each input is tagged and parsed and every object reachable from the
+signs in the final chart (categories, logical forms, etc) is counted,
+using C{sys.getsizeof}. Objects that are shared with the grammar or
+the tagger's or parser's model, like the rule objects, don't belong
+to the chart, so aren't counted. The result is reported as bytes per
+chart edge, which gives an idea of how big a chart will fit in the
+memory available to each parsing process.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import sys, os, gc, types
+from optparse import OptionParser
+
+from jazzparser import settings
+from jazzparser.grammar import get_grammar
+from jazzparser.data.input import DbBulkInput
+from jazzparser.taggers.loader import get_tagger
+from jazzparser.parsers.loader import get_parser
+from jazzparser.utils.options import ModuleOption
+from jazzparser.utils.loggers import create_dummy_logger
+from jazzparser.utils.tableprint import pprint_table
+
+DEFAULT_INPUT = os.path.join(settings.PROJECT_ROOT, "input", "fullseqs")
+# Never follow references into these: they're not part of the chart
+SKIP_TYPES = (type, types.ModuleType, types.FunctionType,
+              types.BuiltinFunctionType, types.MethodType)
+
+def reachable_ids(roots):
+    """
+    Returns the ids of all the objects reachable from the roots.
+    
+    """
+    seen = set()
+    todo = list(roots)
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        todo.extend(gc.get_referents(obj))
+    return seen
+
+def chart_memory(signs, shared):
+    """
+    Adds up the size of all the objects reachable from the signs,
+    apart from those whose ids are in shared.
+    
+    @return: the total size in bytes and a dict mapping each type name
+        to the number of objects and bytes of that type
+    
+    """
+    seen = set(shared)
+    total = 0
+    by_type = {}
+    todo = list(signs)
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        size = sys.getsizeof(obj)
+        total += size
+        counts = by_type.setdefault(type(obj).__name__, [0, 0])
+        counts[0] += 1
+        counts[1] += size
+        todo.extend(gc.get_referents(obj))
+    return total, by_type
+
+def main():
+    usage = "%prog [options]"
+    description = "Parses some sequences and measures the memory used "\
+        "by the signs in the chart, reported in bytes per chart edge"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("--file", dest="file", action="store", default=DEFAULT_INPUT, help="chord sequence file to take the inputs from (default: %s)" % DEFAULT_INPUT)
+    parser.add_option("--indices", dest="indices", action="store", default="19", help="comma-separated indices of the sequences in the file to parse (default: %default)")
+    parser.add_option("--tagger", dest="tagger", action="store", default="ngram-multi", help="supertagger to use (default: %default)")
+    parser.add_option("--topt", dest="topts", action="store", default="batch=0.1:model=bigram", help="options for the supertagger (default: %default)")
+    parser.add_option("--parser", dest="parser", action="store", default="pcfg", help="parser to use (default: %default)")
+    parser.add_option("--popt", dest="popts", action="store", default="model=chords:threshold=0.1:maxarc=5", help="options for the parser (default: %default)")
+    parser.add_option("-t", "--types", dest="types", action="store", type="int", default=10, help="number of the largest types to show a breakdown for (default: %default)")
+    options, arguments = parser.parse_args()
+    
+    grammar = get_grammar()
+    input_data = DbBulkInput.from_file(options.file)
+    tagger_cls = get_tagger(options.tagger)
+    parser_cls = get_parser(options.parser)
+    topts = ModuleOption.process_option_string(options.topts)
+    popts = ModuleOption.process_option_string(options.popts)
+    logger = create_dummy_logger()
+    
+    rows = [["Input", "Chords", "Edges", "Total (KB)", "Bytes/edge"]]
+    total_edges = 0
+    total_bytes = 0
+    all_types = {}
+    for index in [int(i) for i in options.indices.split(",")]:
+        input = input_data[index]
+        tagger = tagger_cls(grammar, input, options=topts.copy(),
+                            logger=logger)
+        parser = parser_cls(grammar, tagger, options=popts.copy(),
+                            logger=logger)
+        parser.parse()
+        
+        chart = parser.chart
+        signs = sum([chart.get_signs(start, end) \
+                        for start in range(len(chart)) \
+                        for end in range(start+1, len(chart)+1)], [])
+        # Anything reachable from the grammar or models is not the chart's
+        shared = reachable_ids([grammar, getattr(tagger, 'model', None),
+                                getattr(parser, 'model', None)])
+        size,by_type = chart_memory(signs, shared)
+        
+        rows.append(["%d" % index, "%d" % len(input), "%d" % len(signs),
+                     "%.1f" % (size / 1024.0),
+                     "%.1f" % (float(size) / max(len(signs), 1))])
+        total_edges += len(signs)
+        total_bytes += size
+        for name,(count,type_size) in by_type.items():
+            counts = all_types.setdefault(name, [0, 0])
+            counts[0] += count
+            counts[1] += type_size
+        print >>sys.stderr, "Done input %d" % index
+    
+    rows.append(["All", "", "%d" % total_edges, "%.1f" % (total_bytes / 1024.0),
+                 "%.1f" % (float(total_bytes) / max(total_edges, 1))])
+    print
+    pprint_table(sys.stdout, rows, justs=[True,True,True,True,True])
+    
+    if options.types:
+        # Show which types are taking up the space
+        rows = [["Type", "Objects", "Bytes/edge"]]
+        for name,(count,type_size) in sorted(all_types.items(),
+                            key=lambda t:-t[1][1])[:options.types]:
+            rows.append([name, "%d" % count,
+                         "%.1f" % (float(type_size) / max(total_edges, 1))])
+        print
+        pprint_table(sys.stdout, rows, justs=[False,True,True])
+
+if __name__ == "__main__":
+    main()
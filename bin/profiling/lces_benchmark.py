@@ -0,0 +1,119 @@
+#!/usr/bin/env ../jazzshell
+"""
+Benchmarks the iterative LCES computation (used by the dependency tree
+metric) against the original recursive implementation.
+
+Random unlabeled trees are generated with sizes covering those of the
+dependency trees of cadences in the corpus and beyond, and each
+implementation is timed on pairs of them.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import sys, random
+from optparse import OptionParser
+
+from jazzparser.misc.tree import ImmutableTree, Node
+from jazzparser.misc.tree.lces import lces_size, recursive_lces_size
+from jazzparser.utils.base import ExecutionTimer
+from jazzparser.utils.tableprint import pprint_table
+
+def random_tree(size, max_depth=None):
+    """
+    Builds a random unlabeled tree with the given number of non-root
+    nodes. Dependency trees tend to be long and thin, so new nodes are
+    attached near to the most recently added node more often than not.
+    
+    """
+    root = Node.unode()
+    nodes = [(root, 0)]
+    for i in range(size):
+        # Prefer to attach to recently added nodes
+        index = len(nodes) - 1 - int(random.expovariate(0.5))
+        parent,depth = nodes[max(index, 0)]
+        if max_depth is not None and depth >= max_depth:
+            parent,depth = nodes[0]
+        child = Node.unode()
+        parent.children.append(child)
+        nodes.append((child, depth+1))
+    return ImmutableTree(root)
+
+def time_function(fn, pairs):
+    """
+    Runs the function on all the pairs and returns the average time
+    taken, or None if it fails (usually by hitting the recursion limit).
+    
+    """
+    timer = ExecutionTimer(clock=True)
+    try:
+        for tree1,tree2 in pairs:
+            fn(tree1, tree2)
+    except RuntimeError:
+        return None
+    return timer.get_time() / len(pairs)
+
+def main():
+    usage = "%prog [options]"
+    description = "Benchmarks the LCES size computation, comparing the "\
+        "iterative implementation to the original recursive one"
+    parser = OptionParser(usage=usage, description=description)
+    parser.add_option("-s", "--sizes", dest="sizes", action="store", help="comma-separated list of tree sizes to test. Default: 5,10,20,40,80,160", default="5,10,20,40,80,160")
+    parser.add_option("-n", "--pairs", dest="pairs", action="store", type="int", help="number of random pairs of trees to time for each size. Default: 10", default=10)
+    parser.add_option("--max-recursive", dest="max_recursive", action="store", type="int", help="don't run the recursive version on trees bigger than this. Default: 40", default=40)
+    parser.add_option("--seed", dest="seed", action="store", type="int", help="random seed", default=0)
+    options, arguments = parser.parse_args()
+    
+    random.seed(options.seed)
+    sizes = [int(size) for size in options.sizes.split(",")]
+    
+    rows = [["Size", "Iterative (s)", "Recursive (s)", "Speedup"]]
+    for size in sizes:
+        pairs = [(random_tree(size), random_tree(size)) \
+                                    for i in range(options.pairs)]
+        iterative = time_function(lces_size, pairs)
+        
+        if size > options.max_recursive:
+            recursive = None
+        else:
+            recursive = time_function(recursive_lces_size, pairs)
+            # Check we're computing the same thing
+            for tree1,tree2 in pairs:
+                if lces_size(tree1, tree2) != recursive_lces_size(tree1, tree2):
+                    print >>sys.stderr, "Implementations disagree on trees "\
+                        "%s and %s" % (tree1, tree2)
+                    sys.exit(1)
+        
+        if recursive is None:
+            rows.append(["%d" % size, "%f" % iterative, "-", "-"])
+        else:
+            rows.append(["%d" % size, "%f" % iterative, "%f" % recursive,
+                         "%.1f" % (recursive / iterative)])
+        print >>sys.stderr, "Done size %d" % size
+    
+    print
+    pprint_table(sys.stdout, rows, justs=[True,True,True,True])
+
+if __name__ == "__main__":
+    main()
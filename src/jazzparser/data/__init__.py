@@ -29,6 +29,7 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
 import copy, re
 import logging
+from heapq import heappush, heappop
 
 from jazzparser.utils.base import filter_latex
 from jazzparser.utils.chords import int_to_chord_numeral, chord_numeral_to_int, \
@@ -265,7 +266,16 @@ class DerivationTrace(object):
     Stores a trace of the derivation of a particular CCGCategory node
     and is associated with that category. For parse results, these structures 
     will often be so large that there's no hope of being able to print the 
-    thing (even recursing to count the size can be prohibitively slow!).
+    thing as a tree.
+    
+    The traces form a packed forest: the arguments of a rule application 
+    are the traces of the signs in the chart, so a sub-derivation that's 
+    used by lots of derivations is only stored once, and every way of 
+    deriving an equal sign is stored in the same trace. The methods that 
+    count derivations (L{get_size}, L{get_num_derivations}) and extract 
+    them (L{get_k_best}) visit each trace in the forest only once, so take 
+    time linear in the size of the forest, not the number of derivations. 
+    Use L{str_packed} to display the forest in this form.
     
     """
     def __init__(self, result, rule=None, args=[], word=None):
@@ -279,10 +289,16 @@ class DerivationTrace(object):
         """
         # Store a list of the rule applications and their arguments
         self.rules = []
+        # Identities of the stored rule applications, for add_rule
+        self._rule_keys = set()
         self.result = result
         self.word = word
         if rule is not None:
-            self.rules.append((rule,args))
+            self.add_rule(rule, args)
+    
+    @staticmethod
+    def _rule_key(rule, args):
+        return (id(rule), tuple(id(arg) for arg in args))
             
     def add_rule(self, rule, args=[]):
         """
@@ -290,11 +306,29 @@ class DerivationTrace(object):
         same category as other rule applications stored here).
         The rule is a pointer to the rule object that was applied.
         The args is a list of the arguments to which the rule was applied.
+        
+        If the same rule has already been stored as applied to the same 
+        argument traces, it's not added again.
         """
+        if getattr(self, "_rule_keys", None) is None:
+            # Unpickled: the stored ids are no use any more
+            self._rule_keys = set(DerivationTrace._rule_key(r, a) \
+                                                for (r,a) in self.rules)
+        key = DerivationTrace._rule_key(rule, args)
+        if key in self._rule_keys:
+            return
+        self._rule_keys.add(key)
         self.rules.append((rule,args))
         
     def add_rules_from_trace(self, other_trace):
-        self.rules.extend(other_trace.rules)
+        for rule,args in other_trace.rules:
+            self.add_rule(rule, args)
+    
+    def __getstate__(self):
+        # The rule keys are object ids, so aren't valid once unpickled
+        state = self.__dict__.copy()
+        state['_rule_keys'] = None
+        return state
         
     def __str__(self):
         return self.str_indent("")
@@ -314,16 +348,270 @@ class DerivationTrace(object):
         
         return output
     
+    def _forest(self):
+        """
+        Gets all the traces in the forest below (and including) this one, 
+        in an order such that each trace comes after all the traces it's 
+        derived from.
+        
+        In principle, a unary rule could derive a sign equal to one of 
+        those it was derived from, making the forest cyclic. Any rule 
+        application that would close a cycle is left out.
+        
+        @return: the ordered list of traces and a dict mapping the id of 
+            each trace to its (acyclic) rule applications
+        
+        """
+        order = []
+        rules = {id(self) : []}
+        # Traces we're currently in the middle of visiting
+        visiting = set([id(self)])
+        # Each frame is: trace, rule index, argument index
+        # Don't use recursion here: traces of long inputs can be very deep
+        stack = [[self, 0, 0]]
+        while stack:
+            frame = stack[-1]
+            trace = frame[0]
+            if trace.word is not None or frame[1] >= len(trace.rules):
+                # Done with all this trace's rules
+                stack.pop()
+                visiting.remove(id(trace))
+                order.append(trace)
+                continue
+            rule,args = trace.rules[frame[1]]
+            if frame[2] == 0:
+                # Starting on a new rule application
+                if any(id(arg) in visiting for arg in args):
+                    # Cyclic: skip it
+                    frame[1] += 1
+                    continue
+                rules[id(trace)].append((rule,args))
+            if frame[2] < len(args):
+                arg = args[frame[2]]
+                frame[2] += 1
+                if id(arg) not in rules:
+                    rules[id(arg)] = []
+                    visiting.add(id(arg))
+                    stack.append([arg, 0, 0])
+            else:
+                # Move onto the next rule
+                frame[1] += 1
+                frame[2] = 0
+        return order, rules
+    
     def get_size(self):
-        if self.word is not None:
-            return 1
+        """
+        The number of rule applications and words in the derivation 
+        tree, if every trace were expanded in full.
+        
+        """
+        order,rules = self._forest()
+        sizes = {}
+        for trace in order:
+            if trace.word is not None:
+                sizes[id(trace)] = 1
+            else:
+                sizes[id(trace)] = sum(
+                    1 + sum(sizes[id(arg)] for arg in args) \
+                        for (rule,args) in rules[id(trace)])
+        return sizes[id(self)]
+    
+    def count_derivations(self):
+        """
+        Counts the distinct derivation trees of every trace in the forest.
+        
+        @rtype: dict
+        @return: the number of derivations of each trace, keyed by the 
+            trace's id
+        
+        """
+        order,rules = self._forest()
+        counts = {}
+        for trace in order:
+            if trace.word is not None:
+                counts[id(trace)] = 1
+            else:
+                total = 0
+                for rule,args in rules[id(trace)]:
+                    product = 1
+                    for arg in args:
+                        product *= counts[id(arg)]
+                    total += product
+                counts[id(trace)] = total
+        return counts
+    
+    def get_num_derivations(self):
+        """
+        The number of distinct derivation trees stored in the trace.
+        
+        """
+        return self.count_derivations()[id(self)]
+    
+    def iter_best_derivations(self, score=None):
+        """
+        Generates the derivations stored in the trace, best first. The 
+        derivations are only extracted from the forest as they're needed, 
+        so getting the first few is quick even when there are a huge 
+        number of them.
+        
+        The score of a derivation is the sum of the scores of its 
+        rule applications and words, given by the function C{score}. 
+        It's called as C{score(trace, rule, args)} for each rule 
+        application, and C{score(trace, None, [])} for each word.
+        If no function is given, all derivations have a score of 0, so 
+        this just enumerates them.
+        
+        @return: iterator over (score, trace) pairs, where each trace 
+            has exactly one rule application at every node
+        
+        """
+        kbest = _KBestDerivations(self, score)
+        rank = 0
+        while True:
+            derivation = kbest.get(self, rank)
+            if derivation is None:
+                return
+            yield (derivation[0], kbest.build(self, rank))
+            rank += 1
+    
+    def get_k_best(self, k, score=None):
+        """
+        Gets the k highest-scoring derivations in the trace. See 
+        L{iter_best_derivations}.
+        
+        @rtype: list of (score, L{DerivationTrace}) pairs
+        
+        """
+        derivations = []
+        for derivation in self.iter_best_derivations(score=score):
+            if len(derivations) >= k:
+                break
+            derivations.append(derivation)
+        return derivations
+    
+    def str_packed(self, signfmt=str):
+        """
+        Like L{str_indent}, but outputs the packed forest, instead of 
+        expanding it into a tree. Each trace is numbered and output 
+        only once, with the arguments of its rule applications referred 
+        to by their numbers. The output is therefore never much bigger 
+        than the chart.
+        
+        """
+        order,rules = self._forest()
+        # Number the traces top-down, in the order we come across them
+        numbers = {id(self) : 0}
+        traces = [self]
+        for trace in traces:
+            for rule,args in rules[id(trace)]:
+                for arg in args:
+                    if id(arg) not in numbers:
+                        numbers[id(arg)] = len(traces)
+                        traces.append(arg)
+        
+        output = ""
+        for trace in traces:
+            output += "[%d] %s\n" % (numbers[id(trace)], signfmt(trace.result))
+            if trace.word is not None:
+                output += " | \"%s\"\n" % trace.word
+            else:
+                for ruleobj,arglist in rules[id(trace)]:
+                    output += " | from %s (%s) applied to %s\n" % \
+                            (ruleobj.readable_rule, ruleobj.name, 
+                             " ".join("[%d]" % numbers[id(arg)] \
+                                                for arg in arglist))
+        return output
+    
+
+class _KBestDerivations(object):
+    """
+    Lazy k-best extraction of derivations from a L{DerivationTrace}'s 
+    forest, following Huang and Chiang's (2005) lazy algorithm. The 
+    best derivation of each trace is found up front. Further derivations 
+    are only computed when they're asked for, by taking the next best 
+    combination of the derivations of the arguments of each rule 
+    application.
+    
+    """
+    def __init__(self, trace, score=None):
+        if score is None:
+            score = lambda trace, rule, args: 0
+        order,rules = trace._forest()
+        # Rule applications of each trace, with their scores
+        self.rules = {}
+        # Derivations of each trace found so far, best first
+        self.derivations = {}
+        # Candidates for the next best derivation of each trace
+        self.candidates = {}
+        self.seen = {}
+        
+        # Go through the traces bottom-up, so the best derivation of 
+        #  every argument is available
+        for trace in order:
+            key = id(trace)
+            if trace.word is not None:
+                self.rules[key] = [(None, [], score(trace, None, []))]
+            else:
+                self.rules[key] = [(rule, args, score(trace, rule, args)) \
+                                        for (rule,args) in rules[key]]
+            self.derivations[key] = []
+            self.candidates[key] = []
+            self.seen[key] = set()
+            for rule_num,(rule,args,rule_score) in enumerate(self.rules[key]):
+                self._add_candidate(trace, rule_num, (0,)*len(args))
+    
+    def _add_candidate(self, trace, rule_num, ranks):
+        key = id(trace)
+        if (rule_num,ranks) in self.seen[key]:
+            return
+        rule,args,total = self.rules[key][rule_num]
+        for arg,rank in zip(args, ranks):
+            derivation = self.get(arg, rank)
+            if derivation is None:
+                # The argument doesn't have that many derivations
+                return
+            total += derivation[0]
+        self.seen[key].add((rule_num,ranks))
+        # Heap is a min-heap: use negative scores to get the best first
+        heappush(self.candidates[key], (-total, rule_num, ranks))
+    
+    def get(self, trace, rank):
+        """
+        Gets the rank-th best derivation of the trace, as a tuple of its 
+        score, the index of the rule application and the ranks of the 
+        derivations of its arguments, or None if there aren't that many.
+        
+        """
+        key = id(trace)
+        derivations = self.derivations[key]
+        candidates = self.candidates[key]
+        while len(derivations) <= rank and candidates:
+            neg_score,rule_num,ranks = heappop(candidates)
+            derivations.append((-neg_score, rule_num, ranks))
+            # The next best derivations using this rule application use 
+            #  the next best derivation of one of the arguments
+            for i in range(len(ranks)):
+                self._add_candidate(trace, rule_num, 
+                                    ranks[:i] + (ranks[i]+1,) + ranks[i+1:])
+        if rank < len(derivations):
+            return derivations[rank]
         else:
-            size = 0
-            for rule in self.rules:
-                size += 1
-                for arg in rule[1]:
-                    size += arg.get_size()
-            return size
+            return None
+    
+    def build(self, trace, rank):
+        """
+        Builds a tree of L{DerivationTrace}s for the rank-th best 
+        derivation of the trace.
+        
+        """
+        score,rule_num,ranks = self.get(trace, rank)
+        rule,args,rule_score = self.rules[id(trace)][rule_num]
+        if rule is None:
+            return DerivationTrace(trace.result, word=trace.word)
+        else:
+            return DerivationTrace(trace.result, rule, 
+                        [self.build(arg, arg_rank) \
+                                for (arg,arg_rank) in zip(args, ranks)])
     
 
 class Fraction(object):
@@ -14,7 +14,8 @@ These classes just provide the unified database-independent data models.
 It is these exported models that are used for training models, etc.
 
 Use load_pickled_data to read in a file that's been created from the 
-database models.
+database models. Sequences can also be stored in a more compact format 
+that's quicker to load: see L{jazzparser.data.db_mirrors.columnar}.
 
 """
 """
@@ -227,18 +228,43 @@ class SequenceIndex(object):
     """
     @staticmethod
     def from_file(filename):
+        """
+        Loads a sequence file. This may be either a pickled list of
+        sequences (see L{save_sequences}) or a columnar corpus file
+        (see L{jazzparser.data.db_mirrors.columnar}), in which case a
+        L{ColumnarSequenceIndex<jazzparser.data.db_mirrors.columnar.ColumnarSequenceIndex>}
+        is returned.
+        
+        """
+        from .columnar import is_columnar_file, ColumnarSequenceIndex
+        if is_columnar_file(filename):
+            return ColumnarSequenceIndex.from_file(filename)
         return SequenceIndex(load_pickled_data(filename))
         
     def __init__(self, sequences):
         self._sequences = sequences
         self.prepare_indices()
         
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Indices pickled by older versions don't include everything
+        if "_indices" not in state:
+            self.prepare_indices()
+        
     def _get_sequences(self):
-        return list(sorted(self._sequences, key=lambda s:s.id))
+        return list(self._sorted)
     sequences = property(_get_sequences)
         
     def prepare_indices(self):
-        self._by_id = dict([(seq.id,seq) for seq in self.sequences])
+        """
+        Builds the lookup tables. If you change the sequences in the 
+        index, you'll need to call this again.
+        
+        """
+        self._sorted = list(sorted(self._sequences, key=lambda s:s.id))
+        self._by_id = dict([(seq.id,seq) for seq in self._sorted])
+        self._ids = list(sorted(self._by_id.keys()))
+        self._indices = dict((id,i) for (i,id) in enumerate(self._ids))
         
     def sequence_by_id(self, id):
         if id in self._by_id:
@@ -247,7 +273,7 @@ class SequenceIndex(object):
             return None
             
     def _get_ids(self):
-        return list(sorted(self._by_id.keys()))
+        return list(self._ids)
     ids = property(_get_ids)
     
     def __len__(self):
@@ -263,7 +289,7 @@ class SequenceIndex(object):
         if index >= len(self):
             return None
         else:
-            return list(sorted(self.ids))[index]
+            return self._ids[index]
     
     def index_for_id(self, id):
         """
@@ -271,10 +297,7 @@ class SequenceIndex(object):
         given id. Returns None if the id isn't in the sequence file.
         
         """
-        if id not in self.ids:
-            return None
-        else:
-            return list(sorted(self.ids)).index(id)
+        return self._indices.get(id)
             
     def __iter__(self):
         return iter(self.sequences)
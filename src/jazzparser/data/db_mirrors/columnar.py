@@ -0,0 +1,349 @@
+"""Compact columnar storage of chord sequence corpora.
+
+The usual way of storing the corpus (L{jazzparser.data.db_mirrors.save_sequences})
+is to pickle the whole list of L{ChordSequence}s, with each chord a
+separate object linked to the next. Loading it means unpickling every
+chord of every sequence, even if you only want one of them.
+
+A columnar corpus file stores the chords of all the sequences in flat
+arrays, one for each attribute of the chords (root, type, duration,
+etc), with the sequences' chords stored one after another. An array of
+offsets gives the position in the chord arrays of the start of each
+sequence. Strings, like chord types and categories, are stored as
+indices into a table of the distinct values. The sequences are stored
+in order of id, so the id for each index is known as soon as the file's
+loaded.
+
+Loading the file reads only the arrays. A L{ChordSequence} is only
+built when it's asked for, so getting a single sequence out of a large
+corpus is quick. L{ColumnarSequenceIndex} provides the same interface
+as L{SequenceIndex} and L{SequenceIndex.from_file} will return one
+whenever it's given a columnar file, so scripts that read sequence
+files don't need to know which format they're given.
+
+Use L{save_columnar} to write a file in this format.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import os.path
+import cPickle as pickle
+import numpy
+
+from . import Chord, ChordSequence, TreeInfo, SequenceIndex
+
+COLUMNAR_HEADER = "JPCOLUMNARCORPUS 1\n"
+"""First line of every columnar corpus file."""
+
+# Attributes of the sequences that are stored as they are
+_SEQUENCE_FIELDS = ['id', 'name', 'key', 'bar_length', 'notes',
+                    'analysis_omitted', 'omissions', 'source']
+# Chord attributes stored as indices into a table of the distinct values
+_STRING_FIELDS = ['type', 'additions', 'category']
+# Bits of the treeinfo flags
+_COORD_UNRESOLVED = 1
+_COORD_RESOLVED = 2
+
+def is_columnar_file(filename):
+    """
+    Checks whether the named file is a columnar corpus file.
+    
+    """
+    infile = open(filename, 'rb')
+    try:
+        return infile.read(len(COLUMNAR_HEADER)) == COLUMNAR_HEADER
+    finally:
+        infile.close()
+
+class _StringTable(object):
+    """
+    Assigns an index to each distinct value it's given.
+    
+    """
+    def __init__(self):
+        self.values = []
+        self._indices = {}
+    
+    def index(self, value):
+        # Include the type, so that '' and u'' stay distinct
+        key = (type(value), value)
+        if key not in self._indices:
+            self._indices[key] = len(self.values)
+            self.values.append(value)
+        return self._indices[key]
+
+class ColumnarCorpus(object):
+    """
+    The chord data of a corpus of sequences, stored in flat arrays.
+    
+    Sequences are identified by their index, which is their position
+    in the corpus in order of id. Use L{get_sequence} to build the
+    L{ChordSequence} for an index.
+    
+    """
+    def __init__(self, sequence_data, offsets, roots, basses, durations,
+                    strings, string_tables, treeinfo):
+        """
+        You won't usually want to call this directly: use
+        L{from_sequences} or L{load}.
+        
+        @type sequence_data: list of tuples
+        @param sequence_data: values of the sequence attributes in
+            C{_SEQUENCE_FIELDS} for each sequence, in order of id
+        @type offsets: numpy int array
+        @param offsets: index of each sequence's first chord in the
+            chord arrays, followed by the total number of chords
+        @type strings: dict
+        @param strings: array of indices into the corresponding
+            string table for each of C{_STRING_FIELDS}
+        @type string_tables: dict
+        @param string_tables: list of the distinct values for each of
+            C{_STRING_FIELDS}
+        
+        """
+        self.sequence_data = sequence_data
+        self.offsets = offsets
+        self.roots = roots
+        self.basses = basses
+        self.durations = durations
+        self.strings = strings
+        self.string_tables = string_tables
+        self.treeinfo = treeinfo
+        
+        self.ids = [data[0] for data in sequence_data]
+    
+    @staticmethod
+    def from_sequences(sequences):
+        """
+        Builds the columnar representation of a list of sequences.
+        
+        @type sequences: list of L{ChordSequence}s
+        
+        """
+        sequences = list(sorted(sequences, key=lambda s:s.id))
+        tables = dict((field, _StringTable()) for field in _STRING_FIELDS)
+        strings = dict((field, []) for field in _STRING_FIELDS)
+        sequence_data = []
+        offsets = [0]
+        roots, basses, durations, treeinfo = [], [], [], []
+        
+        for seq in sequences:
+            sequence_data.append(tuple(getattr(seq, field)
+                                            for field in _SEQUENCE_FIELDS))
+            for chord in seq.iterator():
+                roots.append(-1 if chord.root is None else chord.root)
+                basses.append(-1 if chord.bass is None else chord.bass)
+                durations.append(chord.duration)
+                for field in _STRING_FIELDS:
+                    strings[field].append(
+                                    tables[field].index(getattr(chord, field)))
+                flags = 0
+                if chord.treeinfo.coord_unresolved:
+                    flags |= _COORD_UNRESOLVED
+                if chord.treeinfo.coord_resolved:
+                    flags |= _COORD_RESOLVED
+                treeinfo.append(flags)
+            offsets.append(len(roots))
+        
+        return ColumnarCorpus(
+                    sequence_data,
+                    numpy.array(offsets, dtype=numpy.int64),
+                    numpy.array(roots, dtype=numpy.int8),
+                    numpy.array(basses, dtype=numpy.int8),
+                    numpy.array(durations, dtype=numpy.int32),
+                    dict((field, numpy.array(strings[field], dtype=numpy.int32))
+                                                for field in _STRING_FIELDS),
+                    dict((field, tables[field].values)
+                                                for field in _STRING_FIELDS),
+                    numpy.array(treeinfo, dtype=numpy.uint8))
+    
+    def __len__(self):
+        return len(self.sequence_data)
+    
+    def _get_num_chords(self):
+        return int(self.offsets[-1])
+    num_chords = property(_get_num_chords)
+    
+    def sequence_length(self, index):
+        """
+        Number of chords in the sequence at the given index. Doesn't
+        require the sequence to be built.
+        
+        """
+        return int(self.offsets[index+1] - self.offsets[index])
+    
+    def get_sequence(self, index):
+        """
+        Builds a new L{ChordSequence}, with all its chords, for the
+        sequence at the given index.
+        
+        """
+        seq = ChordSequence(**dict(zip(_SEQUENCE_FIELDS,
+                                       self.sequence_data[index])))
+        start, end = self.offsets[index], self.offsets[index+1]
+        # Convert the slices to lists once, rather than reading
+        #  numpy scalars for every chord
+        roots = self.roots[start:end].tolist()
+        basses = self.basses[start:end].tolist()
+        durations = self.durations[start:end].tolist()
+        treeinfo = self.treeinfo[start:end].tolist()
+        strings = [
+            [self.string_tables[field][i]
+                        for i in self.strings[field][start:end].tolist()]
+                for field in _STRING_FIELDS]
+        
+        # Build the linked list from the end
+        next_chord = None
+        for i in reversed(range(end-start)):
+            flags = treeinfo[i]
+            next_chord = Chord(
+                root = None if roots[i] == -1 else roots[i],
+                type = strings[0][i],
+                additions = strings[1][i],
+                bass = None if basses[i] == -1 else basses[i],
+                next = next_chord,
+                duration = durations[i],
+                category = strings[2][i],
+                sequence = seq,
+                treeinfo = TreeInfo(
+                            coord_unresolved=bool(flags & _COORD_UNRESOLVED),
+                            coord_resolved=bool(flags & _COORD_RESOLVED)))
+        seq.first_chord = next_chord
+        return seq
+    
+    def subset(self, indices):
+        """
+        Builds a new corpus containing only the sequences at the given
+        indices, without building any of the sequences.
+        
+        """
+        indices = list(sorted(indices))
+        chord_indices = numpy.concatenate(
+                    [numpy.arange(self.offsets[i], self.offsets[i+1])
+                                                    for i in indices] +
+                    [numpy.zeros(0, dtype=numpy.int64)])
+        lengths = [self.sequence_length(i) for i in indices]
+        offsets = numpy.zeros(len(indices)+1, dtype=numpy.int64)
+        offsets[1:] = numpy.cumsum(lengths)
+        
+        return ColumnarCorpus(
+                    [self.sequence_data[i] for i in indices],
+                    offsets,
+                    self.roots[chord_indices],
+                    self.basses[chord_indices],
+                    self.durations[chord_indices],
+                    dict((field, array[chord_indices])
+                                for (field,array) in self.strings.items()),
+                    self.string_tables,
+                    self.treeinfo[chord_indices])
+    
+    def save(self, filename):
+        filename = os.path.abspath(filename)
+        outfile = open(filename, 'wb')
+        try:
+            outfile.write(COLUMNAR_HEADER)
+            pickle.dump({
+                'sequence_data' : self.sequence_data,
+                'offsets' : self.offsets,
+                'roots' : self.roots,
+                'basses' : self.basses,
+                'durations' : self.durations,
+                'strings' : self.strings,
+                'string_tables' : self.string_tables,
+                'treeinfo' : self.treeinfo,
+            }, outfile, -1)
+        finally:
+            outfile.close()
+    
+    @staticmethod
+    def load(filename):
+        filename = os.path.abspath(filename)
+        infile = open(filename, 'rb')
+        try:
+            if infile.read(len(COLUMNAR_HEADER)) != COLUMNAR_HEADER:
+                raise ColumnarCorpusError, "%s is not a columnar corpus "\
+                    "file" % filename
+            data = pickle.load(infile)
+        finally:
+            infile.close()
+        return ColumnarCorpus(**data)
+
+class ColumnarSequenceIndex(SequenceIndex):
+    """
+    A L{SequenceIndex} over a L{ColumnarCorpus}. Sequences are only
+    built when they're first asked for, so looking up a few sequences
+    by id or index doesn't require building the whole corpus.
+    
+    Getting C{sequences}, or iterating over the index, will build
+    every sequence.
+    
+    """
+    @staticmethod
+    def from_file(filename):
+        return ColumnarSequenceIndex(ColumnarCorpus.load(filename))
+    
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.prepare_indices()
+    
+    def prepare_indices(self):
+        # Sequences that have been built already
+        self._by_id = {}
+        self._ids = list(self.corpus.ids)
+        self._indices = dict((id,i) for (i,id) in enumerate(self._ids))
+    
+    def _get_sequences(self):
+        return [self.sequence_by_id(id) for id in self._ids]
+    sequences = property(_get_sequences)
+    
+    def sequence_by_id(self, id):
+        if id not in self._by_id:
+            if id not in self._indices:
+                return None
+            self._by_id[id] = self.corpus.get_sequence(self._indices[id])
+        return self._by_id[id]
+    
+    def __len__(self):
+        return len(self._ids)
+
+def save_columnar(filename, sequences):
+    """
+    Given a list of ChordSequence mirror instances, saves them to a
+    file in the columnar format. The counterpart of L{save_sequences}.
+    
+    Alternatively, you can pass in a L{ColumnarCorpus}, which will be
+    saved as it is.
+    
+    """
+    if isinstance(sequences, ColumnarCorpus):
+        corpus = sequences
+    elif isinstance(sequences, ColumnarSequenceIndex):
+        corpus = sequences.corpus
+    else:
+        corpus = ColumnarCorpus.from_sequences(sequences)
+    corpus.save(filename)
+
+class ColumnarCorpusError(Exception):
+    pass
@@ -25,8 +25,38 @@
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
+import numpy
+
 from jazzparser.utils.distance import levenshtein_distance, align
 
+def _chord_subst_costs(seq1, seq2, transpositions):
+    """
+    Computes the substitution costs used to align chord sequences for 
+    every pair of chords from the two sequences, with the first sequence 
+    transposed by each of the given transpositions.
+    
+    Aligning a chord scores a point for getting the root right and a 
+    point for getting the type right (as a negative cost).
+    
+    @rtype: 3D numpy array
+    @return: cost matrix for each transposition (first dimension)
+    
+    """
+    roots1 = numpy.array([crd.root for crd in seq1], dtype=int)
+    roots2 = numpy.array([crd.root for crd in seq2], dtype=int)
+    types1 = [crd.type for crd in seq1]
+    types2 = [crd.type for crd in seq2]
+    # Compare the types once: they don't depend on transposition
+    type_match = numpy.array(
+                    [[type1 == type2 for type2 in types2] for type1 in types1],
+                    dtype=int).reshape((len(seq1), len(seq2)))
+    
+    transposed = (roots1[numpy.newaxis,:] + \
+                    numpy.array(transpositions)[:,numpy.newaxis]) % 12
+    root_match = (transposed[:,:,numpy.newaxis] == \
+                    roots2[numpy.newaxis,numpy.newaxis,:]).astype(int)
+    return -root_match - type_match[numpy.newaxis,:,:]
+
 def chord_sequence_match_score(seq1, seq2):
     """
     Computes the edit distance between two chord sequences to score the 
@@ -38,21 +68,14 @@ def chord_sequence_match_score(seq1, seq2):
     used.
     
     """
+    # Give a half-point to alignments of roots without labels or vice versa
+    subst_costs = _chord_subst_costs(seq1, seq2, range(12))
     costs = []
     for transpose in range(12):
-        # Give a half-point to alignments of roots without labels or vice versa
-        def _subst_cost(crd1, crd2):
-            cost = 0
-            if (crd1.root+transpose) % 12 == crd2.root:
-                cost += -1
-            if crd1.type == crd2.type:
-                cost += -1
-            return cost
-        
         # Try aligning the two sequences
         align_cost = levenshtein_distance(seq1, seq2, 
                                           delins_cost=0, 
-                                          subst_cost_fun=_subst_cost)
+                                          subst_costs=subst_costs[transpose])
         costs.append((transpose,align_cost))
     
     transposition, align_cost = min(costs, key=lambda x:x[1])
@@ -75,15 +98,9 @@ def chord_sequence_alignment(seq1, seq2, transposition=0):
     
     """
     # Give a half-point to alignments of roots without labels or vice versa
-    def _subst_cost(crd1, crd2):
-        cost = 0
-        if (crd1.root+transposition) % 12 == crd2.root:
-            cost += -1
-        if crd1.type == crd2.type:
-            cost += -1
-        return cost
+    subst_costs = _chord_subst_costs(seq1, seq2, [transposition])[0]
     
     # Try aligning the two sequences
-    alignment = align(seq1, seq2, delins_cost=0, subst_cost=_subst_cost)
+    alignment = align(seq1, seq2, delins_cost=0, subst_costs=subst_costs)
     
     return alignment
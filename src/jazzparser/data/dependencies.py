@@ -218,6 +218,59 @@ def dependency_graph_to_latex(graph, words=[], number_nodes=False,
 
 ########################### Alignment-related utilities ##################
 
+def _multiset_includes(big, small):
+    """
+    Checks whether the sorted tuple C{small} is a sub-multiset of the sorted 
+    tuple C{big}.
+    
+    """
+    if len(small) > len(big):
+        return False
+    i = 0
+    for item in small:
+        # Skip anything in big that's smaller than this item
+        while i < len(big) and big[i] < item:
+            i += 1
+        if i == len(big) or big[i] != item:
+            return False
+        i += 1
+    return True
+
+def _prune_candidates(candidates):
+    """
+    Removes from a list of (score, deps, pointer) candidates for a cell of 
+    the alignment table any that can't possibly lead to a better alignment 
+    than another candidate in the list.
+    
+     1. Any candidate whose maximum possible score, C{score+len(deps)}, is 
+        no more than the highest score in the cell.
+     2. Any candidate dominated by another: one with at least as high a 
+        score whose pending dependencies include all of this one's. 
+        Whatever is matched later starting from the dominated candidate 
+        could also be matched starting from the other.
+    
+    Returns a new list, ordered by descending score.
+    
+    """
+    if len(candidates) < 2:
+        return candidates
+    # Find the option with the highest minimum score
+    max_min_score = max([score for (score,deps,pointer) in candidates])
+    # Try the highest-scoring candidates first, so that dominating 
+    #  candidates always come before the ones they dominate
+    candidates = sorted(candidates, key=lambda c:(-c[0], -len(c[1])))
+    kept = [candidates[0]]
+    for candidate in candidates[1:]:
+        score,deps,pointer = candidate
+        if score+len(deps) <= max_min_score:
+            continue
+        for (kscore,kdeps,kpointer) in kept:
+            if kscore >= score and _multiset_includes(kdeps, deps):
+                break
+        else:
+            kept.append(candidate)
+    return kept
+
 def optimal_node_alignment(graph1, graph2, label_compare=(lambda x,y:x==y)):
     """
     Produces the alignment between the nodes of the two dependency graphs that 
@@ -226,90 +279,128 @@ def optimal_node_alignment(graph1, graph2, label_compare=(lambda x,y:x==y)):
     Returns a list of aligned pairs of node indices, using C{None} to 
     represent deletions/insertions.
     
+    The alignment is found by dynamic programming over a table of the 
+    nodes of the two graphs. Each cell stores a set of candidates, each 
+    with the score so far and the dependencies that could still be matched 
+    by later alignments (stored as a sorted tuple, so that candidates can be 
+    hashed). Candidates that can't win are pruned at each cell: see 
+    L{_prune_candidates}.
+    
     """
-    N = len(graph1.nodes)
-    M = len(graph2.nodes)
-    indices1 = list(enumerate(sorted(graph1.nodes)))
-    indices2 = list(enumerate(sorted(graph2.nodes)))
-    root1 = min(graph1.nodes)
-    root2 = min(graph2.nodes)
-    
-    # Initialize a score matrix
-    S = []
-    P = []
-    for x in range(N):
-        row = []
-        prow = []
-        for y in range(M):
-            row.append([])
-            prow.append([])
-        S.append(row)
-        P.append(prow)
-    
-    # Utility functions
-    def _append(lst, val):
-        if val not in lst:
-            lst.append(val)
-    def addS(x, y, val, pointer):
-        # If a value (same score, same dependencies) is already there, don't 
-        #  add it again
-        if val not in S[x][y]:
-            S[x][y].append(val)
-            # Also add a pointer so we can trace the alignment back
-            P[x][y].append(pointer)
-    def removeS(x, y, index):
-        # Remove the value from S and pointers P
-        del S[x][y][index]
-        del P[x][y][index]
+    nodes1 = sorted(graph1.nodes)
+    nodes2 = sorted(graph2.nodes)
+    N = len(nodes1)
+    M = len(nodes2)
+    root1 = nodes1[0]
+    root2 = nodes2[0]
     
     # First nodes should always be aligned: these are the root nodes
     # Find dependencies to or from root
-    root_deps = []
+    root_deps = set()
     for (source1,target1,label1) in graph1.arcs_from(root1):
         for (source2,target2,label2) in graph2.arcs_from(root2):
             if label_compare(label1, label2):
                 # If we align the nodes at the other end of this 
                 #  arc, we match a dependency
-                _append(root_deps, (target1,target2))
+                root_deps.add((target1,target2))
     for (source1,target1,label1) in graph1.arcs_to(root1):
         for (source2,target2,label2) in graph2.arcs_to(root2):
             if label_compare(label1, label2):
                 # If we align the nodes at the other end of this 
                 #  arc, we match a dependency
-                _append(root_deps, (source1,source2))
+                root_deps.add((source1,source2))
     # We don't propogate these potential alignments through the table, since 
     #  they're the same everywhere
     
-    # Initialize (0,0) to empty
-    # This will get propogated along the first row and column
-    addS(0, 0, (0, []), ('UL',0))
-    
-    for x,node1 in indices1:
-        for y,node2 in indices2:
+    # Arcs from and to each node that point forward, which are the ones 
+    #  that can be matched by aligning later nodes
+    def _forward_arcs(graph, node):
+        return ([(target,label) for (source,target,label) in \
+                                    graph.arcs_from(node) if target > node],
+                [(source,label) for (source,target,label) in \
+                                    graph.arcs_to(node) if source > node])
+    forward1 = [_forward_arcs(graph1, node) for node in nodes1]
+    forward2 = [_forward_arcs(graph2, node) for node in nodes2]
+    
+    def _pair_deps(x, y):
+        """
+        Dependencies that might later be matched thanks to aligning the xth 
+        node of graph1 with the yth of graph2.
+        
+        """
+        deps = []
+        from1,to1 = forward1[x]
+        from2,to2 = forward2[y]
+        for (target1,label1) in from1:
+            for (target2,label2) in from2:
+                if label_compare(label1, label2):
+                    deps.append((target1,target2))
+        # Do the same for dependencies pointing backwards to here
+        for (source1,label1) in to1:
+            for (source2,label2) in to2:
+                if label_compare(label1, label2):
+                    deps.append((source1,source2))
+        return deps
+    
+    def _add(candidates, cand_index, score, deps, pointer):
+        # If there's already a candidate with the same deps, keep whichever 
+        #  has the higher score
+        if deps in cand_index:
+            i = cand_index[deps]
+            if score > candidates[i][0]:
+                candidates[i] = (score, deps, pointer)
+        else:
+            cand_index[deps] = len(candidates)
+            candidates.append((score, deps, pointer))
+    
+    # Each cell holds a list of (score, deps, pointer) candidates
+    # The pointer is a direction and the index of the candidate in the 
+    #  cell that it came from
+    S = [[None]*M for x in range(N)]
+    
+    for x,node1 in enumerate(nodes1):
+        for y,node2 in enumerate(nodes2):
+            if x == 0 and y == 0:
+                # Initialize (0,0) to empty
+                # This will get propogated along the first row and column
+                S[0][0] = [(0, (), ('UL',0))]
+                continue
+            
+            # Candidates indexed by their deps, so we only keep the 
+            #  highest scoring one for each set of deps
+            candidates = []
+            cand_index = {}
+            
             if x > 0:
                 # Insertion in graph1
-                for i,(score,deps) in enumerate(S[x-1][y]):
+                for i,(score,deps,pointer) in enumerate(S[x-1][y]):
                     # Remove dependencies that can't possibly be match now
-                    deps = [(goal1, goal2) for (goal1, goal2) in deps if \
-                                goal1 != node1]
+                    deps = tuple([(goal1, goal2) for (goal1, goal2) in deps \
+                                    if goal1 != node1])
                     # Don't add anything to the score for this
-                    addS(x, y, (score,deps), ('U',i))
+                    _add(candidates, cand_index, score, deps, ('U',i))
             
             if y > 0:
                 # Insertion in graph2
-                for i,(score,deps) in enumerate(S[x][y-1]):
+                for i,(score,deps,pointer) in enumerate(S[x][y-1]):
                     # Remove dependencies that can't possibly be match now
-                    deps = [(goal1, goal2) for (goal1, goal2) in deps if \
-                                goal2 != node2]
+                    deps = tuple([(goal1, goal2) for (goal1, goal2) in deps \
+                                    if goal2 != node2])
                     # Don't add anything to the score for this
-                    addS(x, y, (score,deps), ('L',i))
+                    _add(candidates, cand_index, score, deps, ('L',i))
             
             if x > 0 and y > 0:
                 # Alignment
-                for i,(score,deps) in enumerate(S[x-1][y-1]):
+                # The same new dependencies are made possible by this 
+                #  alignment, whatever candidate we're extending
+                pair_deps = _pair_deps(x, y)
+                # Check if we've matched any root arcs by this alignment
+                root_matched = 1 if (node1,node2) in root_deps else 0
+                
+                for i,(score,deps,pointer) in enumerate(S[x-1][y-1]):
                     # Count how many dependencies were satisfied by this alignment
-                    matched = 0
-                    new_deps = []
+                    matched = root_matched
+                    new_deps = list(pair_deps)
                     for (goal1, goal2) in deps:
                         if goal1 == node1 and goal2 == node2:
                             # A required match to match a dependency arc
@@ -317,50 +408,20 @@ def optimal_node_alignment(graph1, graph2, label_compare=(lambda x,y:x==y)):
                         elif goal1 > node1 and goal2 > node2:
                             # Keep looking for this
                             new_deps.append((goal1, goal2))
-                    # Check if we've matched any root arcs by this alignment
-                    matched += root_deps.count((node1,node2))
-                            
-                    # Find dependencies that might later be matched thanks to 
-                    #  this alignment
-                    for (source1,target1,label1) in graph1.arcs_from(node1):
-                        for (source2,target2,label2) in graph2.arcs_from(node2):
-                            if label_compare(label1, label2) and target1 > node1 and target2 > node2:
-                                # If we align the nodes at the other end of this 
-                                #  arc, we match a dependency
-                                new_deps.append((target1,target2))
-                                
-                    # Do the same for dependencies pointing backwards to here
-                    for (source1,target1,label1) in graph1.arcs_to(node1):
-                        for (source2,target2,label2) in graph2.arcs_to(node2):
-                            if label_compare(label1, label2) and source1 > node1 and source2 > node2:
-                                # If we align the nodes at the other end of this 
-                                #  arc, we match a dependency
-                                new_deps.append((source1,source2))
-                    
-                    addS(x, y, (score+matched, new_deps), ('UL',i))
+                    new_deps.sort()
+                    _add(candidates, cand_index, score+matched, 
+                         tuple(new_deps), ('UL',i))
             
-            # Remove from S[x][y] any (score,deps) where the maximum 
-            #  possible score, score+len(deps), <= some other option's 
-            #  minimum score
-            # Find the option with the highest minimum score
-            max_min_score,top_scorer = max((score,i) for i,(score,deps) in enumerate(S[x][y]))
-            # Get indices to remove
-            # Make sure not to remove the one that had the max min score
-            remove = [i for i,(score,deps) in enumerate(S[x][y]) if \
-                                            score+len(deps) <= max_min_score \
-                                            and i != top_scorer]
-            shifter = 0
-            for i in remove:
-                removeS(x, y, i-shifter)
-                shifter += 1
+            S[x][y] = _prune_candidates(candidates)
     
     # Trace back through the pointers to find operations that make the alignment
-    index,(score,deps) = max(enumerate(S[-1][-1]), key=lambda x:x[1][0])
+    index,(score,deps,pointer) = max(enumerate(S[-1][-1]), 
+                                     key=lambda x:x[1][0])
     x = N-1
     y = M-1
     ops = []
     while not (x == 0 and y == 0):
-        direction,index = P[x][y][index]
+        direction,index = S[x][y][index][2]
         if direction == 'U':
             x -= 1
             ops.append('I1')
@@ -376,8 +437,8 @@ def optimal_node_alignment(graph1, graph2, label_compare=(lambda x,y:x==y)):
     ops.reverse()
     
     # Pair up the node indices according to these operations
-    nodes1it = iter(sorted(graph1.nodes))
-    nodes2it = iter(sorted(graph2.nodes))
+    nodes1it = iter(nodes1)
+    nodes2it = iter(nodes2)
     pairs = []
     for op in ops:
         if op == "A":
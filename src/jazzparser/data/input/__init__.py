@@ -27,6 +27,7 @@ from __future__ import absolute_import
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
 import sys
+import numpy
 from jazzparser.data import Fraction, Chord
 from jazzparser.utils.options import ModuleOption
 from jazzparser.data.db_mirrors import SequenceIndex
@@ -244,14 +245,80 @@ class WeightedChordLabelInput(Input):
     list of (label,prob) tuples, where label is a C{ChordLabel} and prob is 
     a probability.
     
+    Internally, the lattice is stored as a dense matrix of probabilities, 
+    with dimensions (timestep, label), where the labels are those in 
+    C{labels}. A label is absent from a timestep if its probability is 0. 
+    Beams are applied to the whole matrix at once and code that handles 
+    long inputs can use the matrix directly (C{probabilities}), instead 
+    of going through the lists for each timestep. Indexing the input 
+    still gives the list of (label,prob) pairs for a timestep, in order 
+    of descending probability.
+    
     """
     FILE_INPUT_OPTIONS = []
     
     def __init__(self, lattice, *args, **kwargs):
         super(WeightedChordLabelInput, self).__init__(*args, **kwargs)
-        # Make sure the lattice entries are sorted
-        self.lattice = [ \
-            list(reversed(sorted(timestep, key=lambda x:x[1]))) for timestep in lattice]
+        # Give each distinct label a column in the matrix
+        columns = {}
+        self.labels = []
+        for timestep in lattice:
+            for (label,prob) in timestep:
+                key = WeightedChordLabelInput._label_key(label)
+                if key not in columns:
+                    columns[key] = len(self.labels)
+                    self.labels.append(label)
+        
+        self.probabilities = numpy.zeros((len(lattice), len(self.labels)), 
+                                         numpy.float64)
+        for t,timestep in enumerate(lattice):
+            for (label,prob) in timestep:
+                self.probabilities[t, 
+                        columns[WeightedChordLabelInput._label_key(label)]] = prob
+        self._lattice = None
+    
+    @staticmethod
+    def _label_key(label):
+        # ChordLabels don't define a hash, so identify them by their fields
+        return (label.root, label.label, label.key, label.model_label)
+    
+    @staticmethod
+    def from_array(probabilities, labels, *args, **kwargs):
+        """
+        Builds the input directly from a probability matrix, without 
+        going through a list for each timestep.
+        
+        @type probabilities: Numpy array
+        @param probabilities: matrix with dimensions (timestep, label)
+        @type labels: list of C{ChordLabel}s
+        @param labels: label corresponding to each column of the matrix
+        
+        """
+        if probabilities.ndim != 2 or probabilities.shape[1] != len(labels):
+            raise ValueError, "lattice probability matrix should have "\
+                "dimensions (timestep, label), with one column for each of "\
+                "the %d labels: got %s" % (len(labels), probabilities.shape)
+        inp = WeightedChordLabelInput([], *args, **kwargs)
+        inp.labels = list(labels)
+        inp.probabilities = numpy.array(probabilities, numpy.float64)
+        return inp
+    
+    @property
+    def lattice(self):
+        """
+        The lattice as a list of timesteps, each a list of (label,prob) 
+        pairs, in order of descending probability. This is built from the 
+        probability matrix when it's first needed.
+        
+        """
+        if self._lattice is None:
+            self._lattice = []
+            for probs in self.probabilities:
+                order = numpy.argsort(-probs, kind='mergesort')
+                order = order[probs[order] > 0.0]
+                self._lattice.append(
+                        [(self.labels[i], probs[i]) for i in order])
+        return self._lattice
         
     def __str__(self):
         return "<Lattice:%s\n>" % "".join(["\n  %d: %s" % (t, \
@@ -262,13 +329,14 @@ class WeightedChordLabelInput(Input):
         return "<Lattice (%d)>" % len(self)
     
     def __len__(self):
-        return len(self.lattice)
+        return self.probabilities.shape[0]
         
     def __getitem__(self, item):
         return self.lattice[item]
         
     def slice(self, start=None, end=None):
-        return WeightedChordLabelInput(self.lattice[start:end])
+        return WeightedChordLabelInput.from_array(
+                        self.probabilities[start:end], self.labels)
     
     def apply_ratio_beam(self, ratio=1e-4):
         """
@@ -281,13 +349,29 @@ class WeightedChordLabelInput(Input):
             probability in the timestep
         
         """
-        for timestep in self:
-            min_prob = timestep[0][1] * ratio
-            # Check if any values have a prob small enough to remove
-            to_remove = [i for i,val in enumerate(timestep) if val[1] < min_prob]
-            # Get rid of all of these values
-            for removed,index in enumerate(to_remove):
-                timestep.pop(index-removed)
+        if self.probabilities.size == 0:
+            return
+        min_probs = numpy.max(self.probabilities, axis=1) * ratio
+        self.probabilities[self.probabilities < min_probs[:,numpy.newaxis]] = 0.0
+        self._lattice = None
+    
+    def apply_top_beam(self, n):
+        """
+        Applies a beam to keep only the C{n} most probable labels at each 
+        timestep. Labels with equal probability are kept in the order of 
+        their columns in the matrix.
+        
+        @type n: int
+        @param n: number of labels to keep for each timestep
+        
+        """
+        if n >= self.probabilities.shape[1]:
+            return
+        # Columns of every timestep in order of descending probability
+        order = numpy.argsort(-self.probabilities, axis=1, kind='mergesort')
+        rows = numpy.arange(self.probabilities.shape[0])[:,numpy.newaxis]
+        self.probabilities[rows, order[:,n:]] = 0.0
+        self._lattice = None
         
     @staticmethod
     def from_file(filename, options={}):
@@ -34,7 +34,8 @@ actual evaluation routines are in jazzparser.evaluation.parsing.
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
-import sys
+import sys, os, struct, zlib
+import cPickle as pickle
 
 from jazzparser.parsers import ParseError
 from jazzparser.grammar import get_grammar
@@ -111,7 +112,8 @@ class ParseResults(object):
     
     """
     def __init__(self, parses, gold_parse=None, signs=False, \
-                    gold_sequence=None, timed_out=None, cpu_time=None):
+                    gold_sequence=None, timed_out=None, cpu_time=None,
+                    limit_exceeded=None):
         self.parses = parses
         """
         List of (probability,interpretation) tuples, where the 
@@ -128,6 +130,11 @@ class ParseResults(object):
         """True if the parse timed out (might still have results from a backoff model)."""
         self.cpu_time = cpu_time
         """Time taken for the parse, measured in CPU time (not wall clock)."""
+        self.limit_exceeded = limit_exceeded
+        """
+        Name of the parser's resource limit that was exceeded, if the 
+        parse was abandoned because the chart got too big.
+        """
     
     def __get_sorted_results(self):
         """
@@ -233,3 +240,317 @@ class ParseResults(object):
     
     class LoadError(Exception):
         pass
+
+
+def load_parse_times(path):
+    """
+    Reads the parse times stored with the results of a previous parse 
+    run. This is useful for predicting how long inputs will take to 
+    parse again.
+    
+    @type path: string
+    @param path: a L{ResultsStore} file, or a directory of parse results 
+        files
+    @rtype: dict
+    @return: CPU time of each parse, keyed by the slugified input 
+        identifier (the results filename, without its extension)
+    
+    """
+    from jazzparser.utils.strings import slugify
+    times = {}
+    if os.path.isdir(path):
+        for filename in os.listdir(path):
+            name,ext = os.path.splitext(filename)
+            if ext != ".res":
+                continue
+            try:
+                pres = ParseResults.from_file(os.path.join(path, filename))
+            except ParseResults.LoadError:
+                continue
+            if getattr(pres, 'cpu_time', None) is not None:
+                times[name] = pres.cpu_time
+    else:
+        store = ResultsStore(path)
+        try:
+            for identifier,pres in store.iter_results(top_only=True):
+                if pres.cpu_time is not None:
+                    times[slugify(identifier)] = pres.cpu_time
+        finally:
+            store.close()
+    return times
+
+class ResultsStore(object):
+    """
+    An append-only file storing the parse results for a whole run, as an 
+    alternative to pickling a L{ParseResults} (with all its signs) to a 
+    separate file for every input.
+    
+    Only what's needed to evaluate the results is stored: the semantics 
+    and probability of each result, the gold standard, whether the parse 
+    timed out (and which resource limit stopped it, if any) and how long 
+    it took. Each input's results are written as a record as soon as 
+    they're added, so results aren't lost if the run is stopped. When the 
+    store is closed, an index of the offset of every record is written at 
+    the end of the file, so that readers can go straight to the results 
+    for one input. The index can also be rebuilt by scanning the records 
+    if the store wasn't closed.
+    
+    The file begins with L{MAGIC} and a version number. Each record 
+    consists of the lengths of two blocks, followed by the blocks 
+    themselves. The first holds everything except the results after the 
+    top one, which are in the second, so that top results can be read 
+    without decoding the rest. Each block is a compressed pickle of a 
+    tuple. The index, if present, is a block of the same form, followed 
+    by its offset and L{INDEX_MAGIC}.
+    
+    Stores can be opened with mode C{'r'} (read), C{'w'} (create a new 
+    store, overwriting any existing file) or C{'a'} (append to an 
+    existing store, or create one).
+    
+    """
+    MAGIC = "JPRSTORE"
+    INDEX_MAGIC = "JPRSINDX"
+    VERSION = 2
+    """Version 2 records also store the resource limit that was exceeded."""
+    _HEADER = struct.Struct(">8sH")
+    _RECORD = struct.Struct(">II")
+    _TRAILER = struct.Struct(">Q8s")
+    
+    def __init__(self, filename, mode='r'):
+        if mode not in ['r', 'w', 'a']:
+            raise ValueError, "invalid results store mode: %s" % mode
+        self.filename = filename
+        self.mode = mode
+        self.index = []
+        """(identifier,offset) for each record, in the order they were added."""
+        self._offsets = {}
+        self._index_dirty = False
+        
+        if mode == 'w' or (mode == 'a' and not os.path.exists(filename)):
+            # Start a new store
+            self._file = open(filename, 'w+b')
+            self._file.write(self._HEADER.pack(self.MAGIC, self.VERSION))
+            self._end = self._HEADER.size
+            self._index_dirty = True
+        else:
+            if mode == 'r':
+                self._file = open(filename, 'rb')
+            else:
+                self._file = open(filename, 'r+b')
+            self._read_header()
+            self._end = self._read_index()
+            if mode == 'a':
+                # Drop the index (or any partly written record) from the end 
+                #  of the file: it will be rewritten when we close
+                self._file.truncate(self._end)
+                self._index_dirty = True
+    
+    @staticmethod
+    def is_store(filename):
+        """
+        Returns True if the file looks like a results store (as opposed 
+        to, for example, a pickled L{ParseResults}).
+        
+        """
+        infile = open(filename, 'rb')
+        try:
+            return infile.read(len(ResultsStore.MAGIC)) == ResultsStore.MAGIC
+        finally:
+            infile.close()
+    
+    def _read_header(self):
+        self._file.seek(0)
+        header = self._file.read(self._HEADER.size)
+        if len(header) < self._HEADER.size:
+            raise ResultsStore.LoadError, "%s is not a results store" % \
+                self.filename
+        magic,version = self._HEADER.unpack(header)
+        if magic != self.MAGIC:
+            raise ResultsStore.LoadError, "%s is not a results store" % \
+                self.filename
+        if version != self.VERSION:
+            raise ResultsStore.LoadError, "%s is a version %d results "\
+                "store: can only read version %d" % \
+                (self.filename, version, self.VERSION)
+    
+    def _read_block(self, length):
+        data = self._file.read(length)
+        if len(data) < length:
+            raise ResultsStore.LoadError, "unexpected end of results store"
+        return pickle.loads(zlib.decompress(data))
+    
+    def _read_index(self):
+        """
+        Reads the index from the end of the file, or rebuilds it by 
+        scanning the records if it's not there. Returns the offset of the 
+        end of the last record.
+        
+        """
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size >= self._HEADER.size + self._TRAILER.size:
+            self._file.seek(size - self._TRAILER.size)
+            index_offset,magic = self._TRAILER.unpack(
+                                        self._file.read(self._TRAILER.size))
+            if magic == self.INDEX_MAGIC:
+                self._file.seek(index_offset)
+                self._set_index(self._read_block(
+                                        size - self._TRAILER.size - index_offset))
+                return index_offset
+        
+        # No index: the store wasn't closed properly
+        # Read through the records to find them all
+        index = []
+        offset = self._HEADER.size
+        while offset + self._RECORD.size <= size:
+            self._file.seek(offset)
+            top_len,rest_len = self._RECORD.unpack(
+                                        self._file.read(self._RECORD.size))
+            end = offset + self._RECORD.size + top_len + rest_len
+            if end > size:
+                # Incomplete record: ignore it
+                break
+            try:
+                identifier = self._read_block(top_len)[0]
+            except Exception:
+                # Corrupt record: assume this is where writing stopped
+                break
+            index.append((identifier, offset))
+            offset = end
+        self._set_index(index)
+        return offset
+    
+    def _set_index(self, index):
+        # If an input was added more than once, its later record replaces 
+        #  the earlier one
+        self._offsets = dict(index)
+        self.index = [(identifier,offset) for (identifier,offset) in index \
+                                if self._offsets[identifier] == offset]
+    
+    def identifiers(self):
+        """Identifiers of all the stored inputs, in the order they were added."""
+        return [identifier for (identifier,offset) in self.index]
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def __contains__(self, identifier):
+        return identifier in self._offsets
+    
+    def add(self, identifier, results):
+        """
+        Appends a record for the results of an input to the store.
+        
+        @type identifier: string
+        @param identifier: name of the input, by which the results can be 
+            retrieved. If there are already results with this identifier, 
+            they will be replaced in the index, but remain in the file.
+        @type results: L{ParseResults}
+        @param results: the parse results, which may have been stored as 
+            signs or as logical forms.
+        
+        """
+        if self.mode == 'r':
+            raise IOError, "results store %s is open for reading" % \
+                self.filename
+        parses = results.semantics
+        top = (identifier, results.timed_out, 
+               getattr(results, 'cpu_time', None),
+               results.gold_parse, results.gold_sequence, parses[:1],
+               getattr(results, 'limit_exceeded', None))
+        top_data = zlib.compress(pickle.dumps(top, -1))
+        rest_data = zlib.compress(pickle.dumps(tuple(parses[1:]), -1))
+        
+        self._file.seek(self._end)
+        self._file.write(self._RECORD.pack(len(top_data), len(rest_data)))
+        self._file.write(top_data)
+        self._file.write(rest_data)
+        # Make sure the record's safely written before we index it
+        self._file.flush()
+        
+        if identifier in self._offsets:
+            self.index = [(ident,offset) for (ident,offset) in self.index \
+                                                if ident != identifier]
+        self.index.append((identifier, self._end))
+        self._offsets[identifier] = self._end
+        self._end = self._file.tell()
+        self._index_dirty = True
+    
+    def record_hash(self, identifier):
+        """
+        Computes a hash of the stored record for an input, which can be 
+        used to tell whether the input's results have changed without 
+        decoding them. Only the block containing the top result is 
+        hashed, so this is suitable for caching evaluations of the top 
+        result.
+        
+        """
+        import hashlib
+        self._file.seek(self._offsets[identifier])
+        lengths = self._file.read(self._RECORD.size)
+        top_len,rest_len = self._RECORD.unpack(lengths)
+        return hashlib.sha1(lengths + self._file.read(top_len)).hexdigest()
+    
+    def _read_record(self, offset, top_only=False):
+        self._file.seek(offset)
+        top_len,rest_len = self._RECORD.unpack(
+                                        self._file.read(self._RECORD.size))
+        top = self._read_block(top_len)
+        identifier,timed_out,cpu_time,gold_parse,gold_sequence,parses,\
+                                        limit_exceeded = top
+        if not top_only:
+            parses = parses + list(self._read_block(rest_len))
+        results = ParseResults(parses, 
+                               gold_parse=gold_parse, 
+                               gold_sequence=gold_sequence, 
+                               timed_out=timed_out, 
+                               cpu_time=cpu_time,
+                               limit_exceeded=limit_exceeded)
+        return identifier,results
+    
+    def get(self, identifier, top_only=False):
+        """
+        Reads the results for a single input.
+        
+        @type top_only: bool
+        @param top_only: only read the top result. The other results 
+            won't be included in the returned L{ParseResults}.
+        @rtype: L{ParseResults}
+        @return: the results, stored as logical forms
+        
+        """
+        if identifier not in self._offsets:
+            raise KeyError, "no results stored for %s" % identifier
+        return self._read_record(self._offsets[identifier], 
+                                 top_only=top_only)[1]
+    
+    def iter_results(self, top_only=False):
+        """
+        Reads the results for every input in turn, in the order they were 
+        added. Yields (identifier,results) pairs, where the results are a 
+        L{ParseResults}.
+        
+        @type top_only: bool
+        @param top_only: only read the top result for each input.
+        
+        """
+        for identifier,offset in self.index:
+            yield self._read_record(offset, top_only=top_only)
+    
+    def close(self):
+        """
+        Writes the index to the end of the file, if the store's been 
+        modified, and closes it.
+        
+        """
+        if self._file.closed:
+            return
+        if self.mode != 'r' and self._index_dirty:
+            self._file.seek(self._end)
+            self._file.write(zlib.compress(pickle.dumps(self.index, -1)))
+            self._file.write(self._TRAILER.pack(self._end, self.INDEX_MAGIC))
+            self._file.truncate()
+        self._file.close()
+    
+    class LoadError(Exception):
+        pass
@@ -0,0 +1,346 @@
+"""Batch evaluation of stored parse results.
+
+Evaluating a large directory of parse results files against their gold
+standards by loading each file and running every metric over it can be
+very slow. This module provides an evaluation engine that:
+ - computes the stats for each (result, gold, metric) combination once
+   (see L{DistanceMetric.pair_stats
+   <jazzparser.formalisms.base.semantics.distance.DistanceMetric.pair_stats>}),
+   so that, for example, precision, recall and f-score all come from the
+   same alignment;
+ - distributes the work over a process pool;
+ - stores the stats for each file in a cache, keyed by a hash of the
+   file's contents, so that re-evaluating a directory only needs to
+   process the files that have changed.
+
+The same can be done for the inputs in a L{ResultsStore
+<jazzparser.data.parsing.ResultsStore>}, using L{evaluate_store}.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import os, hashlib
+import cPickle as pickle
+from multiprocessing import Pool
+
+from jazzparser.data.parsing import ParseResults, ResultsStore
+
+def file_hash(filename):
+    """
+    Computes a hash of the contents of a file, used to identify the file's
+    contents in the evaluation cache.
+    
+    """
+    hsh = hashlib.sha1()
+    infile = open(filename, 'rb')
+    try:
+        while True:
+            block = infile.read(65536)
+            if not block:
+                break
+            hsh.update(block)
+    finally:
+        infile.close()
+    return hsh.hexdigest()
+
+class FileEvaluation(object):
+    """
+    The stats derived from a single results file. This stores everything
+    we need to know about the file to produce the overall evaluation,
+    so that we don't need to load the file again if it hasn't changed.
+    
+    """
+    def __init__(self, filename, timed_out=False, cpu_time=None,
+                    gold=False, result=False, error=None):
+        self.filename = filename
+        self.timed_out = timed_out
+        """True if the parse timed out."""
+        self.cpu_time = cpu_time
+        """Parse time stored with the results, if available."""
+        self.gold = gold
+        """True if a gold standard result was available."""
+        self.result = result
+        """True if there was at least one parse result."""
+        self.error = error
+        """Error message if the file couldn't be loaded."""
+        self.stats = {}
+        """
+        Maps a metric's stats key to the value returned by the metric's
+        C{pair_stats} on the top result and gold standard.
+        """
+    
+    def __repr__(self):
+        return "<FileEvaluation: %s>" % self.filename
+
+def evaluate_file(filename, metrics, evaluation=None):
+    """
+    Loads the results file and computes the stats required for each of
+    the metrics on the top result and the gold standard.
+    
+    @type metrics: list of L{DistanceMetric
+        <jazzparser.formalisms.base.semantics.distance.DistanceMetric>}s
+    @param metrics: metrics to compute stats for. Metrics with the same
+        stats key will only be computed once.
+    @type evaluation: L{FileEvaluation}
+    @param evaluation: an existing (e.g. cached) evaluation of the same
+        file. Only stats that are missing from it will be computed.
+    @rtype: L{FileEvaluation}
+    
+    """
+    try:
+        pres = ParseResults.from_file(filename)
+    except ParseResults.LoadError, err:
+        return FileEvaluation(filename, error=str(err))
+    return evaluate_results(pres, filename, metrics, evaluation=evaluation)
+
+def evaluate_results(pres, filename, metrics, evaluation=None):
+    """
+    Does the work of L{evaluate_file} once the results have been loaded.
+    
+    @type pres: L{ParseResults}
+    @param pres: results to evaluate. Only the top result is needed.
+    @type filename: string
+    @param filename: name to identify the results in the evaluation
+    
+    """
+    if evaluation is None:
+        evaluation = FileEvaluation(filename,
+                                    timed_out=pres.timed_out,
+                                    cpu_time=getattr(pres, 'cpu_time', None))
+    else:
+        evaluation.filename = filename
+    
+    # Try to get a gold standard result
+    gold_result = pres.get_gold_semantics()
+    if gold_result is None:
+        # Can't evaluate this
+        evaluation.gold = False
+        return evaluation
+    evaluation.gold = True
+    
+    # Get the top result's semantics
+    semantics = pres.semantics
+    if len(semantics) == 0:
+        top_result = None
+    else:
+        top_result = semantics[0][1]
+    evaluation.result = top_result is not None
+    
+    for metric in metrics:
+        key = metric.stats_key
+        if key not in evaluation.stats:
+            evaluation.stats[key] = metric.pair_stats(top_result, gold_result)
+    return evaluation
+
+def _evaluate_file(args):
+    # Wrapper to allow us to call evaluate_file using Pool.map
+    return evaluate_file(*args)
+
+def _evaluate_stored(store, identifier, metrics, evaluation):
+    # Evaluates a single input in an open store
+    try:
+        pres = store.get(identifier, top_only=True)
+    except Exception, err:
+        return FileEvaluation(store_input_name(store.filename, identifier),
+                              error=str(err))
+    return evaluate_results(pres, 
+                            store_input_name(store.filename, identifier), 
+                            metrics, evaluation=evaluation)
+
+# The store opened by each of evaluate_store's worker processes
+_worker_store = None
+
+def _init_store_worker(store_filename):
+    # Pool initializer: each worker reads the store's index once
+    global _worker_store
+    _worker_store = ResultsStore(store_filename)
+
+def _evaluate_store_input(args):
+    # Used by evaluate_store's workers to evaluate a single input
+    return _evaluate_stored(_worker_store, *args)
+
+def store_input_name(store_filename, identifier):
+    """
+    The name used as the filename of the L{FileEvaluation} of an input 
+    from a results store.
+    
+    """
+    return "%s:%s" % (store_filename, identifier)
+
+class EvaluationCache(object):
+    """
+    Stores L{FileEvaluation}s keyed by the hash of the file contents they
+    were computed from. The cache is stored in a single pickled file.
+    
+    """
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.evaluations = {}
+        
+        if filename is not None and os.path.exists(filename):
+            try:
+                infile = open(filename, 'rb')
+                try:
+                    self.evaluations = pickle.load(infile)
+                finally:
+                    infile.close()
+            except Exception:
+                # Unreadable cache: just start again
+                self.evaluations = {}
+    
+    def get(self, hsh):
+        return self.evaluations.get(hsh, None)
+    
+    def set(self, hsh, evaluation):
+        self.evaluations[hsh] = evaluation
+    
+    def save(self, filename=None):
+        if filename is None:
+            filename = self.filename
+        if filename is None:
+            return
+        # Write to a temporary file first, so we don't lose the cache if
+        #  we get interrupted
+        tmp_filename = "%s.tmp" % filename
+        outfile = open(tmp_filename, 'wb')
+        try:
+            pickle.dump(self.evaluations, outfile, -1)
+        finally:
+            outfile.close()
+        os.rename(tmp_filename, filename)
+
+def evaluate_files(filenames, metrics, processes=1, cache=None):
+    """
+    Computes a L{FileEvaluation} for each of the results files, using
+    stored evaluations from the cache where the file is unchanged.
+    
+    @type processes: int
+    @param processes: number of processes to use to evaluate the files
+        that aren't found in the cache. If 1, no process pool is used.
+    @type cache: L{EvaluationCache}
+    @param cache: cache to get stored evaluations from. Any new
+        evaluations are added to the cache, but the cache is not saved.
+    @rtype: list of L{FileEvaluation}s
+    @return: an evaluation for each file, in the same order as the
+        filenames.
+    
+    """
+    stats_keys = set([metric.stats_key for metric in metrics])
+    
+    evaluations = [None] * len(filenames)
+    hashes = [None] * len(filenames)
+    # Check which files we've already got stats for
+    todo = []
+    for i,filename in enumerate(filenames):
+        existing = None
+        if cache is not None:
+            hashes[i] = file_hash(filename)
+            existing = cache.get(hashes[i])
+        if existing is not None and (not existing.gold or
+                        stats_keys.issubset(set(existing.stats.keys()))):
+            # We've got everything we need already
+            existing.filename = filename
+            evaluations[i] = existing
+        else:
+            todo.append((i, (filename, metrics, existing)))
+    
+    if len(todo):
+        args = [arg for (i,arg) in todo]
+        if processes > 1 and len(todo) > 1:
+            pool = Pool(processes=min(processes, len(todo)))
+            try:
+                results = pool.map(_evaluate_file, args, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = map(_evaluate_file, args)
+        
+        for (i,arg),evaluation in zip(todo, results):
+            evaluations[i] = evaluation
+            # Don't cache load errors: the file may have been read while
+            #  still being written
+            if cache is not None and evaluation.error is None:
+                cache.set(hashes[i], evaluation)
+    return evaluations
+
+def evaluate_store(store_filename, metrics, processes=1, cache=None):
+    """
+    Like L{evaluate_files}, but evaluates every input in a L{ResultsStore 
+    <jazzparser.data.parsing.ResultsStore>}. The cache is keyed by a hash 
+    of each input's record in the store.
+    
+    @rtype: list of L{FileEvaluation}s
+    @return: an evaluation for each input in the store, in the order they 
+        were added to it. The filename of each is given by 
+        L{store_input_name}.
+    
+    """
+    stats_keys = set([metric.stats_key for metric in metrics])
+    # Keep the store open for the whole evaluation, so its index is only 
+    #  read once, but don't keep it any longer: it may be added to later
+    store = ResultsStore(store_filename)
+    try:
+        identifiers = store.identifiers()
+        evaluations = [None] * len(identifiers)
+        hashes = [None] * len(identifiers)
+        todo = []
+        for i,identifier in enumerate(identifiers):
+            existing = None
+            if cache is not None:
+                hashes[i] = store.record_hash(identifier)
+                existing = cache.get(hashes[i])
+            if existing is not None and (not existing.gold or
+                        stats_keys.issubset(set(existing.stats.keys()))):
+                existing.filename = store_input_name(store_filename, 
+                                                     identifier)
+                evaluations[i] = existing
+            else:
+                todo.append((i, (identifier, metrics, existing)))
+        
+        if len(todo):
+            args = [arg for (i,arg) in todo]
+            if processes > 1 and len(todo) > 1:
+                pool = Pool(processes=min(processes, len(todo)), 
+                            initializer=_init_store_worker, 
+                            initargs=(store_filename,))
+                try:
+                    # Send the inputs in chunks, since each is quick to 
+                    #  evaluate
+                    results = pool.map(_evaluate_store_input, args, 
+                            chunksize=max(1, len(todo) / (4*processes)))
+                finally:
+                    pool.close()
+                    pool.join()
+            else:
+                results = [_evaluate_stored(store, *arg) for arg in args]
+            
+            for (i,arg),evaluation in zip(todo, results):
+                evaluations[i] = evaluation
+                if cache is not None and evaluation.error is None:
+                    cache.set(hashes[i], evaluation)
+    finally:
+        store.close()
+    return evaluations
@@ -136,6 +136,15 @@ class FormalismBase(object):
         """
         return cls.semantics_to_coordinates(sign.semantics)
     
+    transpose_sign = None
+    """
+    Function to transpose a parse result by a number of semitones, 
+    in place. Used by the L{parse cache<jazzparser.parsers.cache>} to 
+    reuse the results of parsing a transposed input. If not given, 
+    results can't be transposed.
+    
+    """
+    
     semantics_distance_metrics = []
     """
     List of distance metrics available in the formalism. Each item is a 
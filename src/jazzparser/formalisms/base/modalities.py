@@ -165,7 +165,12 @@ class ModalSlash(object):
     A CCG slash class that wants modalities should inherit (first) from 
     the base Slash (or some subclass) and also from this, to add the 
     modality functionality.
+    
+    Slashes use slots, so the slash subclass must provide a slot for 
+    C{modality}.
     """
+    __slots__ = ()
+    
     def __init__(self, modality):
         if modality is None:
             modality = ""
@@ -191,6 +196,8 @@ class ModalSlash(object):
     _pre_string = property(__pre_string)
 
 class ModalComplexCategory(object):
+    __slots__ = ()
+    
     def set_slash_modality(self, slash_id, modality):
         """
         Look for the slash with id slash_id and set its modality.
@@ -201,5 +208,7 @@ class ModalComplexCategory(object):
         self.result.set_slash_modality(slash_id, modality)
 
 class ModalAtomicCategory(object):
+    __slots__ = ()
+    
     def set_slash_modality(self, slash_id, modality):
         pass
@@ -80,7 +80,44 @@ class DistanceMetric(object):
         however, for both of the pair to be C{None}.
         
         """
-        return sum([self.distance(*pair) for pair in input_pairs], 0.0)
+        return self.total_from_stats([self.pair_stats(*pair) for pair in input_pairs])
+    
+    def pair_stats(self, sem1, sem2):
+        """
+        Computes whatever statistics are needed from a single pair of 
+        inputs in order to compute the L{total_distance} over a set of 
+        pairs. The result is passed, along with those for other pairs, 
+        to L{total_from_stats}.
+        
+        Splitting the computation in this way means that the expensive 
+        part (typically some alignment) can be done once per pair, stored 
+        and combined later. By default, the stats are just the distance.
+        
+        The returned value must be picklable.
+        
+        """
+        return self.distance(sem1, sem2)
+    
+    def total_from_stats(self, stats):
+        """
+        Combines a list of values returned by L{pair_stats} to get the 
+        value that L{total_distance} would return for the pairs.
+        
+        """
+        return sum(stats, 0.0)
+    
+    def _get_stats_key(self):
+        """
+        A string that identifies the computation performed by 
+        L{pair_stats}. Two metric instances with the same stats key will 
+        return the same stats for the same inputs, so this can be used 
+        to key stored stats.
+        
+        """
+        opts = ",".join(["%s=%s" % (key,val) for (key,val) in \
+                                    sorted(self.options.items())])
+        return "%s:%s" % (self.name, opts)
+    stats_key = property(_get_stats_key)
     
     def format_distance(self, dist):
         """
@@ -124,79 +161,75 @@ class FScoreMetric(DistanceMetric):
             "fscore_match method" % self.name
     
     def distance(self, sem1, sem2):
-        scores = self.fscore_match(sem1, sem2)
-        alignment = scores[0]
-        max_score1 = scores[1]
-        max_score2 = scores[2]
+        return self.total_from_stats([self.pair_stats(sem1, sem2)])
+    
+    def pair_stats(self, sem1, sem2):
+        """
+        The first three values from L{fscore_match} are all we need to 
+        compute any of the outputs, for a single pair or summed over many.
+        
+        """
+        return tuple(self.fscore_match(sem1, sem2)[:3])
+    
+    def total_from_stats(self, stats):
+        """
+        We don't just sum up f-scores to get another f-score: the match 
+        stats are summed and then the output computed from these.
+        
+        """
+        alignment = sum([s[0] for s in stats], 0.0)
+        max_score1 = sum([s[1] for s in stats], 0.0)
+        max_score2 = sum([s[2] for s in stats], 0.0)
+        
+        precision,recall,f_score = self.fscore_from_stats(alignment, 
+                                                    max_score1, max_score2)
         
-        # Compute recall and precision
-        if alignment == 0:
-            recall = 0.0
-        else:
-            recall = alignment / max_score2
         if self.options['output'] == 'recall':
             return recall
-            
-        if alignment == 0:
-            precision = 0.0
-        else:
-            precision = alignment / max_score1
-        if self.options['output'] == 'precision':
+        elif self.options['output'] == 'precision':
             return precision
-        
-        # Harmonic mean: f-score
-        if alignment == 0:
-            f_score = 0.0
-        else:
-            f_score = 2 * recall * precision / (recall+precision)
-        
-        if self.options['output'] == 'f':
+        elif self.options['output'] == 'f':
             return f_score
         else:
             # Assume it must be 'inversef' output
             return 1.0-f_score
     
-    def total_distance(self, input_pairs):
-        """
-        We don't just sum up f-scores to get another f-score.
-        
+    @staticmethod
+    def fscore_from_stats(alignment, max_score1, max_score2):
         """
-        max_score1 = 0.0
-        max_score2 = 0.0
-        alignment = 0.0
+        Computes precision, recall and f-score from the match stats 
+        returned by L{fscore_match} (or summed over several calls).
         
-        for (input1,input2) in input_pairs:
-            scores = self.fscore_match(input1, input2)
-            alignment += scores[0]
-            max_score1 += scores[1]
-            max_score2 += scores[2]
+        @rtype: tuple
+        @return: (precision, recall, f-score)
         
-        # Now compute the appropriate metric over the whole set
+        """
         if alignment == 0:
-            recall = 0
+            return 0.0, 0.0, 0.0
+        if max_score2 == 0:
+            recall = 0.0
         else:
             recall = alignment / max_score2
-        if self.options['output'] == 'recall':
-            return recall
-            
-        if alignment == 0:
-            precision = 0
+        if max_score1 == 0:
+            precision = 0.0
         else:
             precision = alignment / max_score1
-        if self.options['output'] == 'precision':
-            return precision
-        
+        if recall == 0.0 or precision == 0.0:
+            return precision, recall, 0.0
         # Harmonic mean: f-score
-        if alignment == 0:
-            f_score = 0
-        else:
-            f_score = 2 * recall * precision / (recall+precision)
+        f_score = 2 * recall * precision / (recall+precision)
+        return precision, recall, f_score
+    
+    def _get_stats_key(self):
+        """
+        The output option doesn't affect the stats, so precision, recall 
+        and f-score can all be computed from the same stored stats.
         
-        if self.options['output'] == 'f':
-            return f_score
-        else:
-            # Assume it must be 'inversef' output
-            return 1.0-f_score
+        """
+        opts = ",".join(["%s=%s" % (key,val) for (key,val) in \
+                    sorted(self.options.items()) if key != 'output'])
+        return "%s:%s" % (self.name, opts)
+    stats_key = property(_get_stats_key)
     
     def format_distance(self, dist):
         return "%f%%" % (dist * 100.0)
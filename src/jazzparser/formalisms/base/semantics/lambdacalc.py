@@ -11,6 +11,15 @@ the logical form it represents.
 LambdaAbstraction, FunctionApplication and Variable define the 
 basic lambda expressions.
 
+Each logical form keeps a cache of the free and bound variables in it, so 
+that beta-reduction doesn't have to walk the whole expression every time 
+it checks for clashing variables. The cache is cleared whenever the 
+structure below a node changes. All changes to the structure go through 
+setting the C{parent} of a logical form (as C{replace_immediate_constituent} 
+and friends do), or through renaming a variable by alpha-conversion, so 
+subclasses get this for free as long as they always set the parent 
+of new constituents.
+
 """
 """
 ============================== License ========================================
@@ -39,16 +48,26 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 import copy
 import logging
 from jazzparser import settings
+from jazzparser.utils.base import SlotPickleMixin
 
 # Get the logger from the logging system
 logger = logging.getLogger("main_logger")
 
-class Semantics(object):
+_NO_VARIABLES = frozenset()
+
+class Semantics(SlotPickleMixin):
     """This acts as the root node in the LF's tree structure. Any
     LF that is built as a semantic representation should 
     be contained in an instance of Semantics.
     
     """
+    # The root never caches variables, but acts as the end of the chain 
+    #  for clearing the LFs' caches
+    _variable_cache = None
+    # Backoff models store the probability of their results on the 
+    #  semantics
+    __slots__ = ('lf', 'probability')
+    
     def __init__(self, lf):
         """
         Creates a new container for a logical form. The
@@ -103,17 +122,109 @@ class Semantics(object):
         return str(self)
         
 
-class LogicalForm(object):
+class LogicalForm(SlotPickleMixin):
     """
     A semantic element, used to build the semantic
     interpretations returned by the parser.
     This class is effectively abstract. Most of its methods
     should be overridden.
     
+    LFs use slots, rather than an instance dict, since there are a 
+    great many of them in a chart. Subclasses must declare slots for 
+    the attributes they add.
+    
     """
+    # _variable_cache stores the free and bound variables, computed 
+    #  when first needed
+    __slots__ = ('_parent', '_variable_cache')
+    
     def __init__(self):
         """ Builds a basic logical form object. """
-        self.parent = None
+        self._parent = None
+        self._variable_cache = None
+    
+    def _get_parent(self):
+        return self._parent
+    def _set_parent(self, parent):
+        old_parent = self._parent
+        self._parent = parent
+        # Both the old and the new parent's variables might have changed
+        if old_parent is not None and old_parent._variable_cache is not None:
+            old_parent._invalidate_variable_cache()
+        if parent is not None and parent._variable_cache is not None:
+            parent._invalidate_variable_cache()
+    parent = property(_get_parent, _set_parent)
+    
+    def _invalidate_variable_cache(self):
+        """
+        Clears the cached variables of this node and its ancestors. The 
+        cache is only ever filled in from the bottom up, so once we 
+        reach a node that has nothing cached there's nothing above it 
+        to clear.
+        
+        """
+        node = self
+        while node is not None and node._variable_cache is not None:
+            node._variable_cache = None
+            node = node._parent
+    
+    def _get_variable_sets(self):
+        if self._variable_cache is None:
+            self._variable_cache = self._compute_variable_sets()
+        return self._variable_cache
+    
+    def _compute_variable_sets(self):
+        """
+        Computes the free and bound variables of this node. By default, 
+        these are the union of those of the children. Override this for 
+        nodes that bind variables.
+        
+        """
+        free = bound = _NO_VARIABLES
+        for child in self.get_children():
+            child_free,child_bound = child._get_variable_sets()
+            # Most children have no variables, so avoid building new sets 
+            #  where we can just share the child's
+            if child_free:
+                free = (free | child_free) if free else child_free
+            if child_bound:
+                bound = (bound | child_bound) if bound else child_bound
+        return (free, bound)
+    
+    def get_free_variable_set(self):
+        """
+        Returns the variables that occur free in this logical form, as a 
+        frozenset. This is cached, so is cheap to call repeatedly.
+        
+        The variables in the set are copies and not the variables in the 
+        logical form itself.
+        
+        """
+        return self._get_variable_sets()[0]
+    
+    def get_bound_variable_set(self):
+        """
+        Returns the variables bound by lambda abstractions in this 
+        logical form, as a frozenset. Like L{get_free_variable_set}, 
+        this is cached.
+        
+        """
+        return self._get_variable_sets()[1]
+    
+    def __getstate__(self):
+        state = super(LogicalForm, self).__getstate__()
+        # No need to store the cache
+        state.pop('_variable_cache', None)
+        return state
+    
+    def __setstate__(self, state):
+        state = dict(state)
+        # LFs pickled before parent was a property stored it directly
+        if 'parent' in state:
+            state['_parent'] = state.pop('parent')
+        self._parent = None
+        self._variable_cache = None
+        super(LogicalForm, self).__setstate__(state)
     
     def alpha_convert(self, source_var, target_var):
         """This should be overridden by subclasses."""
@@ -217,13 +328,13 @@ class LogicalForm(object):
         higher up the structure and can therefore be used unbound within 
         this element.
         """
-        if self.parent is not None:
-            vars = self.parent.get_ancestor_bound_variables()
-            if isinstance(self.parent, LambdaAbstraction):
-                vars.add(self.parent.variable)
-            return vars
-        else:
-            return set()
+        vars = set()
+        parent = self.parent
+        while isinstance(parent, LogicalForm):
+            if isinstance(parent, LambdaAbstraction):
+                vars.add(parent.variable)
+            parent = parent.parent
+        return vars
         
     def __repr__(self):
         return str(self)
@@ -235,6 +346,7 @@ class LambdaAbstraction(LogicalForm):
     to a lambda abstraction.
     
     """
+    __slots__ = ('variable', 'expression')
     
     def __init__(self, variable, expression):
         """
@@ -245,10 +357,12 @@ class LambdaAbstraction(LogicalForm):
         
         """
         super(LambdaAbstraction, self).__init__()
+        # Nothing's cached on a new node, so we can skip the parent 
+        #  property's cache clearing
         self.variable = variable.copy()
-        self.variable.parent = self
+        self.variable._parent = self
         self.expression = expression.copy()
-        self.expression.parent = self
+        self.expression._parent = self
         
     def copy(self):
         # Copying of these args is already done in the constructor
@@ -267,6 +381,19 @@ class LambdaAbstraction(LogicalForm):
         if source_variable == self.variable:
             logger.warning("Trying to substitute a bound variable: %s for %s in abstraction %s" % (target_expression, source_variable, self))
             raise ValueError, "Trying to substitute a bound variable: %s for %s in abstraction %s" % (target_expression, source_variable, self)
+        expr_free = self.expression.get_free_variable_set()
+        if source_variable not in expr_free:
+            # Nothing to substitute in here
+            return
+        target_free = target_expression.get_free_variable_set()
+        if self.variable in target_free:
+            # The abstraction would capture a free variable of the 
+            #  expression: rename the abstracted variable first
+            used_vars = target_free | expr_free | \
+                            self.expression.get_bound_variable_set() | \
+                            self.get_ancestor_bound_variables()
+            new_var = next_unused_variable(self.variable, used_vars)
+            self.alpha_convert(self.variable.copy(), new_var)
         self.expression.substitute(source_variable, target_expression)
         
     def replace_immediate_constituent(self, old_lf, new_lf):
@@ -292,6 +419,14 @@ class LambdaAbstraction(LogicalForm):
         vars.extend(self.expression.get_bound_variables())
         return vars
     
+    def _compute_variable_sets(self):
+        free,bound = self.expression._get_variable_sets()
+        if self.variable in free:
+            free = free - frozenset([self.variable])
+        if self.variable not in bound:
+            bound = bound | frozenset([self.variable.copy()])
+        return (free, bound)
+    
     def __eq__(self, lf):
         return (type(lf) == type(self)) and \
                (self.variable == lf.variable) and \
@@ -378,6 +513,7 @@ class LambdaAbstraction(LogicalForm):
 
 class Variable(LogicalForm):
     """A variable in a semantic expression."""
+    __slots__ = ('name', 'index')
     
     def __init__(self, name, index=0):
         """Creates a new variable object, representing the 
@@ -398,6 +534,7 @@ class Variable(LogicalForm):
         if (self.name == source_var.name) and (self.index == source_var.index):
             self.name = target_var.name
             self.index = target_var.index
+            self._invalidate_variable_cache()
     
     def beta_reduce(self, *args, **kwargs):
         # Doesn't do anything
@@ -422,6 +559,9 @@ class Variable(LogicalForm):
         # This is an unbound variable. Return nothing.
         return []
     
+    def _compute_variable_sets(self):
+        return (frozenset([self.copy()]), _NO_VARIABLES)
+    
     def __eq__(self, lf):
         """For the time being, two variables are considered equal
         if they have the same name. We could use some more elaborate
@@ -498,6 +638,7 @@ class FunctionApplication(LogicalForm):
     
     """
     INFIX_OPERATORS = []
+    __slots__ = ('functor', 'argument')
     
     def __init__(self, functor, argument):
         """
@@ -506,10 +647,11 @@ class FunctionApplication(LogicalForm):
         
         """
         super(FunctionApplication, self).__init__()
+        # No need to go through the parent property, as in LambdaAbstraction
         self.functor = functor.copy()
-        self.functor.parent = self
+        self.functor._parent = self
         self.argument = argument.copy()
-        self.argument.parent = self
+        self.argument._parent = self
         
     def copy(self):
         # Copying of args is done in the constructor anyway
@@ -525,15 +667,14 @@ class FunctionApplication(LogicalForm):
         ## Now if the functor is a lambda expression, we must apply it to the arg
         if isinstance(self.functor, LambdaAbstraction):
             ## First make sure no variable in the functor occurs in the arg.
-            # Free variables are fine to overlap - they might be bound higher up.
-            arg_vars = set(self.argument.get_bound_variables())
-            fun_vars = set(self.functor.get_bound_variables())
+            # Free variables are fine to overlap - they might be bound higher 
+            #  up. Substitution takes care of them not getting captured.
+            arg_vars = self.argument.get_bound_variable_set()
+            fun_vars = self.functor.get_bound_variable_set()
             # Also avoid using any variables bound higher up
-            used_vars = set([
-                            var.copy() for var in \
-                                (arg_vars | 
-                                 fun_vars | 
-                                 self.get_ancestor_bound_variables())])
+            used_vars = set(arg_vars | fun_vars)
+            used_vars.update(var.copy() for var in \
+                                    self.get_ancestor_bound_variables())
             # Alpha-convert each of the intersection's variables 
             #  in one of the expressions
             overlap = [var.copy() for var in (arg_vars & fun_vars)]
@@ -574,6 +715,9 @@ class FunctionApplication(LogicalForm):
             return self
     
     def substitute(self, source_variable, target_expression):
+        if source_variable not in self.get_free_variable_set():
+            # Nothing to substitute in here
+            return
         try:
             self.functor.substitute(source_variable,target_expression)
             self.argument.substitute(source_variable,target_expression)
@@ -657,6 +801,8 @@ class Terminal(LogicalForm):
     behaviour for terminals.
     
     """
+    __slots__ = ()
+    
     def alpha_convert(self, source_var, target_var):
         """Alpha-converting a terminal does nothing."""
         return
@@ -704,6 +850,7 @@ class Literal(Terminal):
     together using lambda expressions.
     
     """
+    __slots__ = ('name',)
     
     def __init__(self, name):
         """Builds a basic logical form object for a literal.
@@ -738,6 +885,8 @@ class DummyLogicalForm(LogicalForm):
     got as far as implementing the semantics.
     
     """
+    __slots__ = ()
+    
     def alpha_convert(self, *args):
         pass
         
@@ -47,7 +47,10 @@ class Temporal(object):
     Note that you must inherit from the logical form class as well: 
     just subclassing this may result in horrible things happening.
     You should also call Temporal's init when initializing subclasses.
+    Timed subclasses (those with C{timed_object=True}) must provide 
+    slots for C{_time} and C{_duration}.
     """
+    __slots__ = ()
     timed_object = False
     
     def __init__(self, duration=None, time=None):
@@ -114,14 +117,16 @@ class Temporal(object):
     def __get_duration(self):
         return self._duration if self.timed_object else None
     def __set_duration(self,dur):
-        self._duration = dur if self.timed_object else None
+        if self.timed_object:
+            self._duration = dur
     duration = property(__get_duration, __set_duration)
     """The duration of this phrase. Always None for types with timed_object=False."""
     
     def __get_time(self):
         return self._time if self.timed_object else None
     def __set_time(self, time):
-        self._time = time if self.timed_object else None
+        if self.timed_object:
+            self._time = time
     time = property(__get_time, __set_time)
     """The onset time of this phrase. Always None for types with timed_object=False."""
     
@@ -157,6 +162,8 @@ class TemporalSemantics(object):
     """
     Adds temporal semantics to the Semantics root class.
     """
+    __slots__ = ()
+    
     def _get_duration(self):
         return self.lf.duration
     def _set_duration(self, value):
@@ -30,7 +30,7 @@ CCG formalisms and defines the core CCG syntactic functionality.
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
-from jazzparser.utils.base import filter_latex
+from jazzparser.utils.base import filter_latex, SlotPickleMixin
 from jazzparser.utils.domxml import remove_unwanted_elements
 from jazzparser.data.assignments import EquivalenceAssignment
 from jazzparser.utils.chords import ChordError, chord_numeral_to_int, int_to_chord_numeral
@@ -40,7 +40,11 @@ import logging, copy, re
 # Get the logger from the logging system
 logger = logging.getLogger("main_logger")
 
-class SlashBase(object):
+class SlashBase(SlotPickleMixin):
+    # There are a lot of these in a chart: slots avoid having a dict 
+    #  on every instance
+    __slots__ = ('forward', 'formalism', 'id')
+    
     def __init__(self, formalism, forward, id=0):
         self.forward = forward
         self.formalism = formalism
@@ -87,7 +91,7 @@ class SlashBase(object):
     def copy(self):
         return SlashBase(self.formalism, self.forward, self.id)
 
-class SignBase(object):
+class SignBase(SlotPickleMixin):
     """
     A CCG category and its associated semantics: a CCG sign.
     
@@ -95,7 +99,19 @@ class SignBase(object):
     signs they were applied to, so that the parser can avoid re-applying 
     the same rule to the same inputs again.
     
+    Signs, like categories and logical forms, use slots instead of an 
+    instance dict, since a chart can hold a very large number of them. 
+    The attributes that parsers and taggers store on signs (C{tag}, 
+    C{probability}, etc) each have a slot, so any new ones must be 
+    added here.
+    
     """
+    __slots__ = ('formalism', 'category', 'semantics', 
+                 'unary_rules_applied', 'derivation_trace', 'result_index',
+                 '_unary_applied', '_binary_applied',
+                 # Set on signs by parsers, taggers and tools
+                 'tag', 'probability', 'inside_probability', '_str_prepend')
+    
     def __init__(self, formalism, category, semantics, derivation_trace=None):
         """
         @type formalism: L{FormalismBase subclass<FormalismBase>}
@@ -117,9 +133,10 @@ class SignBase(object):
         # This is not used until results are being processed. We give it
         #  a default value so it will be clear if the value hasn't been stored.
         self.result_index = -1
-        # Note which rules have been applied
-        self._unary_applied = []
-        self._binary_applied = {}
+        # Note which rules have been applied. Most signs never have 
+        #  any applied, so these are only created when needed
+        self._unary_applied = None
+        self._binary_applied = None
         
     def __hash__(self):
         return hash(self.category)
@@ -205,13 +222,15 @@ class SignBase(object):
         
         """
         if rule.arity == 1:
-            return rule in self._unary_applied
+            return self._unary_applied is not None and \
+                    rule in self._unary_applied
         else:
             # Binary rule
             if other_input is None:
                 raise ValueError, "tried to check whether a binary rule "\
                     "has been applied, but didn't give a second input"
-            return rule in self._binary_applied and \
+            return self._binary_applied is not None and \
+                    rule in self._binary_applied and \
                     id(other_input) in self._binary_applied[rule]
                     
     def note_rule_applied(self, rule, other_input=None):
@@ -222,18 +241,28 @@ class SignBase(object):
         
         """
         if rule.arity == 1:
+            if self._unary_applied is None:
+                self._unary_applied = []
             self._unary_applied.append(rule)
         else:
             if other_input is None:
                 raise ValueError, "tried to note that a binary rule "\
                     "has been applied, but didn't give a second input"
+            if self._binary_applied is None:
+                self._binary_applied = {}
             self._binary_applied.setdefault(rule, []).append(id(other_input))
 
 
-class Category(object):
+class Category(SlotPickleMixin):
     """
     Parent class of categories (i.e. functional and atomic).
+    
+    Categories use slots, so subclasses should declare slots for any 
+    attributes they add. C{_model_cache} is left for models to store 
+    things on the category.
     """
+    __slots__ = ('formalism', '_model_cache')
+    
     def __init__(self, formalism):
         self.formalism = formalism
     
@@ -242,12 +271,21 @@ class Category(object):
         
     def __repr__(self):
         return str(self)
+    
+    def __getstate__(self):
+        # Don't pickle anything models have cached on the category: it 
+        #  may only be valid in the current process
+        state = super(Category, self).__getstate__()
+        state.pop('_model_cache', None)
+        return state
         
     class CategoryParseError(Exception):
         pass
 
 
 class ComplexCategoryBase(Category):
+    __slots__ = ('result', 'argument', 'slash')
+    
     def __init__(self, formalism, result, slash, argument):
         """A slash category must be initialised with
         a pair of categories (argument and result) that 
@@ -309,6 +347,8 @@ class AtomicCategoryBase(Category):
     Much of the implementation of an atomic category is left to 
     subclasses, since this is where the most formalism-dependence is.
     """
+    __slots__ = ()
+    
     def __init__(self, formalism):
         super(AtomicCategoryBase, self).__init__(formalism)
         
@@ -339,6 +379,8 @@ class DummyCategoryBase(Category):
     model).
     
     """
+    __slots__ = ()
+    
     def __init__(self, formalism):
         super(DummyCategoryBase, self).__init__(formalism)
         
@@ -80,6 +80,7 @@ class Formalism(FormalismBase):
     semantics_to_coordinates = staticmethod(semantics.semantics_to_coordinates)
     semantics_to_functions = staticmethod(semantics.semantics_to_functions)
     semantics_to_keys = staticmethod(semantics.semantics_to_keys)
+    transpose_sign = staticmethod(syntax.transpose_sign)
     
     semantics_distance_metrics = [
         distance.TonalSpaceEditDistance,
@@ -25,7 +25,10 @@
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
+import numpy
+
 from jazzparser.utils.base import group_pairs
+from jazzparser.formalisms.music_halfspan.semantics import cache_paths
 
 def _subst_type(point1, point2):
     root = point1[0] != point2[0]
@@ -55,6 +58,29 @@ def _subst_cost_float(point1, point2):
     """
     return float(_subst_cost(point1,point2))/2
 
+def _subst_cost_matrix(steps1, steps2):
+    """
+    Computes L{_subst_cost} for every pair of points from the two lists 
+    in one go, giving a matrix that can be passed to the edit distance 
+    functions instead of the cost function.
+    
+    Each cost is 1 if the roots differ plus 1 if the functions differ.
+    
+    """
+    coords1 = numpy.array([point[0] for point in steps1]).reshape(-1, 2)
+    coords2 = numpy.array([point[0] for point in steps2]).reshape(-1, 2)
+    # Give each function an integer code so we can compare them as arrays
+    fun_ids = {}
+    funs1 = numpy.array([fun_ids.setdefault(point[1], len(fun_ids)) \
+                                                    for point in steps1])
+    funs2 = numpy.array([fun_ids.setdefault(point[1], len(fun_ids)) \
+                                                    for point in steps2])
+    
+    root_diff = numpy.any(coords1[:,numpy.newaxis,:] != \
+                                coords2[numpy.newaxis,:,:], axis=2)
+    fun_diff = funs1[:,numpy.newaxis] != funs2[numpy.newaxis,:]
+    return root_diff.astype(int) + fun_diff.astype(int)
+
 def _steps_list(seq):
     """
     Given a list of (coordinate,function) pairs, produces a similar list 
@@ -78,6 +104,7 @@ def _steps_list(seq):
     # Put the functions back in for the result
     return zip(steps, funs)
 
+@cache_paths
 def _lf_to_coord_funs(sem):
     """
     Gets a list of (coordinate,function) pairs from a logical form.
@@ -121,7 +148,7 @@ def tonal_space_distance(sem1, sem2):
                                 steps1, 
                                 steps2,
                                 delins_cost=2,
-                                subst_cost_fun=_subst_cost)
+                                subst_costs=_subst_cost_matrix(steps1, steps2))
     return float(edit_dist) / 2.0
 
 def tonal_space_alignment_costs(sem1, sem2):
@@ -145,7 +172,7 @@ def tonal_space_alignment_costs(sem1, sem2):
                                 steps1, 
                                 steps2,
                                 delins_cost=2,
-                                subst_cost_fun=_subst_cost)
+                                subst_costs=_subst_cost_matrix(steps1, steps2))
     # We now have the matrix of costs and the pointers that generated 
     #  those costs.
     # Trace back to find out what costs were incurred in the optimal 
@@ -219,7 +246,7 @@ def tonal_space_alignment(sem1, sem2, distance=False):
                                 steps1, 
                                 steps2,
                                 delins_cost=2,
-                                subst_cost_fun=_subst_cost)
+                                subst_costs=_subst_cost_matrix(steps1, steps2))
     
     # We now have the matrix of costs and the pointers that generated 
     #  those costs.
@@ -272,7 +299,8 @@ def tonal_space_align(sem1, sem2):
     steps1 = _steps_list(seq1)
     steps2 = _steps_list(seq2)
     
-    pairs = align(steps1, steps2, delins_cost=2, subst_cost=_subst_cost)
+    pairs = align(steps1, steps2, delins_cost=2, 
+                  subst_costs=_subst_cost_matrix(steps1, steps2))
     return pairs
     
 def tonal_space_precision_recall(sem, gold_sem):
@@ -350,7 +378,7 @@ def tonal_space_local_distance(sem1, sem2):
                                 steps1, 
                                 steps2,
                                 delins_cost=2,
-                                subst_cost_fun=_subst_cost)
+                                subst_costs=_subst_cost_matrix(steps1, steps2))
     return float(dists[-1][-1]) / 2.0
 
 def tonal_space_local_alignment(sem1, sem2):
@@ -373,7 +401,7 @@ def tonal_space_local_alignment(sem1, sem2):
                                 steps1, 
                                 steps2,
                                 delins_cost=2,
-                                subst_cost_fun=_subst_cost)
+                                subst_costs=_subst_cost_matrix(steps1, steps2))
     
     # We now have the matrix of costs and the pointers that generated 
     #  those costs.
@@ -145,6 +145,64 @@ class HalfspanPcfgModel(PcfgModel):
         self._lexical_dist = ConditionalProbDist(lexical_counts, 
                                     estimator, self.word_bins)
         
+        # Compile the distributions into lookup tables for fast scoring
+        self._compile_tables()
+        
+    def _compile_tables(self):
+        """
+        Compiles the model's distributions into lookup tables keyed by 
+        the interned ids of category representations (see 
+        L{CategoryRepTable}), so that scoring an edge only needs a few 
+        dictionary lookups. The tables are filled in up front for 
+        everything seen in the training data. Probabilities of anything 
+        else are computed from the distributions the first time they're 
+        needed and then added to the tables.
+        
+        """
+        self._category_reps = reps = CategoryRepTable()
+        self._parent_table = dict(
+            (reps.intern(parent), self._parent_dist.prob(parent))
+                for parent in self._parent_counts.keys())
+        
+        self._expansion_table = {}
+        for parent in self._expansion_type_counts.conditions():
+            dist = self._expansion_type_dist[parent]
+            parent_id = reps.intern(parent)
+            for expansion in self._expansion_type_counts[parent].keys():
+                self._expansion_table[(parent_id, expansion)] = \
+                                                    dist.prob(expansion)
+        
+        self._head_table = {}
+        for (expansion,parent) in self._head_expansion_counts.conditions():
+            dist = self._head_expansion_dist[(expansion,parent)]
+            parent_id = reps.intern(parent)
+            for head in self._head_expansion_counts[(expansion,parent)].keys():
+                self._head_table[
+                        (expansion, parent_id, reps.intern(head))] = \
+                                                    dist.prob(head)
+        
+        self._non_head_table = {}
+        for condition in self._non_head_expansion_counts.conditions():
+            head,expansion,parent = condition
+            dist = self._non_head_expansion_dist[condition]
+            cond_ids = (reps.intern(head), expansion, 
+                        reps.intern(parent))
+            for non_head in self._non_head_expansion_counts[condition].keys():
+                self._non_head_table[
+                        cond_ids + (reps.intern(non_head),)] = \
+                                                    dist.prob(non_head)
+        
+        self._lexical_table = {}
+        for parent in self._lexical_counts.conditions():
+            dist = self._lexical_dist[parent]
+            parent_id = reps.intern(parent)
+            for observation in self._lexical_counts[parent].keys():
+                self._lexical_table[(parent_id, observation)] = \
+                                                    dist.prob(observation)
+        
+        # Chord observations for each (word, base pitch) pair
+        self._observations = {}
+        
     def chord_observation(self, chord):
         """
         Returns the string observation counted for a given chord.
@@ -195,9 +253,16 @@ class HalfspanPcfgModel(PcfgModel):
         multiply the returned value with the daughters' insider probabilities.
         
         """
-        parent_rep = model_category_repr(parent.category)
+        reps = self._category_reps
+        parent_id = reps.category_id(parent.category)
         # Get the probability of the expansion type
-        exp_prob = self._expansion_type_dist[parent_rep].prob(expansion)
+        key = (parent_id, expansion)
+        try:
+            exp_prob = self._expansion_table[key]
+        except KeyError:
+            exp_prob = self._expansion_table[key] = \
+                self._expansion_type_dist[reps.reps[parent_id]].prob(
+                                                                expansion)
         
         if expansion == 'leaf':
             # Get the probability of the word given parent
@@ -207,12 +272,23 @@ class HalfspanPcfgModel(PcfgModel):
             else:
                 # In this case the word is given as the left branch
                 word = left
-                # Word should be a chord label: interpret it as such
-                chord = Chord.from_name(word)
-                chord_obs = self.chord_observation(
+                obs_key = (word, base_pitch(parent.category))
+                try:
+                    chord_obs = self._observations[obs_key]
+                except KeyError:
+                    # Word should be a chord label: interpret it as such
+                    chord = Chord.from_name(word)
+                    chord_obs = self._observations[obs_key] = \
+                            self.chord_observation(
                                 category_relative_chord(chord, 
                                                 category=parent.category))
-                word_prob = self._lexical_dist[parent_rep].prob(chord_obs)
+                key = (parent_id, chord_obs)
+                try:
+                    word_prob = self._lexical_table[key]
+                except KeyError:
+                    word_prob = self._lexical_table[key] = \
+                        self._lexical_dist[reps.reps[parent_id]].prob(
+                                                                chord_obs)
             return exp_prob * word_prob
         else:
             # We currently only recognise one other case: right-head
@@ -220,15 +296,27 @@ class HalfspanPcfgModel(PcfgModel):
             head = right
             non_head = left
             # Get the probability of the head (right) daughter given the parent
-            condition = (expansion, parent_rep)
-            head_rep = model_category_repr(head.category, parent.category)
-            head_prob = self._head_expansion_dist[condition].prob(head_rep)
+            head_id = reps.category_id(head.category, parent.category)
+            key = (expansion, parent_id, head_id)
+            try:
+                head_prob = self._head_table[key]
+            except KeyError:
+                condition = (expansion, reps.reps[parent_id])
+                head_prob = self._head_table[key] = \
+                    self._head_expansion_dist[condition].prob(
+                                                    reps.reps[head_id])
             # Get the probability of the non-head daughter given the 
             #  parent and the head daughter
-            condition = (head_rep, expansion, parent_rep)
-            non_head_rep = model_category_repr(non_head.category, parent.category)
-            non_head_prob = \
-                self._non_head_expansion_dist[condition].prob(non_head_rep)
+            non_head_id = reps.category_id(non_head.category, parent.category)
+            key = (head_id, expansion, parent_id, non_head_id)
+            try:
+                non_head_prob = self._non_head_table[key]
+            except KeyError:
+                condition = (reps.reps[head_id], expansion, 
+                             reps.reps[parent_id])
+                non_head_prob = self._non_head_table[key] = \
+                    self._non_head_expansion_dist[condition].prob(
+                                                reps.reps[non_head_id])
             return exp_prob * head_prob * non_head_prob
     
     def outside_probability(self, parent):
@@ -240,8 +328,14 @@ class HalfspanPcfgModel(PcfgModel):
         probability.
         
         """
-        cat = model_category_repr(parent.category)
-        return self._parent_dist.prob(cat)
+        reps = self._category_reps
+        parent_id = reps.category_id(parent.category)
+        try:
+            return self._parent_table[parent_id]
+        except KeyError:
+            prob = self._parent_table[parent_id] = \
+                    self._parent_dist.prob(reps.reps[parent_id])
+            return prob
             
     def description(self):
         buff = StringIO()
@@ -529,6 +623,67 @@ def model_category_repr(category, base_category=None):
     
     return category
 
+class CategoryRepTable(object):
+    """
+    Interns the category representations (as returned by 
+    L{model_category_repr}) used by a model, giving each an integer id 
+    that uniquely identifies it within the table. Each model has its 
+    own table, so the representations are freed along with the model.
+    
+    """
+    def __init__(self):
+        self._ids = {}
+        #: The representation with each id
+        self.reps = []
+    
+    def intern(self, rep):
+        """
+        Returns the id of the category representation, allocating a new 
+        one if the representation hasn't been seen before. The 
+        representation can be retrieved from the id using 
+        C{table.reps[id]}.
+        
+        """
+        rep_id = self._ids.get(rep, None)
+        if rep_id is None:
+            rep_id = len(self.reps)
+            self._ids[rep] = rep_id
+            self.reps.append(rep)
+        return rep_id
+    
+    def category_id(self, category, base_category=None):
+        """
+        Interned id of the representation that L{model_category_repr} 
+        would return for these arguments.
+        
+        The representation depends only on the category and the pitch 
+        taken from the base category, so the ids are cached on the 
+        category object for each base pitch. The category must therefore 
+        not be altered once it has been used in the model. Only the ids 
+        from the last table the category was used with are cached.
+        
+        """
+        if base_category is None:
+            root = base_pitch(category)
+        else:
+            root = base_pitch(base_category)
+            if root is None:
+                root = base_pitch(category)
+        
+        try:
+            table,cache = category._model_cache
+        except AttributeError:
+            table = None
+        if table is not self:
+            cache = {}
+            category._model_cache = (self, cache)
+        try:
+            return cache[root]
+        except KeyError:
+            rep_id = cache[root] = self.intern(
+                            model_category_repr(category, base_category))
+            return rep_id
+
 def base_pitch(cat):
     """
     Arbitrarily picks a root out of the category, so that we can take 
@@ -30,6 +30,7 @@ my 2nd-year review.
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
 import copy, re, math
+from functools import wraps
 from ...base.semantics.lambdacalc import \
             Semantics as SemanticsBase, LambdaAbstraction as LambdaAbstractionBase, \
             FunctionApplication as FunctionApplicationBase, \
@@ -39,7 +40,7 @@ from ...base.semantics.lambdacalc import \
             multi_abstract as multi_abstract_base, Terminal
 from ...base.semantics.temporal import Temporal, TemporalSemantics, \
             earliest_time
-from jazzparser.utils.base import group_pairs
+from jazzparser.utils.base import group_pairs, slot_names
 from jazzparser.utils.tonalspace import root_to_et_coord, \
             coordinate_to_roman_name, coordinate_to_et_2d, \
             coordinate_to_alpha_name_c
@@ -54,6 +55,8 @@ from itertools import izip
 FORMALISM_NAME = "music_halfspan"
 
 class Semantics(SemanticsBase, TemporalSemantics):
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         SemanticsBase.__init__(self, *args, **kwargs)
         TemporalSemantics.__init__(self)
@@ -62,6 +65,8 @@ class Semantics(SemanticsBase, TemporalSemantics):
         return self.lf.format_result()
 
 class DummyLogicalForm(DummyLogicalFormBase, Temporal):
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         DummyLogicalFormBase.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -105,8 +110,8 @@ class EnharmonicCoordinate(Terminal, Temporal):
     This is used in the semantics as a tonic point.
     
     """
+    __slots__ = ('_x', '_y', '_X', '_Y', 'delta', '_time', '_duration')
     timed_object = True
-    delta = False
     
     def __init__(self, coord=(0,0), block=(0,0), time=None, duration=None, delta=False, *args, **kwargs):
         """
@@ -373,6 +378,7 @@ class LexicalCoordinate(Terminal, Temporal):
     at ((x+cx)%4, (y+cy)%3).
     
     """
+    __slots__ = ('x', 'y', '_time', '_duration')
     timed_object = True
     
     def __init__(self, coord=(0,0), time=None, duration=None, *args, **kwargs):
@@ -425,6 +431,8 @@ class GhostCoordinate(Terminal, Temporal):
     to this point, but that the point itself should be burnt after reading.
     
     """
+    __slots__ = ('coordinate',)
+    
     def __init__(self, coordinate, *args, **kwargs):
         Terminal.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -460,6 +468,8 @@ class List(LogicalForm, Temporal):
     theoretical definition of the semantics.
     
     """
+    __slots__ = ('_items',)
+    
     def __init__(self, items=[], *args, **kwargs):
         LogicalForm.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -607,6 +617,8 @@ class ListCat(LogicalForm, Temporal):
     aren't yet.
     
     """
+    __slots__ = ('lists',)
+    
     def __init__(self, lists=[], *args, **kwargs):
         LogicalForm.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -703,6 +715,8 @@ class Coordination(LogicalForm, Temporal):
     nested coordinations into one.
     
     """
+    __slots__ = ('_cadences',)
+    
     def __init__(self, cadences=[], *args, **kwargs):
         LogicalForm.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -829,6 +843,8 @@ class Variable(VariableBase, Temporal):
     processing.
     
     """
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         VariableBase.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -851,6 +867,7 @@ class LambdaAbstraction(LambdaAbstractionBase, Temporal):
     processing.
     
     """
+    __slots__ = ()
     VARIABLE_CLASS = Variable
         
     def __init__(self, *args, **kwargs):
@@ -880,6 +897,8 @@ class FunctionApplication(FunctionApplicationBase, Temporal):
     processing.
     
     """
+    __slots__ = ()
+    
     def set_time(self, time):
         self.functor.set_time(time)
         
@@ -909,6 +928,7 @@ class Predicate(Literal, Temporal):
     Superclass of literal predicates (such as leftonto).
     
     """
+    __slots__ = ('_time', '_duration')
     timed_object = True
     
     def __init__(self, *args, **kwargs):
@@ -973,6 +993,8 @@ class Leftonto(Predicate):
     (leftonto ...)
     
     """
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         Predicate.__init__(self, "leftonto", *args, **kwargs)
 
@@ -981,6 +1003,8 @@ class Rightonto(Predicate):
     A rightonto predicate literal, analagous to L{Leftonto}.
     
     """
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         Predicate.__init__(self, "rightonto", *args, **kwargs)
 
@@ -991,6 +1015,8 @@ class Now(Predicate):
     predicate.
     
     """
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         Predicate.__init__(self, "now", *args, **kwargs)
     
@@ -1053,6 +1079,8 @@ class PathCoordinate(EnharmonicCoordinate):
     kind of semantics for storing results from backoff models.
     
     """
+    __slots__ = ('function',)
+    
     def __init__(self, *args, **kwargs):
         self.function = kwargs.pop('function', 'T')
         super(PathCoordinate, self).__init__(*args, **kwargs)
@@ -1088,6 +1116,8 @@ class CoordinateList(LogicalForm, Temporal):
     kind of semantics for storing results from backoff models.
     
     """
+    __slots__ = ('_items',)
+    
     def __init__(self, items=[], *args, **kwargs):
         LogicalForm.__init__(self, *args, **kwargs)
         Temporal.__init__(self)
@@ -1248,6 +1278,105 @@ def make_absolute_lf_from_relative(sems, root_coord):
         for child in children:
             make_absolute_lf_from_relative(child, root_coord)
 
+def transpose_lf(sems, coord):
+    """
+    Moves every tonal space point in an absolute logical form by the
+    given 2D ET coordinate (e.g. from L{root_to_et_coord
+    <jazzparser.utils.tonalspace.root_to_et_coord>}). The LF is altered
+    in place.
+    
+    Points in the semantics are kept in the same enharmonic block, so
+    the LF is the same as we'd get from parsing the transposed input. The points of a backoff path
+    (L{CoordinateList}) are all moved by the same vector, so the path
+    keeps its shape.
+    
+    """
+    if isinstance(sems, Semantics):
+        transpose_lf(sems.lf, coord)
+    elif isinstance(sems, CoordinateList):
+        if len(sems) == 0:
+            return
+        # Move the first point within its block, like the rest of the
+        #  semantics, and take the rest of the path with it
+        first = sems[0]
+        moved = EnharmonicCoordinate(first.add_coord(coord).zero_coord,
+                                     first.block_coord)
+        (mx,my),(fx,fy) = moved.harmonic_coord, first.harmonic_coord
+        vector = (mx-fx, my-fy)
+        for point in sems:
+            new_point = point.add_coord(vector)
+            point.x, point.y = new_point.zero_coord
+            point.X, point.Y = new_point.block_coord
+    elif isinstance(sems, EnharmonicCoordinate):
+        # Deltas are vectors, which aren't affected by transposition
+        if not sems.delta:
+            sems.x, sems.y = sems.add_coord(coord).zero_coord
+    elif isinstance(sems, GhostCoordinate):
+        transpose_lf(sems.coordinate, coord)
+    else:
+        for child in sems.get_children():
+            transpose_lf(child, coord)
+
+# Maximum number of paths kept by L{cache_paths}
+PATH_CACHE_SIZE = 1000
+_path_cache = {}
+_content_attrs = {}
+
+def lf_content_key(lf):
+    """
+    Builds a hashable key from everything stored in a logical form: 
+    the types of all its nodes and all their attributes (coordinates, 
+    times, etc), apart from the links to their parents. Two logical 
+    forms have the same key only if they're identical, not just equal, 
+    so the key can be used to cache things computed from an LF.
+    
+    This is much quicker than converting the LF to a path, but still 
+    walks the whole LF, so don't use it to cache anything that's cheap 
+    to compute.
+    
+    """
+    if isinstance(lf, LogicalForm):
+        cls = type(lf)
+        if cls not in _content_attrs:
+            _content_attrs[cls] = [name for name in slot_names(cls) \
+                            if name not in ('_parent', '_variable_cache')]
+        return (cls,) + tuple([lf_content_key(getattr(lf, name, None)) \
+                                    for name in _content_attrs[cls]])
+    elif isinstance(lf, (list, tuple)):
+        return tuple([lf_content_key(item) for item in lf])
+    else:
+        return lf
+
+def cache_paths(fn):
+    """
+    Decorator for functions that compute a path (or anything else that 
+    doesn't get modified) from a L{List} logical form. The first time 
+    the path is computed for an LF, it's stored under the LF's 
+    L{content key<lf_content_key>}, so the same path is returned 
+    for the same LF or an identical one without computing it again. 
+    This means, for example, that the paths for a set of songs only 
+    need to be computed once to compare them all against each other.
+    
+    Paths are returned as a new list each time, so the caller may 
+    modify it. Other inputs (e.g. a L{CoordinateList}, which is quick 
+    to get a path from) are passed straight to the function.
+    
+    """
+    @wraps(fn)
+    def _cached(lst, *args, **kwargs):
+        if not isinstance(lst, List):
+            return fn(lst, *args, **kwargs)
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())), 
+               lf_content_key(lst))
+        if key not in _path_cache:
+            path = tuple(fn(lst, *args, **kwargs))
+            if len(_path_cache) >= PATH_CACHE_SIZE:
+                _path_cache.clear()
+            _path_cache[key] = path
+        return list(_path_cache[key])
+    return _cached
+
+@cache_paths
 def list_lf_to_coordinates(lst, start_block=(0,0)):
     """
     Produces a list of (x,y) coordinates in the tonal space, given 
@@ -1384,6 +1513,7 @@ def list_lf_to_coordinates(lst, start_block=(0,0)):
         path.extend(zip(coords,times))
     return [(coord.harmonic_coord, time) for (coord, time) in path]
 
+@cache_paths
 def list_lf_to_functions(lst):
     """
     Like L{list_lf_to_coordinates}, but produces a list of (function,time) 
@@ -1508,7 +1638,7 @@ def backoff_states_to_lf(states):
     ((first_point,first_fun), first_time) = states[0]
     first = PathCoordinate.from_enharmonic_coord(
                 EnharmonicCoordinate((first_point[2],first_point[3])))
-    first.fun = first_fun
+    first.function = first_fun
     first.time = first_time
     
     points = [first]
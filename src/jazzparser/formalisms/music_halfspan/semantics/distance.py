@@ -109,13 +109,26 @@ class TonalSpaceEditDistance(FScoreMetric):
         pairs = tonal_space_align(sem1.lf, sem2.lf)
         return "\n".join(["%s %s" % pair for pair in pairs])
     
-    def total_distance(self, input_pairs):
+    def pair_stats(self, sem1, sem2):
         """ Handle the 'dist' output specially (just sum up distances). """
         if self.options['output'] == 'dist':
             # Do the normal (non-f-score) metric thing of summing up all vals
-            return DistanceMetric.total_distance(self, input_pairs)
+            return DistanceMetric.pair_stats(self, sem1, sem2)
         else:
-            return FScoreMetric.total_distance(self, input_pairs)
+            return FScoreMetric.pair_stats(self, sem1, sem2)
+    
+    def total_from_stats(self, stats):
+        if self.options['output'] == 'dist':
+            return DistanceMetric.total_from_stats(self, stats)
+        else:
+            return FScoreMetric.total_from_stats(self, stats)
+    
+    def _get_stats_key(self):
+        if self.options['output'] == 'dist':
+            return DistanceMetric._get_stats_key(self)
+        else:
+            return FScoreMetric._get_stats_key(self)
+    stats_key = property(_get_stats_key)
     
     def format_distance(self, dist):
         if self.options['output'] == 'dist':
@@ -47,12 +47,15 @@ from jazzparser.formalisms.base.modalities import ModalSlash, \
 from jazzparser.utils.chords import ChordError, chord_numeral_to_int, int_to_pitch_class
 from jazzparser.utils.latex import filter_latex
 from jazzparser.utils.tonalspace import root_to_et_coord
-from .semantics import make_absolute_lf_from_relative
+from jazzparser.utils.base import SlotPickleMixin
+from .semantics import make_absolute_lf_from_relative, transpose_lf
 
 # Get the logger from the logging system
 logger = logging.getLogger("main_logger")
 
 class Slash(SlashBase, ModalSlash):
+    __slots__ = ('modality',)
+    
     def __init__(self, dir, modality=None, **kwargs):
         from . import Formalism
         if modality is None:
@@ -76,6 +79,8 @@ class Sign(SignBase):
     formalism-specific things.
     
     """
+    __slots__ = ()
+    
     def __init__(self, *args, **kwargs):
         from . import Formalism
         super(Sign, self).__init__(Formalism, *args, **kwargs)
@@ -121,6 +126,7 @@ class ComplexCategory(ComplexCategoryBase, ModalComplexCategory):
     
     """
     ATOMIC = False
+    __slots__ = ()
     
     def __init__(self, *args, **kwargs):
         from . import Formalism
@@ -137,7 +143,9 @@ class ComplexCategory(ComplexCategoryBase, ModalComplexCategory):
                self.argument == other.argument and \
                self.result == other.result
 
-class HalfCategory(object):
+_FUNCTION_SETS = {}
+
+class HalfCategory(SlotPickleMixin):
     """
     One half of an atomic category, or the argument or result of a 
     complex category.
@@ -145,6 +153,8 @@ class HalfCategory(object):
     a set of functions in the case of an argument half category).
     
     """
+    __slots__ = ('root', 'functions')
+    
     def __init__(self, root_symbol=None, function='T', root_number=None):
         """
         Either root_symbol or root_number must be given.
@@ -180,12 +190,15 @@ class HalfCategory(object):
                 "be given when creating a half category"
         
         if type(function) == str:
-            self.functions = set([function])
-        else:
-            if len(function) == 0:
-                raise ValueError, "cannot create a category with an "\
-                    "empty set of possible functions"
-            self.functions = set(function)
+            function = [function]
+        elif len(function) == 0:
+            raise ValueError, "cannot create a category with an "\
+                "empty set of possible functions"
+        # There are only a handful of different function sets, so we 
+        #  share a single frozenset between all categories with the same 
+        #  functions
+        functions = frozenset(function)
+        self.functions = _FUNCTION_SETS.setdefault(functions, functions)
         
     def __str__(self):
         return "%s^%s" % (self.symbol, self.function_symbol)
@@ -268,6 +281,7 @@ class AtomicCategory(AtomicCategoryBase, ModalAtomicCategory):
     
     """
     ATOMIC = True
+    __slots__ = ('from_half', 'to_half')
     
     def __init__(self, from_half, to_half):
         from . import Formalism
@@ -315,6 +329,7 @@ class AtomicCategory(AtomicCategoryBase, ModalAtomicCategory):
 
 class DummyCategory(DummyCategoryBase):
     ATOMIC = None
+    __slots__ = ()
     
     def __init__(self):
         from . import Formalism
@@ -394,6 +409,18 @@ def make_absolute_category_from_relative(relative_cat, base_root):
         raise TypeError, "Tried to alter a category object of the wrong type"
     return
 
+def transpose_sign(sign, semitones):
+    """
+    Transposes a sign (e.g. a parse result) up by the given number of 
+    semitones, altering its category and semantics in place. The 
+    category of a backoff result is a L{DummyCategory}, which has no 
+    roots to change, so only its semantics are transposed.
+    
+    """
+    if not isinstance(sign.category, DummyCategory):
+        make_absolute_category_from_relative(sign.category, semitones)
+    transpose_lf(sign.semantics, root_to_et_coord(semitones))
+
 def pre_generalize_category(category):
     """
     When abstracting categories to something general that just 
@@ -492,20 +492,15 @@ class Grammar(object):
             logger.debug("\n".join(["  %s: %s" % (name,val) for (name,val) in self.literal_functions.items()]))
     
     
-    def get_signs_for_word(self, word, tags=None, extra_features=None):
+    def _lookup_word(self, word, tags=None):
         """
-        Given a word string, returns a list of the possible signs
-        (as CCGSigns) that the grammar can assign to it.
-        word may also be a Chord object.
-        For now, this assumes that the input is a single chord in
-        roman numeral notation and that spelling issues have already
-        been resolved (e.g. that 6s have been removed).
+        Looks up the lexicon's interpretations (morph items) of a word, 
+        for L{get_signs_for_word} and L{get_tags_for_word}. If tags is 
+        given, only morphs whose POS is in the list are returned.
         
-        If tags is given it should be a list of strings. Signs will be 
-        restricted to those whose entry's tag name/POS is in the list.
-        
-        If you need to get an instantiated category from a lexical entry, 
-        use the methods on L{EntriesItem} directly, or L{get_signs_for_tag}.
+        @raise GrammarLookupError: if the word isn't in the lexicon, or 
+            one of its POSs has no family
+        @return: the word as a chord and the list of its morphs
         
         """
         if isinstance(word, Chord):
@@ -515,7 +510,7 @@ class Grammar(object):
         elif isinstance(word, DbChord):
             chord = word
         else:
-            raise GrammarLookupError, "Tried to get signs for a word of type "\
+            raise GrammarLookupError, "Tried to look up a word of type "\
                 "'%s': %s" % (type(word), word)
         # Get a chord type string to look up in the grammar
         chord_lookup = "X%s" % chord.type
@@ -534,13 +529,34 @@ class Grammar(object):
         if tags is not None:
             morphs = [m for m in morphs if m.pos in tags]
         
-        # Build a sign for each morph-family pair
-        category_list = []
+        # Look for families corresponding to the POSs
         for morph in morphs:
-            # Look for families corresponding to the POS
             if not morph.pos in self.families:
                 raise GrammarLookupError, "There is no family in the lexicon "\
                     "for the POS %s." % morph.pos
+        return chord, morphs
+    
+    def get_signs_for_word(self, word, tags=None, extra_features=None):
+        """
+        Given a word string, returns a list of the possible signs
+        (as CCGSigns) that the grammar can assign to it.
+        word may also be a Chord object.
+        For now, this assumes that the input is a single chord in
+        roman numeral notation and that spelling issues have already
+        been resolved (e.g. that 6s have been removed).
+        
+        If tags is given it should be a list of strings. Signs will be 
+        restricted to those whose entry's tag name/POS is in the list.
+        
+        If you need to get an instantiated category from a lexical entry, 
+        use the methods on L{EntriesItem} directly, or L{get_signs_for_tag}.
+        
+        """
+        chord,morphs = self._lookup_word(word, tags=tags)
+        
+        # Build a sign for each morph-family pair
+        category_list = []
+        for morph in morphs:
             for family in self.families[morph.pos]:
                 # Build a CCGCategory for each entry in each family found
                 for entry in family.entries:
@@ -557,6 +573,26 @@ class Grammar(object):
         
         return category_list
         
+    def get_tags_for_word(self, word, tags=None):
+        """
+        Returns the set of POS tags for which L{get_sign_for_word_by_tag} 
+        would return a sign for the given word. This only looks at the 
+        lexicon, so it's much quicker than instantiating the signs to 
+        find out which tags are possible.
+        
+        If tags is given, only tags in this list will be returned, as 
+        with L{get_signs_for_word}, and other POSs of the word won't be 
+        looked up at all.
+        
+        """
+        chord,morphs = self._lookup_word(word, tags=tags)
+        
+        word_tags = set()
+        for morph in morphs:
+            if any(len(family.entries) for family in self.families[morph.pos]):
+                word_tags.add(morph.pos)
+        return word_tags
+        
     def get_sign_for_word_by_tag(self, word, tag, extra_features=None):
         """
         Returns a sign that can be assigned to the given word and that 
@@ -26,32 +26,67 @@
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
 import wave, os.path
+import numpy
 
 DEFAULT_SAMPLE_RATE = 44100
+# Number of samples to write at once when streaming to a file
+DEFAULT_CHUNK_SIZE = 65536
 
 class SoundFile(object):
     """
     A wave file to store uncompressed audio signal data.
+    
+    Either build up the signal in the object and then L{save} it, or 
+    write a signal straight to the file as it's generated, a chunk at 
+    a time, using L{stream}.
+    
     """
     def  __init__(self, filename="audio.wav", sample_rate=DEFAULT_SAMPLE_RATE):
         self.filename = filename
         self._signal = []
         self.sr = sample_rate
 
-    def save(self):
+    def _open(self):
         file = wave.open(self.filename, 'wb')
-        # Convert the numerical data into a binary string
-        str_signal = self.get_data()
-
         file.setparams((1, 2, self.sr, self.sr*4, 'NONE', 'noncompressed'))
-        file.writeframes(str_signal)
-        file.close()
+        return file
+
+    def save(self):
+        file = self._open()
+        try:
+            # Convert the numerical data into binary a chunk at a time
+            for start in range(0, len(self._signal), DEFAULT_CHUNK_SIZE):
+                file.writeframes(samples_to_data(
+                            self._signal[start:start+DEFAULT_CHUNK_SIZE]))
+        finally:
+            file.close()
+    
+    def stream(self, chunks):
+        """
+        Writes a signal to the file as it's generated, without storing 
+        it all. The signal stored in this object is ignored.
+        
+        @type chunks: iterable
+        @param chunks: arrays or lists of samples, written one after 
+            another. E.g. L{ToneMatrix.render_chunks<jazzparser.harmonical.tones.ToneMatrix.render_chunks>}
+        
+        """
+        file = self._open()
+        try:
+            for chunk in chunks:
+                file.writeframes(samples_to_data(chunk))
+        finally:
+            file.close()
     
     def set_signal(self, signal):
         self._signal = signal
         
     def add_signal(self, signal):
-        self._signal.extend(signal)
+        if isinstance(self._signal, list):
+            self._signal.extend(signal)
+        else:
+            # The signal was set as an array
+            self._signal = numpy.concatenate((self._signal, signal))
         
     def add_silence(self, seconds=1.0):
         self.add_signal([0]*int(self.sr*seconds))
@@ -61,7 +96,7 @@ class SoundFile(object):
         Return the raw data that will be written to the file.
         
         """
-        return ''.join([wave.struct.pack('h', samp) for samp in self._signal])
+        return samples_to_data(self._signal)
         
     def get_buffer(self):
         """
@@ -73,6 +108,17 @@ class SoundFile(object):
         from StringIO import StringIO
         return StringIO(self.get_data())
 
+def samples_to_data(samples):
+    """
+    Converts samples to the binary data that gets written to a wave 
+    file: 16-bit little-endian. Samples out of range are clipped.
+    
+    """
+    samples = numpy.asarray(samples, dtype=numpy.float)
+    # Truncate towards zero, like converting each sample with int()
+    samples = numpy.clip(numpy.trunc(samples), -32768, 32767)
+    return samples.astype('<i2').tostring()
+
 def save_wave_data(signal, filename):
     """
     Shortcut to store a wave file given some sample data.
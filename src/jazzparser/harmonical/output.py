@@ -67,7 +67,7 @@ def play_audio(samples, wait_for_end=False):
     
     # Prepare the wave data to play
     # Make it stereo and the right number format
-    smp_array = numpy.array(zip(samples,samples)).astype(numpy.int16)
+    smp_array = numpy.column_stack((samples, samples)).astype(numpy.int16)
     
     # Generate the sound object from the sample array
     snd = make_sound(smp_array)
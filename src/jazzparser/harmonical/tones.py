@@ -34,7 +34,7 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
 import numpy
 import math, logging
-from .files import DEFAULT_SAMPLE_RATE, save_wave_data
+from .files import DEFAULT_SAMPLE_RATE, DEFAULT_CHUNK_SIZE, SoundFile
 from . import CHORD_TYPES
 from jazzparser.data import Fraction
 from jazzparser.utils.base import group_pairs
@@ -55,6 +55,10 @@ class ToneMatrix(object):
     temperament note values, as with MIDI or something similar.
     Time values are discretized according to the sample rate.
     
+    Use L{render} to get the whole signal at once, or L{render_chunks} 
+    to generate it bit by bit. The latter only keeps the tones that 
+    are sounding in memory, so is better for long pieces.
+    
     """
     def __init__(self, sample_rate=DEFAULT_SAMPLE_RATE):
         self.sample_rate = sample_rate
@@ -63,34 +67,86 @@ class ToneMatrix(object):
     def add_tone(self, time, event):
         self._events.setdefault(int(time*self.sample_rate), []).append(event)
         
+    def get_num_samples(self):
+        """
+        The length of the rendered signal: up to the end of the last 
+        tone to finish.
+        
+        """
+        return max([0] + [time + tone.get_num_samples(self.sample_rate) \
+                          for (time,tones) in self._events.items() \
+                            for tone in tones])
+        
     def render(self):
         """
-        Renders the wave and returns a list of samples.
+        Renders the wave and returns an array of samples.
         
         """
-        samples = []
-        def _add_samples(new_samples, offset):
-            # Pad out until we reach the start time
-            while len(samples) < offset:
-                samples.append(0.0)
-            for intime in range(len(new_samples)):
-                cursor = offset + intime
-                if len(samples) <= cursor:
-                    # We've not added any samples at this time yet
-                    samples.append(new_samples[intime])
-                else:
-                    # This timestep already has a sample in it - just add
-                    samples[cursor] += new_samples[intime]
+        samples = numpy.zeros(self.get_num_samples())
         for time in sorted(self._events.keys()):
             # Get the samples for the given tones
             for tone in self._events[time]:
                 tone_samples = tone.get_samples(self.sample_rate)
                 # Add them to the global matrix
-                _add_samples(tone_samples, time)
+                samples[time:time+len(tone_samples)] += tone_samples
         # This mustn't go over the max sample, so we normalize to 1.0
         # If you want a different volume, renormalize afterwards
         samples = normalize(samples, level=1.0)
         return samples
+    
+    def _mix_chunks(self, chunk_size):
+        """
+        Mixes the tones into consecutive chunks of the signal, without 
+        normalizing. A tone's samples are only generated when it 
+        starts and are dropped once it's finished.
+        
+        """
+        times = sorted(self._events.keys())
+        next_time = 0
+        # Tones that are currently sounding, with their start times
+        sounding = []
+        length = self.get_num_samples()
+        for chunk_start in range(0, length, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, length)
+            # Generate any tones that start in this chunk
+            while next_time < len(times) and times[next_time] < chunk_end:
+                time = times[next_time]
+                for tone in self._events[time]:
+                    sounding.append((time, tone.get_samples(self.sample_rate)))
+                next_time += 1
+            
+            chunk = numpy.zeros(chunk_end - chunk_start)
+            still_sounding = []
+            for time,tone_samples in sounding:
+                start = max(time, chunk_start)
+                end = min(time + len(tone_samples), chunk_end)
+                if end > start:
+                    chunk[start-chunk_start:end-chunk_start] += \
+                                    tone_samples[start-time:end-time]
+                if time + len(tone_samples) > chunk_end:
+                    still_sounding.append((time, tone_samples))
+            sounding = still_sounding
+            yield chunk
+    
+    def render_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE, level=1.0):
+        """
+        Renders the wave in chunks, yielding an array of samples for 
+        each. The result is the same as L{render}, split into chunks 
+        of C{chunk_size} samples (the last may be shorter).
+        
+        The tones are mixed twice: once to find the peak level for 
+        normalization, then again to output them.
+        
+        """
+        peak = 0.0
+        for chunk in self._mix_chunks(chunk_size):
+            peak = max(peak, numpy.abs(chunk).max())
+        if peak == 0.0:
+            scale = 1.0
+        else:
+            scale = level * MAX_SAMPLE / peak
+        for chunk in self._mix_chunks(chunk_size):
+            yield chunk * scale
         
 class BaseToneEvent(object):
     """
@@ -100,11 +156,20 @@ class BaseToneEvent(object):
     """
     def get_samples(self, sample_rate=DEFAULT_SAMPLE_RATE):
         """
-        This should return a list of samples for the event's whole 
+        This should return an array of samples for the event's whole 
         duration at the given sample rate.
         
         """
         raise NotImplementedError
+    
+    def get_num_samples(self, sample_rate=DEFAULT_SAMPLE_RATE):
+        """
+        The number of samples L{get_samples} will return. By default, 
+        this generates the samples to find out, so subclasses should 
+        override it if they can do better.
+        
+        """
+        return len(self.get_samples(sample_rate))
         
 class SineToneEvent(BaseToneEvent):
     """
@@ -126,6 +191,9 @@ class SineToneEvent(BaseToneEvent):
             # Apply an envelope to shape the wave
             wave = apply_envelope(wave, self.envelope)
         return wave
+    
+    def get_num_samples(self, sample_rate=DEFAULT_SAMPLE_RATE):
+        return num_samples(self.duration, sample_rate)
 
 class MultiSineToneEvent(BaseToneEvent):
     """
@@ -152,6 +220,11 @@ class MultiSineToneEvent(BaseToneEvent):
         if self.envelope is not None:
             wave = apply_envelope(wave, self.envelope)
         return wave
+    
+    def get_num_samples(self, sample_rate=DEFAULT_SAMPLE_RATE):
+        if len(self.tones) == 0:
+            return 0
+        return num_samples(self.duration, sample_rate)
         
 class SineClusterEvent(MultiSineToneEvent):
     """
@@ -219,6 +292,14 @@ class SineChordEvent(SineClusterEvent):
         
         super(SineChordEvent, self).__init__(frequency, ts_notes, *args, **kwargs)
 
+def num_samples(duration, sample_rate):
+    """
+    The number of samples in a wave of the given duration, as generated 
+    by L{generate_sine_wave}.
+    
+    """
+    return max(0, int(math.ceil(duration*sample_rate)))
+    
 def generate_sine_wave(frequency, duration, amplitude, sample_rate):
     samples = duration*sample_rate
     period = sample_rate / float(frequency) # in sample points
@@ -231,28 +312,48 @@ def generate_sine_wave(frequency, duration, amplitude, sample_rate):
     return wave
     
 def apply_envelope(wave, envelope):
-    return [s * envelope[i*len(envelope)/len(wave)] for i,s in enumerate(wave)]
+    """
+    Shapes the wave by multiplying it by the envelope, stretched to 
+    the length of the wave.
+    
+    """
+    wave = numpy.asarray(wave, dtype=numpy.float)
+    if len(wave) == 0:
+        return wave
+    envelope = numpy.asarray(envelope, dtype=numpy.float)
+    # Index of the envelope value to use for each sample
+    indices = numpy.arange(len(wave)) * len(envelope) // len(wave)
+    return wave * envelope[indices]
         
 def sum_signals(sigs, norm=1.0):
     """
-    Sum two wave signals.
+    Sum wave signals. If they're different lengths, the result is 
+    the length of the shortest.
     
     """
-    wave = normalize([sum(samps) for samps in zip(*sigs)], level=norm)
-    return wave
+    if len(sigs) == 0:
+        return numpy.zeros(0)
+    length = min(len(sig) for sig in sigs)
+    wave = numpy.zeros(length)
+    for sig in sigs:
+        wave += sig[:length]
+    return normalize(wave, level=norm)
     
 def normalize(wave, level=0.8):
     """
     Normalize the amplitude of the wave data.
     
     """
+    wave = numpy.asarray(wave, dtype=numpy.float)
     if len(wave) == 0:
         return wave
     # This should be the amplitude of the highest sample
     targ_max = level * MAX_SAMPLE
-    current_max = max(max(wave), -1*min(wave))
-    wave = [s*targ_max/current_max for s in wave]
-    return wave
+    current_max = numpy.abs(wave).max()
+    if current_max == 0.0:
+        # Silence: nothing to scale
+        return wave
+    return wave * (targ_max / current_max)
     
 ######################### Envelopes #############################
 def fade_in_out_envelope(precision=200, hold_ratio=10):
@@ -406,7 +507,6 @@ def render_path_to_file(filename, path, *args, **kwargs):
     
     """
     tones = path_to_tones(path, *args, **kwargs)
-    # Generate the audio samples
-    samples = tones.render()
-    # Output to a wave file
-    save_wave_data(samples, filename)
+    # Generate the audio samples a bit at a time and write them straight 
+    #  to the wave file
+    SoundFile(filename).stream(tones.render_chunks())
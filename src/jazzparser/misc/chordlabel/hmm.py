@@ -40,6 +40,7 @@ from jazzparser.utils.nltk.probability import logprob, add_logs, \
                         prob_dist_to_dictionary_prob_dist, mle_estimator, \
                         laplace_estimator
 from jazzparser.utils.options import ModuleOption, choose_from_list, new_file_option
+from jazzparser.utils.modelcache import load_cached_model
 from jazzparser.utils.strings import str_to_bool
 from jazzparser import settings
 from jazzparser.data.input import detect_input_type, \
@@ -1085,15 +1086,18 @@ class HPChordLabeler(DictionaryHmmModel):
     @classmethod
     def load_model(cls, model_name):
         filename = cls.__get_filename(model_name)
-        # Load the model from a file
-        if os.path.exists(filename):
-            f = open(filename, 'r')
-            model_data = f.read()
-            model_data = pickle.loads(model_data)
-            f.close()
-        else:
-            raise ModelLoadError, "the model '%s' has not been trained" % model_name
-        return cls.from_picklable_dict(model_data, model_name)
+        def _load():
+            # Load the model from a file
+            if os.path.exists(filename):
+                f = open(filename, 'r')
+                model_data = f.read()
+                model_data = pickle.loads(model_data)
+                f.close()
+            else:
+                raise ModelLoadError, "the model '%s' has not been trained" % model_name
+            return cls.from_picklable_dict(model_data, model_name)
+        # Use an already loaded model if the model cache is enabled
+        return load_cached_model(cls, model_name, filename, _load)
     
     ############### Output ##############
     def _get_readable_params(self):
@@ -29,9 +29,215 @@ ordered trees.
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
+import numpy
+
 from .datastructs import Node, MutableTree
 from .balancedseq import BalancedSequence
 
+MAX_TABLE_CELLS = 10000000
+"""
+Largest number of pairs of states that L{lces_size} and L{lces} will 
+allocate a full table for. The table takes 4 bytes a pair, plus 1 for 
+L{lces}'s choices, so this caps it at about 50MB. Bigger problems are 
+computed only over the pairs of states that are actually reached, which 
+is slower, but uses much less memory on large trees.
+"""
+
+class _SequenceStates(object):
+	"""
+	Integer encoding of all the sequences in the decomposition of a 
+	balanced sequence that the LCES computation will need.
+	
+	Each state is a range [i,j) of the (non-root) nodes of the tree in 
+	preorder. State 0 is always the empty sequence. The other states are 
+	numbered in order of increasing size, so that the states of each size 
+	form a contiguous range of ids, given in C{levels}.
+	
+	For each state, C{head}, C{tail} and C{head_tail} give the id of the 
+	state that results from these operations on the sequence.
+	
+	"""
+	def __init__(self, seq):
+		# Find the preorder index of the end of each node's subtree
+		ends = []
+		stack = []
+		num_nodes = 0
+		for item in seq:
+			if item == 0:
+				stack.append(num_nodes)
+				ends.append(None)
+				num_nodes += 1
+			else:
+				ends[stack.pop()] = num_nodes
+		
+		# Find all ranges reachable from the full sequence
+		root = (0, num_nodes)
+		seen = set([root])
+		agenda = [root]
+		while agenda:
+			start,end = agenda.pop()
+			if start >= end:
+				continue
+			first_end = ends[start]
+			for state in [(start+1, first_end), 
+						  (first_end, end), 
+						  (start+1, end)]:
+				if state not in seen:
+					seen.add(state)
+					agenda.append(state)
+		
+		# Number the non-empty states in order of size
+		ranges = sorted([r for r in seen if r[0] < r[1]], 
+							key=lambda r:r[1]-r[0])
+		ids = dict((r,i+1) for (i,r) in enumerate(ranges))
+		def _id(r):
+			if r[0] >= r[1]:
+				return 0
+			return ids[r]
+		
+		num_states = len(ranges) + 1
+		self.head = numpy.zeros(num_states, dtype=numpy.int32)
+		self.tail = numpy.zeros(num_states, dtype=numpy.int32)
+		self.head_tail = numpy.zeros(num_states, dtype=numpy.int32)
+		for (start,end),state in ids.items():
+			first_end = ends[start]
+			self.head[state] = _id((start+1, first_end))
+			self.tail[state] = _id((first_end, end))
+			self.head_tail[state] = _id((start+1, end))
+		
+		# Group the non-empty states by size
+		self.levels = []
+		level_start = 1
+		for i in range(1, len(ranges)):
+			if ranges[i][1]-ranges[i][0] != ranges[i-1][1]-ranges[i-1][0]:
+				self.levels.append((level_start, i+1))
+				level_start = i+1
+		if len(ranges):
+			self.levels.append((level_start, num_states))
+		
+		self.num_states = num_states
+		self.root = _id(root)
+
+def _lces_table(states1, states2, choices=False):
+	"""
+	Fills the table of LCES sizes for every pair of states of the two 
+	sequences.
+	
+	Pairs are processed in blocks: all the states of one size in the 
+	first sequence against all those of one size in the second. Every 
+	pair in a block depends only on pairs in blocks that have already 
+	been computed, so each block can be computed by array operations.
+	
+	The table covers every pair of states, so takes 
+	C{states1.num_states*states2.num_states} ints (and as many bytes 
+	again for the choices), even though many pairs are never needed. 
+	Use L{_fill_table} to fall back to L{_lces_pairs} for big problems.
+	
+	@type choices: bool
+	@param choices: if True, also returns a table of the choice made at 
+		each pair: 0 for matching the heads, 1 for skipping the head of 
+		the first sequence and 2 for skipping that of the second.
+	
+	"""
+	table = numpy.zeros((states1.num_states, states2.num_states), 
+							dtype=numpy.int32)
+	if choices:
+		choice_table = numpy.zeros(table.shape, dtype=numpy.int8)
+	
+	for (a0,a1) in states1.levels:
+		head1 = states1.head[a0:a1, numpy.newaxis]
+		tail1 = states1.tail[a0:a1, numpy.newaxis]
+		head_tail1 = states1.head_tail[a0:a1]
+		for (b0,b1) in states2.levels:
+			head2 = states2.head[b0:b1]
+			tail2 = states2.tail[b0:b1]
+			head_tail2 = states2.head_tail[b0:b1]
+			
+			# Try matching the heads to each other
+			head_match = table[head1, head2] + table[tail1, tail2] + 1
+			# Skip a level of embedding on the head of the first
+			head_skip1 = table[head_tail1, b0:b1]
+			# Skip a level of embedding on the head of the second
+			head_skip2 = table[a0:a1][:, head_tail2]
+			
+			if choices:
+				options = numpy.array([head_match, head_skip1, head_skip2])
+				# Argmax gives us the first of any equal options
+				choice = numpy.argmax(options, axis=0)
+				choice_table[a0:a1, b0:b1] = choice
+				table[a0:a1, b0:b1] = numpy.max(options, axis=0)
+			else:
+				table[a0:a1, b0:b1] = numpy.maximum(head_match, 
+									numpy.maximum(head_skip1, head_skip2))
+	
+	if choices:
+		return table, choice_table
+	else:
+		return table
+
+def _lces_pairs(states1, states2, choices=False):
+	"""
+	Computes the same LCES sizes as L{_lces_table}, but only for the 
+	pairs of states that are reachable from the pair of full sequences. 
+	The results are stored in dicts keyed by pairs of states, which can 
+	be indexed in the same way as the tables. Pairs including the empty 
+	state are left out.
+	
+	"""
+	head1, tail1, head_tail1 = states1.head.tolist(), \
+					states1.tail.tolist(), states1.head_tail.tolist()
+	head2, tail2, head_tail2 = states2.head.tolist(), \
+					states2.tail.tolist(), states2.head_tail.tolist()
+	sizes = {}
+	choice_table = {}
+	
+	def _size(pair):
+		if pair[0] == 0 or pair[1] == 0:
+			return 0
+		return sizes[pair]
+	
+	agenda = [(states1.root, states2.root)]
+	while agenda:
+		pair = agenda[-1]
+		s1,s2 = pair
+		if s1 == 0 or s2 == 0 or pair in sizes:
+			agenda.pop()
+			continue
+		deps = [(head1[s1], head2[s2]), (tail1[s1], tail2[s2]), 
+				(head_tail1[s1], s2), (s1, head_tail2[s2])]
+		# Compute any of these we've not got yet first
+		missing = [dep for dep in deps if dep[0] != 0 and dep[1] != 0 \
+												and dep not in sizes]
+		if missing:
+			agenda.extend(missing)
+			continue
+		agenda.pop()
+		
+		options = [_size(deps[0]) + _size(deps[1]) + 1, 
+				   _size(deps[2]), _size(deps[3])]
+		size = max(options)
+		sizes[pair] = size
+		if choices:
+			# Take the first of any equal options, like the table
+			choice_table[pair] = options.index(size)
+	
+	if choices:
+		return sizes, choice_table
+	else:
+		return sizes
+
+def _fill_table(states1, states2, choices=False):
+	"""
+	Computes the LCES sizes using L{_lces_table}, unless the full table 
+	would have more than L{MAX_TABLE_CELLS} cells, in which case 
+	L{_lces_pairs} is used.
+	
+	"""
+	if states1.num_states * states2.num_states > MAX_TABLE_CELLS:
+		return _lces_pairs(states1, states2, choices=choices)
+	else:
+		return _lces_table(states1, states2, choices=choices)
+
 def lces_size(tree1, tree2):
 	"""
 	Computes the size of the largest common embedded subtree for two 
@@ -39,6 +245,67 @@ def lces_size(tree1, tree2):
 	the common tree itself, so this function doesn't actually compute what 
 	the tree is.
 	
+	"""
+	# Get a balanced sequence to represent each tree and encode its 
+	#  decomposition
+	states1 = _SequenceStates(BalancedSequence.from_tree(tree1))
+	states2 = _SequenceStates(BalancedSequence.from_tree(tree2))
+	
+	if states1.root == 0 or states2.root == 0:
+		# Common subtree of empty tree and anything is the empty tree
+		return 0
+	table = _fill_table(states1, states2)
+	return int(table[states1.root, states2.root])
+
+def lces(tree1, tree2):
+	"""
+	Computes the largest common embedded subtree for two 
+	unlabeled trees. Even you only need to know the size, use L{lces_size}, 
+	since it's a slightly simpler problem.
+	
+	"""
+	states1 = _SequenceStates(BalancedSequence.from_tree(tree1))
+	states2 = _SequenceStates(BalancedSequence.from_tree(tree2))
+	
+	table,choices = _fill_table(states1, states2, choices=True)
+	
+	# Follow the choices back from the full sequences to build the tree
+	seq = []
+	agenda = [(states1.root, states2.root)]
+	while agenda:
+		item = agenda.pop()
+		if type(item) is int:
+			# A bracket to be output
+			seq.append(item)
+			continue
+		state1,state2 = item
+		if state1 == 0 or state2 == 0:
+			# Common subtree of empty tree and anything is the empty tree
+			continue
+		choice = choices[state1, state2]
+		if choice == 0:
+			# Matched the heads: build 0<head>1<tail>
+			agenda.append((states1.tail[state1], states2.tail[state2]))
+			agenda.append(1)
+			agenda.append((states1.head[state1], states2.head[state2]))
+			agenda.append(0)
+		elif choice == 1:
+			agenda.append((states1.head_tail[state1], state2))
+		else:
+			agenda.append((state1, states2.head_tail[state2]))
+	return BalancedSequence(seq).to_tree()
+
+
+def recursive_lces_size(tree1, tree2):
+	"""
+	Original recursive implementation of L{lces_size}. This is kept for 
+	comparison with (and testing of) the iterative version: use L{lces_size}.
+	
+	Computes the size of the largest common embedded subtree for two 
+	unlabeled trees. It is quicker to compute the size than to compute 
+	the common tree itself, so this function doesn't actually compute what 
+	the tree is.
+	
 	"""
 	# Get a balanced sequence to represent each tree
 	bs1 = BalancedSequence.from_tree(tree1)
@@ -86,10 +353,14 @@ def lces_size(tree1, tree2):
 	return size
 
 
-def lces(tree1, tree2):
+def recursive_lces(tree1, tree2):
 	"""
+	Original recursive implementation of L{lces}. This is kept for 
+	comparison with (and testing of) the iterative version: use L{lces}.
+	
 	Computes the largest common embedded subtree for two 
-	unlabeled trees. Even you only need to know the size, use L{lces_size}, 
+	unlabeled trees. Even you only need to know the size, use 
+	L{recursive_lces_size}, 
 	since it's a slightly simpler problem.
 	
 	"""
@@ -30,7 +30,7 @@ See usage info for more details.
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
 # Make sure the necessary directories are on the path
-import sys, os
+import sys, os, json
 codedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 libdir = os.path.abspath(os.path.join(codedir, "..", "lib"))
 if codedir not in sys.path:
@@ -66,7 +66,12 @@ from jazzparser.harmonical.tones import render_path_to_file as render_path_to_wa
 from jazzparser.harmonical.midi.chords import render_path_to_file as render_path_to_midi_file
 from jazzparser.harmonical.files import save_wave_data
 from jazzparser.backoff.loader import get_backoff_builder, BackoffLoadError
-from jazzparser.data.parsing import ParseResults
+from jazzparser.data.parsing import ParseResults, ResultsStore, \
+                            load_parse_times
+from jazzparser.utils.multiproc import predict_costs, longest_first, \
+                            WorkerUsage
+from jazzparser.parsers.cache import ParseCache, ParseCacheError, \
+                            model_filenames, cacheable
 
 import copy
 import logging, traceback
@@ -104,7 +109,7 @@ def main():
     group.add_option("--only-load", dest="only_load", action="store_true", help="don't do anything with the inputs, just load and list them. Handy for checking the inputs load and getting their indices")
     group.add_option("--partitions", dest="partitions", action="store", type="int", help="divide the input data into this number of partitions and use a different set of models for each. For any parser, tagger and backoff that takes a 'model' argument, the partition number will be appended to the given value")
     group.add_option("--seq-parts", "--sequence-partitions", dest="sequence_partitions", action="store", help="use a chord sequence index to partition the inputs. Input type (bulk) must support association of the inputs with chord sequences by id. Sequences in the given sequence index file are partitioned n ways (--partitions) and the inputs are processed according to their associated sequence.")
-    group.add_option("--continue", "--skip-done", dest="skip_done", action="store_true", help="skip any inputs for which a readable results file already exists. This is useful for continuing a bulk job that was stopped in the middle")
+    group.add_option("--continue", "--skip-done", dest="skip_done", action="store_true", help="skip any inputs for which a readable results file already exists, or which are already in the results store if using --store. This is useful for continuing a bulk job that was stopped in the middle")
     ###
     group = OptionGroup(optparser, "Parser", "Parser, supertagger and backoff parser")
     optparser.add_option_group(group)
@@ -119,16 +124,23 @@ def main():
     # Backoff options
     group.add_option("-b", "--backoff", "--noparse", dest="backoff", action="store", help="use the named backoff model as a backoff if the parser produces no results")
     group.add_option("--bopt", "--backoff-options", "--backoff-options", "--npo", dest="backoff_opts", action="append", help="specify options for the  backoff model. Type '--npo help', using '--backoff <name>' to select a backoff modules, to get a list of options.")
+    # Parse cache
+    group.add_option("--parse-cache", dest="parse_cache", action="store", help="directory to keep a cache of parse results in. A chord sequence that has been parsed before, in any key, with the same grammar, tagger, parser and backoff options isn't parsed again: the stored results are transposed to the input's key. Only chord inputs and parses that finish within the time and resource limits are cached. Parses are only reused while the model files are unchanged. Can't be used with --derivations, --interactive, --harmonical or --enharmonical")
+    group.add_option("--parse-cache-size", dest="parse_cache_size", action="store", type="float", help="maximum size of the parse cache (--parse-cache) in MB. Once it gets bigger, the least recently used parses are removed. 0 means no limit. Default: 100", default=100)
     ###
     # Multiprocessing options
     group = OptionGroup(optparser, "Multiprocessing")
     optparser.add_option_group(group)
     group.add_option("--processes", dest="processes", action="store", type="int", help="number of processes to create to perform parses in parallel. Default: 1, i.e. no process pool. Use -1 to create a process for every input", default=1)
+    group.add_option("--schedule", dest="schedule", action="store", type="choice", choices=["file", "longest"], help="order in which to send inputs to the worker processes. 'file': the order they're loaded in. 'longest': longest predicted parse time first, so that long inputs don't leave the other workers idle at the end of the run. Parse time is predicted from the input length or from --schedule-times. Each worker takes the next input as soon as it finishes the last. Default: file", default="file")
+    group.add_option("--schedule-times", dest="schedule_times", action="store", help="results store or directory of results files from a previous run on the same inputs. Parse times stored in the results are used to predict the parse time for --schedule=longest")
     ###
     # Output options
     group = OptionGroup(optparser, "Output")
     optparser.add_option_group(group)
     group.add_option("--output", dest="output", action="store", help="directory name to output parse results to. A filename specific to the individual input will be appended to this")
+    group.add_option("--store", "--results-store", dest="results_store", action="store", help="append parse results to a single results store file, as well as or instead of outputting a file for each input with --output. Only the semantics and probabilities of the results are stored, which makes the store much faster to read than the results files. With --continue, inputs already in the store are skipped")
+    group.add_option("--stats", dest="stats", action="store", help="collect statistics about each parse (rule applications, time spent on syntax and semantics, cell sizes, etc) and write them to the named file, one JSON record per line. Sets the parser's stats option, so only works with parsers that have one")
     group.add_option("--topn", dest="topn", action="store", type="int", help="limit the number of final results to store in the output file to the top n by probability. By default, stores all")
     group.add_option("--output-opts", "--oopts", dest="output_opts", action="store", help="options that affect the output formatting. Use '--output-opts help' for a list of options.")
     group.add_option("-a", "--atomic-results", dest="atoms_only", action="store_true", help="only include atomic categories in the results.")
@@ -220,6 +232,11 @@ def main():
     else:
         poptstr = ""
     popts = ModuleOption.process_option_string(poptstr)
+    if options.stats is not None:
+        if 'stats' not in [opt.name for opt in parser_cls.PARSER_OPTIONS]:
+            logger.error("The parser '%s' can't collect stats" % options.parser)
+            return 1
+        popts['stats'] = True
     # Check that the options are valid
     try:
         parser_cls.check_options(popts)
@@ -313,6 +330,50 @@ def main():
         output_dir = os.path.abspath(options.output)
         check_directory(output_dir, is_dir=True)
     
+    # Open the results store, if we're using one
+    if options.results_store is None:
+        results_store = None
+    else:
+        store_filename = os.path.abspath(options.results_store)
+        check_directory(store_filename)
+        try:
+            # Only add to an existing store if we're continuing a job
+            results_store = ResultsStore(store_filename, 
+                                    mode=('a' if options.skip_done else 'w'))
+        except ResultsStore.LoadError, err:
+            logger.error("Could not open results store: %s" % err)
+            return 1
+    
+    # Open the file to write stats to
+    if options.stats is None:
+        stats_file = None
+    else:
+        stats_filename = os.path.abspath(options.stats)
+        check_directory(stats_filename)
+        stats_file = open(stats_filename, 'a' if options.skip_done else 'w')
+    
+    # Open the parse cache, if we're using one
+    if options.parse_cache is None:
+        parse_cache = None
+    else:
+        # None of these can be produced from the cached results
+        if options.derivations or options.interactive or \
+                options.harmonical is not None or \
+                options.enharmonical is not None:
+            logger.error("--parse-cache can't be used with --derivations, "\
+                "--interactive, --harmonical or --enharmonical")
+            return 1
+        try:
+            parse_cache = ParseCache(os.path.abspath(options.parse_cache), 
+                                     grammar, 
+                                     max_size=options.parse_cache_size)
+        except ParseCacheError, err:
+            logger.error("Could not use parse cache: %s" % err)
+            return 1
+    # Cache keys of the inputs being parsed, so we can store their 
+    #  results when they come back
+    cache_keys = {}
+    
     if options.partitions and options.partitions > 1:
         partitions = options.partitions
     else:
@@ -488,6 +549,9 @@ def main():
     if multiprocessing:
         print >>sys.stderr, "Spawning %d worker processes" % processes
         pool = Pool(processes=processes)
+        # Keep track of how much work each worker does, from when the 
+        #  first job is submitted
+        worker_usage = WorkerUsage()
     
     #################### Result callback ###############
     def get_output_filename(identifier):
@@ -504,6 +568,9 @@ def main():
             # Mark this input as completed
             global completed_parses
             completed_parses[response['identifier']] = True
+            if 'worker' in response:
+                worker_usage.add(response['worker'], response['wall_time'])
+            cache_key = cache_keys.pop(response['identifier'], None)
             
             if response['results'] is None:
                 # There was some error: check what it was
@@ -514,9 +581,17 @@ def main():
                 global parse_exit_status
                 parse_exit_status = 1
             else:
+                if cache_key is not None and cacheable(response):
+                    # Store the results before anything gets filtered out
+                    parse_cache.set(cache_key[0], cache_key[1], 
+                                    response['results'], response['time'])
+                
                 # Keep this together with all the other processes' responses
                 all_results.append(response)
                 print "Parsed: %s" % response['input']
+                if response.get('limit_exceeded') is not None:
+                    print "Parse abandoned: %s exceeded" % \
+                                                response['limit_exceeded']
                 
                 # Run any cleanup routines that the formalism defines
                 grammar.formalism.clean_results(response['results'])
@@ -529,7 +604,7 @@ def main():
                     print "Results:"
                     list_results(response['results'])
                 
-                if output_dir is not None:
+                if output_dir is not None or results_store is not None:
                     # Try getting a gold standard analysis if one has been 
                     #  associated with the input
                     gold = response['input'].get_gold_analysis()
@@ -547,10 +622,30 @@ def main():
                                     signs=True,
                                     gold_parse=gold,
                                     timed_out=response['timed_out'],
-                                    cpu_time=response['time'])
-                    filename = get_output_filename(response['identifier'])
-                    presults.save(filename)
-                    print "Parse results output to %s" % filename
+                                    cpu_time=response['time'],
+                                    limit_exceeded=response['limit_exceeded'])
+                    if output_dir is not None:
+                        filename = get_output_filename(response['identifier'])
+                        presults.save(filename)
+                        print "Parse results output to %s" % filename
+                    if results_store is not None:
+                        results_store.add(str(response['identifier']), 
+                                          presults)
+                        print "Parse results added to %s" % \
+                                                    results_store.filename
+                
+                if stats_file is not None and response['stats'] is not None:
+                    # Write a record of the stats for this input
+                    record = {
+                        'identifier' : str(response['identifier']),
+                        'time' : response['time'],
+                        'timed_out' : response['timed_out'],
+                        'limit_exceeded' : response['limit_exceeded'],
+                        'results' : len(response['results']),
+                        'stats' : response['stats'],
+                    }
+                    print >>stats_file, json.dumps(record, sort_keys=True)
+                    stats_file.flush()
                 
                 if time_parse:
                     print "Parse took %f seconds" % response['time']
@@ -615,6 +710,8 @@ def main():
     # Process each input one by one
     all_results = []
     jobs = []
+    # Jobs waiting to be submitted to the pool: see --schedule
+    pending_jobs = []
     # This will get set to 1 if any errors are encountered during parsing
     global parser_exit_status
     parser_exit_status = 0
@@ -635,7 +732,12 @@ def main():
             print "Input %d: %s" % (input_index,input_identifier)
             continue
         
-        if options.skip_done:
+        if options.skip_done and results_store is not None:
+            # Skip any inputs that are already in the results store
+            if str(input_identifier) in results_store:
+                completed_parses[input_identifier] = True
+                continue
+        elif options.skip_done and output_dir is not None:
             # Skip any inputs for which a readable output file already exists
             outfile = get_output_filename(input_identifier)
             if os.path.exists(outfile):
@@ -678,16 +780,59 @@ def main():
             if 'model' in input_npopts and input_npopts['model'] is not None:
                 input_npopts['partition'] = partition_num
         
+        if parse_cache is not None:
+            if isinstance(input, str):
+                # Preprocess the input here, so we can look it up
+                input = input.rstrip("\n")
+                if len(input) == 0:
+                    continue
+                input = ChordInput.from_string(input)
+            cache_key,offset = parse_cache.key(input, 
+                    options.supertagger, input_topts, options.parser, 
+                    input_popts, options.backoff, input_npopts, 
+                    model_files=model_filenames(grammar, 
+                            tagger_cls, input_topts, parser_cls, 
+                            input_popts, backoff, input_npopts))
+            if cache_key is not None:
+                cache_timer = ExecutionTimer(clock=True)
+                cached = parse_cache.get(cache_key, offset)
+                if cached is not None:
+                    # Skip the parse and use the stored results
+                    print "Loaded from parse cache: %s (%s)" % \
+                                                (input, input_identifier)
+                    _result_callback({
+                        'tagger' : None,
+                        'parser' : None,
+                        'input' : input,
+                        'error' : None,
+                        'messages' : ["Results loaded from parse cache "\
+                                      "(original parse took %f seconds)" % \
+                                      cached[1]],
+                        'time' : cache_timer.get_time(),
+                        'identifier' : input_identifier,
+                        'results' : cached[0],
+                        'timed_out' : False,
+                        'limit_exceeded' : None,
+                        'stats' : None,
+                    })
+                    continue
+                cache_keys[input_identifier] = (cache_key, offset)
+        
         if multiprocessing:
-            # Add a job to the process pool
-            jobs.append(
-                pool.apply_async(do_parse, \
-                    (grammar, tagger_cls, parser_cls, input, input_topts, 
+            job_args = (grammar, tagger_cls, parser_cls, input, input_topts, 
                         input_popts, backoff, input_npopts, options, 
-                        input_identifier), 
-                    { 'multiprocessing' : True, 
-                      'logfile' : parse_logger },
-                    _result_callback))
+                        input_identifier)
+            job_kwargs = { 'multiprocessing' : True, 
+                           'logfile' : parse_logger }
+            if options.schedule == "longest":
+                # Wait until we've seen all the inputs to submit the jobs
+                pending_jobs.append((input_identifier, input_length(input), 
+                                     job_args, job_kwargs))
+            else:
+                # Add a job to the process pool
+                worker_usage.start()
+                jobs.append(pool.apply_async(do_parse_job, job_args, 
+                                             job_kwargs, _result_callback))
         else:
             # Just run do_parse on this input
             response = do_parse(grammar, tagger_cls, parser_cls, input, 
@@ -696,6 +841,30 @@ def main():
                 logfile=parse_logger)
             _result_callback(response)
     
+    if multiprocessing and len(pending_jobs):
+        # Schedule the jobs so the longest are processed first
+        if options.schedule_times is not None:
+            try:
+                known_times = load_parse_times(options.schedule_times)
+            except (IOError, OSError, ResultsStore.LoadError), err:
+                logger.error("Could not load parse times from %s: %s" % \
+                                (options.schedule_times, err))
+                known_times = {}
+        else:
+            known_times = {}
+        lengths = [length for (ident,length,args,kwargs) in pending_jobs]
+        times = [known_times.get(slugify(str(ident)), None) \
+                                for (ident,length,args,kwargs) in pending_jobs]
+        costs = predict_costs(lengths, times)
+        print >>sys.stderr, "Scheduling %d inputs longest first (%d with "\
+            "known parse times)" % (len(pending_jobs), 
+                                    len([t for t in times if t is not None]))
+        for job_num in longest_first(costs):
+            ident,length,job_args,job_kwargs = pending_jobs[job_num]
+            worker_usage.start()
+            jobs.append(pool.apply_async(do_parse_job, job_args, 
+                                         job_kwargs, _result_callback))
+    
     if multiprocessing:
         # Block until all processes are done
         try:
@@ -706,6 +875,10 @@ def main():
             # Subprocesses return on keyboard interrupt, so we should receive 
             #  it here
             print >>sys.stderr, "Exiting on keyboard interrupt"
+            if results_store is not None:
+                results_store.close()
+            if stats_file is not None:
+                stats_file.close()
             sys.exit(1)
     
         # Check that each process completed and display the errors if not
@@ -719,6 +892,19 @@ def main():
                     #  more info on where the error came from
                     print >>sys.stderr, "\nError in worker thread: %s" % err
                     parser_exit_status = 1
+        
+        # Report how well the work was spread over the workers
+        worker_usage.finish()
+        print >>sys.stderr, "\nWorker utilization over %.1fs:" % \
+                                                    worker_usage.run_time
+        pprint_table(sys.stderr, worker_usage.table(), 
+                     justs=[True,False,False,False])
+    
+    if results_store is not None:
+        # Write out the store's index
+        results_store.close()
+    if stats_file is not None:
+        stats_file.close()
     
     if stdinput:
         print
@@ -770,6 +956,8 @@ def do_parse(grammar, tagger_cls, parser_cls, input, topts, popts, backoff,
         'identifier' : identifier,
         'results' : None,
         'timed_out' : False,
+        'limit_exceeded' : None,
+        'stats' : None,
     }
     tagger = None
     parser = None
@@ -792,7 +980,9 @@ def do_parse(grammar, tagger_cls, parser_cls, input, topts, popts, backoff,
         logger.info("Tagging sequence (%d timesteps)" % len(input))
         
         # Prepare a suitable tagger component
+        tagger_timer = ExecutionTimer(clock=True)
         tagger = tagger_cls(grammar, input, options=topts.copy(), logger=logger)
+        tagger_time = tagger_timer.get_time()
         if not multiprocessing:
             response['tagger'] = tagger
         
@@ -904,10 +1094,41 @@ def do_parse(grammar, tagger_cls, parser_cls, input, topts, popts, backoff,
             'time' : timer.get_time(),
             'messages' : messages,
             'timed_out' : parser.timed_out,
+            'limit_exceeded' : parser.limit_exceeded,
         })
+        if parser.stats is not None:
+            stats = parser.stats.to_dict()
+            # Most taggers do their work when they're created
+            stats['tagger_init_time'] = tagger_time
+            response['stats'] = stats
         return response
 
 
+def do_parse_job(*args, **kwargs):
+    """
+    Calls L{do_parse} in a worker process. Adds to the response the 
+    worker's process id and the wall-clock time spent on the job, so 
+    that we can report how busy each worker was.
+    
+    """
+    timer = ExecutionTimer()
+    response = do_parse(*args, **kwargs)
+    if response is not None:
+        response['worker'] = os.getpid()
+        response['wall_time'] = timer.get_time()
+    return response
+
+def input_length(input):
+    """
+    Length of an input, as used to predict how long it will take to parse.
+    
+    """
+    if isinstance(input, basestring):
+        # Not preprocessed yet: count the chords
+        return len(input.split())
+    else:
+        return len(input)
+
 def list_results(results):
     """
     Prints out a list of the results in the given results list. 
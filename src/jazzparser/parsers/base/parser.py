@@ -81,6 +81,9 @@ class Parser(object):
             self.logger = logger
         
         self.timed_out = False
+        self.limit_exceeded = None
+        # Parsers that can collect statistics during parsing put them here
+        self.stats = None
         
     def parse(self, derivations=False, summaries=False):
         """
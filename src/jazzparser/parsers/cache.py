@@ -0,0 +1,335 @@
+"""Persistent cache of whole parses.
+
+Bulk jobs often parse the same chord sequence several times, or the
+same sequence in different keys (e.g. one standard transcribed in
+different keys). The models we use only ever look at chord roots
+relative to one another, so parsing a transposed sequence just gives
+the same results, transposed. The parse cache stores the results of
+each parse, keyed by the input transposed so that it starts on C,
+along with the grammar and the tagger, parser and backoff options.
+When the same sequence comes up again, in any key, the stored results
+are transposed to the input's key and used instead of parsing it.
+The results are the same as we'd get from parsing, except that, where
+a backoff model found several equally probable paths, the one we get
+may be in a different (enharmonically equivalent) position.
+
+The cache is a directory with a file for each stored parse. Once the
+files take up more than the maximum size, the least recently used ones
+are removed.
+
+The key includes the names of the models and the modification times
+of their files, so retraining a model stops its old parses being used.
+Parses that were cut short by a time or resource limit aren't stored.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import os, time, copy, hashlib
+import cPickle as pickle
+
+from jazzparser.data.input import ChordInput, DbInput
+
+def grammar_version(grammar):
+    """
+    Computes a hash of the files that define the grammar, so that
+    cached parses aren't used once the grammar has been changed.
+    
+    """
+    grammar_dir = os.path.dirname(grammar.grammar_file)
+    hsh = hashlib.sha1()
+    for filename in sorted(os.listdir(grammar_dir)):
+        path = os.path.join(grammar_dir, filename)
+        if os.path.isfile(path):
+            hsh.update(filename)
+            infile = open(path, 'rb')
+            try:
+                hsh.update(infile.read())
+            finally:
+                infile.close()
+    return hsh.hexdigest()
+
+def normalize_input(input):
+    """
+    Produces a canonical form of a chord input that doesn't depend on
+    its key. Every root is given relative to the root of the first
+    chord.
+    
+    @rtype: (string, int) pair
+    @return: the normalized input and the root of the first chord,
+        which is the number of semitones the normalized input must be
+        transposed up by to get the original. If the input's not a
+        type that can be normalized, returns (None, None).
+    
+    """
+    if not isinstance(input, (ChordInput, DbInput)) or not input.chords:
+        return (None, None)
+    offset = input.chords[0].root
+    chords = []
+    for chord,duration,start in zip(input.chords, input.durations,
+                                    input.times):
+        if chord.bass is None:
+            bass = ""
+        else:
+            bass = (chord.bass - offset) % 12
+        chords.append("%d:%s:%s:%s:%s@%s" % ((chord.root - offset) % 12,
+                        chord.type, chord.additions or "", bass,
+                        duration, start))
+    return (" ".join(chords), offset)
+
+def model_filenames(grammar, tagger_cls, topts, parser_cls, popts,
+                    backoff_cls, npopts):
+    """
+    Gets the files of the trained models that the tagger, parser and
+    backoff builder will load when given these options.
+    
+    @rtype: list of strings
+    
+    """
+    from jazzparser.parsers.pcfg.parser import PcfgParser
+    if parser_cls is not None and issubclass(parser_cls, PcfgParser):
+        parser_model_cls = getattr(grammar.formalism, 'PcfgModel', None)
+    else:
+        parser_model_cls = None
+    components = [
+        (tagger_cls, getattr(tagger_cls, 'MODEL_CLASS', None), topts),
+        (parser_cls, parser_model_cls, popts),
+        (backoff_cls, getattr(backoff_cls, 'MODEL_CLASS', None), npopts),
+    ]
+    filenames = []
+    for cls,model_cls,options in components:
+        if model_cls is None or options.get('model') is None:
+            continue
+        if options.get('partition') is not None:
+            model_name = cls.partition_model_name(options['model'], 
+                                                  options['partition'])
+        else:
+            model_name = options['model']
+        filenames.append(model_cls.get_filename(model_name))
+    return filenames
+
+def cacheable(response):
+    """
+    Checks whether the results of a parse should be stored in the
+    cache. Parses that failed or were abandoned at a time or resource
+    limit aren't: the limits depend on things other than the input,
+    like the process's memory use at the time.
+    
+    @type response: dict
+    @param response: the response from the parse, as produced by
+        C{parse.py}'s C{do_parse}
+    
+    """
+    return response['results'] is not None and \
+            not response['timed_out'] and \
+            response.get('limit_exceeded') is None
+
+def _file_version(filename):
+    try:
+        return os.path.getmtime(filename)
+    except OSError:
+        # Leave the component to complain about the missing file
+        return ""
+
+def _options_key(options):
+    # Unprocessed option values are represented by their strings
+    return ",".join("%s=%s" % (name, options[name]) \
+                                    for name in sorted(options.keys()))
+
+class ParseCache(object):
+    """
+    Size-bounded, on-disk store of the results of parses.
+    
+    Create a cache in a given directory and use L{key} to get the key
+    for an input, then L{get} and L{set} to read and store results.
+    
+    """
+    def __init__(self, dirname, grammar, max_size=100):
+        """
+        @type dirname: string
+        @param dirname: directory to store the cache in. Will be created
+            if it doesn't exist
+        @type grammar: L{jazzparser.grammar.Grammar}
+        @param grammar: grammar being used to parse. It must provide
+            a formalism that can transpose results
+        @type max_size: float
+        @param max_size: maximum total size of the cached parses in MB.
+            0 means no limit
+        
+        """
+        if grammar.formalism.transpose_sign is None:
+            raise ParseCacheError, "the formalism %s can't transpose "\
+                "results, so can't use a parse cache" % \
+                grammar.formalism.get_name()
+        self.dirname = dirname
+        self.grammar = grammar
+        self.max_size = max_size
+        self.grammar_version = grammar_version(grammar)
+        
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        # Keep track of the size and last use of every file
+        self._files = {}
+        for filename in os.listdir(dirname):
+            if filename.endswith(".parse"):
+                stat = os.stat(os.path.join(dirname, filename))
+                self._files[filename] = (stat.st_mtime, stat.st_size)
+    
+    def key(self, input, tagger, topts, parser, popts, backoff, npopts, 
+            model_files=[]):
+        """
+        Gets the key to store the results of parsing the input under.
+        The component names and options should be those given on the
+        command line.
+        
+        The files of the models that the components load should be 
+        given in C{model_files} (see L{model_filenames}). Their 
+        modification times are included in the key, so that parses 
+        aren't reused once a model's been retrained.
+        
+        @rtype: (string, int) pair
+        @return: the key and the number of semitones the cached results
+            must be transposed by to give this input's results. If the
+            input can't be cached, returns (None, None).
+        
+        """
+        normalized,offset = normalize_input(input)
+        if normalized is None:
+            return (None, None)
+        key = "\n".join([
+            self.grammar.name,
+            self.grammar_version,
+            "%s:%s" % (tagger, _options_key(topts)),
+            "%s:%s" % (parser, _options_key(popts)),
+            "%s:%s" % (backoff or "", _options_key(npopts)),
+            ",".join("%s=%s" % (filename, _file_version(filename)) \
+                                            for filename in model_files),
+            normalized,
+        ])
+        return (key, offset)
+    
+    def _filename(self, key):
+        return "%s.parse" % hashlib.sha1(key).hexdigest()
+    
+    def get(self, key, offset):
+        """
+        Loads the results stored under the key, transposed by the given
+        number of semitones.
+        
+        @return: the stored result signs and the time the original
+            parse took, or None if the key isn't in the cache
+        
+        """
+        filename = self._filename(key)
+        if filename not in self._files:
+            return None
+        path = os.path.join(self.dirname, filename)
+        try:
+            infile = open(path, 'rb')
+            try:
+                data = pickle.load(infile)
+            finally:
+                infile.close()
+        except Exception:
+            # Removed by someone else or unreadable: treat it as missing
+            self._files.pop(filename, None)
+            return None
+        # Check for hash collisions
+        if data['key'] != key:
+            return None
+        
+        results = data['results']
+        if offset % 12:
+            for sign in results:
+                self.grammar.formalism.transpose_sign(sign, offset)
+        # Record that this was used, so it's not evicted
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+        self._files[filename] = (now, self._files[filename][1])
+        return results, data['time']
+    
+    def set(self, key, offset, results, parse_time):
+        """
+        Stores the results of a parse under the key. The results are
+        not altered: they're copied before being transposed back to the
+        key's normalized form.
+        
+        """
+        results = copy.deepcopy(results)
+        if offset % 12:
+            for sign in results:
+                self.grammar.formalism.transpose_sign(sign, -offset % 12)
+        filename = self._filename(key)
+        path = os.path.join(self.dirname, filename)
+        # Write to a temporary file first, so we never leave a
+        #  half-written file in the cache
+        tmp_path = "%s.tmp" % path
+        outfile = open(tmp_path, 'wb')
+        try:
+            pickle.dump({
+                'key' : key,
+                'results' : results,
+                'time' : parse_time,
+            }, outfile, -1)
+        finally:
+            outfile.close()
+        os.rename(tmp_path, path)
+        self._files[filename] = (time.time(), os.path.getsize(path))
+        self.evict()
+    
+    def _get_size(self):
+        return sum(size for (used,size) in self._files.values())
+    size = property(_get_size)
+    """Total size in bytes of the stored parses."""
+    
+    def evict(self):
+        """
+        Removes the least recently used parses until the cache is
+        within its maximum size.
+        
+        """
+        if not self.max_size:
+            return
+        max_bytes = self.max_size * 1024 * 1024
+        total = self.size
+        if total <= max_bytes:
+            return
+        for used,filename in sorted((used,filename) for \
+                                (filename,(used,size)) in self._files.items()):
+            try:
+                os.remove(os.path.join(self.dirname, filename))
+            except OSError:
+                pass
+            total -= self._files.pop(filename)[1]
+            if total <= max_bytes:
+                break
+    
+    def __len__(self):
+        return len(self._files)
+
+class ParseCacheError(Exception):
+    pass
@@ -31,7 +31,7 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
 
 from jazzparser.data import DerivationTrace, Fraction, HashSet
-import logging
+import logging, time
 
 # Get the logger from the logging system
 logger = logging.getLogger("main_logger")
@@ -55,6 +55,8 @@ class SignHashSet(HashSet):
         self.formalism = formalism
         self._signs_by_category = {}
         self.derivation_traces = derivation_traces
+        # Set by the chart if it's collecting stats
+        self.stats = None
         
     def append(self, new_entry):
         """
@@ -91,6 +93,8 @@ class SignHashSet(HashSet):
                 del self._signs_by_category[entry.category]
     
     def _add_existing_value(self, existing_value, new_value):
+        if self.stats is not None:
+            self.stats.merged_signs += 1
         # Add the new derivation trace if necessary
         if self.derivation_traces:
             existing_value.\
@@ -143,6 +147,10 @@ class Chart(object):
     
     Functions are contained in Chart for applying unary and binary rules.
     
+    If C{stats} is given, it should be a L{ChartStats 
+    <jazzparser.parsers.cky.stats.ChartStats>}, which will be updated 
+    with statistics about the rule applications as they're done.
+    
     You may instantiate a chart with no signs. You must still provide a 
     signs list, which will define the size of the chart, so you should 
     fill it with empty lists.
@@ -155,9 +163,13 @@ class Chart(object):
     
     """
     HASH_SET_IMPL = SignHashSet
+    # If this is a list, every pair of signs that a binary rule is noted 
+    #  as having been applied to is also added to it as (rule,(first,second))
+    _noted_pairs = None
     
-    def __init__(self, grammar, signs, derivations=False, hash_set_kwargs={}, allow_complex=False):
+    def __init__(self, grammar, signs, derivations=False, hash_set_kwargs={}, allow_complex=False, stats=None):
         self.derivations = derivations
+        self.stats = stats
         self.grammar = grammar
         self.allow_complex = allow_complex
         # For efficiency
@@ -173,10 +185,11 @@ class Chart(object):
             for y in range(x,len(signs)):
                 # Cell (column) for each node
                 # Cells are currently empty hash tables: will later put categories in here
-                self._table[x].append(
-                        self.HASH_SET_IMPL(grammar.formalism, 
-                                           derivation_traces=derivations,
-                                           **hash_set_kwargs))
+                cell = self.HASH_SET_IMPL(grammar.formalism, 
+                                          derivation_traces=derivations,
+                                          **hash_set_kwargs)
+                cell.stats = stats
+                self._table[x].append(cell)
         for i,sign_list in enumerate(signs):
             if len(sign_list):
                 self.add_word_signs(sign_list,i)
@@ -186,6 +199,22 @@ class Chart(object):
         
     size = property(__len__)
     
+    def cell_size(self, start, end):
+        """
+        @return: the number of signs in the chart between nodes start 
+            and end.
+        
+        """
+        return len(self._table[start][end-start-1])
+    
+    def _get_total_signs(self):
+        """
+        The total number of signs in all of the cells of the chart.
+        
+        """
+        return sum(len(cell) for row in self._table for cell in row)
+    total_signs = property(_get_total_signs)
+    
     def _get_parses(self):
         results = self._table[0][self.size-1].values()
         if not self.allow_complex:
@@ -313,7 +342,13 @@ class Chart(object):
             # Don't try applying unary rules more than once (they'll have the same results)
             if not sign.check_rule_applied(rule):
                 # Get the possible results of applying the rule
-                results = rule.apply_rule([sign])
+                if self.stats is not None:
+                    timer = time.time()
+                    results = rule.apply_rule([sign])
+                    self.stats.syntax_time += time.time() - timer
+                    self.stats.rule_applied(rule, results is not None)
+                else:
+                    results = rule.apply_rule([sign])
                 # Check the rule was able to apply
                 if results is not None:
                     # If storing derivation traces, add them now
@@ -352,6 +387,8 @@ class Chart(object):
         results = rule.apply_rule(sign_pair)
         # Note for future attempts that we've already done this
         sign_pair[0].note_rule_applied(rule, sign_pair[1])
+        if self._noted_pairs is not None:
+            self._noted_pairs.append((rule, sign_pair))
         if results is not None:
             # If storing derivation traces, add them now
             if self.derivations:
@@ -395,6 +432,7 @@ class Chart(object):
          False otherwise
         """
         signs_added = False
+        stats = self.stats
         
         all_pair_results = []
         binary_rules = self.grammar.binary_rules
@@ -407,7 +445,14 @@ class Chart(object):
                 #  the groups. If this doesn't work, we can skip all the 
                 #  rest of the signs in the groups, since they all have 
                 #  the same syntactic category.
-                results = rule.apply_rule((first_set[0], second_set[0]))
+                if stats is not None:
+                    timer = time.time()
+                    results = rule.apply_rule((first_set[0], second_set[0]))
+                    stats.syntax_time += time.time() - timer
+                    stats.rule_applied(rule, results is not None)
+                    timer = time.time()
+                else:
+                    results = rule.apply_rule((first_set[0], second_set[0]))
                 if results is not None:
                     if len(results) == 1:
                         # There's only one syntactic result (this is the most 
@@ -433,6 +478,8 @@ class Chart(object):
                                 # Apply the rule
                                 pair_results = self._apply_binary_rule(rule, (first_sign,second_sign))
                                 all_pair_results.extend(pair_results)
+                    if stats is not None:
+                        stats.semantics_time += time.time() - timer
         if len(all_pair_results) > 0:
             # Add the resulting signs to the chart
             added = self._table[start][end-start-1].extend(all_pair_results)
@@ -455,13 +502,22 @@ class Chart(object):
         for first_set,second_set in input_pairs:
             # Try applying the rule to the first of each set. If this 
             #  fails, it will also fail for the rest.
-            results = rule.apply_rule((first_set[0], second_set[0]))
+            if self.stats is not None:
+                timer = time.time()
+                results = rule.apply_rule((first_set[0], second_set[0]))
+                self.stats.syntax_time += time.time() - timer
+                self.stats.rule_applied(rule, results is not None)
+                timer = time.time()
+            else:
+                results = rule.apply_rule((first_set[0], second_set[0]))
             if results is not None:
                 # Apply the rule to all the pairs in the cross product
                 for first_sign in first_set:
                     for second_sign in second_set:
                         pair_results = self._apply_binary_rule(rule, (first_sign,second_sign))
                         all_pair_results.extend(pair_results)
+                if self.stats is not None:
+                    self.stats.semantics_time += time.time() - timer
         if len(all_pair_results) > 0:
             # Store the results in the table
             added = self._table[start][end-start-1].extend(all_pair_results)
@@ -0,0 +1,338 @@
+"""Parallel filling of the cells of a CKY chart.
+
+The signs in a cell (start,end) are produced only from the signs in
+the cells that span shorter parts of the input. All the cells on the
+same diagonal of the chart (those spanning the same number of words)
+can therefore be filled at the same time, once the shorter diagonals
+are finished. This lets a single long input be parsed faster on a
+machine with several cores.
+
+Rule application is pure Python, so threads would be no help. Instead,
+worker processes are forked for each diagonal. The workers get a copy
+of the chart as it is when they're forked, without having to pickle it.
+The cells are shared out between them and each fills whole cells,
+just as L{CkyParser<.parser.CkyParser>} does (including any beam), and
+sends the finished cell back to be put into the chart. Only the signs that survive the beam need to be pickled.
+Signs that were already in the cell are sent as a reference to the
+main process's object, together with their new state, so that notes
+other signs have made about them still apply.
+
+Since the workers start with exactly the state that the main process
+would have after filling the shorter diagonals, the chart ends up the
+same as after a serial parse. The signs are grouped by category in a
+plain dict, so the order of the categories in the worker's cell is sent
+along with it and the cell's index is rebuilt in the same order.
+
+The parser's limits on the chart's size and its timeout are checked in
+the workers as they fill each cell, in the same way as in a serial
+parse, using a function passed in by the parser. If the check raises an
+exception, the worker stops and the exception is re-raised in the main
+process.
+
+This relies on C{os.fork}, so isn't available on Windows.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import os, gc
+import cPickle as pickle
+from cStringIO import StringIO
+from multiprocessing import Process, Pipe, current_process
+
+from jazzparser.utils.base import exception_tuple
+from .stats import ChartStats
+
+# Diagonals with less work than this (measured in pairs of input signs
+#  that binary rules could be applied to) aren't worth starting
+#  processes for
+MIN_PARALLEL_PAIRS = 200
+
+def parallel_available():
+    """
+    Returns True if cells can be filled in parallel in this process.
+    Processes need to be forked and can't be started from a pool's
+    worker process (e.g. when parsing several inputs in parallel).
+    
+    """
+    return hasattr(os, 'fork') and not current_process().daemon
+
+def diagonal_cells(chart, length):
+    """
+    @return: the (start,end) pairs of all the cells in the chart that
+        span C{length} words.
+    
+    """
+    return [(start, start+length) for start in range(len(chart)-length+1)]
+
+def diagonal_work(chart, length):
+    """
+    Estimates how much work filling a diagonal will take: the number of
+    pairs of signs that binary rules could be applied to.
+    
+    """
+    return sum([chart.cell_size(start, middle) * chart.cell_size(middle, end) \
+                    for (start,end) in diagonal_cells(chart, length) \
+                    for middle in range(start+1, end)])
+
+def _shared_objects(chart, start, end):
+    """
+    Objects that the main process and the workers both have, which
+    don't need to be pickled to send a cell back, keyed by their id.
+    Since the workers are forked, each object has the same id in all
+    the processes.
+    
+    """
+    objects = [chart.grammar.formalism] + list(chart.grammar.rules)
+    for sign in chart.get_signs(start, end):
+        objects.extend([sign, sign.category])
+    return dict((id(obj), obj) for obj in objects)
+
+def _category_order(cell):
+    """
+    @return: the index in the cell of the first sign of each group of 
+        signs sharing a category, in the order the groups come out of 
+        the cell's index.
+    
+    """
+    positions = dict((id(sign), index) for (index,sign) in \
+                                                enumerate(cell.values()))
+    return [positions[id(group[0])] for group in \
+                                        cell.get_signs_grouped_by_category()]
+
+def _restore_category_order(cell, order):
+    """
+    Rebuilds the cell's index of signs by category, adding the 
+    categories in the given order (as returned by L{_category_order}).
+    The signs in each group stay in the order they are in the cell.
+    
+    """
+    signs = cell.values()
+    groups = {}
+    for sign in signs:
+        groups.setdefault(sign.category, []).append(sign)
+    cell._signs_by_category = {}
+    for index in order:
+        category = signs[index].category
+        cell._signs_by_category[category] = groups[category]
+
+def _fill_cell(chart, start, end, check):
+    """
+    Fills the cell with the results of binary rules and then unary 
+    rules. This is done in a worker process.
+    
+    If C{check} is given, it is called after the rules have been 
+    applied for each middle node and after the unary rules, as 
+    C{check(start, end, other_signs, complete)}, where C{other_signs} 
+    is the number of signs in the rest of the chart and C{complete} is 
+    True only for the last call. It should raise an exception if the 
+    parse should be abandoned.
+    
+    @return: the pickled cell and the stats for the work done. The
+        pickle also contains the new state of each of the signs that
+        were already in the cell, the rule applications that were
+        noted on signs in other cells, identified by the index of the
+        rule in the grammar and of the signs in their cells, and the 
+        order of the cell's categories.
+    
+    """
+    # Keep references to these, so their ids don't get reused
+    shared = _shared_objects(chart, start, end)
+    old_signs = chart.get_signs(start, end)[:]
+    # This doesn't include the other cells being filled at the same 
+    #  time, so the main process checks the total again
+    other_signs = chart.total_signs - len(old_signs)
+    
+    stats = None
+    if chart.stats is not None:
+        stats = ChartStats()
+        chart.stats = stats
+        chart._table[start][end-start-1].stats = stats
+    rule_indices = dict((id(rule), index) for (index,rule) in \
+                                enumerate(chart.grammar.binary_rules))
+    
+    notes = []
+    for middle in range(start+1, end):
+        chart._noted_pairs = []
+        chart.apply_binary_rules(start, middle, end)
+        firsts = dict((id(sign), index) for (index,sign) in \
+                                enumerate(chart.get_signs(start, middle)))
+        seconds = dict((id(sign), index) for (index,sign) in \
+                                enumerate(chart.get_signs(middle, end)))
+        notes.extend([(middle, rule_indices[id(rule)], firsts[id(first)],
+                       seconds[id(second)]) \
+                            for (rule,(first,second)) in chart._noted_pairs])
+        if check is not None:
+            check(start, end, other_signs, False)
+    chart._noted_pairs = None
+    chart.apply_unary_rules(start, end)
+    if check is not None:
+        check(start, end, other_signs, True)
+    
+    # Old signs will be referred to by id, so send their state separately
+    old_states = []
+    for index,sign in enumerate(old_signs):
+        state = sign.__getstate__()
+        # These never change
+        del state['category']
+        del state['semantics']
+        old_states.append((index, state))
+    
+    def _persistent_id(obj):
+        if obj is stats:
+            return "stats"
+        elif id(obj) in shared:
+            return id(obj)
+        return None
+    
+    data = StringIO()
+    pickler = pickle.Pickler(data, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = _persistent_id
+    cell = chart._table[start][end-start-1]
+    pickler.dump((cell, old_states, notes, _category_order(cell)))
+    return data.getvalue(), stats
+
+class _Abandoned(Exception):
+    """ Wraps an exception raised by the check in a worker """
+    def __init__(self, reason):
+        self.reason = reason
+        Exception.__init__(self, str(reason))
+
+def _worker(chart, cells, connection, check):
+    """
+    Fills each of the cells in turn and sends the results back down 
+    the pipe. If the check raises an exception, that is sent instead 
+    and the rest of the cells are left. If something else goes wrong, 
+    the traceback is sent.
+    
+    """
+    # The collector would touch every object we were forked with, so 
+    #  they'd all have to be copied. The process is short-lived anyway
+    gc.disable()
+    if check is not None:
+        def _check(*args):
+            try:
+                check(*args)
+            except Exception, err:
+                raise _Abandoned(err)
+    else:
+        _check = None
+    try:
+        for (start,end) in cells:
+            connection.send((_fill_cell(chart, start, end, _check), None, None))
+    except _Abandoned, abandoned:
+        connection.send((None, None, abandoned.reason))
+    except Exception:
+        connection.send((None, exception_tuple(str_tb=True)[2], None))
+    connection.close()
+
+def parallel_fill_diagonal(chart, length, processes, check=None):
+    """
+    Fills all the cells on a diagonal of the chart, using a number of
+    worker processes. The result is the same as applying binary rules
+    for every middle node and then unary rules to each of the cells in
+    turn. Stats about the work done are added to the chart's stats.
+    
+    This is a generator, so that the limits on the chart's size can be
+    checked as each cell is added to the chart while the others are
+    still being filled. The workers are terminated if the generator's
+    not run to the end.
+    
+    @type length: int
+    @param length: number of words spanned by the cells on the diagonal
+    @type processes: int
+    @param processes: maximum number of worker processes to use
+    @type check: function
+    @param check: called by the workers while filling each cell (see 
+        L{_fill_cell}). If it raises an exception, the exception is 
+        raised here when the cell's result is reached. It must be 
+        possible to pickle the exception
+    @return: yields a tuple (start, end, old_size) once each cell has
+        been filled, in order of start node, where old_size is the
+        number of signs in the cell before
+    
+    """
+    cells = diagonal_cells(chart, length)
+    binary_rules = chart.grammar.binary_rules
+    
+    # Each worker takes every n-th cell, so that they all get some of 
+    #  the long and short ones
+    workers = []
+    try:
+        for worker_num in range(min(processes, len(cells))):
+            receiver,sender = Pipe(False)
+            worker = Process(target=_worker, 
+                    args=(chart, cells[worker_num::processes], sender, 
+                          check))
+            worker.daemon = True
+            worker.start()
+            # We only need the worker's copy of this end
+            sender.close()
+            workers.append((worker, receiver))
+        
+        for cell_num,(start,end) in enumerate(cells):
+            receiver = workers[cell_num % len(workers)][1]
+            result,error,abandoned = receiver.recv()
+            if abandoned is not None:
+                raise abandoned
+            if error is not None:
+                raise ParallelFillError("error filling cell (%d,%d): %s" % \
+                                            (start, end, error))
+            data,stats = result
+            
+            shared = _shared_objects(chart, start, end)
+            old_signs = chart.get_signs(start, end)
+            
+            def _persistent_load(pid):
+                if pid == "stats":
+                    return chart.stats
+                return shared[pid]
+            
+            unpickler = pickle.Unpickler(StringIO(data))
+            unpickler.persistent_load = _persistent_load
+            new_cell,old_states,notes,category_order = unpickler.load()
+            _restore_category_order(new_cell, category_order)
+            
+            for index,state in old_states:
+                old_signs[index].__setstate__(state)
+            # Make the same notes that the worker made on its signs
+            for (middle,rule,first,second) in notes:
+                chart.get_signs(start, middle)[first].note_rule_applied(
+                        binary_rules[rule], chart.get_signs(middle, end)[second])
+            
+            old_size = len(old_signs)
+            chart._table[start][end-start-1] = new_cell
+            if chart.stats is not None:
+                chart.stats.add(stats)
+            yield start, end, old_size
+    finally:
+        # Don't leave the workers going if we've given up on the parse
+        for worker,receiver in workers:
+            receiver.close()
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+class ParallelFillError(Exception):
+    pass
@@ -31,11 +31,14 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
 from jazzparser.grammar import Grammar
 from chart import Chart
-from jazzparser.utils.base import filter_latex, ExecutionTimer
+from jazzparser.utils.base import filter_latex, ExecutionTimer, \
+                            process_memory
 from jazzparser.utils.options import ModuleOption, new_file_option
 from jazzparser.utils.strings import str_to_bool
 from jazzparser.parsers.base.parser import Parser
 from .tools import ChartTool, InteractiveChartTool
+from .stats import ChartStats
+from . import parallel as parallel_fill
 
 import sys, re
 
@@ -90,6 +93,31 @@ class CkyParser(Parser):
             usage="timeout=X, where X is an integer number of seconds.",
             default=0,
         ),
+        ModuleOption('max_cell_signs', filter=int,
+            help_text="Maximum number of signs allowed in any one cell of "\
+                "the chart. If this is exceeded, the parse is abandoned "\
+                "and treated as if it had timed out. 0 (default) imposes "\
+                "no limit.",
+            usage="max_cell_signs=X, where X is an integer.",
+            default=0,
+        ),
+        ModuleOption('max_signs', filter=int,
+            help_text="Maximum total number of signs allowed in the chart. "\
+                "If this is exceeded, the parse is abandoned and treated "\
+                "as if it had timed out. 0 (default) imposes no limit.",
+            usage="max_signs=X, where X is an integer.",
+            default=0,
+        ),
+        ModuleOption('max_memory', filter=int,
+            help_text="Approximate maximum memory the parsing process may "\
+                "use, in megabytes. This is checked each time a cell of the "\
+                "chart is completed and, if it is exceeded, the parse is "\
+                "abandoned and treated as if it had timed out. Note that "\
+                "this measures the memory of the whole process, not just "\
+                "the chart. 0 (default) imposes no limit.",
+            usage="max_memory=X, where X is an integer number of megabytes.",
+            default=0,
+        ),
         ModuleOption('inspect', filter=str_to_bool,
             help_text="If true, the graphical chart inspector will be "\
                 "displayed during parsing.",
@@ -113,6 +141,25 @@ class CkyParser(Parser):
             usage="derivations=X, where X is a boolean value",
             default=None,
         ),
+        ModuleOption('stats', filter=str_to_bool,
+            help_text="Collect statistics about the parse, such as the "\
+                "number of times each rule was applied and the time spent "\
+                "on syntax and semantics. They're available after the parse "\
+                "as the parser's stats attribute",
+            usage="stats=X, where X is a boolean value",
+            default=False,
+        ),
+        ModuleOption('processes', filter=int,
+            help_text="Number of processes to use to fill the chart. With "\
+                "more than 1, the cells spanning the same number of words "\
+                "are filled in parallel, which speeds up parsing long "\
+                "inputs. The chart ends up the same as with 1 (the "\
+                "default). Can't be used with derivations, or on "\
+                "platforms without fork, in which case the chart is "\
+                "filled in a single process.",
+            usage="processes=X, where X is an integer.",
+            default=1,
+        ),
     ]
     
     def _create_chart(self, *args, **kwargs):
@@ -129,7 +176,12 @@ class CkyParser(Parser):
             by a tuple (start_node, end_node, sign)
         
         """
-        signs = self.tagger.get_signs(offset)
+        if self.stats is not None:
+            timer = ExecutionTimer()
+            signs = self.tagger.get_signs(offset)
+            self.stats.tagger_time += timer.get_time()
+        else:
+            signs = self.tagger.get_signs(offset)
         words = self.tagger.get_string_input()
         if signs is None or len(signs) == 0:
             return []
@@ -179,13 +231,19 @@ class CkyParser(Parser):
             
         # Time excecution if we're showing any summaries
         time = bool(summaries)
+        if self.options['stats']:
+            self.stats = ChartStats()
+            parse_timer = ExecutionTimer()
+        else:
+            self.stats = None
         # Find out from the tagger how long the input it read in was
         input_length = self.tagger.input_length
         # Create and initialise a chart for parsing
         # Don't initialise the chart with signs - we'll add signs gradually instead
         chart = self._create_chart(
                                 [[]]*input_length,
-                                derivations=derivations)
+                                derivations=derivations,
+                                stats=self.stats)
         
         # Launch a chart inspector if requested
         if self.options['inspect'] or inspect:
@@ -211,10 +269,81 @@ class CkyParser(Parser):
             
         required_parses = self.options['parses']
         
+        processes = self.options['processes']
+        parallel = processes > 1
+        if parallel and derivations:
+            self.logger.warn("can't fill the chart in parallel when storing "\
+                            "derivations: using a single process")
+            parallel = False
+        elif parallel and not parallel_fill.parallel_available():
+            self.logger.warn("can't fill the chart in parallel here: using "\
+                            "a single process")
+            parallel = False
+        
         timeout = 60*self.options['timeout']
         check_timeout = timeout>0
         # Make sure the timed out flag is unset to start with
         self.timed_out = False
+        self.limit_exceeded = None
+        
+        # Resource limits on the size of the chart
+        max_cell_signs = self.options['max_cell_signs']
+        max_signs = self.options['max_signs']
+        max_memory = self.options['max_memory'] * 1024 * 1024
+        check_memory = max_memory > 0 and process_memory() is not None
+        
+        def _check_size(start, end, other_signs):
+            # Check the size of the cell (start,end) and the whole chart 
+            #  against the limits, given the number of signs in all the 
+            #  other cells. Returns the new total number of signs
+            cell_signs = chart.cell_size(start, end)
+            if max_cell_signs and cell_signs > max_cell_signs:
+                raise ParserResourceLimit('max_cell_signs', cell_signs, 
+                                          max_cell_signs)
+            total_signs = other_signs + cell_signs
+            if max_signs and total_signs > max_signs:
+                raise ParserResourceLimit('max_signs', total_signs, max_signs)
+            return total_signs
+        
+        def _check_memory():
+            if check_memory:
+                memory = process_memory()
+                if memory > max_memory:
+                    raise ParserResourceLimit('max_memory', memory, max_memory)
+        
+        def _check_timeout():
+            # Check whether the timeout has expired and don't process 
+            #  any more if it has
+            if check_timeout:
+                # Check whether the timeout has passed
+                if int(timeout_timer.get_time()) > timeout:
+                    # Move on to post-parse stuff
+                    raise ParserTimeout
+        
+        def _check_cell(start, end, other_signs, complete):
+            # Checks done while filling a cell: after the binary rules 
+            #  for each middle node and, once the cell's complete, after 
+            #  the unary rules. The parallel workers do the same checks
+            total_signs = _check_size(start, end, other_signs)
+            if complete:
+                _check_memory()
+            else:
+                _check_timeout()
+            return total_signs
+        
+        def _fill_cell(start, end, total_signs):
+            # Apply the binary and unary rules to produce the signs 
+            #  for (start,end) and check the limits. Returns the new 
+            #  total number of signs
+            other_signs = total_signs - chart.cell_size(start, end)
+            for middle in range(start+1,end):
+                chart.apply_binary_rules(start, middle, end)
+                # Stop if the cell's got too big
+                _check_cell(start, end, other_signs, False)
+            
+            # Check for new unary rule applications
+            chart.apply_unary_rules(start, end)
+            return _check_cell(start, end, other_signs, True)
         
         # This is where progress output will go
         # Note that it's not the same as logger, which is the main system logger
@@ -226,7 +355,9 @@ class CkyParser(Parser):
         ##################################################
         ### Here is the parser itself.
         # Keep track of how long since we started for timing out
-        timeout_timer = ExecutionTimer(clock=True)
+        # This process's CPU time doesn't count the workers', so use wall 
+        #  time when filling in parallel
+        timeout_timer = ExecutionTimer(clock=not parallel)
         
         signs_taken = [0]*input_length
             
@@ -257,38 +388,64 @@ class CkyParser(Parser):
                     # No new signs added by the tagger: no point in continuing 
                     prog_logger.info("No new signs added: ending parse")
                     break
+                # Count up all the signs we've now got
+                total_signs = chart.total_signs
+                if max_signs and total_signs > max_signs:
+                    raise ParserResourceLimit('max_signs', total_signs, 
+                                              max_signs)
                  
                 ##### Main parser loop: produce all possible results
-                # Set end point to each node
-                for end in range(1,input_length+1):
-                    if time:
-                        # Start a timer
-                        timer = ExecutionTimer()
-                    chart.apply_unary_rules(end-1, end)
-                    
-                    # Set start point to each node before the end, in reverse order
-                    for start in range(end-2,-1,-1):
-                        for middle in range(start+1,end):
-                            chart.apply_binary_rules(start, middle, end)
-                            
-                            # Check whether the timeout has expired and don't process 
-                            #  any more if it has
-                            if check_timeout:
-                                # Check whether the timeout has passed
-                                if int(timeout_timer.get_time()) > timeout:
-                                    # Move on to post-parse stuff
-                                    raise ParserTimeout
+                if parallel:
+                    # Fill a diagonal at a time: the cells spanning the 
+                    #  same number of words can be done at the same time
+                    for length in range(1,input_length+1):
+                        if time:
+                            timer = ExecutionTimer()
+                        if length > 1 and \
+                                parallel_fill.diagonal_work(chart, length) \
+                                    >= parallel_fill.MIN_PARALLEL_PAIRS:
+                            # The workers check the limits as they go, but 
+                            #  only know about their own cells: check the 
+                            #  whole chart once each cell's complete
+                            for (start,end,old_size) in \
+                                    parallel_fill.parallel_fill_diagonal(
+                                                chart, length, processes, 
+                                                check=_check_cell):
+                                total_signs = _check_size(start, end, 
+                                                    total_signs - old_size)
+                                _check_memory()
+                                _check_timeout()
+                        else:
+                            # Not worth starting processes for
+                            for (start,end) in \
+                                    parallel_fill.diagonal_cells(chart, length):
+                                total_signs = _fill_cell(start, end, 
+                                                         total_signs)
                         
-                        # Check for new unary rule applications
-                        chart.apply_unary_rules(start, end)
-                
-                    if summaries:
-                        prog_logger.info("Completed parsing up to node %d / %d (%.2f secs)" % (end,input_length, timer.get_time()))
-                        if summaries != 2:
-                            prog_logger.info(chart.summary)
-                    if self.options['dump_chart']:
-                        # Dump an update of the chart to the file
-                        dump_chart(chart, self.options['dump_chart'])
+                        if summaries:
+                            prog_logger.info("Completed parsing spans of length %d / %d (%.2f secs)" % (length,input_length, timer.get_time()))
+                            if summaries != 2:
+                                prog_logger.info(chart.summary)
+                        if self.options['dump_chart']:
+                            dump_chart(chart, self.options['dump_chart'])
+                else:
+                    # Set end point to each node
+                    for end in range(1,input_length+1):
+                        if time:
+                            # Start a timer
+                            timer = ExecutionTimer()
+                        
+                        # Set start point to each node, in reverse order
+                        for start in range(end-1,-1,-1):
+                            total_signs = _fill_cell(start, end, total_signs)
+                    
+                        if summaries:
+                            prog_logger.info("Completed parsing up to node %d / %d (%.2f secs)" % (end,input_length, timer.get_time()))
+                            if summaries != 2:
+                                prog_logger.info(chart.summary)
+                        if self.options['dump_chart']:
+                            # Dump an update of the chart to the file
+                            dump_chart(chart, self.options['dump_chart'])
                     
                 if summaries:
                     prog_logger.info("Completed parsing to end of sequence")
@@ -302,6 +459,12 @@ class CkyParser(Parser):
                             "to backoff/fail" % self.options['timeout'])
             # Set the timed_out flag so we can check later whether we timed out
             self.timed_out = True
+        except ParserResourceLimit, err:
+            # The chart got too big: give up in the same way as a timeout
+            prog_logger.info("Parse abandoned: %s. Continuing to "\
+                            "backoff/fail" % err)
+            self.timed_out = True
+            self.limit_exceeded = err.limit
         except KeyboardInterrupt:
             # We pass the interrupt on to a higher level, but first kill 
             #  the inspector window, so it doesn't hang around and mess up
@@ -311,7 +474,10 @@ class CkyParser(Parser):
         parses = chart.parses
         if len(parses) == 0 and self.backoff is not None:
             prog_logger.info("Using backoff model")
+            backoff_timer = ExecutionTimer()
             backoff_results = self.run_backoff()
+            if self.stats is not None:
+                self.stats.backoff_time = backoff_timer.get_time()
             if len(backoff_results) > 0:
                 for res in backoff_results:
                     # Put the semantics result into a sign, with a dummy 
@@ -328,6 +494,10 @@ class CkyParser(Parser):
         else:
             prog_logger.info("Parse finished with no results")
         
+        if self.stats is not None:
+            self.stats.record_cell_sizes(chart)
+            self.stats.parse_time = parse_timer.get_time()
+        
         # Close the inspector window if one was opened
         if not self.options['inspect_persist']:
             self.chart.kill_inspector()
@@ -495,3 +665,21 @@ class DirectedParseError(Exception):
 
 class ParserTimeout(Exception):
     pass
+
+class ParserResourceLimit(Exception):
+    """
+    Raised during parsing when the chart exceeds one of the limits on 
+    its size. C{limit} is the name of the option that set the limit that 
+    was exceeded.
+    
+    """
+    def __init__(self, limit, value, maximum):
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        Exception.__init__(self, "%s exceeded (%d > %d)" % \
+                                                    (limit, value, maximum))
+    
+    def __reduce__(self):
+        # Make sure this can be sent back from a parallel worker
+        return (ParserResourceLimit, (self.limit, self.value, self.maximum))
@@ -0,0 +1,154 @@
+"""Statistics collected during CKY parsing.
+
+Collecting these is off by default. When they're requested, the parser
+gives the chart a L{ChartStats}, which it updates as it goes along.
+When they're not, the chart only has to check that it hasn't got one,
+so parsing is no slower.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+class ChartStats(object):
+    """
+    Counts and timings for a single parse.
+    
+    Binary rules are first applied to one sign from each group of signs
+    with the same category. Only if this succeeds are they applied to
+    all the pairs of signs in the groups, which only needs to be done to
+    get the semantics. The time spent on the first application is
+    counted as C{syntax_time} and the rest as C{semantics_time}. Unary
+    rule applications are all counted as syntax.
+    
+    """
+    def __init__(self):
+        self.rule_attempts = {}
+        """Number of times each rule was tried, keyed by internal name."""
+        self.rule_successes = {}
+        """Number of times each rule produced a result."""
+        self.syntax_time = 0.0
+        self.semantics_time = 0.0
+        self.merged_signs = 0
+        """Number of new signs merged into an equal existing sign."""
+        self.beam_cells = {}
+        """
+        Maps (start,end) to a list [before,after,removed]: the largest
+        the cell got before a beam was applied, its size after the last
+        beam and the total number of signs removed by beams.
+        """
+        self.cell_sizes = {}
+        """Number of signs in each non-empty cell at the end of the parse."""
+        self.tagger_time = 0.0
+        """Time spent getting signs from the tagger during the parse."""
+        self.backoff_time = 0.0
+        self.parse_time = 0.0
+    
+    def rule_applied(self, rule, success):
+        """
+        Records an attempt to apply the rule and whether it worked.
+        
+        """
+        name = rule.internal_name
+        self.rule_attempts[name] = self.rule_attempts.get(name, 0) + 1
+        if success:
+            self.rule_successes[name] = self.rule_successes.get(name, 0) + 1
+    
+    def add(self, other):
+        """
+        Adds the counts and timings from another set of stats to these. 
+        This is used to collect the stats from the work done in other 
+        processes (see L{jazzparser.parsers.cky.parallel}).
+        
+        """
+        for name,count in other.rule_attempts.items():
+            self.rule_attempts[name] = self.rule_attempts.get(name, 0) + count
+        for name,count in other.rule_successes.items():
+            self.rule_successes[name] = self.rule_successes.get(name, 0) + count
+        self.syntax_time += other.syntax_time
+        self.semantics_time += other.semantics_time
+        self.merged_signs += other.merged_signs
+        for (start,end),(before,after,removed) in other.beam_cells.items():
+            if (start,end) in self.beam_cells:
+                cell = self.beam_cells[(start,end)]
+                cell[0] = max(cell[0], before)
+                cell[1] = after
+                cell[2] += removed
+            else:
+                self.beam_cells[(start,end)] = [before, after, removed]
+    
+    def beam_applied(self, start, end, before, after):
+        """
+        Records the size of a cell before and after a beam was applied to
+        it.
+        
+        """
+        if (start,end) in self.beam_cells:
+            cell = self.beam_cells[(start,end)]
+            cell[0] = max(cell[0], before)
+            cell[1] = after
+            cell[2] += before - after
+        else:
+            self.beam_cells[(start,end)] = [before, after, before-after]
+    
+    def record_cell_sizes(self, chart):
+        """
+        Stores the sizes of all the non-empty cells in the chart.
+        
+        """
+        self.cell_sizes = {}
+        for start in range(len(chart)):
+            for end in range(start+1, len(chart)+1):
+                size = chart.cell_size(start, end)
+                if size:
+                    self.cell_sizes[(start,end)] = size
+    
+    def _get_success_rates(self):
+        return dict(
+            (name, float(self.rule_successes.get(name, 0)) / attempts) \
+                for (name,attempts) in self.rule_attempts.items())
+    success_rates = property(_get_success_rates)
+    
+    def to_dict(self):
+        """
+        Returns the stats as a dictionary containing only basic types
+        (suitable, for example, for JSON output). Cells are given as
+        lists beginning with their start and end nodes.
+        
+        """
+        return {
+            'rule_attempts' : dict(self.rule_attempts),
+            'rule_successes' : dict(self.rule_successes),
+            'rule_success_rates' : self.success_rates,
+            'syntax_time' : self.syntax_time,
+            'semantics_time' : self.semantics_time,
+            'merged_signs' : self.merged_signs,
+            'beam_cells' : [[start, end] + sizes for ((start,end),sizes) in \
+                                        sorted(self.beam_cells.items())],
+            'cell_sizes' : [[start, end, size] for ((start,end),size) in \
+                                        sorted(self.cell_sizes.items())],
+            'total_signs' : sum(self.cell_sizes.values()),
+            'tagger_time' : self.tagger_time,
+            'backoff_time' : self.backoff_time,
+            'parse_time' : self.parse_time,
+        }
@@ -273,14 +273,26 @@ class PcfgChart(Chart):
             if not (start == 0 and end == self.size):
                 # Apply to a specific arc
                 logger.debug("Beaming (%s,%s)" % arc)
-                self._table[start][end-start-1]._apply_beam()
+                cell = self._table[start][end-start-1]
+                if self.stats is not None:
+                    before = len(cell)
+                    cell._apply_beam()
+                    self.stats.beam_applied(start, end, before, len(cell))
+                else:
+                    cell._apply_beam()
         else:
             # Apply to whole chart
             for i,ends in enumerate(self._table):
                 for j,arcs in enumerate(ends):
                     # Exclude the longest span
                     if not (i==0 and i+j+1==self.size):
-                        arcs._apply_beam()
+                        if self.stats is not None:
+                            before = len(arcs)
+                            arcs._apply_beam()
+                            self.stats.beam_applied(i, i+j+1, before, 
+                                                    len(arcs))
+                        else:
+                            arcs._apply_beam()
     
     def _sign_string(self, sign):
         return "%s (%s)" % (sign, fmt_prob(2**sign.probability))
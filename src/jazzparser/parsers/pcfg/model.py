@@ -37,6 +37,7 @@ from jazzparser.taggers import Tagger
 from jazzparser import settings
 from jazzparser.utils.options import ModuleOption
 from jazzparser.utils.base import abstractmethod
+from jazzparser.utils.modelcache import load_cached_model
 
 FILE_EXTENSION = "mdl"
 
@@ -75,10 +76,11 @@ class PcfgModel(object):
         self.grammar = grammar
         
     @classmethod
-    def __get_filename(cls, model_name):
+    def get_filename(cls, model_name):
+        """ The file that the named model of this type is stored in. """
         return os.path.join(cls._get_model_dir(), "%s.%s" % (model_name, FILE_EXTENSION))
     def __get_my_filename(self):
-        return type(self).__get_filename(self.model_name)
+        return type(self).get_filename(self.model_name)
     _filename = property(__get_my_filename)
     
     def process_training_options(self):
@@ -153,20 +155,23 @@ class PcfgModel(object):
             
     @classmethod
     def load_model(cls, model_name):
-        filename = cls.__get_filename(model_name)
-        # Load the model from a file
-        if os.path.exists(filename):
-            f = open(filename, 'rb')
-            model_data = f.read()
-            model_data = pickle.loads(model_data)
-            f.close()
-        else:
-            raise ModelLoadError, "the model '%s' has not been trained" % model_name
-        obj = cls._load_model(model_name, model_data['data'])
-        # Load the descriptive text (stored for every model type)
-        obj._description = model_data['desc']
-        obj.model_description = model_data['model_desc']
-        return obj
+        filename = cls.get_filename(model_name)
+        def _load():
+            # Load the model from a file
+            if os.path.exists(filename):
+                f = open(filename, 'rb')
+                model_data = f.read()
+                model_data = pickle.loads(model_data)
+                f.close()
+            else:
+                raise ModelLoadError, "the model '%s' has not been trained" % model_name
+            obj = cls._load_model(model_name, model_data['data'])
+            # Load the descriptive text (stored for every model type)
+            obj._description = model_data['desc']
+            obj.model_description = model_data['model_desc']
+            return obj
+        # Use an already loaded model if the model cache is enabled
+        return load_cached_model(cls, model_name, filename, _load)
         
     def _generate_description(self):
         """
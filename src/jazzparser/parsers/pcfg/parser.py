@@ -176,7 +176,7 @@ class PcfgParser(CkyParser):
                                                     self.options['partition'])
         else:
             model_name = self.options['model']
-        self.model = self.grammar.formalism.PcfgModel.load_model(self.options['model'])
+        self.model = self.grammar.formalism.PcfgModel.load_model(model_name)
         self.logger.info("Parsing model: %s" % model_name)
         
         self.use_tagger_probs = False
@@ -0,0 +1,286 @@
+"""Sweeps over beam settings for the PCFG parser.
+
+Tuning the PCFG parser's beam (the C{threshold} and C{maxarc} options)
+means parsing the same inputs over and over with different settings.
+Doing that by running the parser for each setting reloads the grammar
+and models and tags every input again each time, though none of that
+depends on the beam.
+
+L{beam_sweep} runs a whole grid of settings in one go. Models are
+loaded once (using the L{model cache<jazzparser.utils.modelcache>}),
+each input is tagged once and the tags are reused for every setting
+and the gold standard analysis of each input is only computed once.
+It reports the parse time, chart size and accuracy for each setting.
+
+The inputs can be spread over a pool of worker processes. Each worker
+keeps its models loaded and handles all the settings for an input, so
+the tagging is still only done once.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import copy
+from multiprocessing import Pool
+
+from jazzparser.grammar import get_grammar
+from jazzparser.utils.base import ExecutionTimer
+from jazzparser.utils.loggers import create_dummy_logger
+from jazzparser.utils.modelcache import enable_model_cache, \
+                        disable_model_cache, model_cache_enabled
+from .parser import PcfgParser
+
+class CachedTagger(object):
+    """
+    Wraps a tagger that's already tagged its input so that it can be
+    used by several parsers. The parser alters the signs it gets from
+    the tagger, so every call to L{get_signs} returns fresh copies of
+    them. Everything else is passed on to the wrapped tagger.
+    
+    """
+    def __init__(self, tagger):
+        self.tagger = tagger
+        self._signs = {}
+    
+    def _fetch(self, offset):
+        if offset not in self._signs:
+            self._signs[offset] = self.tagger.get_signs(offset)
+        return self._signs[offset]
+    
+    def get_signs(self, offset=0):
+        return [(start, end, (sign.copy(), tag, prob)) for \
+                    (start, end, (sign, tag, prob)) in self._fetch(offset)]
+    
+    def fetch_all(self, max_offset=None):
+        """
+        Gets the signs for every offset from the tagger now, so that no 
+        tagging is done by later calls to L{get_signs}. Like the parser, 
+        stops at the first offset with no signs, or at C{max_offset}.
+        
+        """
+        offset = 0
+        while max_offset is None or offset < max_offset:
+            if not self._fetch(offset):
+                break
+            offset += 1
+    
+    def __getattr__(self, name):
+        return getattr(self.tagger, name)
+
+class BeamSweepResult(object):
+    """
+    Measurements from parsing all the inputs with one beam setting.
+    Each list has a value for each input, in the order they were given.
+    
+    """
+    def __init__(self, threshold, maxarc):
+        self.threshold = threshold
+        self.maxarc = maxarc
+        self.times = []
+        """CPU time taken to parse each input, excluding tagging."""
+        self.chart_sizes = []
+        """Total number of signs in the chart at the end of each parse."""
+        self.parsed = []
+        """Whether each parse found a full result."""
+        self.timed_out = []
+        """Whether each parse stopped on a timeout or resource limit."""
+        self.metric_stats = []
+        """
+        Stats from the metric comparing the top result to the gold
+        standard, or None where there was no gold standard.
+        """
+    
+    def _get_mean_time(self):
+        return sum(self.times, 0.0) / max(len(self.times), 1)
+    mean_time = property(_get_mean_time)
+    
+    def _get_std_time(self):
+        mean = self.mean_time
+        return (sum([(t-mean)**2 for t in self.times], 0.0) / \
+                                        max(len(self.times), 1)) ** 0.5
+    std_time = property(_get_std_time)
+    
+    def _get_mean_chart_size(self):
+        return float(sum(self.chart_sizes)) / max(len(self.chart_sizes), 1)
+    mean_chart_size = property(_get_mean_chart_size)
+    
+    def accuracy(self, metric):
+        """
+        Combines the metric stats from all the inputs with a gold
+        standard to give an overall score, using the metric that
+        produced them.
+        
+        """
+        stats = [s for s in self.metric_stats if s is not None]
+        if not stats:
+            return None
+        return metric.total_from_stats(stats)
+    
+    def __str__(self):
+        return "threshold=%s, maxarc=%d" % (self.threshold, self.maxarc)
+
+# Everything that's the same for all the inputs, set up once in each 
+#  process by _init_worker
+_worker = {}
+
+def _set_worker(grammar, tagger_cls, settings, metric):
+    _worker['grammar'] = grammar
+    _worker['tagger_cls'] = tagger_cls
+    _worker['settings'] = settings
+    _worker['metric'] = metric
+
+def _init_worker(grammar_name, tagger_cls, settings, metric):
+    # Each worker keeps the models it loads for all its inputs
+    enable_model_cache()
+    _set_worker(get_grammar(grammar_name), tagger_cls, settings, metric)
+
+def _sweep_input(input, topts, popts):
+    """
+    Tags a single input and parses it with each of the settings.
+    
+    @return: a list containing a tuple for each setting: (time, chart
+        size, parsed, timed out, metric stats)
+    
+    """
+    grammar = _worker['grammar']
+    tagger_cls = _worker['tagger_cls']
+    metric = _worker['metric']
+    logger = create_dummy_logger()
+    tagger = CachedTagger(tagger_cls(grammar, input, options=topts.copy(),
+                                     logger=logger))
+    if metric is not None:
+        gold = input.get_gold_analysis()
+    else:
+        gold = None
+    
+    measurements = []
+    for threshold,maxarc in _worker['settings']:
+        options = copy.deepcopy(popts)
+        options['threshold'] = threshold
+        options['maxarc'] = maxarc
+        parser = PcfgParser(grammar, tagger, options=options, logger=logger)
+        # Do all the tagging before timing the parse, so it isn't charged 
+        #  to whichever setting asks for the signs first
+        tagger.fetch_all(parser.options['max_iter'] or None)
+        timer = ExecutionTimer(clock=True)
+        results = parser.parse()
+        parse_time = timer.get_time()
+        
+        if gold is not None:
+            if results:
+                top = results[0].semantics
+            else:
+                top = None
+            stats = metric.pair_stats(top, gold)
+        else:
+            stats = None
+        measurements.append((parse_time, parser.chart.total_signs,
+                             len(results) > 0, parser.timed_out, stats))
+    return measurements
+
+def _sweep_input_job(args):
+    return _sweep_input(*args)
+
+def beam_sweep(grammar, inputs, tagger_cls, settings, tagger_options={},
+                parser_options={}, partitions=None, metric=None,
+                processes=1):
+    """
+    Parses every input with every beam setting and measures the
+    results.
+    
+    @type grammar: L{jazzparser.grammar.Grammar}
+    @type inputs: list
+    @param inputs: inputs to parse, of a type the tagger accepts. To
+        measure accuracy, they must be able to supply a gold analysis
+        (like L{jazzparser.data.input.DbInput}s)
+    @type tagger_cls: class
+    @param tagger_cls: tagger to use for all the inputs
+    @type settings: list of (float,int) tuples
+    @param settings: beam settings to try: pairs of the parser's
+        C{threshold} and C{maxarc} options
+    @type tagger_options: dict
+    @param tagger_options: options for the tagger
+    @type parser_options: dict
+    @param parser_options: options for the parser, apart from the beam
+        settings
+    @type partitions: list of ints
+    @param partitions: optionally, the number of the partition each
+        input's in. These are passed to the tagger and parser (if they
+        use a model) to select the models trained without that input
+    @type metric: L{jazzparser.formalisms.base.semantics.distance.FScoreMetric}
+    @param metric: metric used to compare the top result with the gold
+        standard. If not given, accuracy isn't measured
+    @type processes: int
+    @param processes: number of worker processes to spread the inputs
+        over. With 1, everything's done in this process
+    @rtype: list of L{BeamSweepResult}s
+    @return: a result for each setting, in the same order
+    
+    """
+    settings = list(settings)
+    jobs = []
+    for index,input in enumerate(inputs):
+        topts = copy.deepcopy(tagger_options)
+        popts = copy.deepcopy(parser_options)
+        if partitions is not None:
+            # Same as the main parse script
+            if topts.get('model') is not None:
+                topts['partition'] = partitions[index]
+            if popts.get('model') is not None:
+                popts['partition'] = partitions[index]
+        # The grammar's loaded by the workers, so it doesn't get sent 
+        #  with every input
+        jobs.append((input, topts, popts))
+    
+    if processes > 1:
+        pool = Pool(processes=processes, initializer=_init_worker, 
+                    initargs=(grammar.name, tagger_cls, settings, metric))
+        try:
+            all_measurements = pool.map(_sweep_input_job, jobs, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        cache_enabled = model_cache_enabled()
+        enable_model_cache()
+        _set_worker(grammar, tagger_cls, settings, metric)
+        try:
+            all_measurements = [_sweep_input_job(job) for job in jobs]
+        finally:
+            # Don't leave the cache on if it wasn't before
+            if not cache_enabled:
+                disable_model_cache()
+            _worker.clear()
+    
+    results = [BeamSweepResult(threshold, maxarc) for \
+                                        (threshold,maxarc) in settings]
+    for measurements in all_measurements:
+        for result,(parse_time,size,parsed,timed_out,stats) in \
+                                            zip(results, measurements):
+            result.times.append(parse_time)
+            result.chart_sizes.append(size)
+            result.parsed.append(parsed)
+            result.timed_out.append(timed_out)
+            result.metric_stats.append(stats)
+    return results
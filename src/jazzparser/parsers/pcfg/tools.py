@@ -131,7 +131,7 @@ class ProbabilisticDerivationTraceTool(Tool):
     usage = ('pderiv <res>', 'show derivation of numbered result, including '\
                 'probabilities of each sign')
     help = """
-Just like deriv, but displays probabilities on signs.
+Just like deriv (without k), but displays probabilities on signs.
 
 See also:
   deriv, the standard derivation trace tool.
@@ -154,7 +154,7 @@ See also:
             else:
                 print "Probabilistic derivation trace for result %d: %s" % (result_num,results[result_num])
                 print "\n%s" % \
-                    results[result_num].derivation_trace.str_indent(\
+                    results[result_num].derivation_trace.str_packed(\
                         signfmt=_signfmt)
         else:
             raise ShellError, "There are only %d results" % len(results)
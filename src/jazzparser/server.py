@@ -0,0 +1,638 @@
+"""Long-running parse server.
+
+Loading the grammar and the tagger, parser and backoff models takes much
+longer than parsing a short chord sequence. The parse server loads them
+once and then accepts parse requests over a socket, so that applications
+that parse lots of short inputs don't pay the start-up cost every time.
+Parsing is done by a pool of worker processes, each of which keeps the
+grammar and every model it has loaded (see L{jazzparser.utils.modelcache}).
+
+The server listens on a Unix socket (C{--socket}) or a port on localhost
+(C{--port}). The protocol is line-based: the client sends requests and
+the server sends responses, each as a JSON object on a single line. A
+request may contain:
+ - C{id}: any value, sent back with the responses to identify the request;
+ - C{input}: a chord sequence, in the same format as the parser's
+   command-line input; or
+ - C{file}: the path to an input file (for example, a MIDI file), read
+   as type C{filetype} (default C{chords}) with options C{file_options};
+ - C{tagger_options}, C{parser_options}, C{backoff_options}: options for
+   this request, in the same format as C{--topt}, etc, or as a dictionary.
+   They override the options the server was started with;
+ - C{topn}: maximum number of results to send back.
+
+The server responds to each request straight away with C{status}
+C{"queued"}, or C{"error"} if the request isn't valid. When the parse is
+finished, it sends another response with C{status} C{"done"} or
+C{"error"}. A finished response contains the C{results} (each with a
+C{probability}, C{category} and C{semantics}), the parse C{time},
+C{timed_out}, C{limit_exceeded} and, if the parser's collected them,
+C{stats}. Requests on the same connection are parsed in parallel, so the
+responses may come back in a different order to the requests. If the
+worker process parsing a request dies, the server sends an C{"error"}
+response for it.
+
+L{ParseClient} sends requests to a server from Python.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+# Make sure the necessary directories are on the path
+import sys, os
+codedir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+libdir = os.path.abspath(os.path.join(codedir, "..", "lib"))
+if codedir not in sys.path:
+    sys.path.append(codedir)
+if libdir not in sys.path:
+    sys.path.append(libdir)
+
+import json, socket, threading, SocketServer, traceback, signal
+from optparse import OptionParser
+from multiprocessing import Pool
+from multiprocessing.queues import SimpleQueue
+
+from jazzparser import settings
+from jazzparser.grammar import get_grammar
+from jazzparser.data.input import ChordInput, get_input_type, is_bulk_type
+from jazzparser.taggers.loader import get_tagger, TaggerLoadError
+from jazzparser.parsers.loader import get_parser, ParserLoadError
+from jazzparser.backoff.loader import get_backoff_builder, BackoffLoadError
+from jazzparser.utils.base import ExecutionTimer
+from jazzparser.utils.options import ModuleOption, ModuleOptionError, \
+                            UnprocessedOptionValue
+from jazzparser.utils.loggers import create_dummy_logger, \
+                            create_plain_stderr_logger
+from jazzparser.utils.modelcache import enable_model_cache
+from jazzparser.utils.system import set_proc_title
+
+class ParseServer(object):
+    """
+    Accepts parse requests on a socket and hands them over to a pool of
+    worker processes. The tagger, parser and backoff are chosen when the
+    server is started, but their options may be changed by each request.
+    
+    """
+    def __init__(self, grammar=None, tagger=None, parser=None, backoff=None,
+                    topts="", popts="", npopts="", processes=1,
+                    warm_up=None, logger=None):
+        """
+        Option values are given as strings, in the same form as on the
+        command line. Raises a L{ParseServerError} if any of the modules
+        can't be loaded or the options aren't valid.
+        
+        @type warm_up: str
+        @param warm_up: an input (in the same form as a request's C{input})
+            that each worker will parse when it starts, so that it loads
+            all of the models before the first request comes in.
+        
+        """
+        if tagger is None:
+            tagger = settings.DEFAULT_SUPERTAGGER
+        if parser is None:
+            parser = settings.DEFAULT_PARSER
+        try:
+            self.tagger_cls = get_tagger(tagger)
+        except TaggerLoadError:
+            raise ParseServerError, "the tagger '%s' could not be loaded" % \
+                                                                        tagger
+        try:
+            self.parser_cls = get_parser(parser)
+        except ParserLoadError:
+            raise ParseServerError, "the parser '%s' could not be loaded" % \
+                                                                        parser
+        if backoff is not None:
+            try:
+                self.backoff = get_backoff_builder(backoff)
+            except BackoffLoadError:
+                raise ParseServerError, "the backoff model '%s' could not "\
+                                        "be loaded" % backoff
+        else:
+            self.backoff = None
+        self.names = (grammar, tagger, parser, backoff)
+        
+        self.topts = ModuleOption.process_option_string(topts)
+        self.popts = ModuleOption.process_option_string(popts)
+        self.npopts = ModuleOption.process_option_string(npopts)
+        # Check the default options now, so we don't start with bad ones
+        self._check_options(self.topts, self.popts, self.npopts)
+        
+        self.processes = processes
+        self.warm_up = warm_up
+        if logger is None:
+            logger = create_dummy_logger()
+        self.logger = logger
+        self.pool = None
+        
+        # The request id and callback of each job that hasn't finished, 
+        #  by job number
+        self._jobs = {}
+        # The process parsing each job that's been started
+        self._running = {}
+        self._jobs_lock = threading.Lock()
+        self._next_job = 0
+        self._stopped = threading.Event()
+    
+    def _check_options(self, topts, popts, npopts):
+        try:
+            self.tagger_cls.check_options(topts)
+        except ModuleOptionError, err:
+            raise ParseServerError, "problem with tagger options: %s" % err
+        try:
+            self.parser_cls.check_options(popts)
+        except ModuleOptionError, err:
+            raise ParseServerError, "problem with parser options: %s" % err
+        if self.backoff is not None:
+            try:
+                self.backoff.check_options(npopts)
+            except ModuleOptionError, err:
+                raise ParseServerError, "problem with backoff options: %s" \
+                                                                    % err
+    
+    def prepare_job(self, request):
+        """
+        Checks a request and combines its options with the server's.
+        Raises a L{ParseServerError} if the request isn't valid.
+        
+        @type request: dict
+        @param request: decoded request, as described in the module docs
+        @return: the job to pass to a worker's L{_parse_request}
+        
+        """
+        if not isinstance(request, dict):
+            raise ParseServerError, "request should be a JSON object"
+        
+        if 'input' in request:
+            if not isinstance(request['input'], basestring):
+                raise ParseServerError, "input should be a string"
+            input_spec = (None, str(request['input']), None)
+        elif 'file' in request:
+            filetype = request.get('filetype', 'chords')
+            input_type = get_input_type(filetype)
+            if input_type is None:
+                raise ParseServerError, "unknown filetype '%s'" % filetype
+            if is_bulk_type(input_type):
+                raise ParseServerError, "the server only parses single "\
+                    "inputs: use a separate request for each"
+            if not os.path.exists(request['file']):
+                raise ParseServerError, "file %s does not exist" % \
+                                                            request['file']
+            input_spec = (filetype, request['file'],
+                          request.get('file_options', None))
+        else:
+            raise ParseServerError, "request contains no input or file"
+        
+        def _options(defaults, key):
+            opts = defaults.copy()
+            value = request.get(key, None)
+            if isinstance(value, basestring):
+                opts.update(ModuleOption.process_option_string(str(value)))
+            elif isinstance(value, dict):
+                # Treat the values as if they'd come from an option string
+                opts.update(dict((str(k), UnprocessedOptionValue(str(v))) \
+                                            for (k,v) in value.items()))
+            elif value is not None:
+                raise ParseServerError, "%s should be a string or object" % \
+                                                                        key
+            return opts
+        topts = _options(self.topts, 'tagger_options')
+        popts = _options(self.popts, 'parser_options')
+        npopts = _options(self.npopts, 'backoff_options')
+        self._check_options(topts, popts, npopts)
+        
+        topn = request.get('topn', None)
+        if topn is not None and not isinstance(topn, int):
+            raise ParseServerError, "topn should be an integer"
+        return (request.get('id', None), input_spec, topts, popts, npopts,
+                    topn)
+    
+    def start(self):
+        """
+        Starts the worker processes.
+        
+        """
+        # The workers say which jobs they start on this queue. It's written 
+        #  to straight away, so the message isn't lost if the worker dies
+        self._started = SimpleQueue()
+        self._stopped.clear()
+        self.pool = Pool(processes=self.processes,
+                         initializer=_init_worker,
+                         initargs=self.names + (self.warm_up, self._started))
+        monitor = threading.Thread(target=self._monitor_workers)
+        monitor.daemon = True
+        monitor.start()
+    
+    def stop(self):
+        """
+        Stops the worker processes.
+        
+        """
+        self._stopped.set()
+        self.pool.terminate()
+        self.pool.join()
+        self.pool = None
+    
+    def submit(self, job, callback):
+        """
+        Queues a job (from L{prepare_job}) to be parsed by one of the 
+        workers. C{callback} is called with the response when the parse 
+        is finished, or with an error response if the worker parsing it 
+        dies. It's called from another thread.
+        
+        """
+        self._jobs_lock.acquire()
+        try:
+            job_num = self._next_job
+            self._next_job += 1
+            self._jobs[job_num] = (job[0], callback)
+        finally:
+            self._jobs_lock.release()
+        self.pool.apply_async(_run_job, (job_num, job), 
+                    callback=lambda response: self._job_done(job_num, response))
+    
+    def _job_done(self, job_num, response):
+        self._jobs_lock.acquire()
+        try:
+            job = self._jobs.pop(job_num, None)
+            self._running.pop(job_num, None)
+        finally:
+            self._jobs_lock.release()
+        # The job may already have been given up on
+        if job is not None:
+            job[1](response)
+    
+    def _monitor_workers(self):
+        # The pool replaces a worker that dies, but the job it was 
+        #  parsing never finishes. Watch for that and send an error
+        while not self._stopped.wait(0.5):
+            try:
+                started = []
+                while not self._started.empty():
+                    started.append(self._started.get())
+            except (IOError, EOFError):
+                # The queue's been closed
+                return
+            
+            self._jobs_lock.acquire()
+            try:
+                for job_num,pid in started:
+                    if job_num in self._jobs:
+                        self._running[job_num] = pid
+                lost = [(job_num, self._jobs[job_num][0]) for \
+                            (job_num,pid) in self._running.items() \
+                                if not _process_alive(pid)]
+            finally:
+                self._jobs_lock.release()
+            for job_num,request_id in lost:
+                self.logger.error("Worker died while parsing request %s" % \
+                                                            (request_id,))
+                self._job_done(job_num, {
+                    'id' : request_id,
+                    'status' : 'error',
+                    'error' : "the worker process parsing the input died",
+                })
+    
+    def serve(self, socket_path=None, port=None):
+        """
+        Starts the workers, unless L{start} has already been called, and 
+        accepts requests until interrupted. Listens on a Unix socket if 
+        C{socket_path} is given, or otherwise on the given port on 
+        localhost.
+        
+        """
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                # Left over from a previous server
+                os.remove(socket_path)
+            server = _UnixServer(socket_path, _ParseRequestHandler)
+            address = socket_path
+        elif port is not None:
+            server = _TCPServer(("localhost", port), _ParseRequestHandler)
+            address = "localhost:%d" % port
+        else:
+            raise ParseServerError, "the server needs a socket or a port "\
+                                    "to listen on"
+        server.parse_server = self
+        
+        if self.pool is None:
+            self.start()
+        self.logger.info("Parse server listening on %s" % address)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.stop()
+
+class _ParseRequestHandler(SocketServer.StreamRequestHandler):
+    """
+    Handles a single connection to the server, which may send any
+    number of requests.
+    
+    """
+    def setup(self):
+        SocketServer.StreamRequestHandler.setup(self)
+        self._lock = threading.Lock()
+        # Notified when each parse finishes
+        self._finished = threading.Condition(self._lock)
+        self._pending = 0
+    
+    def _send(self, response):
+        line = json.dumps(response) + "\n"
+        self._lock.acquire()
+        try:
+            self.wfile.write(line)
+            self.wfile.flush()
+        except socket.error:
+            # The client's gone away: nothing to do about it
+            pass
+        finally:
+            self._lock.release()
+    
+    def _parse_done(self, response):
+        # Called by the pool when a parse finishes
+        self._send(response)
+        self._finished.acquire()
+        try:
+            self._pending -= 1
+            self._finished.notify_all()
+        finally:
+            self._finished.release()
+    
+    def handle(self):
+        server = self.server.parse_server
+        for line in iter(self.rfile.readline, ""):
+            line = line.strip()
+            if not line:
+                continue
+            request_id = None
+            try:
+                try:
+                    request = json.loads(line)
+                except ValueError, err:
+                    raise ParseServerError, "could not decode request: %s" \
+                                                                        % err
+                if isinstance(request, dict):
+                    request_id = request.get('id', None)
+                job = server.prepare_job(request)
+            except ParseServerError, err:
+                self._send({'id' : request_id, 'status' : 'error',
+                            'error' : str(err)})
+                continue
+            
+            self._finished.acquire()
+            self._pending += 1
+            self._finished.release()
+            self._send({'id' : request_id, 'status' : 'queued'})
+            server.submit(job, self._parse_done)
+        
+        # Don't close the connection until we've sent all the results
+        self._finished.acquire()
+        try:
+            while self._pending > 0:
+                self._finished.wait()
+        finally:
+            self._finished.release()
+
+class _UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+class _TCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+######## Worker processes ########
+# Everything each worker needs, set by _init_worker
+_worker = {}
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+def _init_worker(grammar_name, tagger_name, parser_name, backoff_name,
+                    warm_up, started):
+    set_proc_title("jazzparser-server-worker")
+    _worker['started'] = started
+    # Keep models once we've loaded them
+    enable_model_cache()
+    _worker['grammar'] = get_grammar(grammar_name)
+    _worker['tagger_cls'] = get_tagger(tagger_name)
+    _worker['parser_cls'] = get_parser(parser_name)
+    if backoff_name is not None:
+        _worker['backoff'] = get_backoff_builder(backoff_name)
+    else:
+        _worker['backoff'] = None
+    
+    if warm_up is not None:
+        # Parse the warm-up input once to get everything loaded
+        _parse_request((None, (None, warm_up, None), {}, {}, {}, 0))
+
+def _load_input(input_spec):
+    filetype, data, file_options = input_spec
+    if filetype is None:
+        # Just a chord sequence string
+        return ChordInput.from_string(data)
+    input_type = get_input_type(filetype)
+    options = ModuleOption.process_option_string(file_options or "")
+    options = input_type.process_option_dict(options)
+    return input_type.from_file(data, options)
+
+def _run_job(job_num, job):
+    # Let the server know which process is parsing the job, so it can 
+    #  tell if the process dies
+    _worker['started'].put((job_num, os.getpid()))
+    return _parse_request(job)
+
+def _parse_request(job):
+    """
+    Parses a single input in a worker process. Returns a response ready
+    to be encoded and sent back to the client, even if something goes
+    wrong.
+    
+    """
+    request_id, input_spec, topts, popts, npopts, topn = job
+    timer = ExecutionTimer(clock=True)
+    try:
+        grammar = _worker['grammar']
+        logger = create_dummy_logger()
+        input = _load_input(input_spec)
+        tagger = _worker['tagger_cls'](grammar, input, options=topts,
+                                       logger=logger)
+        parser = _worker['parser_cls'](grammar, tagger, options=popts,
+                                       backoff=_worker['backoff'],
+                                       backoff_options=npopts,
+                                       logger=logger)
+        results = parser.parse()
+        grammar.formalism.clean_results(results)
+        
+        results = [{
+            'probability' : getattr(result, 'probability', None),
+            'category' : str(result.category),
+            'semantics' : str(result.semantics),
+        } for result in results]
+        if topn is not None:
+            results = results[:topn]
+        response = {
+            'id' : request_id,
+            'status' : 'done',
+            'results' : results,
+            'time' : timer.get_time(),
+            'timed_out' : parser.timed_out,
+            'limit_exceeded' : parser.limit_exceeded,
+        }
+        if parser.stats is not None:
+            response['stats'] = parser.stats.to_dict()
+        return response
+    except Exception, err:
+        # Always send something back, or the server will keep waiting 
+        #  for this job
+        return {
+            'id' : request_id,
+            'status' : 'error',
+            'error' : traceback.format_exc(),
+            'time' : timer.get_time(),
+        }
+
+class ParseClient(object):
+    """
+    Sends requests to a running L{ParseServer}.
+    
+    """
+    def __init__(self, socket_path=None, port=None):
+        if socket_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.connect(socket_path)
+        elif port is not None:
+            self.socket = socket.create_connection(("localhost", port))
+        else:
+            raise ParseServerError, "the client needs a socket or a port "\
+                                    "to connect to"
+        self._file = self.socket.makefile('rw')
+        self._next_id = 0
+    
+    def send(self, request):
+        """
+        Sends a request without waiting for the response. Use
+        L{responses} to get the responses.
+        
+        """
+        self._file.write(json.dumps(request) + "\n")
+        self._file.flush()
+    
+    def responses(self):
+        """
+        Iterates over the responses received from the server.
+        
+        """
+        for line in iter(self._file.readline, ""):
+            yield json.loads(line)
+    
+    def parse(self, input=None, **kwargs):
+        """
+        Sends a single request and waits for its results. Any request
+        values other than the input may be given as kwargs.
+        
+        @type input: str
+        @param input: chord sequence to parse. If not given, C{file}
+            should be.
+        @return: the final response for the request, as a dict
+        
+        """
+        request = dict(kwargs)
+        if input is not None:
+            request['input'] = input
+        request['id'] = self._next_id
+        self._next_id += 1
+        self.send(request)
+        for response in self.responses():
+            if response['id'] == request['id'] and \
+                    response['status'] != 'queued':
+                return response
+        raise ParseServerError, "the server closed the connection"
+    
+    def close(self):
+        self._file.close()
+        self.socket.close()
+
+class ParseServerError(Exception):
+    pass
+
+def main():
+    set_proc_title("jazzparser-server")
+    usage = "%prog [options]"
+    description = "Runs a parse server, which keeps the grammar and models "\
+        "loaded and accepts parse requests on a socket. See the docs of "\
+        "jazzparser.server for the protocol"
+    optparser = OptionParser(usage=usage, description=description)
+    optparser.add_option("--socket", dest="socket", action="store", help="Unix socket to listen on")
+    optparser.add_option("--port", dest="port", action="store", type="int", help="port to listen on (on localhost), if not using a Unix socket")
+    optparser.add_option("--processes", dest="processes", action="store", type="int", help="number of worker processes to parse with. Default: 1", default=1)
+    optparser.add_option("-g", "--grammar", dest="grammar", action="store", help="use the named grammar instead of the default.")
+    optparser.add_option("-p", "--parser", dest="parser", action="store", help="use the named parser algorithm instead of the default. Default: %s" % settings.DEFAULT_PARSER, default=settings.DEFAULT_PARSER)
+    optparser.add_option("--popt", "--parser-options", dest="popts", action="append", help="default options for the parser. Requests may override these")
+    optparser.add_option("-t", "--tagger", "--supertagger", dest="supertagger", action="store", help="run the parser using the named supertagger. Default: %s" % settings.DEFAULT_SUPERTAGGER, default=settings.DEFAULT_SUPERTAGGER)
+    optparser.add_option("--topt", "--tagger-options", dest="topts", action="append", help="default options for the tagger. Requests may override these")
+    optparser.add_option("-b", "--backoff", dest="backoff", action="store", help="use the named backoff model as a backoff if the parser produces no results")
+    optparser.add_option("--bopt", "--backoff-options", dest="backoff_opts", action="append", help="default options for the backoff model. Requests may override these")
+    optparser.add_option("--warm-up", dest="warm_up", action="store", help="chord sequence for each worker to parse when it starts, so that all the models are loaded before the first request")
+    options, arguments = optparser.parse_args()
+    
+    if options.socket is None and options.port is None:
+        print >>sys.stderr, "Specify a socket or a port to listen on"
+        sys.exit(1)
+    
+    logger = create_plain_stderr_logger()
+    try:
+        server = ParseServer(grammar=options.grammar,
+                    tagger=options.supertagger,
+                    parser=options.parser,
+                    backoff=options.backoff,
+                    topts=":".join(options.topts or []),
+                    popts=":".join(options.popts or []),
+                    npopts=":".join(options.backoff_opts or []),
+                    processes=options.processes,
+                    warm_up=options.warm_up,
+                    logger=logger)
+    except ParseServerError, err:
+        print >>sys.stderr, "Could not start the server: %s" % err
+        sys.exit(1)
+    
+    server.start()
+    # Shut down cleanly when we're killed. This is done after starting the 
+    #  workers, so they don't inherit it
+    def _terminate(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, _terminate)
+    try:
+        server.serve(socket_path=options.socket, port=options.port)
+    except KeyboardInterrupt:
+        print >>sys.stderr, "Stopping server"
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
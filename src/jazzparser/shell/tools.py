@@ -72,13 +72,20 @@ class DerivationTraceTool(Tool):
     """
     name = "Derivation Trace"
     commands = ['deriv', 'd']
-    usage = ('deriv <res>', 'show derivation of numbered result.')
+    usage = ('deriv <res> [<k>]', 'show derivation of numbered result.')
     help = """
 Shows a full derivation trace for a specific result.
 This includes all possible derivations of the sign. In order to use this,
 the parser must have been run with the -d option, so that it stored 
 the traces during parsing.
 Specify the result by its enumeration in the result list.
+
+Sub-derivations that are shared between derivations are only shown 
+once: each sign in the trace is numbered and rule applications refer 
+to the signs they were applied to by their numbers.
+
+If k is given, instead shows the first k derivations, each as a 
+separate tree.
 """
     
     def run(self, args, state):
@@ -93,8 +100,15 @@ Specify the result by its enumeration in the result list.
             if results[result_num].derivation_trace is None:
                 raise ShellError, "Derivation traces have not been stored. Run parser with -d flag to create them"
             else:
+                trace = results[result_num].derivation_trace
                 print "Derivation trace for result %d: %s" % (result_num,results[result_num])
-                print "\n%s" % results[result_num].derivation_trace
+                print "%d derivations" % trace.get_num_derivations()
+                if len(args) > 1:
+                    for i,(score,derivation) in enumerate(
+                                    trace.get_k_best(int(args[1]))):
+                        print "\nDerivation %d:\n%s" % (i, derivation)
+                else:
+                    print "\n%s" % trace.str_packed()
         else:
             raise ShellError, "There are only %d results" % len(results)
 
@@ -127,6 +141,14 @@ interactively.
             else:
                 print "Derivation trace for result %d: %s" % (result_num,results[result_num])
                 top_trace = results[result_num].derivation_trace
+                # Count the derivations of everything in the trace once
+                counts = top_trace.count_derivations()
+                def _count(traces):
+                    product = 1
+                    for t in traces:
+                        product *= counts.get(id(t), 0)
+                    return product
+                
                 root_traces = [top_trace]
                 while True:
                     print
@@ -136,9 +158,10 @@ interactively.
                         print " lexical category for %s" % trace.word
                         root_traces.pop()
                     else:
-                        print " derived from:"
+                        print " derived from (%d derivations):" % \
+                                                counts.get(id(trace), 0)
                         for i,(rule,traces) in enumerate(trace.rules):
-                            print "%d  %s ->\t %s" % (i,rule.name,"\t ".join([str(t.result) for t in traces]))
+                            print "%d  %s ->\t %s\t(%d)" % (i,rule.name,"\t ".join([str(t.result) for t in traces]),_count(traces))
                         cmd = raw_input("Expand number (up: .., stop: q): ")
                         if cmd == "q":
                             return
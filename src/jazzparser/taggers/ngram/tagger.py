@@ -29,6 +29,7 @@ which use NLTK's probability handling classes.
 """
 import cPickle as pickle
 import random
+import numpy
 from jazzparser.taggers.models import ModelTagger, ModelLoadError, \
                 TaggerModel, TaggingModelError, ModelSaveError
 from jazzparser.taggers import process_chord_input
@@ -296,7 +297,10 @@ class NgramTagger(ModelTagger):
         process_chord_input(self)
         
         #### Tag the input sequence ####
-        self._tagged_data = []
+        # Signs are only instantiated when a batch containing them is 
+        #  requested: the parser rarely needs more than the first few
+        self._tag_probs = []
+        self._signs = []
         self._batch_ranges = []
         # Group the input into pairs to get observations
         inpairs = group_pairs(self.input, none_final=True)
@@ -315,31 +319,31 @@ class NgramTagger(ModelTagger):
         word_tag_probs = []
         
         for index,probs in enumerate(probabilities):
-            features = {
-                'duration' : self.durations[index],
-                'time' : self.times[index],
-            }
-            word_signs = []
-            # Now assign a probability to each tag, given the observation
-            for tag in self.model.tags:
-                # Read a full sign out of the grammar
-                sign = self.grammar.get_sign_for_word_by_tag(self.input[index], tag, extra_features=features)
-                if sign is not None:
-                    # Read off the probability from the matrix
-                    probability = probs[tag]
-                    word_signs.append((sign, tag, probability))
+            # Only consider tags that the grammar can assign to this word
+            word_tags = self.grammar.get_tags_for_word(self.input[index], 
+                                                       tags=self.model.tags)
+            tags = [tag for tag in self.model.tags if tag in word_tags]
+            # Read off the probabilities from the matrix
+            tag_probs = numpy.array([probs[tag] for tag in tags], 
+                                                        dtype=numpy.float64)
+            
+            # Randomly order the tags first to make sure equal 
+            #  probabilities are randomly ordered
+            order = range(len(tags))
+            random.shuffle(order)
+            order = numpy.array(order, dtype=int)
+            # Now sort by probability: the stable sort keeps the random 
+            #  order of ties
+            order = order[numpy.argsort(-tag_probs[order], kind='mergesort')]
             
-            # Randomly sort the list first to make sure equal probabilities are randomly ordered
-            word_signs = [(sign, tag, prob) for sign,tag,prob in word_signs]
-            random.shuffle(word_signs)
-            # Now sort by probability
-            word_signs = list(reversed(sorted(word_signs, key=lambda x:x[2])))
-            self._tagged_data.append(word_signs)
+            sorted_probs = tag_probs[order].tolist()
+            self._tag_probs.append(zip([tags[i] for i in order], sorted_probs))
+            self._signs.append([])
             
             # Store the list of probabilities for tags, which we'll use 
             #  after we've tagged every word to work out the sizes
             #  of the tag batches
-            word_tag_probs.append([p for __,__,p in word_signs])
+            word_tag_probs.append(sorted_probs)
         
         if self.options['best']:
             # Only return one for each word
@@ -355,6 +359,27 @@ class NgramTagger(ModelTagger):
             self._batch_ranges = [[(sum(batches[:i]),sum(batches[:i+1])) for i in range(len(batches))] \
                                     for batches in batch_sizes]
 
+    def _get_word_signs(self, index, start, end):
+        """
+        Gets the (sign,tag,probability) triples for the tags between 
+        C{start} and C{end} in the ordered list of tags for the 
+        C{index}th word, instantiating any signs that haven't been 
+        needed before.
+        
+        """
+        signs = self._signs[index]
+        if len(signs) < end:
+            features = {
+                'duration' : self.durations[index],
+                'time' : self.times[index],
+            }
+            for tag,prob in self._tag_probs[index][len(signs):end]:
+                # Read a full sign out of the grammar
+                sign = self.grammar.get_sign_for_word_by_tag(
+                                self.input[index], tag, extra_features=features)
+                signs.append((sign, tag, prob))
+        return [triple for triple in signs[start:end] if triple[0] is not None]
+    
     def get_signs(self, offset=0):
         all_signs = []
         for start_node in range(len(self.input)):
@@ -364,7 +389,7 @@ class NgramTagger(ModelTagger):
                 # No more batches left for this word
                 continue
             start,end = ranges[offset]
-            signs = self._tagged_data[start_node][start:end]
+            signs = self._get_word_signs(start_node, start, end)
             # Add each sign to the output list along with its node values
             for sign in signs:
                 all_signs.append((start_node, start_node+1, sign))
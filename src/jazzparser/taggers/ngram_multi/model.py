@@ -127,6 +127,7 @@ class MultiChordNgramModel(NgramModel):
         self._schema_transition_matrix_cache = None
         self._schema_transition_matrix_transpose_cache = None
         self._root_transition_matrix_cache = None
+        self._state_index_map_cache = None
         return NgramModel.clear_cache(self)
         
     def add_history(self, string):
@@ -411,12 +412,69 @@ class MultiChordNgramModel(NgramModel):
             self._root_transition_matrix_cache = trans
         return self._root_transition_matrix_cache
         
+    def get_state_index_map(self):
+        """
+        Index arrays that map the factored (root, schema, ...) layout of 
+        the forward and backward matrices onto the flat layout of the 
+        superclass, where each dimension after time is indexed by a 
+        state in C{label_dom}. Only the root of the most recent state is 
+        stored in the factored layout, so the roots of earlier states 
+        are ignored.
+        
+        A factored matrix C{mat} can be converted using a single gather:
+        C{mat[(slice(None),)+model.get_state_index_map()]}.
+        
+        @rtype: tuple of Numpy arrays
+        @return: (root indices, schema indices, previous schema indices, 
+            ...), each with the shape of the flat layout minus the time 
+            dimension
+        
+        """
+        if self._state_index_map_cache is None:
+            S = len(self.schemata)
+            state_roots = numpy.array(
+                            [root for (root,schema) in self.label_dom])
+            state_schemata = numpy.array(
+                            [self.schemata.index(schema) \
+                                for (root,schema) in self.label_dom])
+            
+            # Unigram matrices still have a schema dimension for the 
+            #  current state
+            dims = max(self.order - 1, 1)
+            index_map = []
+            # Root of the most recent state
+            shape = [1]*dims
+            shape[0] = self.num_labels
+            index_map.append(state_roots.reshape(shape))
+            # Schema of each state in the n-gram
+            for dim in range(dims):
+                shape = [1]*dims
+                shape[dim] = self.num_labels
+                index_map.append(state_schemata.reshape(shape))
+            # Broadcast all the arrays to the full shape
+            self._state_index_map_cache = tuple(numpy.broadcast_arrays(*index_map))
+        return self._state_index_map_cache
+    
+    def factored_to_states(self, matrix):
+        """
+        Converts a matrix in the factored layout returned by the 
+        C{root_schema=True} versions of the forward and backward 
+        computations to the flat layout of the superclass.
+        
+        @see: L{get_state_index_map}
+        
+        """
+        return matrix[(slice(None),)+self.get_state_index_map()]
+        
     def get_schema_emission_matrix(self, sequence):
         """
         Emission matrix for states decomposed into schema and root. 
         Matrix has dimensions (time, root, schema).
         
         """
+        if isinstance(sequence, LatticeEmissions):
+            return self._get_lattice_schema_emission_matrix(sequence)
+        
         T = len(sequence)
         S = len(self.schemata)
         ems = numpy.zeros((T, 12, S), numpy.float64)
@@ -428,6 +486,30 @@ class MultiChordNgramModel(NgramModel):
                     ems[t,root,i] = self.emission_probability(emission, (root,schema))
         return ems
     
+    def _get_lattice_schema_emission_matrix(self, lattice):
+        """
+        Emission matrix for a lattice of emissions, computed from the 
+        lattice's probability matrix, instead of summing over the 
+        emissions in every timestep for every state.
+        
+        """
+        S = len(self.schemata)
+        # Probability of each of the lattice's labels given each schema
+        roots = numpy.array([root for (root,label) in lattice.emissions])
+        label_probs = numpy.array(
+            [[self.emission_probability(emission, (emission[0],schema)) \
+                    for schema in self.schemata] \
+                for emission in lattice.emissions], numpy.float64).reshape(-1, S)
+        
+        ems = numpy.zeros((len(lattice), 12, S), numpy.float64)
+        # A label's probability is 0 for states with a different root
+        for root in range(12):
+            columns = roots == root
+            if numpy.any(columns):
+                ems[:,root,:] = numpy.dot(lattice.probabilities[:,columns], 
+                                          label_probs[columns])
+        return ems
+    
     def normal_forward_probabilities(self, sequence, root_schema=False):
         """
         @see: jazzparser.utils.nltk.ngram.model.NgramModel.normal_forward_probabilities
@@ -440,7 +522,6 @@ class MultiChordNgramModel(NgramModel):
         
         """
         N = len(sequence)
-        states = self.label_dom
         schemata = self.schemata
         
         # Prepare the transition and emission matrices
@@ -533,18 +614,7 @@ class MultiChordNgramModel(NgramModel):
             
         if not root_schema:
             # Convert to a state matrix
-            new_forward_matrix = numpy.zeros([N,len(states)]*(self.order-1), numpy.float64)
-            indices = _all_indices(self.order-1, len(states))
-            for time in range(N):
-                for state_indices in indices:
-                    # Get the index into the new-style matrix
-                    schema_indices = [self.schemata.index(self.label_dom[i][1]) \
-                                                        for i in state_indices]
-                    root = self.label_dom[state_indices[0]][0]
-                    selector = tuple([time,root]+schema_indices)
-                    # Set the value in the matrix we're creating
-                    new_forward_matrix[tuple([time]+state_indices)] = forward_matrix[selector]
-            return new_forward_matrix
+            return self.factored_to_states(forward_matrix)
         return forward_matrix
     
     def normal_backward_probabilities(self, sequence, root_schema=False):
@@ -557,7 +627,6 @@ class MultiChordNgramModel(NgramModel):
         
         """
         N = len(sequence)
-        states = self.label_dom
         schemata = self.schemata
         S = len(schemata)
         
@@ -681,22 +750,11 @@ class MultiChordNgramModel(NgramModel):
         
         if not root_schema:
             # Convert to a state matrix
-            new_backward_matrix = numpy.zeros([N,len(states)]*(self.order-1), numpy.float64)
-            indices = _all_indices(self.order-1, len(states))
-            for time in range(N):
-                for state_indices in indices:
-                    # Get the index into the new-style matrix
-                    schema_indices = [self.schemata.index(self.label_dom[i][1]) \
-                                                        for i in state_indices]
-                    root = self.label_dom[state_indices[0]][0]
-                    selector = tuple([time,root]+schema_indices)
-                    # Set the value in the matrix we're creating
-                    new_backward_matrix[tuple([time]+state_indices)] = reordered_backward_matrix[selector]
-            return new_backward_matrix
+            return self.factored_to_states(reordered_backward_matrix)
         return reordered_backward_matrix
         
     def gamma_probabilities(self, sequence, dictionary=False,
-            forward=None, backward=None):
+            forward=None, backward=None, root_schema=False):
         """
         State-occupation probabilities.
         
@@ -707,6 +765,9 @@ class MultiChordNgramModel(NgramModel):
         @type dictionary: bool
         @param dictionary: return a list of label dictionaries instead 
             of a numpy matrix
+        @type root_schema: bool
+        @param root_schema: return a matrix with dimensions (time, root, 
+            schema), instead of (time, state)
         
         """
         # Don't use normal_forward_backward_probabilities: just get the 
@@ -721,8 +782,7 @@ class MultiChordNgramModel(NgramModel):
         
         (T,R,S) = gamma.shape
         # Renormalize
-        for t in range(T):
-            gamma[t] /= numpy.sum(gamma[t])
+        gamma /= numpy.sum(numpy.sum(gamma, axis=2), axis=1)[:,numpy.newaxis,numpy.newaxis]
             
         if dictionary:
             # Convert to a list of dictionaries, keyed by label
@@ -734,6 +794,8 @@ class MultiChordNgramModel(NgramModel):
                         dic[(r,schema)] = gamma[t,r,s]
                 dict_gamma.append(dic)
             return dict_gamma
+        elif root_schema:
+            return gamma
         else:
             # Convert to a matrix of state probabilities
             new_gamma = numpy.copy(gamma.reshape(T,R*S))
@@ -797,9 +859,19 @@ def lattice_to_emissions(lattice, chord_map=None):
     Gets an emission sequence in an appropriate format for the ngram-multi 
     HMM model from a chord lattice.
     
+    If the lattice is a L{jazzparser.data.input.WeightedChordLabelInput}, 
+    this gives a L{LatticeEmissions}, which L{MultiChordNgramModel} can 
+    use without going through each timestep's emissions. Otherwise, the 
+    lattice should be a list of timesteps, as given to 
+    C{WeightedChordLabelInput}.
+    
     @see: L{jazzparser.data.input.WeightedChordLabelInput}
     
     """
+    from jazzparser.data.input import WeightedChordLabelInput
+    if isinstance(lattice, WeightedChordLabelInput):
+        return LatticeEmissions(lattice, chord_map=chord_map)
+    
     emissions = []
     
     if chord_map is None:
@@ -815,3 +887,44 @@ def lattice_to_emissions(lattice, chord_map=None):
         
         emissions.append(time_emissions)
     return emissions
+
+class LatticeEmissions(object):
+    """
+    Emission sequence for a lattice of chord labels, backed by the 
+    lattice's probability matrix. 
+    
+    Each timestep is a distribution over emissions, as described for 
+    L{MultiChordNgramModel.emission_log_probability}. Indexing or 
+    iterating over the sequence gives a list of (prob,emission) pairs for 
+    each timestep, so it can be used by models that take a list. 
+    L{MultiChordNgramModel} uses the matrix directly to compute its 
+    emission matrix.
+    
+    """
+    def __init__(self, lattice, chord_map=None):
+        if chord_map is None:
+            _map_chord = lambda c:c
+        else:
+            _map_chord = lambda c: chord_map[c]
+        
+        self.probabilities = lattice.probabilities
+        # The emission corresponding to each column of the matrix
+        self.emissions = [(label.root, _map_chord(label.label)) \
+                                for label in lattice.labels]
+    
+    def __len__(self):
+        return self.probabilities.shape[0]
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # Like a list, give a list of the timesteps
+            return [self[t] for t in range(*index.indices(len(self)))]
+        elif not isinstance(index, (int, long, numpy.integer)):
+            raise TypeError, "emission sequence indices must be integers "\
+                "or slices, not %s" % type(index).__name__
+        probs = self.probabilities[index]
+        return [(probs[i], self.emissions[i]) for i in numpy.nonzero(probs)[0]]
+    
+    def __iter__(self):
+        for t in range(len(self)):
+            yield self[t]
@@ -42,6 +42,7 @@ __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 import cPickle as pickle
 from cStringIO import StringIO
 from operator import mul
+import numpy
 
 from jazzparser.taggers.models import ModelTagger, ModelLoadError, \
                             TaggerModel, TaggingModelError, ModelSaveError
@@ -180,32 +181,61 @@ Training sequences: %(seqs)d\
     #################### Decoding ######################
     # Decoding is mostly done by the superclass: we just provide some 
     #  handy interfaces here
+    def state_probability_matrix(self, observations, forward_only=False):
+        """
+        Computes the probability of each state at each timestep, keeping 
+        the factored layout used internally by the model, so we don't 
+        need to convert to the flat state layout.
+        
+        @type forward_only: bool
+        @param forward_only: use only the forward algorithm, instead of 
+            forward-backward
+        @rtype: Numpy array
+        @return: matrix with dimensions (time, root, schema), where the 
+            schema dimension corresponds to C{model.schemata}
+        
+        """
+        if forward_only:
+            matrix = self.model.normal_forward_probabilities(observations, 
+                                                            root_schema=True)
+            # Sum over the earlier schemata in the ngram
+            for i in range(matrix.ndim-3):
+                matrix = numpy.sum(matrix, axis=-1)
+            return matrix
+        else:
+            # Get the state occupation probabilities
+            return self.model.gamma_probabilities(observations, 
+                                                            root_schema=True)
+    
+    def _matrix_to_dicts(self, matrix):
+        # Make a (time, root, schema) matrix into a list of dictionaries
+        #  indexed by the state labels
+        dicts = []
+        for t in range(matrix.shape[0]):
+            state_probs = {}
+            for root in range(12):
+                for s,schema in enumerate(self.model.schemata):
+                    state_probs[(root,schema)] = matrix[t, root, s]
+            dicts.append(state_probs)
+        return dicts
+    
     def forward_backward_probabilities(self, observations):
         """
         Returns a list of timesteps, each consisting of a dictionary mapping 
         states to their occupation probability in that timestep.
         
         """
-        matrix = []
-        # Get the state occupation probabilities
-        gamma = self.model.compute_gamma(observations)
-        
-        T,N = gamma.shape
-        # Make these into a matrix indexed by the state labels
-        for t in range(T):
-            state_probs = {}
-            for s,state in enumerate(self.model.label_dom):
-                state_probs[state] = gamma[t, s]
-            matrix.append(state_probs)
-        return matrix
+        return self._matrix_to_dicts(
+                        self.state_probability_matrix(observations))
         
     def forward_probabilities(self, observations):
         """
         Like L{forward_backward_probabilities}, but only uses forward algorithm.
         
         """
-        # This is easy, since the hmm already provides the right form of matrix
-        return self.model.normal_forward_probabilities(observations)
+        return self._matrix_to_dicts(
+                        self.state_probability_matrix(observations, 
+                                                      forward_only=True))
     
     ############ Parameter output ###########
     def _get_readable_parameters(self):
@@ -298,18 +328,21 @@ class MultiChordNgramTagger(ModelTagger):
             observations = lattice_to_emissions(input, chord_map=chord_map)
             
         # Use the ngram model to get tag probabilities for each input by 
-        # computing the forward probability matrix
-        if self.options['decode'] == "forward":
-            probabilities = self.model.forward_probabilities(observations)
-        else:
-            probabilities = self.model.forward_backward_probabilities(observations)
+        # computing the forward(-backward) probability matrix
+        matrix = self.model.state_probability_matrix(observations, 
+                        forward_only=(self.options['decode'] == "forward"))
+        schemata = self.model.model.schemata
+        T,R,S = matrix.shape
+        matrix = matrix.reshape(T, R*S)
         
         # Filter out zero probability states and order by desc prob
-        probabilities = [
-            reversed(sorted(\
-                [(state,prob) for (state,prob) in timestep.items() if prob > 0.0], \
-                    key=lambda x:x[1])) \
-                for timestep in probabilities]
+        probabilities = []
+        for t in range(T):
+            order = numpy.argsort(-matrix[t], kind='mergesort')
+            order = order[matrix[t,order] > 0.0]
+            probabilities.append(
+                [((int(index // S), schemata[index % S]), matrix[t,index]) \
+                            for index in order])
         
         for index,probs in enumerate(probabilities):
             features = {
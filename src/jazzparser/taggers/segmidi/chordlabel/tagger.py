@@ -25,6 +25,8 @@
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
+import numpy
+
 from jazzparser.taggers.tagger import Tagger
 from jazzparser.taggers.ngram_multi.tagger import MultiChordNgramTagger
 from jazzparser.taggers.fail.tagger import FailTagger
@@ -139,7 +141,24 @@ class ChordLabelNgramTagger(Tagger):
         else:
             self.tagger = MultiChordNgramTagger(grammar, lattice, options, 
                                                  logger=logger, *args, **kwargs)
-            self._lex_prob_cache = [{} for i in range(self.input_length)]
+            self._prepare_lattice_emissions()
+    
+    def _prepare_lattice_emissions(self):
+        """
+        Gets the labeling model's emission probability for each of 
+        the lattice's labels at every timestep, leaving 0 where the 
+        label isn't in the lattice, ready for computing lexical 
+        probabilities.
+        
+        """
+        # All keys have the same em prob, so we don't worry about that
+        roots = numpy.array([chord.root for chord in self.lattice.labels], int)
+        chord_types = numpy.array([self.labeler.chord_types.index(
+                        chord.model_label) for chord in self.lattice.labels], 
+                                  int)
+        self._lattice_emissions = numpy.where(self.lattice.probabilities > 0.0, 
+                self.labeler_emission_matrix[:, roots, chord_types], 0.0)
+        self._tagger_em_cache = {}
     
     def get_signs(self, offset=0):
         return self.tagger.get_signs(offset=offset)
@@ -158,31 +177,28 @@ class ChordLabelNgramTagger(Tagger):
         
         """
         # Take product of emission probabilities for time steps in this range
-        prob = 1.0
-        for time in range(start_time, end_time):
-            prob *= self.single_step_lexical_probability(time, span_label)
-        return prob
+        return float(numpy.prod(numpy.dot(
+                            self._lattice_emissions[start_time:end_time], 
+                            self._tagger_emission_probabilities(span_label))))
     
     def single_step_lexical_probability(self, time, span_label):
-        if span_label not in self._lex_prob_cache[time]:
-            # Compute the lexical probability for this single time step
-            # Consider each of the chord labels in the lattice at this time
-            chord_probs = []
-            for (chord,prob) in self.lattice[time]:
-                # Get the emission probabilities for this chord form the 
-                #  chord labeling model
-                chord_label = self.labeler.chord_types.index(chord.model_label)
-                # All keys have the same em prob, so we don't worry about that
-                chord_em_prob = self.labeler_emission_matrix[time, chord.root, chord_label]
-                # Get the probability of generating this chord label from 
-                #  the supertagger's distributions
-                tagger_label = self.tagger.model.chordmap[chord.label]
-                tagger_em_prob = self.tagger.model.model.emission_probability(
-                                        (chord.root,tagger_label), span_label)
-                # Multiply these probabilities to get the probability of the 
-                #  chord label and emission given the tag
-                chord_probs.append(chord_em_prob * tagger_em_prob)
-            # Sum over the chords in the lattice to get the probabilitiy of 
-            #  the emission given the tag
-            self._lex_prob_cache[time][span_label] = sum(chord_probs, 0.0)
-        return self._lex_prob_cache[time][span_label]
+        # Sum over the chords in the lattice at this time to get the 
+        #  probability of the emission given the tag
+        return float(numpy.dot(self._lattice_emissions[time], 
+                               self._tagger_emission_probabilities(span_label)))
+    
+    def _tagger_emission_probabilities(self, span_label):
+        """
+        Probability of generating each of the lattice's chord labels 
+        from the supertagger's distributions, given the tag. Multiplied 
+        by the chord labeling model's emission probabilities, this gives 
+        the probability of the chord label and emission given the tag.
+        
+        """
+        if span_label not in self._tagger_em_cache:
+            model = self.tagger.model
+            self._tagger_em_cache[span_label] = numpy.array([
+                model.model.emission_probability(
+                        (chord.root, model.chordmap[chord.label]), span_label) \
+                    for chord in self.lattice.labels], numpy.float64)
+        return self._tagger_em_cache[span_label]
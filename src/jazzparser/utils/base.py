@@ -224,5 +224,82 @@ class ExecutionTimer(object):
         else:
             return time.time() - self.start_time
 
+def process_memory():
+    """
+    Returns the amount of memory currently used by this process (its 
+    resident set size) in bytes. This is read from C{/proc}, so is only 
+    available on Linux. Elsewhere, we fall back to the peak memory use 
+    reported by C{getrusage}, which will overestimate the current use if 
+    the process has freed memory. Returns None if neither is available.
+    
+    """
+    import os
+    try:
+        statm = open("/proc/self/statm", 'r')
+        try:
+            pages = int(statm.read().split()[1])
+        finally:
+            statm.close()
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # OS X reports this in bytes, everything else in kilobytes
+        return peak
+    else:
+        return peak * 1024
+
+_slot_names = {}
+
+def slot_names(cls):
+    """
+    Returns the names of all the slots declared by a class and its
+    superclasses (not including C{__dict__} and C{__weakref__}).
+    
+    """
+    if cls not in _slot_names:
+        names = []
+        for base in reversed(cls.__mro__):
+            slots = base.__dict__.get('__slots__', ())
+            if isinstance(slots, basestring):
+                slots = [slots]
+            names.extend(name for name in slots if name not in \
+                                    ('__dict__', '__weakref__') and \
+                                    name not in names)
+        _slot_names[cls] = tuple(names)
+    return _slot_names[cls]
+
+class SlotPickleMixin(object):
+    """
+    Lets classes that use C{__slots__} be pickled (with any protocol)
+    and copied like classes with an instance dictionary.
+    
+    The state is a dict of the attributes that have been set, so
+    objects pickled before their class used slots can still be
+    loaded. Attributes in an old state that the class no longer
+    has a place for are dropped.
+    
+    """
+    __slots__ = ()
+    
+    def __getstate__(self):
+        state = dict((name, getattr(self, name)) for name in \
+                        slot_names(type(self)) if hasattr(self, name))
+        # Subclasses that don't use slots also have a dict
+        state.update(getattr(self, '__dict__', {}))
+        return state
+    
+    def __setstate__(self, state):
+        for name,value in state.items():
+            try:
+                setattr(self, name, value)
+            except AttributeError:
+                pass
+
 class OptionalImportError(Exception):
     pass
@@ -1,5 +1,14 @@
 """Algorithms for commonly-used distance metrics.
 
+The edit distance functions fill their tables one anti-diagonal at a 
+time: every cell on an anti-diagonal depends only on the two previous 
+ones, so each diagonal can be computed with array operations.
+
+Substitution costs may be given as a function, which is called for every 
+pair of elements, or as a precomputed matrix (C{subst_costs}). If you're 
+computing the costs in bulk using array operations, the latter will be 
+much faster.
+
 """
 """
 ============================== License ========================================
@@ -25,7 +34,116 @@
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
-def levenshtein_distance(seq1, seq2, delins_cost=1, subst_cost_fun=None):
+import numpy
+
+def subst_cost_matrix(seq1, seq2, subst_cost_fun=None, delins_cost=1):
+    """
+    Builds the matrix of substitution costs for every pair of elements 
+    from the two sequences by calling the substitution cost function. 
+    If no function is given, the default used by the distance functions 
+    is used: a cost of 0 for equal elements and C{delins_cost} otherwise.
+    
+    This is used when the distance functions are given a cost function 
+    instead of a matrix. If you can, it's better to build the matrix 
+    directly using array operations.
+    
+    @rtype: 2D numpy array
+    
+    """
+    if subst_cost_fun is None:
+        subst_cost_fun = lambda x,y: 0 if x==y else delins_cost
+    costs = numpy.array([[subst_cost_fun(x, y) for y in seq2] for x in seq1])
+    return costs.reshape((len(seq1), len(seq2)))
+
+def _get_subst_costs(seq1, seq2, delins_cost, subst_cost_fun, subst_costs):
+    """
+    Gets hold of a substitution cost matrix for the pairs of elements in 
+    the sequences, computing it if it wasn't given.
+    
+    """
+    if subst_costs is None:
+        subst_costs = subst_cost_matrix(seq1, seq2, 
+                                        subst_cost_fun=subst_cost_fun, 
+                                        delins_cost=delins_cost)
+    else:
+        subst_costs = numpy.asarray(subst_costs)
+        if subst_costs.shape != (len(seq1), len(seq2)):
+            raise ValueError, "substitution cost matrix should have shape "\
+                "%s, got %s" % ((len(seq1), len(seq2)), subst_costs.shape)
+    return subst_costs
+
+def _fill_table(subst_costs, delins_cost, first_column, first_row, 
+                    pointers=False):
+    """
+    Fills the Levenshtein distance table for the given substitution costs 
+    by anti-diagonals.
+    
+    The table is stored in a flat array, so that each anti-diagonal is a 
+    strided slice: a step of one row and one column back is a step of 
+    M, where M+1 is the number of columns. The cells above, to the left and 
+    diagonally above a range of cells are then just offset slices.
+    
+    @type first_column: array
+    @param first_column: values to initialize the first column of the table 
+        with (the costs of deletions at the start)
+    @type first_row: array
+    @param first_row: values to initialize the first row of the table 
+        with (the costs of insertions at the start)
+    @type pointers: bool
+    @param pointers: if True, also fills a table of pointers to indicate 
+        which operation gave the best cost for each cell: 0 for deletion, 
+        1 for insertion, 2 for substitution. Ties are resolved in that order.
+    @return: the cost table, or (costs,pointers) if C{pointers=True}
+    
+    """
+    N,M = subst_costs.shape
+    width = M+1
+    dtype = numpy.result_type(subst_costs.dtype, 
+                              numpy.asarray(delins_cost).dtype)
+    dist = numpy.zeros((N+1, M+1), dtype=dtype)
+    dist[:,0] = first_column
+    dist[0,:] = first_row
+    # Pad the substitution costs so they have the same indices as the table
+    subst = numpy.zeros((N+1, M+1), dtype=subst_costs.dtype)
+    subst[1:,1:] = subst_costs
+    
+    flat_dist = dist.reshape(-1)
+    flat_subst = subst.reshape(-1)
+    if pointers:
+        ptrs = numpy.zeros((N+1, M+1), dtype=numpy.int8)
+        flat_ptrs = ptrs.reshape(-1)
+    
+    for diag in range(2, N+M+1):
+        # Range of rows that this diagonal covers, excluding the first row 
+        #  and column
+        i0 = max(1, diag-M)
+        i1 = min(N, diag-1)
+        start = i0*width + (diag-i0)
+        stop = i1*width + (diag-i1) + 1
+        cells = slice(start, stop, M)
+        
+        deletion = flat_dist[start-width:stop-width:M] + delins_cost
+        insertion = flat_dist[start-1:stop-1:M] + delins_cost
+        substitution = flat_dist[start-width-1:stop-width-1:M] + \
+                            flat_subst[cells]
+        
+        best = numpy.minimum(deletion, numpy.minimum(insertion, substitution))
+        flat_dist[cells] = best
+        if pointers:
+            # Take the first option that gives the best cost
+            flat_ptrs[cells] = numpy.where(deletion == best, 0, 
+                                    numpy.where(insertion == best, 1, 2))
+    
+    if pointers:
+        return dist, ptrs
+    else:
+        return dist
+
+# Pointer names used in the tables returned by the functions below
+_POINTER_NAMES = numpy.array(['D', 'I', 'S', '.'])
+
+def levenshtein_distance(seq1, seq2, delins_cost=1, subst_cost_fun=None, 
+                            subst_costs=None):
     """
     Compute the Levenshtein distance between two sequences.
     By default, will compare the elements using the == operator, but 
@@ -37,37 +155,28 @@ def levenshtein_distance(seq1, seq2, delins_cost=1, subst_cost_fun=None):
     the first argument with the second. If not given, a cost of delins 
     is used for any substitution.
     
+    @type subst_costs: 2D array
+    @param subst_costs: matrix of substitution costs for every pair of 
+        elements of seq1 (rows) and seq2 (columns). If given, 
+        C{subst_cost_fun} is ignored.
+    
     """
-    if subst_cost_fun is None:
-        subst_cost_fun = lambda x,y: 0 if x==y else delins_cost
-        
     # Simple cases: empty sequences
     if len(seq1) == 0:
         return len(seq2) * delins_cost
     elif len(seq2) == 0:
         return len(seq1) * delins_cost
     
-    # Create a table with m+1 rows and n+1 columns
-    dist = []
-    for i in range(len(seq1)+1):
-        dist.append([None] * (len(seq2)+1))
-    
-    for i in range(len(seq1)+1):
-        dist[i][0] = i*delins_cost      # deletion
-    for j in range(len(seq2)+1):
-        dist[0][j] = j*delins_cost      # insertion
-    
-    for j in range(1, len(seq2)+1):
-        for i in range(1, len(seq1)+1):
-            dist[i][j] = min(
-                            dist[i-1][j] + delins_cost,  # deletion
-                            dist[i][j-1] + delins_cost,  # insertion
-                            dist[i-1][j-1] + subst_cost_fun(seq1[i-1], seq2[j-1])    # substitution
-                            )
-    
-    return dist[-1][-1]
+    subst_costs = _get_subst_costs(seq1, seq2, delins_cost, subst_cost_fun, 
+                                    subst_costs)
+    N,M = subst_costs.shape
+    dist = _fill_table(subst_costs, delins_cost, 
+                       numpy.arange(N+1) * delins_cost,     # deletion
+                       numpy.arange(M+1) * delins_cost)     # insertion
+    return dist[-1,-1].item()
 
-def levenshtein_distance_with_pointers(seq1, seq2, delins_cost=1, subst_cost_fun=None):
+def levenshtein_distance_with_pointers(seq1, seq2, delins_cost=1, 
+                                subst_cost_fun=None, subst_costs=None):
     """
     Compute the Levenshtein distance between two sequences.
     This does the same thing as levenshtein_distance, but stores 
@@ -78,40 +187,26 @@ def levenshtein_distance_with_pointers(seq1, seq2, delins_cost=1, subst_cost_fun
     C{seq1} moves on a cell without a corresponding cell in C{seq2}.
     
     """
-    if subst_cost_fun is None:
-        subst_cost_fun = lambda x,y: 0 if x==y else delins_cost
-        
     # Simple cases: empty sequences
     if len(seq1) == 0:
         return len(seq2) * delins_cost
     elif len(seq2) == 0:
         return len(seq1) * delins_cost
     
-    # Create a table with m+1 rows and n+1 columns
-    pointers = []
-    dist = []
-    for i in range(len(seq1)+1):
-        dist.append([None] * (len(seq2)+1))
-        pointers.append([None] * (len(seq2)+1))
-    
-    for i in range(len(seq1)+1):
-        dist[i][0] = i*delins_cost      # deletion
-        pointers[i][0] = 'D'
-    for j in range(len(seq2)+1):
-        dist[0][j] = j*delins_cost      # insertion
-        pointers[0][j] = 'I'
-    
-    for j in range(1, len(seq2)+1):
-        for i in range(1, len(seq1)+1):
-            dist[i][j],pointers[i][j] = min(
-                            (dist[i-1][j] + delins_cost, 'D'),  # deletion
-                            (dist[i][j-1] + delins_cost, 'I'),  # insertion
-                            (dist[i-1][j-1] + subst_cost_fun(seq1[i-1], seq2[j-1]), 'S'),    # substitution
-                            key=lambda x:x[0])
-    
-    return dist, pointers
+    subst_costs = _get_subst_costs(seq1, seq2, delins_cost, subst_cost_fun, 
+                                    subst_costs)
+    N,M = subst_costs.shape
+    dist,pointers = _fill_table(subst_costs, delins_cost, 
+                       numpy.arange(N+1) * delins_cost,     # deletion
+                       numpy.arange(M+1) * delins_cost,     # insertion
+                       pointers=True)
+    pointers[:,0] = 0
+    pointers[0,:] = 1
+    
+    return dist.tolist(), _POINTER_NAMES[pointers].tolist()
 
-def align(seq1, seq2, delins_cost=1, subst_cost=None, dist=False):
+def align(seq1, seq2, delins_cost=1, subst_cost=None, dist=False, 
+            subst_costs=None):
     """
     Finds the optimal alignment of the two sequences using Levenshtein 
     distance and traces back the pointers to find the alignment. Returns 
@@ -128,13 +223,17 @@ def align(seq1, seq2, delins_cost=1, subst_cost=None, dist=False):
     
     @type dist: bool
     @param dist: return a tuple of the alignment and the dist
+    @type subst_costs: 2D array
+    @param subst_costs: precomputed matrix of substitution costs, used 
+        instead of the function C{subst_cost}
     
     """
     dists,pointers = levenshtein_distance_with_pointers(
                                 seq1, 
                                 seq2,
                                 delins_cost=delins_cost,
-                                subst_cost_fun=subst_cost)
+                                subst_cost_fun=subst_cost,
+                                subst_costs=subst_costs)
     # We now have the matrix of costs and the pointers that generated 
     #  those costs.
     # Trace back to find out what costs were incurred in the optimal 
@@ -161,7 +260,8 @@ def align(seq1, seq2, delins_cost=1, subst_cost=None, dist=False):
     else:
         return operations
 
-def local_levenshtein_distance(seq1, seq2, delins_cost=1, subst_cost_fun=None):
+def local_levenshtein_distance(seq1, seq2, delins_cost=1, subst_cost_fun=None, 
+                                subst_costs=None):
     """
     Compute a local alignment variant of the Levenshtein distance between two 
     sequences. Options are the same as L{levenshtein_distance_with_pointers}.
@@ -173,44 +273,32 @@ def local_levenshtein_distance(seq1, seq2, delins_cost=1, subst_cost_fun=None):
     deletion at zero-cost at the beginning or end.
     
     """
-    if subst_cost_fun is None:
-        subst_cost_fun = lambda x,y: 0 if x==y else delins_cost
-        
     # Simple cases: empty sequences
     if len(seq1) == 0:
         return len(seq2) * delins_cost
     elif len(seq2) == 0:
         return len(seq1) * delins_cost
     
-    # Create a table with m+1 rows and n+1 columns
-    dist = []
-    pointers = []
-    for i in range(len(seq1)+1):
-        dist.append([None] * (len(seq2)+1))
-        pointers.append([None] * (len(seq2)+1))
-    
-    for i in range(len(seq1)+1):
-        # Initial deletions cost us nothing because the alignment's local
-        dist[i][0] = 0
-        pointers[i][0] = '.'
-    for j in range(len(seq2)+1):
-        dist[0][j] = j*delins_cost      # insertion
-        pointers[0][j] = 'I'
-    
-    for j in range(1, len(seq2)+1):
-        for i in range(1, len(seq1)+1):
-            dist[i][j],pointers[i][j] = min(
-                (dist[i-1][j] + delins_cost, 'D'),  # deletion
-                (dist[i][j-1] + delins_cost, 'I'),  # insertion
-                (dist[i-1][j-1] + subst_cost_fun(seq1[i-1], seq2[j-1]), 'S'),    # substitution
-                    key=lambda x:x[0])
+    subst_costs = _get_subst_costs(seq1, seq2, delins_cost, subst_cost_fun, 
+                                    subst_costs)
+    N,M = subst_costs.shape
+    dist,pointers = _fill_table(subst_costs, delins_cost, 
+                       # Initial deletions cost us nothing because the 
+                       #  alignment's local
+                       numpy.zeros(N+1, dtype=int),
+                       numpy.arange(M+1) * delins_cost,     # insertion
+                       pointers=True)
+    pointers[:,0] = 3
+    pointers[0,:] = 1
     
     # Allow free deletions at the end of seq2
-    for i in range(1, len(seq1)+1):
-        # Let us move along seq1 at 0-cost when seq1 is over if it helps
-        dist[i][-1],pointers[i][-1] = min(
-            (dist[i][-1], pointers[i][-1]), # Keep the same
-            (dist[i-1][-1], '.'),           # Use free move
-                key=lambda x:x[0])
-    
-    return dist, pointers
+    # Let us move along seq1 at 0-cost when seq1 is over if it helps
+    last = dist[:,-1]
+    running_min = numpy.minimum.accumulate(last)
+    # Use the free move wherever it's strictly better than what we had
+    free = numpy.zeros(N+1, dtype=bool)
+    free[1:] = running_min[:-1] < last[1:]
+    pointers[free,-1] = 3
+    dist[:,-1] = running_min
+    
+    return dist.tolist(), _POINTER_NAMES[pointers].tolist()
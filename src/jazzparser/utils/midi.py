@@ -36,6 +36,7 @@ and generation are in the L{<jazzparser.harmonical>harmonical module}.
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
 
+import numpy
 from midi import NoteOnEvent, NoteOffEvent
 
 def note_on_similarity(midi0, midi1):
@@ -62,32 +63,27 @@ def note_on_similarity(midi0, midi1):
         opposite.
     
     """
-    from copy import copy
-    
-    note_ons0 = [ev for ev in midi0.trackpool if isinstance(ev, NoteOnEvent)]
-    note_ons1 = [ev for ev in midi1.trackpool if isinstance(ev, NoteOnEvent)]
+    # Sort by time, then pitch, so we can step through both in one go
+    note_ons0 = [(ev.tick, ev.pitch) for ev in midi0.trackpool \
+                                            if isinstance(ev, NoteOnEvent)]
+    note_ons1 = [(ev.tick, ev.pitch) for ev in midi1.trackpool \
+                                            if isinstance(ev, NoteOnEvent)]
     note_ons0.sort()
     note_ons1.sort()
     
     def _matches(base, comp):
-        base = copy(base)
-        comp = copy(comp)
         matches = 0
+        cursor = 0
         # Go through each note-on in the first file and look for a matching 
-        #  one in the second
+        #  one (same note at the same time) in the second
         for note_on in base:
-            # Try to find a note-on with the same note at the same time
-            while len(comp) and comp[0].tick < note_on.tick:
-                comp.pop(0)
-            if len(comp) == 0:
+            while cursor < len(comp) and comp[cursor] < note_on:
+                cursor += 1
+            if cursor == len(comp):
                 # No more matches to find
                 break
-            i = 0
-            while len(comp) > i and comp[i].tick == note_on.tick:
-                if comp[i].pitch == note_on.pitch:
-                    matches += 1
-                    break
-                i += 1
+            if comp[cursor] == note_on:
+                matches += 1
         return matches
     
     # Work out the similarity both ways so the measure is symetric
@@ -96,6 +92,181 @@ def note_on_similarity(midi0, midi1):
     
     return float(matches0)/len(note_ons0), float(matches1)/len(note_ons1)
 
+def note_on_shingles(stream, shingle_size=4, quantization=12):
+    """
+    Represents the notes of a L{midi.EventStream} as a set of 
+    I{shingles}: each is a hash of a run of consecutive note onsets, 
+    described by the pitch interval and time from each note to the 
+    next. This doesn't depend on the key, absolute timing, tempo or 
+    MIDI resolution of the file, so a transposed or offset copy of a 
+    file has the same shingles.
+    
+    Notes that start together are taken in order of pitch.
+    
+    @type shingle_size: int
+    @param shingle_size: number of intervals in each shingle
+    @type quantization: int
+    @param quantization: number of steps per beat to round the time 
+        between notes to
+    @rtype: set of ints
+    
+    """
+    onsets = sorted((ev.tick, ev.pitch) for ev in note_ons(stream))
+    steps = [(pitch1-pitch0, 
+              int(round(float(tick1-tick0) * quantization / stream.resolution))) \
+                for ((tick0,pitch0),(tick1,pitch1)) in zip(onsets, onsets[1:])]
+    return set(hash(tuple(steps[i:i+shingle_size])) \
+                for i in range(len(steps)-shingle_size+1))
+
+class MidiFingerprintIndex(object):
+    """
+    Index for finding near-duplicate MIDI files in a large collection, 
+    without comparing every pair of files.
+    
+    Each file is represented by its L{note_on_shingles}, which are 
+    summarized by a MinHash signature: for each of a number of hash 
+    functions, the lowest hash of any of the shingles. The proportion 
+    of signature values two files share estimates the proportion of 
+    their shingles they share (the Jaccard similarity). The signatures 
+    are split into bands and files that are identical in any band 
+    are candidate duplicates. Adding a file and finding candidates both 
+    take time proportional to the size of the file, so finding all the 
+    near-duplicates in a collection takes roughly linear time.
+    
+    Files with a similarity of M{s} become candidates with probability 
+    M{1-(1-s^r)^b}, where M{b} is the number of bands and M{r} the 
+    number of hashes in each. The candidates should then be checked 
+    more carefully, for example using L{note_on_similarity}.
+    
+    """
+    # Modulus for the hash functions: a prime below 2^31, so that 
+    #  products of hashes don't overflow 64-bit ints
+    _PRIME = 2147483647
+    
+    def __init__(self, num_hashes=32, bands=8, shingle_size=4, 
+                    quantization=12, seed=0):
+        """
+        @type num_hashes: int
+        @param num_hashes: length of each file's signature
+        @type bands: int
+        @param bands: number of bands to split the signature into. Must 
+            divide C{num_hashes}
+        @param shingle_size: see L{note_on_shingles}
+        @param quantization: see L{note_on_shingles}
+        @type seed: int
+        @param seed: seed for choosing the hash functions. Signatures 
+            can only be compared if they used the same seed
+        
+        """
+        import random
+        if num_hashes % bands != 0:
+            raise ValueError, "number of bands (%d) must divide number "\
+                "of hashes (%d)" % (bands, num_hashes)
+        self.num_hashes = num_hashes
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.quantization = quantization
+        
+        rand = random.Random(seed)
+        self._hash_a = numpy.array(
+                    [rand.randint(1, self._PRIME-1) for i in range(num_hashes)],
+                    dtype=numpy.int64)
+        self._hash_b = numpy.array(
+                    [rand.randint(0, self._PRIME-1) for i in range(num_hashes)],
+                    dtype=numpy.int64)
+        
+        self._signatures = {}
+        # The position of each key in the order they were added
+        self._order = {}
+        # Keys of the files with each band of signature
+        self._buckets = {}
+    
+    def get_signature(self, stream):
+        """
+        Computes the MinHash signature of a file.
+        
+        @rtype: tuple of ints, or None if the file has too few notes to 
+            have any shingles
+        
+        """
+        shingles = note_on_shingles(stream, shingle_size=self.shingle_size,
+                                    quantization=self.quantization)
+        if len(shingles) == 0:
+            return None
+        shingles = numpy.array([shingle % self._PRIME for shingle in shingles],
+                               dtype=numpy.int64)
+        # Apply every hash function to every shingle at once
+        hashes = (self._hash_a[:,numpy.newaxis] * shingles[numpy.newaxis,:] \
+                        + self._hash_b[:,numpy.newaxis]) % self._PRIME
+        return tuple(int(h) for h in hashes.min(axis=1))
+    
+    def _bands(self, signature):
+        rows = self.num_hashes / self.bands
+        for band in range(self.bands):
+            yield (band, signature[band*rows:(band+1)*rows])
+    
+    def add(self, key, stream):
+        """
+        Adds a file to the index.
+        
+        @param key: any hashable value to identify the file by, e.g. 
+            its filename
+        @type stream: L{midi.EventStream}
+        @return: the keys of the files already in the index that are 
+            candidate duplicates of this one
+        
+        """
+        if key in self._signatures:
+            raise ValueError, "%s is already in the index" % (key,)
+        signature = self.get_signature(stream)
+        self._signatures[key] = signature
+        self._order[key] = len(self._order)
+        if signature is None:
+            # Nothing to compare this file to
+            return []
+        
+        candidates = set()
+        for band in self._bands(signature):
+            bucket = self._buckets.setdefault(band, [])
+            candidates.update(bucket)
+            bucket.append(key)
+        return sorted(candidates, key=self._order.__getitem__)
+    
+    def get_candidates(self):
+        """
+        Finds all pairs of files in the index that are candidate 
+        duplicates of each other.
+        
+        @rtype: list of pairs of keys
+        @return: pairs of keys, each given with the earlier added first
+        
+        """
+        order = self._order
+        pairs = set()
+        for bucket in self._buckets.values():
+            for i,key1 in enumerate(bucket):
+                for key0 in bucket[:i]:
+                    pairs.add((key0,key1))
+        return sorted(pairs, key=lambda (key0,key1): (order[key1],order[key0]))
+    
+    def estimate_similarity(self, key0, key1):
+        """
+        Estimates the proportion of shared shingles between two files 
+        in the index from their signatures.
+        
+        @rtype: float
+        
+        """
+        sig0 = self._signatures[key0]
+        sig1 = self._signatures[key1]
+        if sig0 is None or sig1 is None:
+            return 0.0
+        return float(sum(1 for (h0,h1) in zip(sig0, sig1) if h0 == h1)) / \
+                        self.num_hashes
+    
+    def __len__(self):
+        return len(self._order)
+
 def trim_intro(mid):
     """
     Many MIDI files begin with a count-in on a drum. Some might even 
@@ -0,0 +1,92 @@
+"""Process-wide cache of loaded models.
+
+Taggers, parsers and backoff builders load their trained models from 
+disk every time they're instantiated. That's fine when we parse a batch 
+of inputs, but a long-running process that parses lots of short inputs 
+(like the L{parse server<jazzparser.server>}) would spend most of its 
+time reloading the same models. If the cache is enabled, the models' 
+C{load_model} methods keep the models they've loaded and only load 
+them again if the file has changed.
+
+The cache is disabled by default, since the models are shared between 
+everything that loads them and it's not safe to assume that nothing 
+modifies them.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
+
+import os
+
+# None when the cache is disabled
+_cache = None
+
+def enable_model_cache():
+    """
+    Start keeping loaded models in this process.
+    
+    """
+    global _cache
+    if _cache is None:
+        _cache = {}
+
+def disable_model_cache():
+    """
+    Stop caching models and forget all the cached ones.
+    
+    """
+    global _cache
+    _cache = None
+
+def model_cache_enabled():
+    return _cache is not None
+
+def load_cached_model(cls, model_name, filename, loader):
+    """
+    Used by the model classes' C{load_model} methods. If the cache is 
+    enabled and contains a model of this class loaded from the file, 
+    which hasn't been modified since, returns it. Otherwise, calls 
+    C{loader} to load it.
+    
+    @type cls: class
+    @param cls: the model class
+    @type filename: str
+    @param filename: file the model is stored in
+    @type loader: 0-arg function
+    @param loader: function that loads the model from the file
+    
+    """
+    if _cache is None:
+        return loader()
+    try:
+        mtime = os.path.getmtime(filename)
+    except OSError:
+        # Leave the loader to deal with a missing file
+        return loader()
+    key = (cls.__module__, cls.__name__, model_name)
+    if key in _cache and _cache[key][0] == mtime:
+        return _cache[key][1]
+    model = loader()
+    _cache[key] = (mtime, model)
+    return model
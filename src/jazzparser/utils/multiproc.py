@@ -24,6 +24,7 @@
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
+import time
 from multiprocessing import TimeoutError
 from threading import Thread
 
@@ -65,3 +66,121 @@ def timeout(fun, *args, **kwargs):
         raise TimeoutError, "call to %s timed out (%s secs)" % (fun,timeout_length)
     else:
         return result.result
+
+def predict_costs(sizes, known_costs=None, exponent=3):
+    """
+    Predicts how long each of a set of jobs will take, so that they can 
+    be scheduled with the longest first.
+    
+    Jobs whose cost is already known (for example, from timings of a 
+    previous run) are given that cost. The others are assumed to cost 
+    in proportion to their size raised to C{exponent}: e.g. 3 for CKY 
+    parsing. The constant of proportion is estimated from the jobs with 
+    known costs, if there are any.
+    
+    @type sizes: list of numbers
+    @param sizes: size of each job
+    @type known_costs: list
+    @param known_costs: known cost of each job, or None where unknown
+    @rtype: list of floats
+    @return: predicted cost of each job
+    
+    """
+    if known_costs is None:
+        known_costs = [None] * len(sizes)
+    # Estimate the cost per unit of size**exponent from the known costs
+    ratios = sorted([float(cost) / size**exponent \
+                        for (size,cost) in zip(sizes, known_costs) \
+                            if cost is not None and size > 0])
+    if len(ratios):
+        scale = ratios[len(ratios)/2]
+    else:
+        scale = 1.0
+    return [float(cost) if cost is not None else scale * size**exponent \
+                for (size,cost) in zip(sizes, known_costs)]
+
+def longest_first(costs):
+    """
+    Returns the indices of the jobs with the given costs in the order 
+    they should be submitted to a pool: highest cost first. Jobs with 
+    equal costs are kept in their original order.
+    
+    Submitting the jobs one by one in this order to a 
+    C{multiprocessing.Pool} (using C{apply_async}) means each worker 
+    takes the next longest job as soon as it's finished its last one, 
+    so the run isn't held up at the end by a long job that was 
+    submitted late.
+    
+    """
+    return sorted(range(len(costs)), key=lambda i:-costs[i])
+
+class WorkerUsage(object):
+    """
+    Keeps track of how much time each worker in a pool spends working, 
+    so we can see how well the work was spread over the workers. The 
+    run is timed from the first call to L{start}, which should be made 
+    when the first job is submitted, so that any time spent preparing 
+    the jobs doesn't count as the workers being idle.
+    
+    """
+    def __init__(self):
+        self.start_time = None
+        self.end_time = None
+        self.busy_times = {}
+        self.jobs = {}
+    
+    def add(self, worker, busy_time):
+        """
+        Records that a worker spent the given time (in seconds) on a job.
+        
+        """
+        self.busy_times[worker] = self.busy_times.get(worker, 0.0) + busy_time
+        self.jobs[worker] = self.jobs.get(worker, 0) + 1
+    
+    def start(self):
+        """
+        Marks the start of the run, unless it's already started. Call 
+        this every time a job is submitted.
+        
+        """
+        if self.start_time is None:
+            self.start_time = time.time()
+    
+    def finish(self):
+        """Marks the end of the run."""
+        self.end_time = time.time()
+    
+    @property
+    def run_time(self):
+        """Wall-clock time since the start of the run (to its end, if finished)."""
+        if self.start_time is None:
+            # No jobs were ever submitted
+            return 0.0
+        if self.end_time is None:
+            return time.time() - self.start_time
+        return self.end_time - self.start_time
+    
+    def utilization(self, worker):
+        """
+        Proportion of the run's time that the worker spent working.
+        
+        """
+        run_time = self.run_time
+        if run_time <= 0.0:
+            return 0.0
+        return self.busy_times.get(worker, 0.0) / run_time
+    
+    def table(self):
+        """
+        Rows of a table (for L{pprint_table 
+        <jazzparser.utils.tableprint.pprint_table>}) summarizing each 
+        worker's usage, with a header row.
+        
+        """
+        rows = [["Worker", "Jobs", "Busy (s)", "Utilization"]]
+        for worker in sorted(self.busy_times.keys()):
+            rows.append(["%s" % worker, 
+                         "%d" % self.jobs[worker], 
+                         "%.1f" % self.busy_times[worker],
+                         "%.1f%%" % (100.0 * self.utilization(worker))])
+        return rows
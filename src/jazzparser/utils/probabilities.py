@@ -25,6 +25,9 @@
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
+import numpy
+from itertools import chain
+
 def batch_sizes(probabilities, batch_ratio, max_batch=0):
     """
     Given a list of probabilities, returns a list of integers that 
@@ -83,6 +86,95 @@ def beamed_batch_sizes(probabilities, batch_ratio, max_batch=0):
     If C{max_batch} is non-zero, a maximum of C{max_batch} items are included 
     in each batch for each word.
     
+    The probabilities are stored in a padded 2D array, sorted for each 
+    word, so that the number of values within each successive beam can 
+    be counted for all the words at once.
+    
+    @type probabilities: list of lists of floats
+    @param probabilities: a list for each word of the probabilities 
+        to batch up.
+    @type batch_ratio: float
+    @param batch_ratio: maximum ratio between the highest probability in a 
+        particular batch and the lowest (over all words).
+    @rtype: list of lists of ints
+    @return: the list of sizes of each batch for each word.
+    
+    """
+    words = len(probabilities)
+    lengths = numpy.array([len(probs) for probs in probabilities], dtype=int)
+    if words == 0 or lengths.sum() == 0:
+        return [[] for i in range(words)]
+    
+    # Put the probabilities in an array, each row sorted from high to low
+    # Pad the rows with -inf, which will never be in the beam
+    probs = numpy.empty((words, lengths.max()), dtype=numpy.float64)
+    probs.fill(-numpy.inf)
+    filled = numpy.arange(lengths.max()) < lengths[:,numpy.newaxis]
+    probs[filled] = numpy.fromiter(chain(*probabilities), 
+                                   dtype=numpy.float64, count=lengths.sum())
+    probs = -numpy.sort(-probs, axis=1)
+    # Pointer to the next value to be taken from each word
+    taken = numpy.zeros(words, dtype=int)
+    batch_lists = []
+    
+    # Keep making more batches until we've taken everything
+    while numpy.any(taken < lengths):
+        # Get the highest probability still waiting to be taken
+        remaining = taken < lengths
+        beam_top = probs[remaining, taken[remaining]].max()
+        beam_bottom = batch_ratio * beam_top
+        # For each word, count all the values that lie within the beam.
+        # Since the rows are sorted, those that haven't been taken yet 
+        #  are the ones after the pointer
+        in_beam = numpy.sum(probs >= beam_bottom, axis=1)
+        vals_in_batch = numpy.maximum(in_beam - taken, 0)
+        # Don't take more than max_batch at once (if given)
+        if max_batch:
+            vals_in_batch = numpy.minimum(vals_in_batch, max_batch)
+        
+        # If this is the first batch, check every word got at least one
+        if len(batch_lists) == 0:
+            for word in numpy.nonzero(vals_in_batch == 0)[0]:
+                # Nothing was assigned to this word - give it many 
+                #  values as have the highest probability (probably 
+                #  just one)
+                vals_in_batch[word] = numpy.sum(
+                            probs[word,:lengths[word]] == probs[word,0])
+        
+        taken += vals_in_batch
+        batch_lists.append(vals_in_batch)
+    
+    # Each column of this is a batch
+    return numpy.array(batch_lists).transpose().tolist()
+
+def list_beamed_batch_sizes(probabilities, batch_ratio, max_batch=0):
+    """
+    Original list-based implementation of L{beamed_batch_sizes}. This is 
+    kept for comparison with (and testing of) the array-based version: use 
+    L{beamed_batch_sizes}.
+    
+    An alternative to L{batch_sizes} which processes many lists of 
+    probabilities at once (i.e. one per word).
+    
+    The lists returned contain the number 
+    of values that should be returned in each batch to represent a 
+    progressively widening probability beam, which is the same across 
+    all the words. The main difference between this and applying 
+    L{batch_sizes} to each word independently is that this may result 
+    in some words having some batches empty, if the beam is not wide 
+    enough to catch the next highest probability.
+    
+    The one exception to this is the first batch, which will always 
+    contain at least one value, even if this means effectively lowering 
+    the beam for that one word.
+    
+    Every batch will include at least one value on at least one word.
+    
+    It is assumed that every word has at least one value.
+    
+    If C{max_batch} is non-zero, a maximum of C{max_batch} items are included 
+    in each batch for each word.
+    
     @type probabilities: list of lists of floats
     @param probabilities: a list for each word of the probabilities 
         to batch up.
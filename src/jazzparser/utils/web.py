@@ -84,18 +84,15 @@ def remove_duplicate_files(files, key=lambda x:x):
     is returned by the key function applied to each value in the list.
     
     """
-    keys = [key(f) for f in reversed(files)]
-    to_remove = []
-    for i,data in enumerate(keys):
-        if data in keys[i+1:]:
-            to_remove.append(i)
-    print "Removing %d duplicates" % len(to_remove)
-    
-    files = list(reversed(
-                [f for (i,f) in enumerate(reversed(files)) 
-                    if i not in to_remove]
-            ))
-    return files
+    seen = set()
+    kept = []
+    for f in files:
+        data = key(f)
+        if data not in seen:
+            seen.add(data)
+            kept.append(f)
+    print "Removing %d duplicates" % (len(files) - len(kept))
+    return kept
     
 def the_jazz_page_midi_files(name, refresh_cache=False, verbose_out=None):
     """
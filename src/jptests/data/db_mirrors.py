@@ -0,0 +1,114 @@
+"""Unit tests for jazzparser.data.db_mirrors
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os, tempfile, shutil
+from jazzparser import settings
+
+from jazzparser.data.db_mirrors import SequenceIndex
+from jazzparser.data.db_mirrors.columnar import ColumnarSequenceIndex, \
+                        ColumnarCorpus, save_columnar, is_columnar_file
+
+DB_SEQUENCES_FILE = os.path.join(settings.TEST_DATA_DIR, "dbsequences")
+
+def _chord_data(seq):
+    return [(chord.root, chord.type, chord.additions, chord.bass,
+             chord.duration, chord.category, chord.treeinfo.coord_resolved,
+             chord.treeinfo.coord_unresolved, chord.sequence is seq)
+                for chord in seq]
+
+class TestSequenceIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SequenceIndex.from_file(DB_SEQUENCES_FILE)
+    
+    def test_indices(self):
+        """ Ids and indices should correspond to the order of ids """
+        ids = list(sorted(seq.id for seq in self.index.sequences))
+        self.assertEqual(self.index.ids, ids)
+        for i,id in enumerate(ids):
+            self.assertEqual(self.index.id_for_index(i), id)
+            self.assertEqual(self.index.index_for_id(id), i)
+            self.assertEqual(self.index.sequence_by_index(i).id, id)
+        self.assertIsNone(self.index.id_for_index(len(ids)))
+        self.assertIsNone(self.index.index_for_id(max(ids)+1))
+        self.assertIsNone(self.index.sequence_by_id(max(ids)+1))
+    
+    def test_prepare_indices(self):
+        """ Changing the sequences should be reflected after re-indexing """
+        removed = self.index.sequences[0]
+        self.index._sequences.remove(removed)
+        self.index.prepare_indices()
+        self.assertIsNone(self.index.index_for_id(removed.id))
+        self.assertEqual(self.index.index_for_id(self.index.ids[0]), 0)
+
+class TestColumnar(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "sequences")
+        self.index = SequenceIndex.from_file(DB_SEQUENCES_FILE)
+        save_columnar(self.filename, self.index.sequences)
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def test_load(self):
+        """ Loading a columnar file should give the same sequences """
+        self.assertTrue(is_columnar_file(self.filename))
+        self.assertFalse(is_columnar_file(DB_SEQUENCES_FILE))
+        columnar = SequenceIndex.from_file(self.filename)
+        self.assertIsInstance(columnar, ColumnarSequenceIndex)
+        self.assertEqual(len(columnar), len(self.index))
+        self.assertEqual(columnar.ids, self.index.ids)
+        for seq,col_seq in zip(self.index, columnar):
+            for field in ['id', 'name', 'key', 'bar_length', 'notes',
+                          'analysis_omitted', 'omissions', 'source']:
+                self.assertEqual(getattr(seq, field), getattr(col_seq, field))
+            self.assertEqual(_chord_data(seq), _chord_data(col_seq))
+    
+    def test_lazy(self):
+        """ Sequences should only be built when they're needed """
+        columnar = SequenceIndex.from_file(self.filename)
+        id = self.index.ids[1]
+        self.assertEqual(columnar.index_for_id(id), 1)
+        self.assertEqual(len(columnar._by_id), 0)
+        seq = columnar.sequence_by_index(1)
+        self.assertEqual(seq.id, id)
+        self.assertEqual(len(columnar._by_id), 1)
+        # Getting it again should give the same object
+        self.assertIs(columnar.sequence_by_id(id), seq)
+        self.assertIsNone(columnar.sequence_by_id(max(self.index.ids)+1))
+    
+    def test_subset(self):
+        """ A subset of the corpus should contain just those sequences """
+        corpus = ColumnarCorpus.load(self.filename)
+        subset = ColumnarSequenceIndex(corpus.subset([2, 0]))
+        self.assertEqual(subset.ids, [self.index.ids[0], self.index.ids[2]])
+        self.assertEqual(_chord_data(subset.sequence_by_index(1)),
+                         _chord_data(self.index.sequence_by_index(2)))
+        self.assertEqual(len(ColumnarSequenceIndex(corpus.subset([]))), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Unit tests for jazzparser.data.dependencies
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
+
+import unittest
+from jazzparser.data.dependencies import DependencyGraph, \
+                    optimal_node_alignment, alignment_to_graph
+
+class TestOptimalNodeAlignment(unittest.TestCase):
+    """
+    Tests for the alignment of dependency graphs that maximizes the 
+    shared dependencies.
+    
+    """
+    def setUp(self):
+        self.graph1 = DependencyGraph([
+            (0, 4, "root"),
+            (4, 2, "a"),
+            (2, 1, "a"),
+            (4, 3, "b"),
+        ])
+        # The same structure, with an extra node inserted
+        self.graph2 = DependencyGraph([
+            (0, 5, "root"),
+            (5, 3, "a"),
+            (3, 1, "a"),
+            (3, 2, "b"),
+            (5, 4, "b"),
+        ])
+    
+    def test_identical(self):
+        """ A graph should align all its nodes with itself. """
+        alignment = optimal_node_alignment(self.graph1, self.graph1)
+        self.assertEqual(alignment, [(n,n) for n in sorted(self.graph1.nodes)])
+        graph,__,__ = alignment_to_graph(alignment, self.graph1, self.graph1)
+        self.assertEqual(len(graph), len(self.graph1))
+    
+    def test_insertion(self):
+        """
+        The best alignment of the two graphs should skip the inserted node 
+        and recover all of the dependencies in the smaller graph.
+        
+        """
+        alignment = optimal_node_alignment(self.graph1, self.graph2)
+        self.assertIn((None, 2), alignment)
+        graph,__,__ = alignment_to_graph(alignment, self.graph1, self.graph2)
+        self.assertEqual(len(graph), len(self.graph1))
+    
+    def test_label_compare(self):
+        """
+        If no labels match, the only dependencies that can be shared are 
+        those with the root.
+        
+        """
+        alignment = optimal_node_alignment(self.graph1, self.graph2, 
+                        label_compare=lambda l1,l2: l1 == l2 == "root")
+        graph,__,__ = alignment_to_graph(alignment, self.graph1, self.graph2,
+                        label_compare=lambda l1,l2: l1 == l2 == "root")
+        self.assertEqual(len(graph), 1)
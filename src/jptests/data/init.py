@@ -26,6 +26,7 @@
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
 import unittest
+import cPickle as pickle
 from jazzparser.data import Chord, DerivationTrace, Fraction
 
 class TestChord(unittest.TestCase):
@@ -223,9 +224,14 @@ class TestDerivationTraceHalfspan(unittest.TestCase):
         trace1 = DerivationTrace(self.sign1, word="V7")
         # Pretend the rule was applied to the above signs
         trace2 = DerivationTrace(self.sign2, rule=self.rule, args=[trace1, trace0])
-        # This rule app is actually the same as trace2, but the DT shouldn't 
-        #  care about that, as it's not clever enough
+        # This rule app is actually the same as trace2, so shouldn't be 
+        #  stored again
         trace2.add_rule(self.rule, [trace1, trace0])
+        self.assertEqual(len(trace2.rules), 1)
+        # But the same rule applied to other traces should
+        trace2.add_rule(self.rule, [trace1, 
+                        DerivationTrace(self.sign0, word="Im7")])
+        self.assertEqual(len(trace2.rules), 2)
         
     def test_combined_traces(self):
         """
@@ -240,6 +246,114 @@ class TestDerivationTraceHalfspan(unittest.TestCase):
         # This is actually the same as trace2
         trace2b = DerivationTrace(self.sign2, rule=self.rule, args=[trace1, trace0])
         trace2.add_rules_from_trace(trace2b)
+        self.assertEqual(len(trace2.rules), 1)
+
+class _RuleStub(object):
+    name = readable_rule = "stub"
+
+class TestDerivationForest(unittest.TestCase):
+    """
+    Tests for counting and extracting the derivations in a 
+    L{DerivationTrace}'s packed forest. We build the forest of all 
+    binary bracketings of a sequence of words, like a chart would.
+    
+    """
+    def _forest(self, length):
+        rule = _RuleStub()
+        traces = {}
+        for i in range(length):
+            traces[(i,i+1)] = DerivationTrace((i,i+1), word="w%d" % i)
+        for span in range(2, length+1):
+            for start in range(length-span+1):
+                end = start + span
+                trace = DerivationTrace((start,end))
+                for middle in range(start+1, end):
+                    trace.add_rule(rule, 
+                            [traces[(start,middle)], traces[(middle,end)]])
+                traces[(start,end)] = trace
+        return traces[(0,length)]
+    
+    def _all_derivations(self, trace, score):
+        # Expands the trace into all its trees, the slow way
+        if trace.word is not None:
+            return [(score(trace, None, []), 
+                     DerivationTrace(trace.result, word=trace.word))]
+        derivations = []
+        for rule,(left,right) in trace.rules:
+            for lscore,ltree in self._all_derivations(left, score):
+                for rscore,rtree in self._all_derivations(right, score):
+                    derivations.append(
+                        (score(trace, rule, [left,right]) + lscore + rscore,
+                         DerivationTrace(trace.result, rule, [ltree, rtree])))
+        return derivations
+    
+    def test_count(self):
+        # The number of bracketings is a Catalan number
+        catalan = [1, 1, 2, 5, 14, 42, 132, 429, 1430, 4862]
+        for length in range(1, 11):
+            self.assertEqual(self._forest(length).get_num_derivations(), 
+                             catalan[length-1])
+        # This would take forever without sharing the sub-derivations
+        self.assertEqual(self._forest(40).get_num_derivations(), 
+                         680425371729975800390L)
+    
+    def test_size(self):
+        def _size(trace):
+            # Old recursive definition of the size
+            if trace.word is not None:
+                return 1
+            return sum(1 + sum(_size(arg) for arg in args) \
+                                    for (rule,args) in trace.rules)
+        for length in range(1, 8):
+            trace = self._forest(length)
+            self.assertEqual(trace.get_size(), _size(trace))
+    
+    def test_pickled(self):
+        """
+        Rule applications already stored should still be recognised once 
+        the trace has been pickled and unpickled.
+        
+        """
+        trace = pickle.loads(pickle.dumps(self._forest(4), -1))
+        num_rules = len(trace.rules)
+        for rule,args in list(trace.rules):
+            trace.add_rule(rule, args)
+        self.assertEqual(len(trace.rules), num_rules)
+        self.assertEqual(trace.get_num_derivations(), 5)
+    
+    def test_k_best(self):
+        """
+        Extracting derivations best first should give the same scores 
+        as sorting all the derivations.
+        
+        """
+        def _score(trace, rule, args):
+            # Prefer splitting near the middle of the span
+            if rule is None:
+                return 0
+            start,end = trace.result
+            return -abs(args[0].result[1] - (start+end)/2.0)
+        
+        trace = self._forest(7)
+        all_derivs = self._all_derivations(trace, _score)
+        best = trace.get_k_best(len(all_derivs)+10, score=_score)
+        self.assertEqual(len(best), len(all_derivs))
+        self.assertEqual([score for (score,tree) in best], 
+                list(reversed(sorted(score for (score,tree) in all_derivs))))
+        # Every derivation should come out once
+        self.assertEqual(set(str(tree) for (score,tree) in best),
+                         set(str(tree) for (score,tree) in all_derivs))
+        for score,tree in best:
+            self.assertEqual(tree.get_num_derivations(), 1)
+        
+        # Getting a few from a huge forest should be quick
+        self.assertEqual(len(self._forest(40).get_k_best(5, score=_score)), 5)
+    
+    def test_packed_output(self):
+        # Each span's trace should only be output once
+        trace = self._forest(20)
+        output = trace.str_packed()
+        self.assertEqual(output.count("\n["), 20*21/2 - 1)
 
 
 class TestFraction(unittest.TestCase):
@@ -32,8 +32,10 @@ from jazzparser.data.input import DbInput, ChordInput, DbBulkInput, \
 								ChordBulkInput, SegmentedMidiInput, \
 								SegmentedMidiBulkInput, detect_input_type, \
 								input_type_name, InputTypeError, INPUT_TYPES, \
-								BULK_INPUT_TYPES, is_bulk_type
+								BULK_INPUT_TYPES, is_bulk_type, \
+								WeightedChordLabelInput
 from jazzparser.data.db_mirrors import SequenceIndex
+from jazzparser.misc.chordlabel.data import ChordLabel
 
 DB_SEQUENCES_FILE = os.path.join(settings.TEST_DATA_DIR, "dbsequences")
 CHORDS_FILE = os.path.join(settings.TEST_DATA_DIR, "text_chords")
@@ -98,6 +100,58 @@ class TestSegmentedMidiInput(unittest.TestCase):
 		})
 		mid = SegmentedMidiInput.from_file(SEGMENTED_MIDI[0], options=options)
 
+class TestWeightedChordLabelInput(unittest.TestCase):
+	"""
+	Tests for the lattice input and its beams.
+	
+	"""
+	def setUp(self):
+		self.labels = [ChordLabel(0, "M", None), ChordLabel(7, "7", None), 
+					   ChordLabel(2, "m7", None)]
+		C,G,D = self.labels
+		self.lattice = WeightedChordLabelInput([
+			[(G, 0.2), (C, 0.7), (D, 0.1)],
+			[(D, 0.5), (G, 0.5)],
+			[(C, 1e-6), (G, 0.9)],
+		])
+	
+	def _labels(self, lattice):
+		return [[str(label) for (label,prob) in timestep] for timestep in lattice]
+	
+	def test_matrix(self):
+		self.assertEqual(self.lattice.labels, [self.labels[1], self.labels[0], 
+											   self.labels[2]])
+		self.assertEqual(self.lattice.probabilities.shape, (3, 3))
+		self.assertEqual(self.lattice.probabilities[1,0], 0.5)
+		self.assertEqual(self.lattice.probabilities[1,1], 0.0)
+	
+	def test_sorted(self):
+		self.assertEqual(self._labels(self.lattice), 
+						 [["CM", "G7", "Dm7"], ["G7", "Dm7"], ["G7", "CM"]])
+		self.assertEqual(self.lattice[0][0][1], 0.7)
+		self.assertEqual(len(self.lattice), 3)
+	
+	def test_ratio_beam(self):
+		self.lattice.apply_ratio_beam(ratio=0.2)
+		self.assertEqual(self._labels(self.lattice), 
+						 [["CM", "G7"], ["G7", "Dm7"], ["G7"]])
+	
+	def test_top_beam(self):
+		self.lattice.apply_top_beam(1)
+		self.assertEqual(self._labels(self.lattice), [["CM"], ["G7"], ["G7"]])
+	
+	def test_slice(self):
+		sliced = self.lattice.slice(1)
+		self.assertEqual(len(sliced), 2)
+		self.assertEqual(self._labels(sliced), self._labels(self.lattice)[1:])
+	
+	def test_from_array(self):
+		lattice = WeightedChordLabelInput.from_array(
+						self.lattice.probabilities, self.lattice.labels)
+		self.assertEqual(lattice[:], self.lattice[:])
+		self.assertRaises(ValueError, WeightedChordLabelInput.from_array, 
+						  self.lattice.probabilities, self.labels[:2])
+
 class TestDbBulkInput(unittest.TestCase):
 	"""
 	Test for loading a DbBulkInput.
@@ -0,0 +1,192 @@
+"""Unit tests for jazzparser.data.parsing
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os, tempfile, shutil
+
+from jazzparser.data.parsing import ParseResults, ResultsStore, \
+                    load_parse_times
+from jazzparser.formalisms.music_halfspan.semantics import \
+                    semantics_from_string
+
+LFS = [
+    "[<0,0>]",
+    "[leftonto(<0,0>)]",
+    "[leftonto(leftonto(<1,0>)), <0,0>]",
+    "[<0,1>, leftonto(<0,0>)]",
+]
+
+def _results(num, gold=True):
+    """ Builds a ParseResults with some arbitrary LFs """
+    parses = [(-float(i), semantics_from_string(LFS[(num+i) % len(LFS)])) \
+                    for i in range(num % 3 + 1)]
+    if gold:
+        gold_parse = semantics_from_string(LFS[num % len(LFS)])
+    else:
+        gold_parse = None
+    return ParseResults(parses, gold_parse=gold_parse, 
+                        timed_out=(num % 2 == 0), cpu_time=float(num),
+                        limit_exceeded=("max_signs" if num % 4 == 0 else None))
+
+class TestResultsStore(unittest.TestCase):
+    """
+    Tests for writing and reading results stores.
+    
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "results.jprs")
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def _write(self, nums, mode='w', close=True):
+        store = ResultsStore(self.filename, mode=mode)
+        for num in nums:
+            store.add("input%d" % num, _results(num, gold=(num != 3)))
+        if close:
+            store.close()
+        return store
+    
+    def _check(self, store, nums):
+        self.assertEqual(store.identifiers(), ["input%d" % num for num in nums])
+        for num in nums:
+            expected = _results(num, gold=(num != 3))
+            for top_only in [False, True]:
+                pres = store.get("input%d" % num, top_only=top_only)
+                if top_only:
+                    self.assertEqual(pres.semantics, expected.semantics[:1])
+                else:
+                    self.assertEqual(pres.semantics, expected.semantics)
+                self.assertEqual(pres.get_gold_semantics(), 
+                                 expected.get_gold_semantics())
+                self.assertEqual(pres.timed_out, expected.timed_out)
+                self.assertEqual(pres.cpu_time, expected.cpu_time)
+                self.assertEqual(pres.limit_exceeded, expected.limit_exceeded)
+        # Check that streaming gives the same
+        streamed = [(ident, pres.semantics) for (ident,pres) in \
+                                                    store.iter_results()]
+        self.assertEqual(streamed, 
+            [("input%d" % num, _results(num).semantics) for num in nums])
+    
+    def test_read(self):
+        self._write(range(6))
+        self.assertTrue(ResultsStore.is_store(self.filename))
+        store = ResultsStore(self.filename)
+        self._check(store, range(6))
+        store.close()
+    
+    def test_append(self):
+        """
+        Adding to an existing store should keep the old results.
+        
+        """
+        self._write(range(3))
+        self._write(range(3, 6), mode='a')
+        store = ResultsStore(self.filename)
+        self._check(store, range(6))
+        store.close()
+    
+    def test_replace(self):
+        """
+        Adding an input again should replace its results.
+        
+        """
+        self._write(range(4))
+        store = ResultsStore(self.filename, mode='a')
+        store.add("input1", _results(5))
+        store.close()
+        store = ResultsStore(self.filename)
+        self.assertEqual(store.identifiers(), 
+                         ["input0", "input2", "input3", "input1"])
+        self.assertEqual(store.get("input1").semantics, _results(5).semantics)
+        store.close()
+    
+    def test_recover(self):
+        """
+        If the store isn't closed, the records written so far should be 
+        found without the index, including after a partly written record.
+        
+        """
+        store = self._write(range(5), close=False)
+        store._file.write("\0\0\0\xff\0\0\0\x01abc")
+        store._file.flush()
+        
+        reader = ResultsStore(self.filename)
+        self._check(reader, range(5))
+        reader.close()
+        
+        # Adding more should overwrite the broken record
+        self._write(range(5, 7), mode='a')
+        reader = ResultsStore(self.filename)
+        self._check(reader, range(7))
+        reader.close()
+        store._file.close()
+    
+    def test_version(self):
+        self._write(range(2))
+        data = open(self.filename, 'rb').read()
+        outfile = open(self.filename, 'wb')
+        outfile.write(data[:len(ResultsStore.MAGIC)] + "\0\x63" + 
+                      data[len(ResultsStore.MAGIC)+2:])
+        outfile.close()
+        self.assertRaises(ResultsStore.LoadError, ResultsStore, self.filename)
+    
+    def test_not_store(self):
+        _results(2).save(self.filename)
+        self.assertFalse(ResultsStore.is_store(self.filename))
+        self.assertRaises(ResultsStore.LoadError, ResultsStore, self.filename)
+
+class TestLoadParseTimes(unittest.TestCase):
+    """
+    Tests for reading parse times from previous results.
+    
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def test_store(self):
+        filename = os.path.join(self.dir, "results.jprs")
+        store = ResultsStore(filename, mode='w')
+        for num in range(4):
+            store.add("Input %d" % num, _results(num))
+        store.close()
+        self.assertEqual(load_parse_times(filename), 
+                    dict(("input_%d" % num, float(num)) for num in range(4)))
+    
+    def test_dir(self):
+        for num in range(4):
+            _results(num).save(os.path.join(self.dir, "input_%d.res" % num))
+        # Other files should be ignored
+        open(os.path.join(self.dir, "notes.txt"), 'w').close()
+        self.assertEqual(load_parse_times(self.dir), 
+                    dict(("input_%d" % num, float(num)) for num in range(4)))
+
+if __name__ == '__main__':
+    unittest.main()
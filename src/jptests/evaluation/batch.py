@@ -0,0 +1,248 @@
+"""Unit tests for jazzparser.evaluation.batch
+
+Also tests the splitting of distance metric computations into per-pair 
+stats and totals, which the batch evaluation relies on.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os, tempfile, shutil
+
+from jazzparser.evaluation import batch
+from jazzparser.evaluation.batch import evaluate_files, EvaluationCache, \
+                    evaluate_store, store_input_name
+from jazzparser.data.parsing import ParseResults, ResultsStore
+from jazzparser.formalisms.base.semantics.distance import FScoreMetric
+from jazzparser.formalisms.music_halfspan.semantics import \
+                    semantics_from_string
+from jazzparser.formalisms.music_halfspan.semantics.distance import \
+                    TonalSpaceEditDistance, DependencyRecovery, \
+                    DependencyGraphSize
+
+LFS = [
+    "[<0,0>]",
+    "[leftonto(<0,0>)]",
+    "[leftonto(leftonto(<1,0>)), <0,0>]",
+    "[<0,1>, leftonto(<0,0>)]",
+    "[leftonto(leftonto(<0,0>)), rightonto(<2,0>)]",
+]
+
+def _pairs():
+    """ (top result, gold) pairs of semantics """
+    return [(semantics_from_string(LFS[i]), 
+             semantics_from_string(LFS[(i*2+1) % len(LFS)])) \
+                    for i in range(len(LFS))]
+
+def _metrics():
+    return [TonalSpaceEditDistance({'output' : output}) for output in \
+                        ['f', 'precision', 'recall', 'inversef', 'dist']] + \
+           [DependencyRecovery({'output' : 'f'}), DependencyGraphSize()]
+
+def _old_total_distance(metric, pairs):
+    """
+    The total distance as it was computed before the computation was 
+    split into L{pair_stats} and L{total_from_stats}.
+    
+    """
+    if not isinstance(metric, FScoreMetric) or \
+            metric.options['output'] == 'dist':
+        return sum([metric.distance(*pair) for pair in pairs], 0.0)
+    
+    alignment = max_score1 = max_score2 = 0.0
+    for (sem1,sem2) in pairs:
+        scores = metric.fscore_match(sem1, sem2)
+        alignment += scores[0]
+        max_score1 += scores[1]
+        max_score2 += scores[2]
+    
+    if alignment == 0:
+        recall = precision = f_score = 0.0
+    else:
+        recall = alignment / max_score2
+        precision = alignment / max_score1
+        f_score = 2 * recall * precision / (recall+precision)
+    return {
+        'recall' : recall,
+        'precision' : precision,
+        'f' : f_score,
+        'inversef' : 1.0-f_score,
+    }[metric.options['output']]
+
+class TestPairStats(unittest.TestCase):
+    """
+    Combining the stats for each pair should give the same total as the 
+    old computation over all the pairs at once.
+    
+    """
+    def test_total(self):
+        pairs = _pairs()
+        for metric in _metrics():
+            self.assertAlmostEqual(
+                    metric.total_from_stats(
+                            [metric.pair_stats(*pair) for pair in pairs]),
+                    _old_total_distance(metric, pairs),
+                    msg="%s differs" % metric.stats_key)
+            self.assertAlmostEqual(metric.total_distance(pairs), 
+                                   _old_total_distance(metric, pairs))
+    
+    def test_no_result(self):
+        # Inputs with no parse result are compared with None
+        pairs = _pairs() + [(None, semantics_from_string(LFS[0]))]
+        for metric in _metrics()[:-1]:
+            self.assertAlmostEqual(
+                    metric.total_from_stats(
+                            [metric.pair_stats(*pair) for pair in pairs]),
+                    _old_total_distance(metric, pairs))
+    
+    def test_stats_key(self):
+        metrics = _metrics()
+        # Precision, recall and f-score can share their stats
+        self.assertEqual(len(set([m.stats_key for m in metrics[:4]])), 1)
+        self.assertNotEqual(metrics[0].stats_key, metrics[4].stats_key)
+
+class TestEvaluateFiles(unittest.TestCase):
+    """
+    Tests for evaluating a set of results files.
+    
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.pairs = _pairs()
+        self.filenames = []
+        for i,(top,gold) in enumerate(self.pairs):
+            filename = os.path.join(self.dir, "results%d" % i)
+            ParseResults([(1.0, top)], gold_parse=gold).save(filename)
+            self.filenames.append(filename)
+        # One with no parse result and one with no gold standard
+        filename = os.path.join(self.dir, "noparse")
+        ParseResults([], gold_parse=semantics_from_string(LFS[0])).save(filename)
+        self.filenames.append(filename)
+        self.pairs.append((None, semantics_from_string(LFS[0])))
+        filename = os.path.join(self.dir, "nogold")
+        ParseResults([(1.0, semantics_from_string(LFS[0]))]).save(filename)
+        self.filenames.append(filename)
+        
+        self.metrics = _metrics()[:-1]
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def _totals(self, evaluations):
+        return [metric.total_from_stats([evaluation.stats[metric.stats_key] \
+                        for evaluation in evaluations if evaluation.gold]) \
+                    for metric in self.metrics]
+    
+    def _check_totals(self, evaluations):
+        self.assertEqual([e.filename for e in evaluations], self.filenames)
+        self.assertEqual([e.gold for e in evaluations], 
+                         [True]*(len(self.filenames)-1) + [False])
+        for metric,total in zip(self.metrics, self._totals(evaluations)):
+            self.assertAlmostEqual(total, metric.total_distance(self.pairs))
+    
+    def test_totals(self):
+        """ Batch totals should be the same as the totals over the files """
+        self._check_totals(evaluate_files(self.filenames, self.metrics))
+    
+    def test_processes(self):
+        self._check_totals(evaluate_files(self.filenames, self.metrics, 
+                                          processes=2))
+    
+    def test_cache(self):
+        """ Cached evaluations should be used and give the same result """
+        cache_filename = os.path.join(self.dir, "cache")
+        cache = EvaluationCache(cache_filename)
+        fresh = evaluate_files(self.filenames, self.metrics, cache=cache)
+        cache.save()
+        
+        # Make sure nothing gets evaluated again
+        def _fail(*args, **kwargs):
+            raise AssertionError, "evaluated a file found in the cache"
+        evaluate_file = batch.evaluate_file
+        batch.evaluate_file = _fail
+        try:
+            cached = evaluate_files(self.filenames, self.metrics, 
+                                    cache=EvaluationCache(cache_filename))
+        finally:
+            batch.evaluate_file = evaluate_file
+        self._check_totals(cached)
+        self.assertEqual(self._totals(cached), self._totals(fresh))
+        for (fresh_eval,cached_eval) in zip(fresh, cached):
+            self.assertEqual(cached_eval.stats, fresh_eval.stats)
+    
+    def test_cache_changed(self):
+        """ A file that's changed should be evaluated again """
+        cache = EvaluationCache()
+        evaluate_files(self.filenames, self.metrics, cache=cache)
+        ParseResults([(1.0, self.pairs[1][1])], 
+                     gold_parse=self.pairs[0][1]).save(self.filenames[0])
+        self.pairs[0] = (self.pairs[1][1], self.pairs[0][1])
+        self._check_totals(evaluate_files(self.filenames, self.metrics, 
+                                          cache=cache))
+
+class TestEvaluateStore(unittest.TestCase):
+    """
+    Tests for evaluating the inputs in a results store.
+    
+    """
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "results.jprs")
+        self.pairs = _pairs()
+        self.metrics = _metrics()[:-1]
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def _add(self, nums, mode):
+        store = ResultsStore(self.filename, mode=mode)
+        for num in nums:
+            top,gold = self.pairs[num]
+            store.add("input%d" % num, 
+                      ParseResults([(1.0, top)], gold_parse=gold))
+        store.close()
+    
+    def _check(self, evaluations, nums):
+        self.assertEqual([e.filename for e in evaluations], 
+                [store_input_name(self.filename, "input%d" % num) \
+                                                        for num in nums])
+        self.assertEqual([e.error for e in evaluations], [None]*len(nums))
+        pairs = [self.pairs[num] for num in nums]
+        for metric in self.metrics:
+            total = metric.total_from_stats(
+                    [e.stats[metric.stats_key] for e in evaluations])
+            self.assertAlmostEqual(total, metric.total_distance(pairs))
+    
+    def test_appended(self):
+        """ Inputs added to the store since the last evaluation should be found """
+        for processes in [1, 2]:
+            self._add([0, 1], 'w')
+            self._check(evaluate_store(self.filename, self.metrics, 
+                                       processes=processes), [0, 1])
+            self._add([2, 3, 4], 'a')
+            self._check(evaluate_store(self.filename, self.metrics, 
+                                       processes=processes), range(5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""Unit tests for jazzparser.formalisms.music_halfspan.pcfg
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest
+import cPickle as pickle
+
+from jazzparser.data import Chord
+from jazzparser.formalisms.music_halfspan.syntax import syntax_from_string
+from jazzparser.formalisms.music_halfspan.pcfg import HalfspanPcfgModel, \
+                    model_category_repr, category_relative_chord, \
+                    CategoryRepTable
+from jazzparser.taggers.chordmap import get_chord_mapping
+from jazzparser.utils.nltk.probability import CutoffFreqDist, \
+                    CutoffConditionalFreqDist, laplace_estimator
+
+CATEGORIES = [
+    "I^T", "V^D-I^T", "II^S-IV^T", "I^D/IV^DT", "V^D/I^DT",
+    "bVII^S\\IV^T", "III^D/VI^DT",
+]
+
+class _SignStub(object):
+    """ Enough of a sign for the model to score """
+    def __init__(self, category):
+        self.category = syntax_from_string(category)
+
+class TestCategoryRepIds(unittest.TestCase):
+    """
+    Tests for the interned ids of the model's category representations.
+    
+    """
+    def setUp(self):
+        self.reps = CategoryRepTable()
+    
+    def test_reps(self):
+        """
+        The interned id of each category, relative to each of the others,
+        should identify the same representation that
+        C{model_category_repr} returns.
+        
+        """
+        for base in [None] + CATEGORIES:
+            if base is not None:
+                base = syntax_from_string(base)
+            for cat in CATEGORIES:
+                cat = syntax_from_string(cat)
+                rep_id = self.reps.category_id(cat, base)
+                self.assertEqual(self.reps.reps[rep_id],
+                                 model_category_repr(cat, base))
+                # Should get the same from the cache next time
+                self.assertEqual(self.reps.category_id(cat, base), rep_id)
+    
+    def test_interned(self):
+        """
+        Categories that are the same relative to their base pitch
+        should have the same id.
+        
+        """
+        self.assertEqual(
+            self.reps.category_id(syntax_from_string("V^D-I^T")),
+            self.reps.category_id(syntax_from_string("VI^D-II^T")))
+        self.assertNotEqual(
+            self.reps.category_id(syntax_from_string("V^D-I^T")),
+            self.reps.category_id(syntax_from_string("V^D-II^T")))
+    
+    def test_separate_tables(self):
+        """
+        Each table should give its own ids, even for a category that's 
+        had its ids cached by another table.
+        
+        """
+        other = CategoryRepTable()
+        other.intern("something else")
+        cat = syntax_from_string("I^D/IV^DT")
+        rep_id = self.reps.category_id(cat)
+        other_id = other.category_id(cat)
+        self.assertEqual(other.reps[other_id], self.reps.reps[rep_id])
+        self.assertNotEqual(other_id, rep_id)
+        # Going back to the first table shouldn't use the other's ids
+        self.assertEqual(self.reps.category_id(cat), rep_id)
+        self.assertEqual(len(self.reps.reps), 1)
+    
+    def test_pickle(self):
+        """
+        The cached ids shouldn't be pickled with the category.
+        
+        """
+        cat = syntax_from_string("I^D/IV^DT")
+        self.reps.category_id(cat)
+        unpickled = pickle.loads(pickle.dumps(cat, -1))
+        self.assertFalse(hasattr(unpickled, '_model_cache'))
+        self.assertEqual(unpickled, cat)
+
+class TestModelTables(unittest.TestCase):
+    """
+    Tests that the model's compiled lookup tables give the same
+    probabilities as the distributions they were compiled from.
+    
+    """
+    WORDS = ["C", "G7", "Dm7", "Bb", "F#%7"]
+    
+    def setUp(self):
+        parents = CutoffFreqDist(0)
+        expansions = CutoffConditionalFreqDist(0)
+        heads = CutoffConditionalFreqDist(0)
+        non_heads = CutoffConditionalFreqDist(0)
+        words = CutoffConditionalFreqDist(0)
+        self.chordmap = get_chord_mapping()
+        
+        # Add some counts for (a few of) the possible events
+        for i,parent in enumerate(CATEGORIES):
+            parent = syntax_from_string(parent)
+            parent_rep = model_category_repr(parent)
+            parents.inc(parent_rep, i+1)
+            expansions[parent_rep].inc('leaf', i+1)
+            expansions[parent_rep].inc('right')
+            chord = category_relative_chord(Chord.from_name(self.WORDS[i % 5]),
+                                            category=parent)
+            words[parent_rep].inc("%s%s" % (chord.root_numeral,
+                                            self.chordmap[chord.type]))
+            head = syntax_from_string(CATEGORIES[(i+1) % len(CATEGORIES)])
+            head_rep = model_category_repr(head, parent)
+            heads[('right', parent_rep)].inc(head_rep, 2)
+            non_head = syntax_from_string(CATEGORIES[(i+2) % len(CATEGORIES)])
+            non_heads[(head_rep, 'right', parent_rep)].inc(
+                                    model_category_repr(non_head, parent))
+        
+        self.model = HalfspanPcfgModel("test", cat_bins=20,
+                    estimator=laplace_estimator, chordmap=self.chordmap,
+                    parent_counts=parents, expansion_type_counts=expansions,
+                    head_expansion_counts=heads,
+                    non_head_expansion_counts=non_heads,
+                    lexical_counts=words)
+    
+    def test_outside(self):
+        for cat in CATEGORIES + ["II^T", "VI^D/II^DT"]:
+            sign = _SignStub(cat)
+            self.assertEqual(self.model.outside_probability(sign),
+                self.model._parent_dist.prob(
+                                    model_category_repr(sign.category)))
+    
+    def test_other_model(self):
+        """
+        Each model has its own ids for the categories, so using a 
+        category in another model first shouldn't affect the 
+        probabilities.
+        
+        """
+        other = HalfspanPcfgModel("other", cat_bins=20,
+                    estimator=laplace_estimator, chordmap=self.chordmap)
+        for cat in reversed(CATEGORIES):
+            sign = _SignStub(cat)
+            other.outside_probability(sign)
+            self.assertEqual(self.model.outside_probability(sign),
+                self.model._parent_dist.prob(
+                                    model_category_repr(sign.category)))
+    
+    def test_leaf(self):
+        for cat in CATEGORIES + ["II^T"]:
+            sign = _SignStub(cat)
+            parent_rep = model_category_repr(sign.category)
+            for word in self.WORDS:
+                chord = category_relative_chord(Chord.from_name(word),
+                                                category=sign.category)
+                obs = self.model.chord_observation(chord)
+                prob = self.model._expansion_type_dist[parent_rep].prob('leaf') * \
+                        self.model._lexical_dist[parent_rep].prob(obs)
+                # Check twice to make sure cached values are right
+                for i in range(2):
+                    self.assertEqual(
+                        self.model.inside_probability('leaf', sign, word),
+                        prob)
+    
+    def test_binary(self):
+        model = self.model
+        for pcat in CATEGORIES:
+            parent = _SignStub(pcat)
+            parent_rep = model_category_repr(parent.category)
+            for hcat in CATEGORIES:
+                head = _SignStub(hcat)
+                head_rep = model_category_repr(head.category, parent.category)
+                for ncat in CATEGORIES:
+                    non_head = _SignStub(ncat)
+                    non_head_rep = model_category_repr(non_head.category,
+                                                       parent.category)
+                    prob = model._expansion_type_dist[parent_rep].prob('right') * \
+                        model._head_expansion_dist[('right', parent_rep)].prob(
+                                                            head_rep) * \
+                        model._non_head_expansion_dist[
+                                (head_rep, 'right', parent_rep)].prob(
+                                                            non_head_rep)
+                    for i in range(2):
+                        self.assertEqual(
+                            model.inside_probability('right', parent,
+                                                     non_head, head),
+                            prob)
+
+if __name__ == '__main__':
+    unittest.main()
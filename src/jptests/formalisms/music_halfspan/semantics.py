@@ -32,7 +32,9 @@ from jazzparser.formalisms.music_halfspan.semantics import Semantics, \
             EnharmonicCoordinate, List, semantics_from_string, ListCat, \
             Variable, FunctionApplication, Leftonto, Rightonto, \
             LambdaAbstraction, Coordination, apply, compose, \
-            list_lf_to_coordinates
+            list_lf_to_coordinates, transpose_lf, CoordinateList, \
+            PathCoordinate, lf_content_key
+from jazzparser.utils.tonalspace import root_to_et_coord
 
 class TestStringBuilder(unittest.TestCase):
     """
@@ -478,6 +480,47 @@ class TestLfToCoordinates(unittest.TestCase):
             output,times = zip(*list_lf_to_coordinates(semantics.lf))
             self.assertExpected(list(output), correct, semantics)
 
+class TestPathCache(unittest.TestCase):
+    """
+    Paths computed from a list LF are cached by the LF's content.
+    
+    """
+    LF = r"[<0,0>, leftonto(leftonto(<2,1>)), ((\$x.leftonto($x)) & (\$x.leftonto($x)) <0,0>)]"
+    
+    def test_same(self):
+        """ An identical LF should get the same path """
+        path = list_lf_to_coordinates(semantics_from_string(self.LF).lf)
+        self.assertEqual(
+            list_lf_to_coordinates(semantics_from_string(self.LF).lf), path)
+        # Callers get their own copy
+        path.append(None)
+        self.assertNotEqual(
+            list_lf_to_coordinates(semantics_from_string(self.LF).lf), path)
+    
+    def test_changed(self):
+        """ 
+        Changing the LF, even without changing its structure, should 
+        give a new path.
+        
+        """
+        sems = semantics_from_string(self.LF)
+        path = list_lf_to_coordinates(sems.lf)
+        transpose_lf(sems.lf, (1,0))
+        self.assertNotEqual(list_lf_to_coordinates(sems.lf), path)
+        
+        sems = semantics_from_string(self.LF)
+        list_lf_to_coordinates(sems.lf)
+        sems.lf[1].functor.time = 7
+        self.assertEqual(list_lf_to_coordinates(sems.lf)[1][1], 7)
+    
+    def test_key(self):
+        key = lf_content_key(semantics_from_string(self.LF).lf)
+        self.assertEqual(lf_content_key(semantics_from_string(self.LF).lf), 
+                         key)
+        self.assertNotEqual(
+                lf_content_key(semantics_from_string("[<0,0>]").lf), key)
+        self.assertEqual(hash(key), hash(key))
+
 class TestEnharmonicCoordinate(unittest.TestCase):
     """
     Tests for certain bits of 
@@ -522,3 +565,99 @@ class TestEnharmonicCoordinate(unittest.TestCase):
                  correct,
                  result))
         
+
+class TestTranspose(unittest.TestCase):
+    """
+    Tests for C{transpose_lf}.
+    
+    """
+    def test_points(self):
+        sems = semantics_from_string("[<0,0>, leftonto(<2,0>)]")
+        # Up a major third: C becomes E and D becomes F#
+        transpose_lf(sems, root_to_et_coord(4))
+        self.assertEqual(sems, semantics_from_string("[<0,1>, leftonto(<2,1>)]"))
+        
+    def test_round_trip(self):
+        for semitones in range(12):
+            sems = semantics_from_string("[<1,2>, leftonto(<3,0>)]")
+            transpose_lf(sems, root_to_et_coord(semitones))
+            transpose_lf(sems, root_to_et_coord(-semitones % 12))
+            self.assertEqual(sems, 
+                    semantics_from_string("[<1,2>, leftonto(<3,0>)]"))
+    
+    def test_path(self):
+        """
+        A backoff path should be moved as a whole, keeping the first 
+        point in its block.
+        
+        """
+        coords = [(0,0), (1,0), (2,0), (3,0), (4,0)]
+        points = [PathCoordinate.from_enharmonic_coord(
+                        EnharmonicCoordinate.from_harmonic_coord(coord)) \
+                    for coord in coords]
+        sems = Semantics(CoordinateList(items=points))
+        transpose_lf(sems, root_to_et_coord(3))
+        self.assertEqual(sems.lf[0].block_coord, (0,0))
+        self.assertEqual(sems.lf[0].zero_coord, root_to_et_coord(3))
+        first = sems.lf[0].harmonic_coord
+        for point,coord in zip(sems.lf, coords):
+            x,y = point.harmonic_coord
+            self.assertEqual((x-first[0], y-first[1]), coord)
+
+class TestVariableCache(unittest.TestCase):
+    """
+    Tests for the cached free and bound variables of LFs, which must 
+    be kept up to date as the LF changes.
+    
+    """
+    def _vars(self, *names):
+        return frozenset(semantics_from_string("$%s" % name).lf \
+                                                    for name in names)
+    
+    def test_sets(self):
+        sems = semantics_from_string("\\$x.(($x $y) \\$z.$z)")
+        self.assertEqual(sems.lf.get_free_variable_set(), self._vars("y"))
+        self.assertEqual(sems.lf.get_bound_variable_set(), 
+                         self._vars("x", "z"))
+        self.assertEqual(sems.lf.expression.get_free_variable_set(), 
+                         self._vars("x", "y"))
+    
+    def test_replace(self):
+        sems = semantics_from_string("\\$x.($x $y)")
+        app = sems.lf.expression
+        self.assertEqual(sems.lf.get_free_variable_set(), self._vars("y"))
+        # Replace $y with something containing another variable
+        app.argument.replace_in_parent(semantics_from_string("($w <0,0>)").lf)
+        self.assertEqual(sems.lf.get_free_variable_set(), self._vars("w"))
+        self.assertEqual(app.get_free_variable_set(), self._vars("x", "w"))
+        # Rename the bound variable
+        sems.lf.alpha_convert(semantics_from_string("$x").lf, 
+                              semantics_from_string("$v").lf)
+        self.assertEqual(sems.lf.get_bound_variable_set(), self._vars("v"))
+        self.assertEqual(app.get_free_variable_set(), self._vars("v", "w"))
+    
+    def test_list(self):
+        sems = semantics_from_string("\\$x.[<0,0>, $x]")
+        self.assertEqual(sems.lf.expression.get_free_variable_set(), 
+                         self._vars("x"))
+        sems.lf.expression.append(semantics_from_string("$y").lf)
+        self.assertEqual(sems.lf.get_free_variable_set(), self._vars("y"))
+        sems.lf.expression.pop(1)
+        self.assertEqual(sems.lf.expression.get_free_variable_set(), 
+                         self._vars("y"))
+    
+    def test_capture(self):
+        """
+        Substituting an expression into an abstraction over one of its 
+        free variables should rename the abstracted variable.
+        
+        """
+        fn = semantics_from_string("\\$x,$y.($x $y)")
+        result = apply(fn, semantics_from_string("$y"))
+        self.assertIsInstance(result.lf, LambdaAbstraction)
+        self.assertNotEqual(result.lf.variable, semantics_from_string("$y").lf)
+        self.assertEqual(result.lf.get_free_variable_set(), self._vars("y"))
+        self.assertEqual(result.lf.expression.argument, result.lf.variable)
+
+if __name__ == '__main__':
+    unittest.main()
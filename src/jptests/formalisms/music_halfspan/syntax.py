@@ -31,10 +31,13 @@ categories.
 """
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
-import unittest, os
+import unittest, os, copy
+import cPickle as pickle
 
 from jazzparser.formalisms.music_halfspan.syntax import syntax_from_string, \
-            AtomicCategory, ComplexCategory
+            AtomicCategory, ComplexCategory, sign_from_string, HalfCategory
+from jazzparser.formalisms.music_halfspan.semantics import Leftonto
+from jazzparser.grammar import get_grammar
 
 class TestStringBuilder(unittest.TestCase):
     """
@@ -74,3 +77,68 @@ class TestStringBuilder(unittest.TestCase):
     def test_complex_modality(self):
         cat = syntax_from_string(r"V^D /{c} I^TD")
         self.assertIsInstance(cat, ComplexCategory)
+    
+class TestSlots(unittest.TestCase):
+    """
+    Signs, categories and LFs use slots instead of instance dicts. 
+    They should still pickle and copy as they did before.
+    
+    """
+    SIGN = r"V^D /{c} I^TD : \$x.leftonto($x)"
+    
+    def _nodes(self, sign):
+        """ All the category and LF objects in a sign. """
+        nodes = [sign, sign.category, sign.category.slash, 
+                 sign.category.result, sign.category.argument]
+        todo = [sign.semantics.lf]
+        while todo:
+            lf = todo.pop()
+            nodes.append(lf)
+            todo.extend(lf.get_children())
+        return nodes
+    
+    def test_no_dict(self):
+        for obj in self._nodes(sign_from_string(self.SIGN)):
+            self.assertFalse(hasattr(obj, '__dict__'), 
+                             msg="%s has a dict" % type(obj).__name__)
+    
+    def test_pickle(self):
+        sign = sign_from_string(self.SIGN)
+        sign.tag = "V7"
+        for protocol in [0, 2]:
+            loaded = pickle.loads(pickle.dumps(sign, protocol))
+            self.assertEqual(loaded, sign)
+            self.assertEqual(loaded.tag, "V7")
+            self.assertIs(loaded.semantics.lf.parent, loaded.semantics)
+    
+    def test_copy(self):
+        sign = sign_from_string(self.SIGN)
+        for copied in [sign.copy(), copy.deepcopy(sign)]:
+            self.assertEqual(copied, sign)
+            self.assertIsNot(copied.category, sign.category)
+    
+    def test_old_state(self):
+        """ 
+        Objects pickled when they had dicts should load with their old 
+        state.
+        
+        """
+        half = HalfCategory.__new__(HalfCategory)
+        half.__setstate__({'root' : 7, 'functions' : set(['D'])})
+        self.assertEqual(half, HalfCategory("V", "D"))
+        
+        pred = Leftonto.__new__(Leftonto)
+        pred.__setstate__({'name' : "leftonto", 'parent' : None, 
+                           '_time' : 4, '_duration' : None})
+        self.assertEqual(pred.time, 4)
+        self.assertIsNone(pred.parent)
+        self.assertEqual(pred.get_free_variable_set(), frozenset())
+    
+    def test_rules_applied(self):
+        fapply = get_grammar().rules_by_name['appf']
+        sign = sign_from_string(self.SIGN)
+        other = sign_from_string("I^T : [<0,0>]")
+        self.assertFalse(sign.check_rule_applied(fapply, other))
+        sign.note_rule_applied(fapply, other)
+        self.assertTrue(sign.check_rule_applied(fapply, other))
+        self.assertFalse(sign.check_rule_applied(fapply, sign))
@@ -33,7 +33,8 @@ I'm not going into a lot of depth on testing other things.
 __author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
 
 import unittest, warnings
-from jazzparser.grammar import Grammar, get_grammar, MorphItem
+from jazzparser.grammar import Grammar, get_grammar, MorphItem, \
+                        GrammarLookupError
 from jptests import prepare_db_input
 
 class TestGrammar(unittest.TestCase):
@@ -123,6 +124,37 @@ class TestGrammar(unittest.TestCase):
                 # Should get a sign or None
                 sign = g.get_sign_for_word_by_tag(chord, tag)
 
+    def test_get_tags_for_word(self):
+        """
+        The tags given by get_tags_for_word should be exactly those for 
+        which a sign can be got.
+        
+        @see: L{jazzparser.grammar.Grammar.get_tags_for_word}
+        
+        """
+        g = Grammar()
+        for chord in self.dbinput.chords[:10]:
+            tags = set([tag for tag in g.pos_tags if \
+                        g.get_sign_for_word_by_tag(chord, tag) is not None])
+            self.assertEqual(g.get_tags_for_word(chord), tags)
+    
+    def test_missing_family(self):
+        """
+        Looking up a word whose POS has no family should fail in the same 
+        way whether we get the tags or the signs.
+        
+        """
+        g = Grammar()
+        chord = self.dbinput.chords[0]
+        pos = g.morph_items["X%s" % chord.type][0].pos
+        del g.families[pos]
+        self.assertRaises(GrammarLookupError, g.get_signs_for_word, chord)
+        self.assertRaises(GrammarLookupError, g.get_tags_for_word, chord)
+        # It's only a problem if that tag is requested
+        others = [tag for tag in g.pos_tags if tag != pos]
+        g.get_signs_for_word(chord, tags=others)
+        self.assertFalse(pos in g.get_tags_for_word(chord, tags=others))
+    
     def test_tag_to_function(self):
         """
         Try getting a function for every tag and check it's in the 
@@ -0,0 +1,67 @@
+"""Unit tests for jazzparser.harmonical.files
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os, tempfile, shutil, wave
+import numpy
+
+from jazzparser.harmonical.files import SoundFile, samples_to_data
+
+class TestSoundFile(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def _read(self, filename):
+        infile = wave.open(filename, 'rb')
+        try:
+            return list(numpy.fromstring(
+                        infile.readframes(infile.getnframes()), '<i2'))
+        finally:
+            infile.close()
+    
+    def test_data(self):
+        self.assertEqual(samples_to_data([1, -2.7, 40000]), 
+                         "\x01\x00\xfe\xff\xff\x7f")
+    
+    def test_save(self):
+        filename = os.path.join(self.dir, "test.wav")
+        sound = SoundFile(filename)
+        sound.set_signal(numpy.arange(-1000, 1000.0))
+        sound.add_silence(0.001)
+        sound.save()
+        self.assertEqual(self._read(filename), range(-1000, 1000) + [0]*44)
+    
+    def test_stream(self):
+        filename = os.path.join(self.dir, "test.wav")
+        SoundFile(filename).stream(
+                    numpy.arange(i*100, (i+1)*100) for i in range(10))
+        self.assertEqual(self._read(filename), range(1000))
+
+if __name__ == '__main__':
+    unittest.main()
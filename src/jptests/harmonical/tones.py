@@ -0,0 +1,100 @@
+"""Unit tests for jazzparser.harmonical.tones
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest
+import numpy
+
+from jazzparser.harmonical.tones import ToneMatrix, SineToneEvent, \
+            MultiSineToneEvent, apply_envelope, sum_signals, normalize, \
+            fade_in_out_envelope, MAX_SAMPLE
+
+class TestSignals(unittest.TestCase):
+    def test_apply_envelope(self):
+        # Each envelope value should cover an equal part of the wave
+        wave = apply_envelope([1.0]*6, [0.0, 0.5, 1.0])
+        self.assertEqual(list(wave), [0.0, 0.0, 0.5, 0.5, 1.0, 1.0])
+    
+    def test_sum_signals(self):
+        wave = sum_signals([[1.0, 2.0, -4.0], [1.0, 0.0, 2.0, 5.0]], norm=1.0)
+        # Cut to the shortest signal and normalized
+        self.assertEqual(list(wave), 
+                    [MAX_SAMPLE, MAX_SAMPLE, -MAX_SAMPLE])
+    
+    def test_normalize(self):
+        wave = normalize([0.5, -2.0, 1.0], level=0.5)
+        self.assertEqual(list(wave), 
+                    [MAX_SAMPLE/8.0, -MAX_SAMPLE/2.0, MAX_SAMPLE/4.0])
+        # Silence should stay silent
+        self.assertEqual(list(normalize([0.0, 0.0])), [0.0, 0.0])
+        self.assertEqual(len(normalize([])), 0)
+
+class TestToneMatrix(unittest.TestCase):
+    def setUp(self):
+        self.matrix = ToneMatrix(sample_rate=1000)
+        self.matrix.add_tone(0.5, SineToneEvent(440, duration=1.0, 
+                                        envelope=fade_in_out_envelope()))
+        self.matrix.add_tone(1.0, MultiSineToneEvent(duration=1.2, 
+                                        tones=[(220, 1.0), (330, 0.5)]))
+        # Two tones at the same time
+        self.matrix.add_tone(1.0, SineToneEvent(550, duration=0.1))
+    
+    def test_render(self):
+        samples = self.matrix.render()
+        # Should end when the last tone does
+        self.assertEqual(len(samples), self.matrix.get_num_samples())
+        self.assertEqual(len(samples), 2200)
+        # Nothing before the first tone
+        self.assertTrue((samples[:500] == 0.0).all())
+        self.assertAlmostEqual(numpy.abs(samples).max(), MAX_SAMPLE)
+        
+        # Check the mixing against adding up each tone by hand
+        mixed = numpy.zeros(2200)
+        for start,tone in [(500, SineToneEvent(440, duration=1.0, 
+                                        envelope=fade_in_out_envelope())),
+                           (1000, MultiSineToneEvent(duration=1.2, 
+                                        tones=[(220, 1.0), (330, 0.5)])),
+                           (1000, SineToneEvent(550, duration=0.1))]:
+            tone_samples = tone.get_samples(1000)
+            mixed[start:start+len(tone_samples)] += tone_samples
+        self.assertTrue(numpy.allclose(samples, normalize(mixed, level=1.0)))
+    
+    def test_render_chunks(self):
+        """ Rendering in chunks should give the same as all at once """
+        samples = self.matrix.render()
+        for chunk_size in [1, 300, 500, 2200, 5000]:
+            chunks = list(self.matrix.render_chunks(chunk_size=chunk_size))
+            self.assertTrue(all(len(chunk) == chunk_size \
+                                for chunk in chunks[:-1]))
+            self.assertTrue(numpy.allclose(numpy.concatenate(chunks), samples))
+    
+    def test_empty(self):
+        matrix = ToneMatrix()
+        self.assertEqual(len(matrix.render()), 0)
+        self.assertEqual(list(matrix.render_chunks()), [])
+
+if __name__ == '__main__':
+    unittest.main()
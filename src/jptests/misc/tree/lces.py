@@ -0,0 +1,126 @@
+"""Unit tests for jazzparser.misc.tree.lces.
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
+
+import unittest, random
+from jazzparser.misc.tree.datastructs import Node, ImmutableTree
+from jazzparser.misc.tree import lces as lces_module
+from jazzparser.misc.tree.lces import lces_size, lces, recursive_lces_size, \
+                    recursive_lces
+
+def _random_tree(size):
+    nodes = [Node.unode()]
+    for i in range(size):
+        child = Node.unode()
+        random.choice(nodes).children.append(child)
+        nodes.append(child)
+    return ImmutableTree(nodes[0])
+
+class TestLces(unittest.TestCase):
+    def setUp(self):
+        self.tree1 = ImmutableTree(
+                    Node("root", 
+                        Node("leaf1"),
+                        Node("A", 
+                            Node("leaf2"),
+                            Node("leaf3")
+                        ),
+                        Node("B",
+                            Node("leaf4"),
+                            Node("C", 
+                                Node("leaf5"),
+                                Node("leaf6")
+                            )
+                        )
+                    ))
+        self.tree2 = ImmutableTree(
+                    Node("root", 
+                        Node("A", 
+                            Node("leaf2"),
+                            Node("C", 
+                                Node("leaf5")
+                            ),
+                        ),
+                    ))
+    
+    def test_identical(self):
+        """ The LCES of a tree with itself is the whole tree. """
+        # The size doesn't count the root
+        self.assertEqual(lces_size(self.tree1, self.tree1), 
+                         len(self.tree1) - 1)
+        self.assertEqual(len(lces(self.tree1, self.tree1)), len(self.tree1))
+    
+    def test_empty(self):
+        """ Nothing is shared with a tree with no nodes below the root. """
+        empty = ImmutableTree(Node("root"))
+        self.assertEqual(lces_size(self.tree1, empty), 0)
+        self.assertEqual(lces_size(empty, self.tree1), 0)
+        self.assertEqual(len(lces(empty, self.tree1)), 1)
+    
+    def test_embedded(self):
+        """
+        The second tree can be embedded in the first, so the LCES should 
+        be the second tree.
+        
+        """
+        self.assertEqual(lces_size(self.tree1, self.tree2), 
+                         len(self.tree2) - 1)
+        self.assertEqual(str(lces(self.tree1, self.tree2)), ".(.(. .(.)))")
+    
+    def test_recursive(self):
+        """
+        Compare the iterative implementation to the original recursive one 
+        on some random trees.
+        
+        """
+        random.seed(0)
+        for i in range(50):
+            tree1 = _random_tree(random.randint(0, 10))
+            tree2 = _random_tree(random.randint(0, 10))
+            self.assertEqual(lces_size(tree1, tree2), 
+                             recursive_lces_size(tree1, tree2))
+            self.assertEqual(str(lces(tree1, tree2)), 
+                             str(recursive_lces(tree1, tree2)))
+    
+    def test_large_problem(self):
+        """
+        Problems too big for the full table should be computed only over 
+        the reachable pairs and give the same results.
+        
+        """
+        random.seed(1)
+        trees = [(_random_tree(random.randint(0, 10)), 
+                  _random_tree(random.randint(0, 10))) for i in range(50)]
+        expected = [(lces_size(tree1, tree2), str(lces(tree1, tree2))) \
+                                                for (tree1,tree2) in trees]
+        max_cells = lces_module.MAX_TABLE_CELLS
+        lces_module.MAX_TABLE_CELLS = 0
+        try:
+            for (tree1,tree2),(size,tree) in zip(trees, expected):
+                self.assertEqual(lces_size(tree1, tree2), size)
+                self.assertEqual(str(lces(tree1, tree2)), tree)
+        finally:
+            lces_module.MAX_TABLE_CELLS = max_cells
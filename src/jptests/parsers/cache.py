@@ -0,0 +1,203 @@
+"""Unit tests for jazzparser.parsers.cache
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os, tempfile, shutil
+
+from jazzparser.parsers.cache import ParseCache, normalize_input, \
+                            cacheable, model_filenames
+from jazzparser.data.input import ChordInput
+from jazzparser.grammar import get_grammar
+from jazzparser.formalisms.music_halfspan.syntax import sign_from_string
+from jazzparser.taggers.ngram_multi.tagger import MultiChordNgramTagger
+from jazzparser.parsers.pcfg.parser import PcfgParser
+from jazzparser.parsers.cky.parser import CkyParser
+
+class TestNormalizeInput(unittest.TestCase):
+    def test_transposed(self):
+        """ Transposed inputs should give the same key """
+        c_input,c_offset = normalize_input(
+                        ChordInput.from_string("Dm7 G7 C Am7"))
+        e_input,e_offset = normalize_input(
+                        ChordInput.from_string("F#m7 B7 E C#m7"))
+        self.assertEqual(c_input, e_input)
+        self.assertEqual(c_offset, 2)
+        self.assertEqual(e_offset, 6)
+    
+    def test_different(self):
+        """ Different chord types or durations should give different keys """
+        normalized = normalize_input(ChordInput.from_string("Dm7 G7 C"))[0]
+        self.assertNotEqual(normalized,
+                    normalize_input(ChordInput.from_string("Dm7 G C"))[0])
+        self.assertNotEqual(normalized,
+                    normalize_input(ChordInput.from_string("Dm7 G7 C C"))[0])
+        self.assertNotEqual(normalized,
+                    normalize_input(ChordInput.from_string("Dm7 G7 Db"))[0])
+    
+    def test_other_input(self):
+        self.assertEqual(normalize_input("Dm7 G7 C"), (None, None))
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.grammar = get_grammar()
+    
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+    
+    def _key(self, cache, string):
+        return cache.key(ChordInput.from_string(string),
+                         "ngram-multi", {'model' : "bigram0"},
+                         "cky", {}, None, {})
+    
+    def test_transposed(self):
+        """
+        Results stored for one input should be found for the same input
+        transposed, and transposed to match it.
+        
+        """
+        cache = ParseCache(self.dir, self.grammar)
+        # Store a result for a sequence in D
+        key,offset = self._key(cache, "Em7 A7 D")
+        cache.set(key, offset,
+                  [sign_from_string("II^T-I^T : [<2,0>, leftonto(<0,0>)]")],
+                  1.0)
+        
+        # Look it up in E
+        key,offset = self._key(cache, "F#m7 B7 E")
+        results,parse_time = cache.get(key, offset)
+        self.assertEqual(parse_time, 1.0)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].category,
+                         sign_from_string("III^T-II^T : <0,0>").category)
+        self.assertEqual(results[0].semantics,
+            sign_from_string("I^T : [<0,1>, leftonto(<2,0>)]").semantics)
+        
+        # Reopening the cache should find the same thing
+        cache = ParseCache(self.dir, self.grammar)
+        self.assertEqual(len(cache), 1)
+        self.assertIsNotNone(cache.get(key, offset))
+        # But not with different options
+        key,offset = cache.key(ChordInput.from_string("F#m7 B7 E"),
+                         "ngram-multi", {'model' : "bigram1"},
+                         "cky", {}, None, {})
+        self.assertIsNone(cache.get(key, offset))
+    
+    def test_stored_unchanged(self):
+        """ Storing results shouldn't alter them """
+        cache = ParseCache(self.dir, self.grammar)
+        sign = sign_from_string("II^T-I^T : [<2,0>, leftonto(<0,0>)]")
+        key,offset = self._key(cache, "Em7 A7 D")
+        cache.set(key, offset, [sign], 1.0)
+        self.assertEqual(sign,
+                sign_from_string("II^T-I^T : [<2,0>, leftonto(<0,0>)]"))
+    
+    def test_eviction(self):
+        """ The least recently used parses should be removed first """
+        cache = ParseCache(self.dir, self.grammar)
+        sign = sign_from_string("I^T : [<0,0>]")
+        keys = [self._key(cache, seq) for seq in ["C G7", "C F", "C Dm"]]
+        for key,offset in keys:
+            cache.set(key, offset, [sign], 1.0)
+        # Make the cache just too small for all three
+        cache.max_size = (cache.size - 1) / 1024.0 / 1024
+        # Use the first one, so the second is the least recently used
+        cache.get(*keys[0])
+        cache.evict()
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(len(os.listdir(self.dir)), 2)
+        self.assertIsNotNone(cache.get(*keys[0]))
+        self.assertIsNone(cache.get(*keys[1]))
+        self.assertIsNotNone(cache.get(*keys[2]))
+
+    def test_model_changed(self):
+        """
+        Parses stored with one version of a model shouldn't be used once 
+        the model file has changed.
+        
+        """
+        cache = ParseCache(self.dir, self.grammar)
+        model_file = os.path.join(self.dir, "model.mdl")
+        open(model_file, 'w').close()
+        def _key():
+            return cache.key(ChordInput.from_string("C G7"),
+                         "ngram-multi", {'model' : "bigram"},
+                         "cky", {}, None, {}, model_files=[model_file])
+        key,offset = _key()
+        cache.set(key, offset, [sign_from_string("I^T : [<0,0>]")], 1.0)
+        self.assertIsNotNone(cache.get(*_key()))
+        # "Retrain" the model
+        mtime = os.path.getmtime(model_file) + 10
+        os.utime(model_file, (mtime, mtime))
+        self.assertIsNone(cache.get(*_key()))
+
+class TestModelFilenames(unittest.TestCase):
+    def test_components(self):
+        """ Model files of the tagger, PCFG parser and partitions """
+        grammar = get_grammar()
+        PcfgModel = grammar.formalism.PcfgModel
+        TaggerModel = MultiChordNgramTagger.MODEL_CLASS
+        self.assertEqual(
+            model_filenames(grammar, 
+                            MultiChordNgramTagger, {'model' : "bigram"}, 
+                            PcfgParser, {'model' : "pcfg", 'partition' : 2},
+                            None, {}),
+            [TaggerModel.get_filename("bigram"), 
+             PcfgModel.get_filename("pcfg2")])
+        # The CKY parser doesn't load a model
+        self.assertEqual(
+            model_filenames(grammar, 
+                            MultiChordNgramTagger, 
+                            {'model' : "bigram", 'partition' : 0}, 
+                            CkyParser, {}, None, {}),
+            [TaggerModel.get_filename("bigram0")])
+
+class TestCacheable(unittest.TestCase):
+    def _response(self, **kwargs):
+        response = {
+            'results' : [sign_from_string("I^T : [<0,0>]")],
+            'timed_out' : False,
+            'limit_exceeded' : None,
+        }
+        response.update(kwargs)
+        return response
+    
+    def test_complete(self):
+        self.assertTrue(cacheable(self._response()))
+    
+    def test_error(self):
+        self.assertFalse(cacheable(self._response(results=None)))
+    
+    def test_timed_out(self):
+        self.assertFalse(cacheable(self._response(timed_out=True)))
+    
+    def test_limit_exceeded(self):
+        """ Parses abandoned at a resource limit shouldn't be stored """
+        self.assertFalse(cacheable(self._response(limit_exceeded="max_memory")))
+        self.assertFalse(cacheable(self._response(limit_exceeded="max_edges")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+"""Unit tests for jazzparser.parsers.cky.parallel
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest
+
+from jazzparser.parsers.cky import parallel, parser as cky_parser
+from jazzparser.parsers.cky.parser import ParserResourceLimit
+from jazzparser.parsers.loader import get_parser
+from jazzparser.data.input import ChordInput
+from jazzparser.grammar import get_grammar
+from jazzparser.taggers.loader import get_tagger
+from jazzparser.utils.base import ExecutionTimer, process_memory
+from jazzparser.utils.loggers import create_dummy_logger
+
+INPUT = "Dm7 G7 C Am7 Dm7 G7 C Em7 A7 Dm7 G7 C"
+TAGGER_OPTIONS = {'model' : "bigram0"}
+
+class _ExpiredTimer(ExecutionTimer):
+    """ A timer that reports that an hour has always passed """
+    def get_time(self):
+        return 3600
+
+@unittest.skipUnless(parallel.parallel_available(), 
+                     "can't fill the chart in parallel here")
+class TestParallelFill(unittest.TestCase):
+    """
+    Filling the chart in parallel should give exactly the same chart as 
+    filling it in a single process.
+    
+    """
+    def setUp(self):
+        # Fill every diagonal in parallel, however small
+        self.min_pairs = parallel.MIN_PARALLEL_PAIRS
+        parallel.MIN_PARALLEL_PAIRS = 0
+    
+    def tearDown(self):
+        parallel.MIN_PARALLEL_PAIRS = self.min_pairs
+    
+    def _parse(self, parser_name, options):
+        grammar = get_grammar()
+        tagger = get_tagger("ngram-multi")(grammar, 
+                    ChordInput.from_string(INPUT), options=TAGGER_OPTIONS)
+        parser = get_parser(parser_name)(grammar, tagger, options=options, 
+                                         logger=create_dummy_logger())
+        results = parser.parse()
+        chart = parser.chart
+        cells = [[(str(sign), getattr(sign, 'probability', None)) \
+                        for sign in chart.get_signs(start, end)] \
+                    for start in range(len(chart)) \
+                    for end in range(start+1, len(chart)+1)]
+        return [str(result) for result in results], cells, parser.stats, \
+                parser.timed_out, parser.limit_exceeded
+    
+    def _compare(self, parser_name, options):
+        serial = self._parse(parser_name, dict(options, stats=True))
+        parallel = self._parse(parser_name, 
+                               dict(options, stats=True, processes=3))
+        self.assertTrue(len(serial[0]) > 0)
+        self.assertEqual(parallel[0], serial[0])
+        self.assertEqual(parallel[1], serial[1])
+        self.assertEqual(parallel[2].rule_attempts, serial[2].rule_attempts)
+        self.assertEqual(parallel[2].beam_cells, serial[2].beam_cells)
+        self.assertEqual(parallel[2].merged_signs, serial[2].merged_signs)
+    
+    def test_cky(self):
+        self._compare("cky", {})
+    
+    def test_pcfg(self):
+        self._compare("pcfg", {'model' : "chords0"})
+    
+    def test_rules_noted(self):
+        """
+        Rule applications done in the workers should be noted on the 
+        signs in the main process, so they're not done again in later 
+        iterations.
+        
+        """
+        serial = self._parse("cky", {'min_iter' : 3, 'stats' : True})
+        parallel = self._parse("cky", 
+                        {'min_iter' : 3, 'stats' : True, 'processes' : 3})
+        self.assertEqual(parallel[1], serial[1])
+        self.assertEqual(parallel[2].rule_attempts, serial[2].rule_attempts)
+    
+    def _compare_abandoned(self, options, limit):
+        """
+        A parallel parse should be abandoned at the same limits as a 
+        serial one.
+        
+        """
+        serial = self._parse("cky", options)
+        parallel = self._parse("cky", dict(options, processes=3))
+        self.assertTrue(serial[3])
+        self.assertEqual(serial[4], limit)
+        self.assertTrue(parallel[3])
+        self.assertEqual(parallel[4], limit)
+        self.assertEqual(parallel[0], serial[0])
+    
+    def test_max_cell_signs(self):
+        # Take more signs from the tagger, so some cells get more than one
+        self._compare_abandoned({'max_cell_signs' : 1, 'min_iter' : 3}, 
+                                'max_cell_signs')
+    
+    def test_max_signs(self):
+        # The full chart has 40 signs
+        self._compare_abandoned({'max_signs' : 30}, 'max_signs')
+    
+    @unittest.skipIf(process_memory() is None, 
+                     "can't measure memory use here")
+    def test_max_memory(self):
+        self._compare_abandoned({'max_memory' : 1}, 'max_memory')
+    
+    def test_timeout(self):
+        timer = cky_parser.ExecutionTimer
+        cky_parser.ExecutionTimer = _ExpiredTimer
+        try:
+            self._compare_abandoned({'timeout' : 1}, None)
+        finally:
+            cky_parser.ExecutionTimer = timer
+    
+    def test_worker_check(self):
+        """
+        An exception raised by the check in a worker should be raised 
+        in the main process.
+        
+        """
+        grammar = get_grammar()
+        tagger = get_tagger("ngram-multi")(grammar, 
+                    ChordInput.from_string(INPUT), options=TAGGER_OPTIONS)
+        parser = get_parser("cky")(grammar, tagger, options={}, 
+                                   logger=create_dummy_logger())
+        parser.parse()
+        
+        def _check(start, end, other_signs, complete):
+            if start == 1:
+                raise ParserResourceLimit('max_signs', 2, 1)
+        
+        try:
+            list(parallel.parallel_fill_diagonal(parser.chart, 2, 3, 
+                                                 check=_check))
+        except ParserResourceLimit, err:
+            self.assertEqual(err.limit, 'max_signs')
+            self.assertEqual((err.value, err.maximum), (2, 1))
+        else:
+            self.fail("the worker's exception wasn't raised")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""Unit tests for jazzparser.parsers.cky.parser
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+
+import unittest
+
+from jazzparser.parsers.cky import parser as cky_parser
+from jazzparser.parsers.loader import get_parser
+from jazzparser.data.input import ChordInput
+from jazzparser.grammar import get_grammar
+from jazzparser.taggers.loader import get_tagger
+from jazzparser.utils.base import ExecutionTimer, process_memory
+from jazzparser.utils.loggers import create_dummy_logger
+
+INPUT = "Dm7 G7 C Am7 Dm7 G7 C"
+TAGGER_OPTIONS = {'model' : "bigram0"}
+
+class _ExpiredTimer(ExecutionTimer):
+    """ A timer that reports that an hour has always passed """
+    def get_time(self):
+        return 3600
+
+class TestLimits(unittest.TestCase):
+    """
+    The parser should abandon the parse when the chart exceeds one of 
+    its resource limits, or the timeout expires, and report which it was.
+    
+    """
+    def _parse(self, options):
+        grammar = get_grammar()
+        tagger = get_tagger("ngram-multi")(grammar, 
+                    ChordInput.from_string(INPUT), options=TAGGER_OPTIONS)
+        parser = get_parser("cky")(grammar, tagger, options=options, 
+                                   logger=create_dummy_logger())
+        results = parser.parse()
+        return parser, [str(result) for result in results]
+    
+    def _check_abandoned(self, options, limit):
+        parser, results = self._parse(options)
+        self.assertTrue(parser.timed_out)
+        self.assertEqual(parser.limit_exceeded, limit)
+        return results
+    
+    def test_unlimited(self):
+        parser, results = self._parse({})
+        self.assertFalse(parser.timed_out)
+        self.assertEqual(parser.limit_exceeded, None)
+        self.assertTrue(len(results) > 0)
+    
+    def test_within_limits(self):
+        """ Limits that aren't reached shouldn't change the result """
+        parser, results = self._parse({})
+        limited, limited_results = self._parse({
+                'max_cell_signs' : 100000, 
+                'max_signs' : 1000000, 
+                'max_memory' : 1000000, 
+                'timeout' : 60 })
+        self.assertFalse(limited.timed_out)
+        self.assertEqual(limited.limit_exceeded, None)
+        self.assertEqual(limited_results, results)
+    
+    def test_max_cell_signs(self):
+        # Take more signs from the tagger, so some cells get more than one. 
+        # Parses found before the limit was reached are kept
+        self._check_abandoned({'max_cell_signs' : 1, 'min_iter' : 3}, 
+                              'max_cell_signs')
+    
+    def test_max_signs(self):
+        results = self._check_abandoned({'max_signs' : 1}, 'max_signs')
+        self.assertEqual(results, [])
+    
+    @unittest.skipIf(process_memory() is None, 
+                     "can't measure memory use here")
+    def test_max_memory(self):
+        results = self._check_abandoned({'max_memory' : 1}, 'max_memory')
+        self.assertEqual(results, [])
+    
+    def test_timeout(self):
+        timer = cky_parser.ExecutionTimer
+        cky_parser.ExecutionTimer = _ExpiredTimer
+        try:
+            results = self._check_abandoned({'timeout' : 1}, None)
+        finally:
+            cky_parser.ExecutionTimer = timer
+        self.assertEqual(results, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Unit tests for jazzparser.parsers.cky.stats
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, json
+
+from jazzparser.parsers.cky.stats import ChartStats
+
+class _RuleStub(object):
+    def __init__(self, name):
+        self.internal_name = name
+
+class _ChartStub(object):
+    """ Just enough of a chart to get cell sizes from """
+    def __init__(self, sizes):
+        self.sizes = sizes
+    
+    def __len__(self):
+        return 3
+    
+    def cell_size(self, start, end):
+        return self.sizes.get((start,end), 0)
+
+class TestChartStats(unittest.TestCase):
+    def test_rules(self):
+        stats = ChartStats()
+        appf = _RuleStub("appf")
+        appb = _RuleStub("appb")
+        for success in [True, False, False, True]:
+            stats.rule_applied(appf, success)
+        stats.rule_applied(appb, False)
+        self.assertEqual(stats.rule_attempts, {"appf" : 4, "appb" : 1})
+        self.assertEqual(stats.rule_successes, {"appf" : 2})
+        self.assertEqual(stats.success_rates, {"appf" : 0.5, "appb" : 0.0})
+    
+    def test_beam(self):
+        """
+        Each cell should keep its largest size before a beam, its size 
+        after the last one and the total pruned.
+        
+        """
+        stats = ChartStats()
+        stats.beam_applied(0, 2, 10, 4)
+        stats.beam_applied(0, 2, 6, 5)
+        stats.beam_applied(1, 3, 3, 3)
+        self.assertEqual(stats.beam_cells, 
+                         {(0,2) : [10, 5, 7], (1,3) : [3, 3, 0]})
+    
+    def test_add(self):
+        """
+        Adding stats from elsewhere should be like recording them all 
+        here.
+        
+        """
+        stats = ChartStats()
+        stats.rule_applied(_RuleStub("appf"), True)
+        stats.beam_applied(0, 2, 10, 4)
+        other = ChartStats()
+        other.rule_applied(_RuleStub("appf"), False)
+        other.rule_applied(_RuleStub("appb"), True)
+        other.beam_applied(0, 2, 6, 5)
+        other.beam_applied(1, 3, 3, 3)
+        other.merged_signs = 2
+        stats.add(other)
+        self.assertEqual(stats.rule_attempts, {"appf" : 2, "appb" : 1})
+        self.assertEqual(stats.rule_successes, {"appf" : 1, "appb" : 1})
+        self.assertEqual(stats.beam_cells, 
+                         {(0,2) : [10, 5, 7], (1,3) : [3, 3, 0]})
+        self.assertEqual(stats.merged_signs, 2)
+    
+    def test_dict(self):
+        """
+        The dict form should survive JSON encoding.
+        
+        """
+        stats = ChartStats()
+        stats.rule_applied(_RuleStub("appf"), True)
+        stats.beam_applied(0, 2, 10, 4)
+        stats.record_cell_sizes(_ChartStub({(0,1) : 2, (0,2) : 4, (2,3) : 1}))
+        data = json.loads(json.dumps(stats.to_dict()))
+        self.assertEqual(data['cell_sizes'], 
+                         [[0, 1, 2], [0, 2, 4], [2, 3, 1]])
+        self.assertEqual(data['total_signs'], 7)
+        self.assertEqual(data['beam_cells'], [[0, 2, 10, 4, 6]])
+        self.assertEqual(data['rule_attempts'], {"appf" : 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Unit tests for jazzparser.parsers.pcfg.parser
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest
+
+from jazzparser.parsers.pcfg.parser import PcfgParser
+from jazzparser.data.input import ChordInput
+from jazzparser.grammar import get_grammar
+from jazzparser.taggers.loader import get_tagger
+
+INPUT = "Dm7 G7 C"
+
+class TestModelLoading(unittest.TestCase):
+    def setUp(self):
+        self.grammar = get_grammar()
+        self.tagger = get_tagger("ngram-multi")(self.grammar, 
+                    ChordInput.from_string(INPUT), options={'model' : "bigram0"})
+    
+    def test_unpartitioned(self):
+        parser = PcfgParser(self.grammar, self.tagger, 
+                            options={'model' : "chords"})
+        self.assertEqual(parser.model.model_name, "chords")
+    
+    def test_partitioned(self):
+        """ The model for the requested partition should be loaded """
+        for partition in [0, 3]:
+            parser = PcfgParser(self.grammar, self.tagger, 
+                        options={'model' : "chords", 'partition' : partition})
+            self.assertEqual(parser.model.model_name, 
+                             PcfgParser.partition_model_name("chords", partition))
+            self.assertEqual(parser.model.model_name, "chords%d" % partition)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""Unit tests for jazzparser.parsers.pcfg.sweep
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest
+
+from jazzparser.parsers.pcfg.sweep import CachedTagger, beam_sweep
+from jazzparser.parsers.pcfg.parser import PcfgParser
+from jazzparser.data.input import ChordInput
+from jazzparser.grammar import get_grammar
+from jazzparser.taggers.loader import get_tagger
+from jazzparser.utils.loggers import create_dummy_logger
+from jazzparser.utils.modelcache import model_cache_enabled
+
+INPUT = "Dm7 G7 C Am7 Dm7 G7 C"
+TAGGER_OPTIONS = {'model' : "bigram0"}
+PARSER_OPTIONS = {'model' : "chords0"}
+
+class TestCachedTagger(unittest.TestCase):
+    def test_copies(self):
+        """ The same signs should come back each time, but not the same objects """
+        grammar = get_grammar()
+        tagger = CachedTagger(get_tagger("ngram-multi")(grammar,
+                    ChordInput.from_string(INPUT), options=TAGGER_OPTIONS))
+        signs1 = tagger.get_signs(0)
+        signs2 = tagger.get_signs(0)
+        self.assertTrue(len(signs1) > 0)
+        self.assertEqual(len(signs1), len(signs2))
+        for (start1,end1,(sign1,tag1,prob1)),(start2,end2,(sign2,tag2,prob2)) \
+                                                    in zip(signs1, signs2):
+            self.assertEqual((start1,end1,tag1,prob1), (start2,end2,tag2,prob2))
+            self.assertEqual(sign1, sign2)
+            self.assertIsNot(sign1, sign2)
+        # Other attributes come from the tagger
+        self.assertEqual(tagger.input_length, 7)
+    
+    def test_fetch_all(self):
+        """ After fetch_all, getting signs shouldn't call the tagger """
+        grammar = get_grammar()
+        tagger = CachedTagger(get_tagger("ngram-multi")(grammar,
+                    ChordInput.from_string(INPUT), options=TAGGER_OPTIONS))
+        tagger.fetch_all()
+        fetched = len(tagger._signs)
+        self.assertTrue(fetched > 0)
+        # The last batch fetched is the empty one the parser stops at
+        self.assertEqual(tagger.get_signs(fetched-1), [])
+        def _fail(offset=0):
+            self.fail("tagger called after fetch_all")
+        tagger.tagger.get_signs = _fail
+        for offset in range(fetched):
+            tagger.get_signs(offset)
+        # Limited to a number of offsets
+        tagger = CachedTagger(get_tagger("ngram-multi")(grammar,
+                    ChordInput.from_string(INPUT), options=TAGGER_OPTIONS))
+        tagger.fetch_all(1)
+        self.assertEqual(tagger._signs.keys(), [0])
+
+class TestBeamSweep(unittest.TestCase):
+    def test_sweep(self):
+        """
+        Each setting should give the same as running the parser with that 
+        setting on its own.
+        
+        """
+        grammar = get_grammar()
+        tagger_cls = get_tagger("ngram-multi")
+        settings = [(0.1, 5), (0.01, 1)]
+        results = beam_sweep(grammar, [ChordInput.from_string(INPUT)], 
+                             tagger_cls, settings, 
+                             tagger_options=TAGGER_OPTIONS,
+                             parser_options=PARSER_OPTIONS)
+        self.assertEqual([(r.threshold, r.maxarc) for r in results], settings)
+        # The cache shouldn't be left on
+        self.assertFalse(model_cache_enabled())
+        
+        for (threshold,maxarc),result in zip(settings, results):
+            self.assertEqual(len(result.times), 1)
+            self.assertEqual(result.metric_stats, [None])
+            self.assertIsNone(result.accuracy(None))
+            
+            options = dict(PARSER_OPTIONS, threshold=threshold, maxarc=maxarc)
+            tagger = tagger_cls(grammar, ChordInput.from_string(INPUT), 
+                                options=TAGGER_OPTIONS)
+            parser = PcfgParser(grammar, tagger, options=options, 
+                                logger=create_dummy_logger())
+            parses = parser.parse()
+            self.assertEqual(result.chart_sizes, [parser.chart.total_signs])
+            self.assertEqual(result.parsed, [len(parses) > 0])
+    
+    def test_processes(self):
+        """ Spreading the inputs over workers should give the same results """
+        grammar = get_grammar()
+        tagger_cls = get_tagger("ngram-multi")
+        settings = [(0.1, 5), (0.01, 1)]
+        inputs = [ChordInput.from_string(INPUT), 
+                  ChordInput.from_string("C F G7 C")]
+        results = [beam_sweep(grammar, inputs, tagger_cls, settings, 
+                              tagger_options=TAGGER_OPTIONS,
+                              parser_options=PARSER_OPTIONS, 
+                              processes=processes) for processes in [1, 2]]
+        for single,multi in zip(*results):
+            self.assertEqual(single.chart_sizes, multi.chart_sizes)
+            self.assertEqual(single.parsed, multi.parsed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,188 @@
+"""Unit tests for jazzparser.server
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+
+import unittest, os, threading
+
+from jazzparser import server
+from jazzparser.server import ParseServer, ParseServerError
+
+def _values(options):
+    # Unprocessed option values as strings
+    return dict((name, str(value)) for (name,value) in options.items())
+
+class TestPrepareJob(unittest.TestCase):
+    """
+    Tests for the server's checking of requests. No workers are started.
+    
+    """
+    def setUp(self):
+        self.server = ParseServer(tagger="ngram-multi", parser="cky",
+                                  topts="model=bigram0", 
+                                  popts="max_signs=1000")
+    
+    def test_input(self):
+        job = self.server.prepare_job({'id' : 3, 'input' : "C G7 C"})
+        self.assertEqual(job[0], 3)
+        self.assertEqual(job[1], (None, "C G7 C", None))
+        self.assertEqual(_values(job[2]), {'model' : "bigram0"})
+        self.assertEqual(job[5], None)
+    
+    def test_options(self):
+        """ Request options should override the server's """
+        job = self.server.prepare_job({'input' : "C", 
+                            'parser_options' : "max_signs=10:stats=true",
+                            'tagger_options' : {'model' : "bigram1"}})
+        self.assertEqual(_values(job[2]), {'model' : "bigram1"})
+        self.assertEqual(_values(job[3]), {'max_signs' : "10", 'stats' : "true"})
+        # The server's own options shouldn't have changed
+        self.assertEqual(_values(self.server.popts), {'max_signs' : "1000"})
+        # The values should still get processed by the options' filters
+        self.assertEqual(self.server.parser_cls.check_options(job[3])['stats'],
+                         True)
+    
+    def test_errors(self):
+        for request in [
+                "C G7 C",
+                {'id' : 1},
+                {'input' : 5},
+                {'input' : "C", 'parser_options' : "nonsense=1"},
+                {'input' : "C", 'topn' : "x"},
+                {'file' : "/nonexistent/file"},
+                {'file' : __file__, 'filetype' : "bulk-db"},
+                {'file' : __file__, 'filetype' : "nonsense"}]:
+            self.assertRaises(ParseServerError, 
+                              self.server.prepare_job, request)
+
+class _ResultStub(object):
+    """ A result that can't be turned into a string """
+    probability = 0.5
+    category = "I^T"
+    
+    @property
+    def semantics(self):
+        raise ValueError, "can't output this result"
+
+class _ParserStub(object):
+    timed_out = False
+    limit_exceeded = None
+    stats = None
+    
+    def __init__(self, *args, **kwargs):
+        pass
+    
+    def parse(self):
+        return [_ResultStub()]
+
+class _FormalismStub(object):
+    def clean_results(self, results):
+        pass
+
+class _GrammarStub(object):
+    formalism = _FormalismStub()
+
+class TestParseRequest(unittest.TestCase):
+    """
+    Tests for a worker's handling of a single parse request.
+    
+    """
+    def setUp(self):
+        self.worker = server._worker.copy()
+        server._worker.update({
+            'grammar' : _GrammarStub(),
+            'tagger_cls' : lambda *args, **kwargs: None,
+            'parser_cls' : _ParserStub,
+            'backoff' : None,
+        })
+    
+    def tearDown(self):
+        server._worker.clear()
+        server._worker.update(self.worker)
+    
+    def test_output_error(self):
+        """
+        A failure in getting the results ready to send back should give 
+        an error response, so the server isn't left waiting.
+        
+        """
+        response = server._parse_request(
+                            (7, (None, "C G7 C", None), {}, {}, {}, None))
+        self.assertEqual(response['id'], 7)
+        self.assertEqual(response['status'], 'error')
+        self.assertTrue("can't output this result" in response['error'])
+
+def _die(job):
+    os._exit(1)
+
+class TestWorkers(unittest.TestCase):
+    """
+    Tests with worker processes running.
+    
+    """
+    def setUp(self):
+        self.parse_request = server._parse_request
+        self.server = ParseServer(tagger="ngram-multi", parser="cky",
+                                  topts="model=bigram0")
+    
+    def tearDown(self):
+        server._parse_request = self.parse_request
+        if self.server.pool is not None:
+            self.server.stop()
+    
+    def _parse(self, input):
+        responses = []
+        finished = threading.Event()
+        def _done(response):
+            responses.append(response)
+            finished.set()
+        self.server.submit(self.server.prepare_job({'id' : 1, 'input' : input}),
+                           _done)
+        finished.wait(60)
+        self.assertEqual(len(responses), 1)
+        return responses[0]
+    
+    def test_parse(self):
+        self.server.start()
+        response = self._parse("C G7 C")
+        self.assertEqual(response['status'], 'done')
+        self.assertTrue(len(response['results']) > 0)
+    
+    def test_dead_worker(self):
+        """
+        If a worker dies while parsing, the server should send an error 
+        instead of waiting for the response forever.
+        
+        """
+        # The workers get this when they're forked
+        server._parse_request = _die
+        self.server.start()
+        response = self._parse("C G7 C")
+        self.assertEqual(response['id'], 1)
+        self.assertEqual(response['status'], 'error')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+"""Unit tests for jazzparser.taggers.ngram.tagger
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os
+
+from jazzparser import settings
+from jazzparser.data.input import AnnotatedDbInput, DbInput
+from jazzparser.data.db_mirrors import SequenceIndex
+from jazzparser.grammar import get_grammar
+from jazzparser.taggers.ngram.tagger import NgramTagger, NgramTaggerModel, \
+                    observation_from_chord_pair
+from jazzparser.utils.base import group_pairs
+from jazzparser.utils.loggers import create_dummy_logger
+
+DB_SEQUENCES_FILE = os.path.join(settings.TEST_DATA_DIR, "dbsequences")
+
+class TestLazySigns(unittest.TestCase):
+    """
+    The tagger only instantiates signs when their batch is requested. It 
+    should return the same signs with the same probabilities as it would 
+    by instantiating a sign for every tag up front.
+    
+    """
+    def setUp(self):
+        self.grammar = get_grammar()
+        sequences = SequenceIndex.from_file(DB_SEQUENCES_FILE).sequences
+        model = NgramTaggerModel("test", options={'n' : 2})
+        model.train([AnnotatedDbInput.from_sequence(seq) for seq in \
+                                    sequences[:10]], grammar=self.grammar)
+        self.inputs = [DbInput.from_sequence(seq) for seq in sequences[10:13]]
+        
+        # Use the model we've just trained instead of loading one
+        class _TestModel(NgramTaggerModel):
+            @classmethod
+            def load_model(cls, model_name):
+                return model
+        self.model_class = NgramTagger.MODEL_CLASS
+        NgramTagger.MODEL_CLASS = _TestModel
+    
+    def tearDown(self):
+        NgramTagger.MODEL_CLASS = self.model_class
+    
+    def _eager_signs(self, tagger):
+        """
+        A (sign,tag,probability) triple for every tag that the grammar 
+        allows for each word, in the way the tagger used to build them.
+        
+        """
+        observations = [observation_from_chord_pair(c1, c2, 
+                                                    tagger.model.chordmap) \
+                    for (c1,c2) in group_pairs(tagger.input, none_final=True)]
+        probabilities = tagger.model.forward_backward_probabilities(observations)
+        word_signs = []
+        for index,probs in enumerate(probabilities):
+            features = {
+                'duration' : tagger.durations[index],
+                'time' : tagger.times[index],
+            }
+            signs = []
+            for tag in tagger.model.tags:
+                sign = self.grammar.get_sign_for_word_by_tag(
+                                tagger.input[index], tag, extra_features=features)
+                if sign is not None:
+                    signs.append((sign, tag, probs[tag]))
+            word_signs.append(signs)
+        return word_signs
+    
+    def test_signs(self):
+        for inp in self.inputs:
+            tagger = NgramTagger(self.grammar, inp, 
+                                 options={'model' : "test"}, 
+                                 logger=create_dummy_logger())
+            eager = self._eager_signs(tagger)
+            
+            # Get every batch of signs
+            lazy = [[] for word in eager]
+            offset = 0
+            while True:
+                signs = tagger.get_signs(offset)
+                if len(signs) == 0:
+                    break
+                for (start,end,triple) in signs:
+                    lazy[start].append(triple)
+                offset += 1
+            
+            for word_eager,word_lazy,tag_probs in \
+                                zip(eager, lazy, tagger._tag_probs):
+                # The tagger should have considered the same tags
+                self.assertEqual(sorted(tag for (tag,prob) in tag_probs), 
+                                 sorted(tag for (sign,tag,prob) in word_eager))
+                self.assertTrue(len(word_lazy) > 0)
+                # The batches should contain the most probable signs, 
+                #  in order of probability
+                eager_probs = sorted([prob for (sign,tag,prob) in word_eager], 
+                                     reverse=True)
+                for (prob,eager_prob) in zip(
+                        [prob for (sign,tag,prob) in word_lazy], eager_probs):
+                    self.assertAlmostEqual(prob, eager_prob)
+                # ...and the same signs as the eager version
+                eager_signs = dict((tag, (str(sign), prob)) for \
+                                        (sign,tag,prob) in word_eager)
+                for (sign,tag,prob) in word_lazy:
+                    self.assertEqual(str(sign), eager_signs[tag][0])
+                    self.assertAlmostEqual(prob, eager_signs[tag][1])
+    
+    def test_signs_cached(self):
+        """ Requesting a batch again gives the same sign objects """
+        tagger = NgramTagger(self.grammar, self.inputs[0], 
+                             options={'model' : "test"}, 
+                             logger=create_dummy_logger())
+        first = tagger.get_signs(0)
+        again = tagger.get_signs(0)
+        self.assertEqual(len(first), len(again))
+        for (start1,end1,triple1),(start2,end2,triple2) in zip(first, again):
+            self.assertIs(triple1[0], triple2[0])
+
+if __name__ == '__main__':
+    unittest.main()
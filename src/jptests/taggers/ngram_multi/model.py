@@ -0,0 +1,240 @@
+"""Unit tests for jazzparser.taggers.ngram_multi.model
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, os, numpy, random
+
+from jazzparser import settings
+from jazzparser.data.input import DbBulkInput, WeightedChordLabelInput
+from jazzparser.grammar import get_grammar
+from jazzparser.taggers.chordmap import get_chord_mapping
+from jazzparser.misc.chordlabel.data import ChordLabel
+from jazzparser.taggers.ngram_multi.model import MultiChordNgramModel, \
+                    _all_indices, lattice_to_emissions, LatticeEmissions
+from jazzparser.taggers.ngram_multi.tagger import MultiChordNgramTaggerModel
+from jazzparser.utils.nltk.ngram import NgramModel
+from jazzparser.utils.nltk.probability import laplace_estimator
+
+DB_SEQUENCES_FILE = os.path.join(settings.TEST_DATA_DIR, "dbsequences")
+
+def _train(order):
+    """ Trains a small model on a few of the test sequences """
+    sequences = list(DbBulkInput.from_file(DB_SEQUENCES_FILE))[:5]
+    chord_map = get_chord_mapping()
+    model = MultiChordNgramModel.train(sequences, get_grammar().pos_tags, 
+                    list(set(chord_map.values())), laplace_estimator, 
+                    chord_map=chord_map, order=order)
+    observations = [(chord.root, chord_map[chord.type]) for chord in \
+                                                sequences[0].chords[:5]]
+    return model, observations, chord_map
+
+def _random_lattice(chord_map, length=8, width=4):
+    """
+    A lattice of random chord labels, with a beam applied so that not 
+    every label is in every timestep.
+    
+    """
+    rand = random.Random(0)
+    chord_types = sorted(chord_map.keys())
+    lattice = WeightedChordLabelInput([
+        [(ChordLabel(rand.randrange(12), rand.choice(chord_types), None), 
+          rand.random()) for i in range(width)] for t in range(length)])
+    lattice.apply_ratio_beam(ratio=0.3)
+    return lattice
+
+def _old_factored_to_states(model, matrix):
+    """
+    The per-state conversion from the factored layout that was used 
+    before L{MultiChordNgramModel.factored_to_states}.
+    
+    """
+    N = matrix.shape[0]
+    states = model.label_dom
+    new_matrix = numpy.zeros([N]+[len(states)]*(model.order-1), numpy.float64)
+    for time in range(N):
+        for state_indices in _all_indices(model.order-1, len(states)):
+            schema_indices = [model.schemata.index(states[i][1]) \
+                                                for i in state_indices]
+            root = states[state_indices[0]][0]
+            selector = tuple([time,root]+schema_indices)
+            new_matrix[tuple([time]+state_indices)] = matrix[selector]
+    return new_matrix
+
+class TestStateLayout(unittest.TestCase):
+    """
+    The factored (root, schema, ...) matrices should be mapped onto the 
+    states in the same order as the per-state computation used to.
+    
+    """
+    def _check_map(self, order):
+        model = _train(order)[0]
+        S = len(model.schemata)
+        matrix = numpy.random.random_sample([3,12]+[S]*(order-1))
+        converted = model.factored_to_states(matrix)
+        self.assertEqual(converted.shape, 
+                         tuple([3]+[model.num_labels]*(order-1)))
+        self.assertTrue(numpy.all(converted == \
+                            _old_factored_to_states(model, matrix)))
+    
+    def test_unigram(self):
+        # Unigram matrices are just flattened
+        model = _train(1)[0]
+        matrix = numpy.random.random_sample((3, 12, len(model.schemata)))
+        self.assertTrue(numpy.all(model.factored_to_states(matrix) == \
+                            matrix.reshape(3, model.num_labels)))
+    
+    def test_bigram(self):
+        self._check_map(2)
+    
+    def test_trigram(self):
+        self._check_map(3)
+
+class TestProbabilities(unittest.TestCase):
+    """
+    The probabilities computed using the factored layout should be 
+    assigned to the same states as before.
+    
+    """
+    def setUp(self):
+        self.model, self.observations, self.chord_map = _train(2)
+    
+    def _assert_close(self, matrix1, matrix2):
+        self.assertEqual(matrix1.shape, matrix2.shape)
+        self.assertTrue(numpy.allclose(matrix1, matrix2, rtol=1e-9, atol=1e-15))
+    
+    def test_forward(self):
+        """
+        The forward probabilities should be the same as those computed by 
+        the generic ngram model, which uses a full state transition matrix.
+        
+        """
+        self._assert_close(
+            self.model.normal_forward_probabilities(self.observations), 
+            NgramModel.normal_forward_probabilities(self.model, 
+                                                    self.observations))
+    
+    def test_backward(self):
+        factored = self.model.normal_backward_probabilities(self.observations, 
+                                                            root_schema=True)
+        self._assert_close(
+            self.model.normal_backward_probabilities(self.observations), 
+            _old_factored_to_states(self.model, factored))
+    
+    def test_tag_probabilities(self):
+        """
+        The tagger's (time, root, schema) matrix should give each state 
+        the probability that the old per-state computation gave it, from 
+        the flat forward and backward matrices.
+        
+        """
+        forward = self.model.normal_forward_probabilities(self.observations)
+        backward = self.model.normal_backward_probabilities(self.observations)
+        gamma = forward * backward
+        gamma /= numpy.sum(gamma, axis=1)[:,numpy.newaxis]
+        
+        tagger_model = MultiChordNgramTaggerModel("test", model=self.model, 
+                                                  chordmap=self.chord_map)
+        matrix = tagger_model.state_probability_matrix(self.observations)
+        self.assertEqual(matrix.shape, 
+                         (len(self.observations), 12, len(self.model.schemata)))
+        for t in range(len(self.observations)):
+            for s,(root,schema) in enumerate(self.model.label_dom):
+                self.assertAlmostEqual(
+                    matrix[t, root, self.model.schemata.index(schema)], 
+                    gamma[t, s])
+        # The tagger flattens the matrix to get the states in this order
+        self._assert_close(matrix.reshape(len(self.observations), -1), gamma)
+        self._assert_close(self.model.gamma_probabilities(self.observations), 
+                           gamma)
+        
+        # Same for the forward-only version
+        forward /= numpy.sum(forward, axis=1)[:,numpy.newaxis]
+        matrix = tagger_model.state_probability_matrix(self.observations, 
+                                                       forward_only=True)
+        self._assert_close(matrix.reshape(len(self.observations), -1), forward)
+
+class TestLatticeEmissions(unittest.TestCase):
+    """
+    The model should get the same emission matrix and tag probabilities 
+    from a lattice's probability matrix as from the list of emissions 
+    in each timestep.
+    
+    """
+    def setUp(self):
+        self.model, observations, self.chord_map = _train(2)
+        self.lattice = _random_lattice(self.chord_map)
+        self.emissions = lattice_to_emissions(self.lattice, 
+                                              chord_map=self.chord_map)
+        # The list version of the same emissions
+        self.lists = [[(prob, (label.root, self.chord_map[label.label])) \
+                            for (label,prob) in timestep] \
+                                for timestep in self.lattice]
+    
+    def _assert_close(self, matrix1, matrix2):
+        self.assertEqual(matrix1.shape, matrix2.shape)
+        self.assertTrue(numpy.allclose(matrix1, matrix2, rtol=1e-9, atol=1e-15))
+    
+    def test_timesteps(self):
+        self.assertTrue(isinstance(self.emissions, LatticeEmissions))
+        self.assertEqual(len(self.emissions), len(self.lists))
+        for timestep,lst in zip(self.emissions, self.lists):
+            self.assertEqual(sorted(timestep), sorted(lst))
+        # Some labels should have been removed by the beam
+        self.assertTrue(any(len(timestep) < len(self.lattice.labels) \
+                                for timestep in self.lists))
+    
+    def test_indexing(self):
+        """ Indexing should work like it does on the list """
+        for index in [0, -1, len(self.lists)-1]:
+            self.assertEqual(sorted(self.emissions[index]), 
+                             sorted(self.lists[index]))
+        for index in [slice(1, 3), slice(None, None, 2), slice(-2, None)]:
+            self.assertEqual(
+                [sorted(timestep) for timestep in self.emissions[index]],
+                [sorted(timestep) for timestep in self.lists[index]])
+        self.assertRaises(TypeError, lambda: self.emissions["1"])
+        self.assertRaises(IndexError, 
+                          lambda: self.emissions[len(self.lists)])
+    
+    def test_emission_matrix(self):
+        matrix = self.model.get_schema_emission_matrix(self.emissions)
+        self._assert_close(matrix, 
+                           self.model.get_schema_emission_matrix(self.lists))
+        # Every timestep should have some probability
+        self.assertTrue(numpy.all(numpy.sum(matrix, axis=(1,2)) > 0.0))
+    
+    def test_tag_probabilities(self):
+        tagger_model = MultiChordNgramTaggerModel("test", model=self.model, 
+                                                  chordmap=self.chord_map)
+        for forward_only in [False, True]:
+            self._assert_close(
+                tagger_model.state_probability_matrix(self.emissions, 
+                                                forward_only=forward_only), 
+                tagger_model.state_probability_matrix(self.lists, 
+                                                forward_only=forward_only))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""Unit tests for jazzparser.taggers.segmidi.chordlabel.tagger
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+
+import unittest, random, numpy
+
+from jazzparser.data.input import WeightedChordLabelInput
+from jazzparser.misc.chordlabel.data import ChordLabel
+from jazzparser.taggers.ngram_multi.tagger import MultiChordNgramTagger
+from jazzparser.taggers.segmidi.chordlabel.tagger import ChordLabelNgramTagger
+
+class _LabelerStub(object):
+    """ Just the chord types of a chord labeling model """
+    def __init__(self, chord_types):
+        self.chord_types = chord_types
+
+class _TaggerStub(object):
+    """ Just the model of a supertagger """
+    def __init__(self, model):
+        self.model = model
+
+class TestLexicalProbabilities(unittest.TestCase):
+    """
+    The lexical probabilities computed from the lattice's probability 
+    matrix should be the same as those from summing over the chords in 
+    each timestep of the lattice.
+    
+    """
+    def setUp(self):
+        model = MultiChordNgramTagger.MODEL_CLASS.load_model("bigram0")
+        chord_types = sorted(model.chordmap.keys())
+        
+        rand = random.Random(0)
+        lattice = WeightedChordLabelInput([
+            [(ChordLabel(rand.randrange(12), rand.choice(chord_types), None), 
+              rand.random()) for i in range(4)] for t in range(10)])
+        lattice.apply_ratio_beam(ratio=0.3)
+        for label in lattice.labels:
+            label.model_label = label.label
+        
+        # Build the tagger without running a labeling model
+        tagger = ChordLabelNgramTagger.__new__(ChordLabelNgramTagger)
+        tagger.labeler = _LabelerStub(chord_types)
+        tagger.lattice = lattice
+        tagger.tagger = _TaggerStub(model)
+        tagger.labeler_emission_matrix = numpy.array(
+                    [[[rand.random() for chord_type in chord_types] \
+                            for root in range(12)] \
+                        for t in range(len(lattice))])
+        tagger._prepare_lattice_emissions()
+        self.tagger = tagger
+        self.states = [(root, schema) for root in range(12) \
+                                    for schema in model.model.schemata[:4]]
+    
+    def _old_single_step(self, time, state):
+        """
+        The lexical probability for a single timestep, computed from the 
+        list of chords in the lattice, as it used to be.
+        
+        """
+        tagger = self.tagger
+        prob = 0.0
+        for (chord,chord_prob) in tagger.lattice[time]:
+            chord_label = tagger.labeler.chord_types.index(chord.model_label)
+            chord_em_prob = tagger.labeler_emission_matrix[time, chord.root, 
+                                                           chord_label]
+            tagger_label = tagger.tagger.model.chordmap[chord.label]
+            tagger_em_prob = tagger.tagger.model.model.emission_probability(
+                                        (chord.root,tagger_label), state)
+            prob += chord_em_prob * tagger_em_prob
+        return prob
+    
+    def _assert_close(self, prob, old):
+        self.assertTrue(abs(prob - old) <= 1e-9 * old, "%s != %s" % (prob, old))
+    
+    def test_single_step(self):
+        nonzero = 0
+        for state in self.states:
+            for time in range(len(self.tagger.lattice)):
+                old = self._old_single_step(time, state)
+                self._assert_close(
+                    self.tagger.single_step_lexical_probability(time, state), 
+                    old)
+                if old > 0.0:
+                    nonzero += 1
+        self.assertTrue(nonzero > 0)
+    
+    def test_span(self):
+        T = len(self.tagger.lattice)
+        nonzero = 0
+        for state in self.states:
+            for start in range(T):
+                for end in range(start+1, min(start+4, T+1)):
+                    old = 1.0
+                    for time in range(start, end):
+                        old *= self._old_single_step(time, state)
+                    if old > 0.0:
+                        nonzero += 1
+                    self._assert_close(
+                        self.tagger.lexical_probability(start, end, state), 
+                        old)
+        self.assertTrue(nonzero > 0)
+
+if __name__ == '__main__':
+    unittest.main()
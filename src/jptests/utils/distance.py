@@ -0,0 +1,81 @@
+"""Unit tests for jazzparser.utils.distance
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
+
+import unittest
+from jazzparser.utils.distance import levenshtein_distance, \
+                    levenshtein_distance_with_pointers, align, \
+                    local_levenshtein_distance, subst_cost_matrix
+
+class TestLevenshteinDistance(unittest.TestCase):
+    """
+    Tests for the edit distance functions, checking that the cost function 
+    and the precomputed cost matrix give the same results.
+    
+    """
+    def setUp(self):
+        self.seq1 = list("kitten")
+        self.seq2 = list("sitting")
+        self.cost_fun = lambda x,y: 0 if x==y else 1
+    
+    def test_distance(self):
+        self.assertEqual(levenshtein_distance(self.seq1, self.seq2), 3)
+        self.assertEqual(levenshtein_distance(self.seq1, []), 6)
+        self.assertEqual(levenshtein_distance(self.seq1, self.seq2, 
+                                              delins_cost=2), 6)
+    
+    def test_cost_matrix(self):
+        costs = subst_cost_matrix(self.seq1, self.seq2, self.cost_fun)
+        self.assertEqual(costs.shape, (6, 7))
+        self.assertEqual(
+            levenshtein_distance(self.seq1, self.seq2, subst_costs=costs),
+            levenshtein_distance(self.seq1, self.seq2, 
+                                 subst_cost_fun=self.cost_fun))
+        self.assertEqual(
+            levenshtein_distance_with_pointers(self.seq1, self.seq2, 
+                                               subst_costs=costs),
+            levenshtein_distance_with_pointers(self.seq1, self.seq2, 
+                                               subst_cost_fun=self.cost_fun))
+        # Matrix of the wrong shape
+        self.assertRaises(ValueError, levenshtein_distance, 
+                          self.seq1, self.seq2, subst_costs=costs[1:])
+    
+    def test_align(self):
+        alignment,dist = align(self.seq1, self.seq2, dist=True)
+        self.assertEqual(dist, 3)
+        self.assertEqual(alignment, [
+            ('k','s'), ('i','i'), ('t','t'), ('t','t'), 
+            ('e','i'), ('n','n'), (None,'g')])
+    
+    def test_local(self):
+        dists,pointers = local_levenshtein_distance(list("xxabcyy"), 
+                                                    list("abc"))
+        self.assertEqual(dists[-1][-1], 0)
+        self.assertEqual(pointers[-1][-1], '.')
+        self.assertEqual([row[0] for row in pointers], ['I'] + ['.']*7)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+"""Unit tests for jazzparser.utils.midi
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, random
+from midi import EventStream, NoteOnEvent
+
+from jazzparser.utils.midi import note_on_similarity, note_on_shingles, \
+            MidiFingerprintIndex
+
+def _make_stream(notes, resolution=220):
+    """ Builds an event stream with note-ons at the given (tick,pitch)s """
+    stream = EventStream()
+    stream.resolution = resolution
+    stream.add_track()
+    for tick,pitch in notes:
+        ev = NoteOnEvent()
+        ev.tick = tick
+        ev.pitch = pitch
+        ev.velocity = 100
+        stream.add_event(ev)
+    return stream
+
+def _random_notes(rand, length):
+    tick = 0
+    notes = []
+    for i in range(length):
+        notes.append((tick, rand.randint(40, 80)))
+        tick += rand.choice([0, 110, 220, 440])
+    return notes
+
+class TestNoteOnSimilarity(unittest.TestCase):
+    def test_similarity(self):
+        mid0 = _make_stream([(0, 60), (0, 64), (220, 62), (440, 60)])
+        mid1 = _make_stream([(0, 64), (220, 62), (220, 67), (660, 60)])
+        # 2 of mid0's notes are in mid1 and vice versa
+        self.assertEqual(note_on_similarity(mid0, mid1), (0.5, 0.5))
+        self.assertEqual(note_on_similarity(mid0, mid0), (1.0, 1.0))
+    
+    def test_repeated(self):
+        # Both of the first file's notes match the same note in the second
+        mid0 = _make_stream([(0, 60), (0, 60)])
+        mid1 = _make_stream([(0, 60), (220, 60), (440, 60)])
+        self.assertEqual(note_on_similarity(mid0, mid1), (1.0, 1.0/3))
+
+class TestFingerprintIndex(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(1)
+        self.notes = [_random_notes(rand, 200) for i in range(20)]
+    
+    def test_shingles(self):
+        """ Shingles shouldn't depend on key, offset or resolution """
+        shingles = note_on_shingles(_make_stream(self.notes[0]))
+        moved = _make_stream([(tick*2+1000, pitch+5) \
+                                for (tick,pitch) in self.notes[0]],
+                             resolution=440)
+        self.assertEqual(shingles, note_on_shingles(moved))
+        self.assertNotEqual(shingles, 
+                            note_on_shingles(_make_stream(self.notes[1])))
+    
+    def test_duplicates(self):
+        index = MidiFingerprintIndex()
+        for i,notes in enumerate(self.notes):
+            self.assertEqual(index.add(i, _make_stream(notes)), [])
+        # Add a transposed copy with a few notes changed
+        notes = [(tick+220, pitch+3) for (tick,pitch) in self.notes[5]]
+        for i in range(0, 200, 50):
+            notes[i] = (notes[i][0], notes[i][1]+1)
+        self.assertEqual(index.add("copy", _make_stream(notes)), [5])
+        self.assertEqual(index.get_candidates(), [(5, "copy")])
+        self.assertGreater(index.estimate_similarity(5, "copy"), 0.5)
+        self.assertLess(index.estimate_similarity(4, "copy"), 0.2)
+        self.assertEqual(len(index), 21)
+    
+    def test_too_short(self):
+        index = MidiFingerprintIndex()
+        index.add(0, _make_stream([(0, 60), (220, 62)]))
+        self.assertEqual(index.add(1, _make_stream([(0, 60), (220, 62)])), [])
+        self.assertEqual(index.estimate_similarity(0, 1), 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
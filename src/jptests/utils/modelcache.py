@@ -0,0 +1,81 @@
+"""Unit tests for jazzparser.utils.modelcache
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+
+import unittest, os, tempfile, shutil, time
+
+from jazzparser.utils.modelcache import enable_model_cache, \
+                    disable_model_cache, load_cached_model
+
+class _Model(object):
+    pass
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "model")
+        open(self.filename, 'w').write("model")
+        self.loads = 0
+    
+    def tearDown(self):
+        disable_model_cache()
+        shutil.rmtree(self.dir)
+    
+    def _load(self):
+        self.loads += 1
+        return _Model()
+    
+    def test_disabled(self):
+        """ Without the cache, the model should be loaded every time """
+        load_cached_model(_Model, "test", self.filename, self._load)
+        load_cached_model(_Model, "test", self.filename, self._load)
+        self.assertEqual(self.loads, 2)
+    
+    def test_enabled(self):
+        enable_model_cache()
+        model = load_cached_model(_Model, "test", self.filename, self._load)
+        self.assertTrue(
+            load_cached_model(_Model, "test", self.filename, self._load) \
+                                                                is model)
+        self.assertEqual(self.loads, 1)
+        # A different model name shouldn't get the same model
+        load_cached_model(_Model, "other", self.filename, self._load)
+        self.assertEqual(self.loads, 2)
+    
+    def test_modified(self):
+        """ The model should be reloaded if the file changes """
+        enable_model_cache()
+        model = load_cached_model(_Model, "test", self.filename, self._load)
+        mtime = os.path.getmtime(self.filename)
+        os.utime(self.filename, (mtime+10, mtime+10))
+        self.assertFalse(
+            load_cached_model(_Model, "test", self.filename, self._load) \
+                                                                is model)
+        self.assertEqual(self.loads, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""Unit tests for jazzparser.utils.multiproc
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>"
+
+import unittest, time
+
+from jazzparser.utils.multiproc import predict_costs, longest_first, \
+                    WorkerUsage
+
+class TestScheduling(unittest.TestCase):
+    """
+    Tests for the functions used to schedule jobs longest first.
+    
+    """
+    def test_size_only(self):
+        # With no known costs, the cost should just be a function of size
+        costs = predict_costs([2, 1, 3], exponent=3)
+        self.assertEqual(costs, [8.0, 1.0, 27.0])
+        self.assertEqual(longest_first(costs), [2, 0, 1])
+    
+    def test_known(self):
+        # Known costs should be used as they are and determine the scale 
+        #  for the others
+        costs = predict_costs([2, 1, 3, 4], [16.0, None, 54.0, None])
+        self.assertEqual(costs, [16.0, 2.0, 54.0, 128.0])
+        # Size shouldn't matter for jobs with known costs
+        costs = predict_costs([2, 10], [100.0, None], exponent=1)
+        self.assertEqual(costs, [100.0, 500.0])
+    
+    def test_order(self):
+        # Ties should stay in their original order
+        self.assertEqual(longest_first([1.0, 5.0, 1.0, 5.0, 3.0]), 
+                         [1, 3, 4, 0, 2])
+        self.assertEqual(longest_first([]), [])
+
+class TestWorkerUsage(unittest.TestCase):
+    def test_usage(self):
+        usage = WorkerUsage()
+        usage.start()
+        usage.add(10, 1.0)
+        usage.add(11, 2.0)
+        usage.add(10, 0.5)
+        usage.finish()
+        # Fake the run time
+        usage.end_time = usage.start_time + 3.0
+        self.assertEqual(usage.jobs, {10 : 2, 11 : 1})
+        self.assertAlmostEqual(usage.utilization(10), 0.5)
+        self.assertAlmostEqual(usage.utilization(11), 2.0/3.0)
+        self.assertEqual(usage.utilization(12), 0.0)
+        table = usage.table()
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table[1], ["10", "2", "1.5", "50.0%"])
+    
+    def test_start(self):
+        """ The run should be timed from the first job, not from creation """
+        usage = WorkerUsage()
+        self.assertEqual(usage.run_time, 0.0)
+        time.sleep(0.05)
+        usage.start()
+        start_time = usage.start_time
+        # Later jobs don't restart the timer
+        usage.start()
+        self.assertEqual(usage.start_time, start_time)
+        usage.add(10, 1.0)
+        usage.finish()
+        self.assertTrue(usage.run_time < 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
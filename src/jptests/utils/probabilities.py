@@ -0,0 +1,78 @@
+"""Unit tests for jazzparser.utils.probabilities
+
+"""
+"""
+============================== License ========================================
+ Copyright (C) 2008, 2010-12 University of Edinburgh, Mark Granroth-Wilding
+ 
+ This file is part of The Jazz Parser.
+ 
+ The Jazz Parser is free software: you can redistribute it and/or modify
+ it under the terms of the GNU General Public License as published by
+ the Free Software Foundation, either version 3 of the License, or
+ (at your option) any later version.
+ 
+ The Jazz Parser is distributed in the hope that it will be useful,
+ but WITHOUT ANY WARRANTY; without even the implied warranty of
+ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ GNU General Public License for more details.
+ 
+ You should have received a copy of the GNU General Public License
+ along with The Jazz Parser.  If not, see <http://www.gnu.org/licenses/>.
+
+============================ End license ======================================
+
+"""
+__author__ = "Mark Granroth-Wilding <mark.granroth-wilding@ed.ac.uk>" 
+
+import unittest, random
+from jazzparser.utils.probabilities import beamed_batch_sizes, \
+                    list_beamed_batch_sizes
+
+class TestBeamedBatchSizes(unittest.TestCase):
+    """
+    Tests for the array-based computation of beamed batch sizes, mainly 
+    by comparison to the original implementation.
+    
+    """
+    def test_simple(self):
+        probs = [[0.5, 0.3, 0.2], [0.9, 0.05, 0.05]]
+        self.assertEqual(beamed_batch_sizes(probs, 0.5), 
+                         [[1, 2, 0], [1, 0, 2]])
+    
+    def test_first_batch(self):
+        """
+        Every word should get something in the first batch, even if it's 
+        not in the beam.
+        
+        """
+        probs = [[0.9, 0.1], [0.01, 0.01, 0.001]]
+        sizes = beamed_batch_sizes(probs, 0.5)
+        self.assertEqual(sizes[1][0], 2)
+        self.assertEqual(sizes, list_beamed_batch_sizes(probs, 0.5))
+    
+    def test_max_batch(self):
+        probs = [[0.25]*4, [0.5, 0.5]]
+        self.assertEqual(beamed_batch_sizes(probs, 0.1, max_batch=3), 
+                         [[3, 1], [2, 0]])
+    
+    def test_random(self):
+        """
+        Compares the results to the original implementation on random 
+        distributions, with lots of ties.
+        
+        """
+        rand = random.Random(0)
+        values = [0.0, 0.1, 0.25, 0.5]
+        for trial in range(500):
+            probs = [[rand.choice(values) if rand.random() < 0.5 else rand.random() \
+                        for i in range(rand.randint(1, 10))] \
+                            for word in range(rand.randint(1, 6))]
+            ratio = rand.choice([0.01, 0.1, 0.5, 1.0])
+            max_batch = rand.choice([0, 0, 1, 2])
+            self.assertEqual(
+                beamed_batch_sizes(probs, ratio, max_batch=max_batch),
+                list_beamed_batch_sizes(probs, ratio, max_batch=max_batch))
+
+if __name__ == '__main__':
+    unittest.main()